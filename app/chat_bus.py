@@ -0,0 +1,224 @@
+# ============================================
+# FILE: app/chat_bus.py
+# Publish / subscribe bus behind the finance chat SSE streams
+# ============================================
+"""
+Routes publish small events (new message, status change) to one or more
+named channels; SSE streams block on `wait()` until something newer than
+their cursor arrives.
+
+    chat_bus.publish(["request:12", "admin"], "status", {...}, db=db)
+
+    if chat_bus.subscribe(limit=8):      # False: this worker is at its limit
+        try:
+            events, cursor, gap = chat_bus.wait(channels, cursor, timeout=15)
+        finally:
+            chat_bus.unsubscribe()
+
+Channels used by app.routers.chat:
+
+    request:<id>   messages + status of one finance request
+    user:<id>      status changes of that requester's requests
+    admin          status changes of every request
+
+Events live in a ring buffer (CHAT_BUS_BUFFER, default 1000) with a
+monotonically increasing id, which doubles as the SSE `id:` field so a
+reconnecting client resumes from `Last-Event-ID`. If the client's id has
+fallen out of the buffer (or the worker restarted), `gap` is True and the
+client re-syncs through the `?after_id=` message API.
+
+With several gunicorn workers set CHAT_BUS_SHARED=1: publishing then
+inserts into the `chat_events` table and each worker tails it every
+CHAT_BUS_POLL seconds (1.0) while it has subscribers, so a send on one
+worker reaches streams held by another. Event ids are then the table ids.
+The poller uses its own unpooled connection (app.db.get_direct_connection)
+so it never takes one of the request pool's slots.
+
+subscribe(limit) refuses a stream once `limit` are open in this worker:
+each open stream holds a gthread thread for up to CHAT_SSE_MAX_AGE, so
+without a cap a handful of chat tabs would leave no threads for ordinary
+requests. Deployments with many concurrent chat users should run the
+streams on an async worker (gevent / eventlet) where a waiting stream
+costs no thread.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque, namedtuple
+from datetime import datetime, timedelta
+
+BUFFER_SIZE = int(os.getenv("CHAT_BUS_BUFFER", "1000"))
+SHARED = os.getenv("CHAT_BUS_SHARED", "0").lower() in ("1", "true", "yes")
+POLL_INTERVAL = float(os.getenv("CHAT_BUS_POLL", "1.0"))
+EVENT_TTL = timedelta(hours=int(os.getenv("CHAT_BUS_TTL_HOURS", "24")))
+
+Event = namedtuple("Event", "id channels kind data")
+
+_cond = threading.Condition()
+_buffer = deque(maxlen=BUFFER_SIZE)
+_state = {"last_id": 0, "subscribers": 0, "poller": None}
+
+
+# ============================================
+# Local buffer
+# ============================================
+def _append(event_id, channels, kind, data):
+    with _cond:
+        if event_id <= _state["last_id"]:
+            return
+        _buffer.append(Event(event_id, frozenset(channels), kind, data))
+        _state["last_id"] = event_id
+        _cond.notify_all()
+
+
+def last_id():
+    return _state["last_id"]
+
+
+def _collect(channels, cursor):
+    """Events after `cursor` on any of `channels` (+ whether some were lost)."""
+    gap = bool(_buffer) and cursor and _buffer[0].id > cursor + 1
+    found = [e for e in _buffer if e.id > cursor and not e.channels.isdisjoint(channels)]
+    return found, gap
+
+
+# ============================================
+# Publish
+# ============================================
+def publish(channels, kind, data, db=None):
+    """
+    Publish one event on `channels`. In shared mode the row is written to
+    chat_events through `db` (committed here); the pollers deliver it.
+    Never raises - a failed publish only delays clients until they re-sync.
+    """
+    if isinstance(channels, str):
+        channels = [channels]
+
+    if SHARED and db is not None:
+        try:
+            payload = json.dumps(data, default=str)
+            cur = db.cursor()
+            cur.execute(
+                "INSERT INTO chat_events (channels, kind, payload, created_at) VALUES (%s, %s, %s, %s)",
+                (",".join(channels), kind, payload, datetime.utcnow()),
+            )
+            db.commit()
+            cur.close()
+            return
+        except Exception as e:
+            print("❌ chat_bus publish error:", e)
+            # fall through so at least this worker's subscribers hear it
+
+    with _cond:
+        _append(_state["last_id"] + 1, channels, kind, data)
+
+
+# ============================================
+# Subscribe
+# ============================================
+def wait(channels, cursor, timeout):
+    """
+    Block up to `timeout` seconds for events newer than `cursor`.
+    Returns (events, new_cursor, gap).
+    """
+    channels = set(channels)
+    with _cond:
+        if cursor > _state["last_id"]:
+            # id from a previous worker / restart - start over from "now"
+            return [], _state["last_id"], True
+
+        deadline = time.monotonic() + timeout
+        while True:
+            events, gap = _collect(channels, cursor)
+            if events or gap:
+                return events, _state["last_id"], gap
+            # nothing for us yet, but skip past other channels' events
+            cursor = _state["last_id"]
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return [], cursor, False
+            _cond.wait(remaining)
+
+
+def subscribe(limit=None):
+    """
+    Register an open stream (keeps the shared-mode poller running).
+    Returns False, registering nothing, when `limit` streams are already open.
+    """
+    with _cond:
+        if limit is not None and _state["subscribers"] >= limit:
+            return False
+        _state["subscribers"] += 1
+    if SHARED:
+        _ensure_poller()
+    return True
+
+
+def unsubscribe():
+    with _cond:
+        _state["subscribers"] -= 1
+
+
+# ============================================
+# Cross-worker poller (CHAT_BUS_SHARED=1)
+# ============================================
+def _ensure_poller():
+    with _cond:
+        poller = _state["poller"]
+        if poller is not None and poller.is_alive():
+            return
+        poller = threading.Thread(target=_poll_loop, name="chat-bus-poller", daemon=True)
+        _state["poller"] = poller
+    poller.start()
+
+
+def _poll_loop():
+    from app.db import get_direct_connection
+
+    last_prune = 0.0
+    while True:
+        if _state["subscribers"] <= 0:
+            time.sleep(POLL_INTERVAL)
+            continue
+
+        conn = get_direct_connection()
+        if conn is None:
+            time.sleep(POLL_INTERVAL * 5)
+            continue
+        try:
+            cur = conn.cursor()
+            if not _state["last_id"]:
+                # first run: start at the tail, history is served by the message API
+                cur.execute("SELECT COALESCE(MAX(id), 0) FROM chat_events")
+                with _cond:
+                    _state["last_id"] = max(_state["last_id"], cur.fetchone()[0])
+
+            while _state["subscribers"] > 0:
+                cur.execute(
+                    "SELECT id, channels, kind, payload FROM chat_events WHERE id > %s ORDER BY id LIMIT 500",
+                    (_state["last_id"],),
+                )
+                for event_id, channels, kind, payload in cur.fetchall():
+                    _append(event_id, channels.split(","), kind, json.loads(payload))
+                conn.commit()  # end the snapshot so the next SELECT sees new rows
+
+                if time.monotonic() - last_prune > 3600:
+                    cur.execute(
+                        "DELETE FROM chat_events WHERE created_at < %s",
+                        (datetime.utcnow() - EVENT_TTL,),
+                    )
+                    conn.commit()
+                    last_prune = time.monotonic()
+
+                time.sleep(POLL_INTERVAL)
+            cur.close()
+        except Exception as e:
+            print("❌ chat_bus poll error:", e)
+            time.sleep(POLL_INTERVAL * 5)
+        finally:
+            try:
+                conn.close()
+            except Exception:
+                pass
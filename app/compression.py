@@ -0,0 +1,164 @@
+# ============================================
+# FILE: app/compression.py
+# gzip / brotli response compression
+# ============================================
+"""
+Compresses text-like responses (JSON, HTML, CSS/JS, CSV) after the view
+has run, so every list API and page benefits without touching routes.
+
+    COMPRESS_MIN_SIZE     bytes below which responses are sent as-is (1024)
+    COMPRESS_LEVEL        gzip level (6)
+    COMPRESS_BR_QUALITY   brotli quality (4) - only if `brotli` is installed
+    COMPRESS_DISABLED     "1" to switch the layer off (e.g. behind nginx gzip)
+
+Streamed responses are compressed chunk by chunk (each chunk flushed so
+the client still receives data progressively); Server-Sent Events and
+file downloads (send_file / direct passthrough) are left alone. Every
+compressible response carries `Vary: Accept-Encoding` so shared caches
+keep encoded and plain variants apart.
+"""
+
+import gzip
+import os
+import zlib
+
+from flask import Blueprint, request
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+compression_bp = Blueprint("compression", __name__)
+
+MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("COMPRESS_LEVEL", "6"))
+BR_QUALITY = int(os.getenv("COMPRESS_BR_QUALITY", "4"))
+DISABLED = os.getenv("COMPRESS_DISABLED", "0").lower() in ("1", "true", "yes")
+
+COMPRESSIBLE_TYPES = {
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+    "text/css",
+    "text/csv",
+    "text/html",
+    "text/javascript",
+    "text/plain",
+    "text/xml",
+}
+
+
+# ============================================
+# Helpers
+# ============================================
+def choose_encoding(accept_encoding):
+    """Best supported coding from an Accept-Encoding header (q-values honoured)."""
+    offered = {}
+    for part in (accept_encoding or "").split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        offered[token] = q
+
+    candidates = (["br"] if brotli is not None else []) + ["gzip"]
+    best, best_q = None, 0.0
+    for coding in candidates:
+        q = offered.get(coding, offered.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def _add_vary(response):
+    vary = response.headers.get("Vary", "")
+    if "accept-encoding" not in vary.lower():
+        response.headers["Vary"] = f"{vary}, Accept-Encoding" if vary else "Accept-Encoding"
+
+
+def _tag_etag(response, coding):
+    # a compressed body is a different representation -> different validator
+    etag = response.headers.get("ETag")
+    if etag and etag.endswith('"'):
+        response.headers["ETag"] = f'{etag[:-1]}-{coding}"'
+
+
+def compress_bytes(data, coding):
+    if coding == "br":
+        return brotli.compress(data, quality=BR_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+
+def compress_stream(chunks, coding):
+    """Compress an iterable of chunks, flushing after each one."""
+    if coding == "br":
+        comp = brotli.Compressor(quality=BR_QUALITY)
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode("utf-8")
+            out = comp.process(chunk) + comp.flush()
+            if out:
+                yield out
+        yield comp.finish()
+        return
+
+    comp = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode("utf-8")
+        out = comp.compress(chunk) + comp.flush(zlib.Z_SYNC_FLUSH)
+        if out:
+            yield out
+    yield comp.flush()
+
+
+# ============================================
+# Hook
+# ============================================
+@compression_bp.after_app_request
+def compress_response(response):
+    if DISABLED:
+        return response
+
+    if response.mimetype not in COMPRESSIBLE_TYPES:
+        return response
+
+    _add_vary(response)
+
+    if (
+        response.status_code < 200
+        or response.status_code in (204, 206, 304)
+        or response.direct_passthrough
+        or "Content-Encoding" in response.headers
+        or request.method == "HEAD"
+    ):
+        return response
+
+    coding = choose_encoding(request.headers.get("Accept-Encoding"))
+    if coding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = compress_stream(response.response, coding)
+        response.headers.pop("Content-Length", None)
+    else:
+        data = response.get_data()
+        if len(data) < MIN_SIZE:
+            return response
+        compressed = compress_bytes(data, coding)
+        if len(compressed) >= len(data):
+            return response
+        response.set_data(compressed)
+
+    response.headers["Content-Encoding"] = coding
+    _tag_etag(response, coding)
+    return response
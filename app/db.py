@@ -2,8 +2,14 @@
 
 import mysql.connector
 from mysql.connector import pooling, Error
+from mysql.connector.errors import PoolError
 from dotenv import load_dotenv
 import os
+import threading
+import time
+
+from app.metrics import instrument
+from app import queries
 
 # Load env
 env_path = os.path.join(os.path.dirname(__file__), ".env")
@@ -15,6 +21,46 @@ DB_PASSWORD = os.getenv("MYSQL_PASSWORD", "Tions@98")
 DB_NAME = os.getenv("MYSQL_DB", "u514260654_test_erp")
 DB_PORT = int(os.getenv("MYSQL_PORT", 3306))
 
+# Session reset on pool return also drops server-side prepared statements
+# (see app/queries.py), so it is off by default: nothing in the app sets
+# session variables, and a transaction left open by the previous user of a
+# connection is rolled back at checkout instead. MYSQL_POOL_RESET_SESSION=1
+# brings the reset back (prepared statements then last one request).
+POOL_RESET_SESSION = os.getenv("MYSQL_POOL_RESET_SESSION", "0").lower() in ("1", "true", "yes")
+
+# gunicorn runs gthread workers (16 threads, mostly idle SSE streams) but the
+# shared DB only takes a few connections per worker. mysql.connector's pool
+# raises PoolError at once when it is empty, so checkout sleeps until a
+# connection is returned (up to MYSQL_POOL_TIMEOUT seconds) instead.
+POOL_SIZE = int(os.getenv("MYSQL_POOL_SIZE", "3"))
+POOL_TIMEOUT = float(os.getenv("MYSQL_POOL_TIMEOUT", "10"))
+
+
+class BlockingPool(pooling.MySQLConnectionPool):
+    """MySQLConnectionPool whose get_connection() can wait for a returned connection."""
+
+    def __init__(self, **kwargs):
+        self._returned = threading.Condition()  # before super(): it adds the first connections
+        super().__init__(**kwargs)
+
+    def add_connection(self, cnx=None):
+        super().add_connection(cnx)
+        with self._returned:
+            self._returned.notify()
+
+    def get_connection(self, timeout=0):
+        deadline = time.monotonic() + timeout
+        with self._returned:
+            while True:
+                try:
+                    return super().get_connection()
+                except PoolError:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise
+                    # add_connection() notifies under this lock: no return is missed
+                    self._returned.wait(remaining)
+
 
 # ============================
 # Try SINGLE TEST CONNECTION
@@ -43,10 +89,10 @@ connection_pool = None
 
 if test_single_connection():   # only build pool if DB is reachable
     try:
-        connection_pool = pooling.MySQLConnectionPool(
+        connection_pool = BlockingPool(
             pool_name="erp_pool",
-            pool_size=3,     # 🔥 Hostinger shared DB cannot handle 10!
-            pool_reset_session=True,
+            pool_size=POOL_SIZE,     # 🔥 Hostinger shared DB cannot handle 10!
+            pool_reset_session=POOL_RESET_SESSION,
             host=DB_HOST,
             user=DB_USER,
             password=DB_PASSWORD,
@@ -65,20 +111,46 @@ else:
 # ============================
 # GET CONNECTION (Failsafe)
 # ============================
+def _checkout():
+    """Pooled connection, waiting (up to POOL_TIMEOUT) while all are in use."""
+    conn = connection_pool.get_connection(timeout=POOL_TIMEOUT)
+    if POOL_RESET_SESSION:
+        queries.forget(conn)  # the reset dropped the server-side statements
+    elif conn.in_transaction:
+        conn.rollback()       # previous user left a transaction open
+    return conn
+
+
+def _connect():
+    return instrument(mysql.connector.connect(
+        host=DB_HOST,
+        user=DB_USER,
+        password=DB_PASSWORD,
+        database=DB_NAME,
+        port=DB_PORT,
+        connection_timeout=5,
+    ))
+
+
 def get_mysql_connection():
     try:
         if connection_pool:
-            return connection_pool.get_connection()
+            return instrument(_checkout())
 
         # fallback
-        return mysql.connector.connect(
-            host=DB_HOST,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            database=DB_NAME,
-            port=DB_PORT,
-            connection_timeout=5,
-        )
+        return _connect()
     except Error as e:
         print("❌ MySQL Get Connection Error:", e)
         return None
+
+
+def get_direct_connection():
+    """
+    Unpooled connection for long-lived background loops (chat bus poller),
+    so they never hold one of the POOL_SIZE slots request threads wait on.
+    """
+    try:
+        return _connect()
+    except Error as e:
+        print("❌ MySQL Direct Connection Error:", e)
+        return None
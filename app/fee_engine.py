@@ -0,0 +1,187 @@
+# ============================================
+# FILE: app/fee_engine.py
+# Fee structure matching + batched assigned_fees inserts
+# ============================================
+"""
+Applies fee_structures to students without one query per structure:
+
+    structures = fee_engine.load_structures(cur)          # whole table, once
+    fee_engine.match(structures, student_row)             # -> [(structure_id, head_id, amount)]
+    fee_engine.apply_to_students(conn, student_ids)       # match + insert, in batches
+
+A structure matches a student when every field it sets (course, session,
+branch, department, batch) equals the student's; an empty field matches
+anything. Values are compared trimmed and case-insensitively, like the
+MySQL collation the old per-structure WHERE relied on.
+
+Structures are kept in a dict keyed by the 5-tuple (None for "any"), plus
+the handful of field masks actually in use. Matching a student is one dict
+lookup per mask. When two structures charge the same fee head, the one
+with more fields set wins, so a student is never billed twice for a head.
+
+Every row written records its structure_id. A student who already has an
+assigned_fees row for a fee head is never given another one for that head
+- this covers rows from before migration 9 (structure_id NULL) and fees
+assigned by hand - so re-running an assignment or importing the same
+students twice adds nothing. The unique key on (student_id, structure_id)
+(schema migration 9) backs that up against two runs racing.
+
+add_student and the bulk import call apply_to_students() for the new
+students when FEE_AUTO_APPLY is on (default).
+"""
+
+import os
+import uuid
+from datetime import datetime
+
+MATCH_FIELDS = ("course", "session", "branch", "department", "batch")
+AUTO_APPLY = os.getenv("FEE_AUTO_APPLY", "1").lower() in ("1", "true", "yes")
+BATCH_SIZE = int(os.getenv("FEE_ENGINE_BATCH", "500"))
+
+INSERT_SQL = """
+    INSERT INTO assigned_fees (id, student_id, head_id, amount, due_date, status, created_at, structure_id)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE id = id
+"""
+
+
+def _norm(value):
+    if value is None:
+        return None
+    value = str(value).strip().lower()
+    return value or None
+
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+# ============================================
+# Lookup table
+# ============================================
+def load_structures(cur, where="", params=()):
+    """All fee_structures (or a filtered subset) as a lookup table."""
+    cur.execute(f"""
+        SELECT id, course, session, branch, department, batch, head_id, amount
+        FROM fee_structures {where}
+    """, tuple(params))
+    table, masks = {}, set()
+    for structure_id, *fields, head_id, amount in cur.fetchall():
+        key = tuple(_norm(v) for v in fields)
+        mask = tuple(v is not None for v in key)
+        table.setdefault(key, []).append((structure_id, head_id, amount))
+        masks.add(mask)
+    # most specific masks first - they win a fee head
+    return {"table": table, "masks": sorted(masks, key=sum, reverse=True)}
+
+
+def match(structures, student):
+    """[(structure_id, head_id, amount)] for a student dict (MATCH_FIELDS keys)."""
+    values = tuple(_norm(student.get(f)) for f in MATCH_FIELDS)
+    chosen = {}
+    for mask in structures["masks"]:
+        if any(m and v is None for m, v in zip(mask, values)):
+            continue
+        key = tuple(v if m else None for m, v in zip(mask, values))
+        for structure_id, head_id, amount in structures["table"].get(key, ()):
+            chosen.setdefault(head_id, (structure_id, amount))
+    return [(sid, head_id, amount) for head_id, (sid, amount) in chosen.items()]
+
+
+# ============================================
+# Writing assigned_fees
+# ============================================
+def _existing_heads(cur, student_ids):
+    """{(student_id, head_id)} already in assigned_fees for these students."""
+    if not student_ids:
+        return set()
+    marks = ", ".join(["%s"] * len(student_ids))
+    cur.execute(f"SELECT student_id, head_id FROM assigned_fees WHERE student_id IN ({marks})",
+                tuple(student_ids))
+    return set(cur.fetchall())
+
+
+def insert_assignments(cur, rows, due_date=None):
+    """
+    rows: [(student_id, structure_id, head_id, amount)]. Inserted in
+    batches, skipping students who already have that fee head.
+    Returns the number of new rows (caller commits).
+    """
+    now = datetime.utcnow()
+    added = 0
+    for chunk in _chunks(rows, BATCH_SIZE):
+        have = _existing_heads(cur, list(dict.fromkeys(r[0] for r in chunk)))
+        fresh = []
+        for student_id, structure_id, head_id, amount in chunk:
+            if (student_id, head_id) not in have:
+                have.add((student_id, head_id))
+                fresh.append((student_id, structure_id, head_id, amount))
+        if not fresh:
+            continue
+        cur.executemany(INSERT_SQL, [
+            (str(uuid.uuid4()), student_id, head_id, amount, due_date, "Not Paid", now, structure_id)
+            for student_id, structure_id, head_id, amount in fresh
+        ])
+        # ON DUPLICATE KEY no-ops count 0
+        added += max(cur.rowcount, 0)
+    return added
+
+
+def assignments_for(cur, student_ids, structures):
+    """Matched rows [(student_id, structure_id, head_id, amount)] for these students (by id)."""
+    if not student_ids:
+        return []
+    marks = ", ".join(["%s"] * len(student_ids))
+    cur.execute(f"SELECT id, {', '.join(MATCH_FIELDS)} FROM students WHERE id IN ({marks})",
+                tuple(student_ids))
+    rows = []
+    for student_id, *values in cur.fetchall():
+        student = dict(zip(MATCH_FIELDS, values))
+        rows += [(student_id, sid, head_id, amount) for sid, head_id, amount in match(structures, student)]
+    return rows
+
+
+def apply_to_students(conn, student_ids, structures=None, due_date=None, progress=None):
+    """
+    Match students (by id) against the structures and insert their fees,
+    one transaction per BATCH_SIZE students. Returns rows added.
+    """
+    student_ids = list(dict.fromkeys(student_ids))
+    if not student_ids:
+        return 0
+    cur = conn.cursor()
+    try:
+        if structures is None:
+            structures = load_structures(cur)
+        if not structures["table"]:
+            return 0
+
+        added = done = 0
+        for chunk in _chunks(student_ids, BATCH_SIZE):
+            added += insert_assignments(cur, assignments_for(cur, chunk, structures), due_date)
+            conn.commit()
+            done += len(chunk)
+            if progress:
+                progress(done, len(student_ids), "Assigning fee structures")
+        return added
+    finally:
+        cur.close()
+
+
+def auto_apply(conn, student_ids):
+    """Hook for newly admitted / imported students (never raises)."""
+    if not AUTO_APPLY or not student_ids:
+        return 0
+    try:
+        added = apply_to_students(conn, student_ids)
+        if added:
+            print(f"💰 Auto-assigned {added} fee rows to {len(student_ids)} new student(s)")
+        return added
+    except Exception as e:
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        print("❌ Fee auto-assign error:", e)
+        return 0
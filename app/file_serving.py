@@ -0,0 +1,143 @@
+# ============================================
+# FILE: app/file_serving.py
+# Upload serving: proxy offload, Range, ETag / immutable caching
+# ============================================
+"""
+Every route that hands out an uploaded document goes through serve_file():
+
+    return serve_file(UPLOAD_FOLDER, filename)
+    return serve_file(directory, name, as_attachment=True)
+
+Behaviour:
+
+  * Content-named files (app.storage paths, aa/bb/<sha256>.ext) get the
+    hash as a strong ETag and `Cache-Control: private, max-age=31536000,
+    immutable` - their bytes can never change under that URL. `private`
+    because these are payment proofs, finance attachments and student ID
+    scans; only the user's own browser may keep them. (app.images stores
+    a downscaled image as a new blob instead of rewriting the original.)
+    Legacy flat names get an mtime/size ETag and `no-cache`, so browsers
+    revalidate with a cheap 304.
+  * Range requests (PDF viewers seek through large scans) and
+    If-None-Match / If-Modified-Since are answered by werkzeug.
+  * FILE_OFFLOAD="nginx" returns an empty response with X-Accel-Redirect
+    so nginx streams the file and the gunicorn worker is free at once.
+    FILE_OFFLOAD="sendfile" uses X-Sendfile (Apache mod_xsendfile,
+    lighttpd). The proxy then also handles Range.
+
+  * With STORAGE_BACKEND=s3 (see app.storage) a file that isn't on local
+    disk is answered with a 302 to a pre-signed bucket URL; the browser /
+    app downloads it from the object store directly. Files still on disk
+    (uploads from before the switch) keep being served from here.
+
+nginx example (FILE_ACCEL_PREFIX=/_files, paths relative to the project):
+
+    location /_files/ {
+        internal;
+        alias /srv/tatwadarsha_erp_flask/;
+    }
+"""
+
+import mimetypes
+import os
+from urllib.parse import quote
+
+from flask import abort, redirect, request, send_file
+from werkzeug.security import safe_join
+
+from app import storage
+
+PROJECT_DIR = os.path.dirname(storage.APP_DIR)
+
+OFFLOAD = os.getenv("FILE_OFFLOAD", "").strip().lower()      # "", "nginx", "sendfile"
+ACCEL_PREFIX = os.getenv("FILE_ACCEL_PREFIX", "/_files").rstrip("/")
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+# ============================================
+# Helpers
+# ============================================
+def _cache_headers(response, digest):
+    if digest:
+        response.cache_control.no_cache = None
+        # payment proofs, ID scans: browser cache only, never shared proxies / CDNs
+        response.cache_control.private = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response
+
+
+def _content_disposition(name, as_attachment):
+    kind = "attachment" if as_attachment else "inline"
+    try:
+        name.encode("ascii")
+        return f'{kind}; filename="{name}"'
+    except UnicodeEncodeError:
+        return f"{kind}; filename*=UTF-8''{quote(name)}"
+
+
+def _offload_response(path, digest, mimetype, download_name, as_attachment):
+    from flask import current_app
+
+    response = current_app.response_class(status=200, mimetype=mimetype)
+    stat = os.stat(path)
+    if OFFLOAD == "nginx":
+        rel = os.path.relpath(path, PROJECT_DIR).replace(os.sep, "/")
+        response.headers["X-Accel-Redirect"] = quote(f"{ACCEL_PREFIX}/{rel}")
+    else:
+        response.headers["X-Sendfile"] = path
+
+    response.headers["Content-Disposition"] = _content_disposition(download_name, as_attachment)
+    response.last_modified = int(stat.st_mtime)
+    response.set_etag(digest or f"{int(stat.st_mtime)}-{stat.st_size}")
+    _cache_headers(response, digest)
+
+    # a 304 still saves the proxy a disk read; the body itself is the proxy's job
+    return response.make_conditional(request)
+
+
+def _remote_response(store, key, download_name, as_attachment):
+    url = store.url(key, download_name, as_attachment)
+    response = redirect(url, code=302)
+    # the signed URL expires; let the browser reuse the redirect for a while only
+    response.cache_control.private = True
+    response.cache_control.max_age = max(store.url_ttl // 2, 0)
+    return response
+
+
+# ============================================
+# Public API
+# ============================================
+def serve_file(directory, filename, as_attachment=False, download_name=None):
+    """send_from_directory() replacement (404 on missing / escaping paths)."""
+    path = safe_join(os.path.abspath(directory), filename)
+    if path is None:
+        abort(404)
+    download_name = download_name or os.path.basename(path)
+
+    if not os.path.isfile(path):
+        store = storage.backend()
+        if not store.remote:
+            abort(404)
+        return _remote_response(store, storage.object_key(directory, filename), download_name, as_attachment)
+
+    rel = filename.replace("\\", "/")
+    digest = storage.digest_of(rel)
+    mimetype = mimetypes.guess_type(download_name)[0] or "application/octet-stream"
+
+    if OFFLOAD in ("nginx", "sendfile"):
+        return _offload_response(path, digest, mimetype, download_name, as_attachment)
+
+    response = send_file(
+        path,
+        mimetype=mimetype,
+        as_attachment=as_attachment,
+        download_name=download_name,
+        etag=digest or True,
+        conditional=True,
+        max_age=None,
+    )
+    response.headers.setdefault("Accept-Ranges", "bytes")
+    return _cache_headers(response, digest)
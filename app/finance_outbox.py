@@ -0,0 +1,284 @@
+# ============================================
+# FILE: app/finance_outbox.py
+# Transactional outbox: fee payments -> finance_transactions
+# ============================================
+"""
+Fee collection used to write the finance INCOME row itself, inside the
+payment transaction: a 3-table join for the student / fee head names, a
+bank_accounts lookup, then the insert - and if any of that failed it
+printed and committed the payment anyway, so the ledger silently missed
+the fee.
+
+Now collect_payment only adds one compact event row, in the same
+transaction as the payment (so there is an event exactly when there is a
+payment):
+
+    finance_outbox.add_fee_payment(cur, payment_id, {...})
+
+and a consumer applies events in batches:
+
+    python tools/run_outbox.py            # loop (Procfile `outbox`)
+    python tools/run_outbox.py --once     # drain and exit (cron)
+
+A batch is claimed with FOR UPDATE SKIP LOCKED (any number of consumers),
+the names and account types for the whole batch are read with two
+IN (...) queries, the finance rows go in with one executemany, and the
+events are marked done - all in one transaction, so a crash never leaves
+a posted event "pending" or the other way round. The finance row's id is
+the payment id, so a payment can't be posted twice either.
+
+When a batch fails, its events are retried one by one so a single bad
+event can't hold up the rest. A failing event waits RETRY_DELAY * 2^n
+seconds between attempts; after MAX_ATTEMPTS it is "dead" and shows up in
+GET /api/finance/outbox?status=dead until someone retries it
+(POST /api/finance/outbox/<id>/retry).
+"""
+
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+BATCH_SIZE = int(os.getenv("OUTBOX_BATCH", "200"))
+POLL_INTERVAL = float(os.getenv("OUTBOX_POLL", "2.0"))
+RETRY_DELAY = int(os.getenv("OUTBOX_RETRY_DELAY", "30"))
+MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+
+STATUS_PENDING = "pending"
+STATUS_DONE = "done"
+STATUS_DEAD = "dead"
+
+KIND_FEE_PAYMENT = "fee_payment"
+
+FINANCE_INSERT = """
+    INSERT INTO finance_transactions
+        (id, account_id, transaction_mode, transaction_type, amount, category,
+         description, attachment_url, tx_date, created_at, student_name, fee_head,
+         payment_mode, utr_no, remark, receipt_no, income_category)
+    VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
+"""
+
+
+# ============================================
+# Producer (inside the payment transaction)
+# ============================================
+def add_fee_payment(cur, payment_id, event):
+    """
+    Queue the finance posting for a payment; caller commits with the payment.
+    event: assigned_id, account_id, amount, tx_date, payment_mode, utr,
+           remark, receipt_no, file
+    """
+    now = datetime.utcnow()
+    cur.execute("""
+        INSERT INTO finance_outbox (kind, ref_id, payload, status, attempts, next_attempt_at, created_at)
+        VALUES (%s, %s, %s, %s, 0, %s, %s)
+    """, (KIND_FEE_PAYMENT, payment_id, json.dumps(event, separators=(",", ":"), default=str),
+          STATUS_PENDING, now, now))
+
+
+# ============================================
+# Consumer
+# ============================================
+def _claim(cur, limit):
+    cur.execute("""
+        SELECT id, ref_id, payload, attempts FROM finance_outbox
+        WHERE status=%s AND next_attempt_at <= %s
+        ORDER BY id
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    """, (STATUS_PENDING, datetime.utcnow(), limit))
+    return [(oid, ref_id, json.loads(payload), attempts) for oid, ref_id, payload, attempts in cur.fetchall()]
+
+
+def _claim_one(cur, outbox_id):
+    cur.execute("""
+        SELECT id, ref_id, payload, attempts FROM finance_outbox
+        WHERE id=%s AND status=%s
+        FOR UPDATE SKIP LOCKED
+    """, (outbox_id, STATUS_PENDING))
+    return [(oid, ref_id, json.loads(payload), attempts) for oid, ref_id, payload, attempts in cur.fetchall()]
+
+
+def _lookup(cur, sql, keys):
+    keys = sorted({k for k in keys if k is not None}, key=str)
+    if not keys:
+        return {}
+    cur.execute(sql.format(marks=", ".join(["%s"] * len(keys))), tuple(keys))
+    return {row[0]: row[1:] for row in cur.fetchall()}
+
+
+def finance_rows(cur, events):
+    """finance_transactions rows for [(outbox_id, payment_id, event, attempts)]."""
+    names = _lookup(cur, """
+        SELECT af.id, s.name, fh.name
+        FROM assigned_fees af
+        LEFT JOIN students s ON af.student_id = s.id
+        LEFT JOIN fee_heads fh ON af.head_id = fh.id
+        WHERE af.id IN ({marks})
+    """, [e["assigned_id"] for _, _, e, _ in events])
+    accounts = _lookup(cur, "SELECT id, account_type FROM bank_accounts WHERE id IN ({marks})",
+                       [int(e["account_id"]) for _, _, e, _ in events])
+
+    now = datetime.utcnow()
+    rows = []
+    for _, payment_id, e, _ in events:
+        student_name, fee_head_name = [v or "" for v in names.get(e["assigned_id"], (None, None))]
+        account_type = (accounts.get(int(e["account_id"])) or (None,))[0]
+        rows.append((
+            payment_id,
+            e["account_id"],
+            account_type or "BANK",
+            "INCOME",
+            float(e["amount"]),
+            "Fee",
+            f"{student_name} - {fee_head_name}" if (student_name or fee_head_name) else "Fee Collection",
+            e.get("file"),
+            e["tx_date"],
+            now,
+            student_name,
+            fee_head_name,
+            e.get("payment_mode") or "",
+            e.get("utr") or "",
+            e.get("remark") or "",
+            e.get("receipt_no"),
+            "Fee Collection",
+        ))
+    return rows
+
+
+def _apply(cur, events):
+    cur.executemany(FINANCE_INSERT, finance_rows(cur, events))
+    marks = ", ".join(["%s"] * len(events))
+    cur.execute(f"""
+        UPDATE finance_outbox SET status=%s, processed_at=%s, last_error=NULL
+        WHERE id IN ({marks})
+    """, (STATUS_DONE, datetime.utcnow(), *[oid for oid, _, _, _ in events]))
+
+
+def _fail(conn, event, error):
+    oid, _, _, attempts = event
+    attempts += 1
+    dead = attempts >= MAX_ATTEMPTS
+    cur = conn.cursor()
+    cur.execute("""
+        UPDATE finance_outbox
+        SET status=%s, attempts=%s, next_attempt_at=%s, last_error=%s
+        WHERE id=%s
+    """, (STATUS_DEAD if dead else STATUS_PENDING, attempts,
+          datetime.utcnow() + timedelta(seconds=RETRY_DELAY * 2 ** (attempts - 1)),
+          error[:2000], oid))
+    conn.commit()
+    cur.close()
+    print(f"{'☠️' if dead else '⚠️'} finance outbox #{oid} attempt {attempts} failed:", error)
+
+
+def drain_batch(conn, limit=BATCH_SIZE):
+    """Apply one batch; returns (posted, failed). 0, 0 means nothing is due."""
+    cur = conn.cursor()
+    try:
+        events = _claim(cur, limit)
+        if not events:
+            conn.commit()
+            return 0, 0
+        try:
+            _apply(cur, events)
+            conn.commit()
+            return len(events), 0
+        except Exception:
+            conn.rollback()
+
+        # isolate the bad event(s): one transaction each
+        posted = failed = 0
+        for event in events:
+            try:
+                claimed = _claim_one(cur, event[0])
+                if claimed:
+                    _apply(cur, claimed)
+                conn.commit()
+                posted += len(claimed)
+            except Exception as e:
+                conn.rollback()
+                _fail(conn, event, f"{type(e).__name__}: {e}")
+                failed += 1
+        return posted, failed
+    finally:
+        cur.close()
+
+
+def drain(conn, limit=BATCH_SIZE):
+    """Apply every due event; returns (posted, failed)."""
+    posted = failed = 0
+    while True:
+        p, f = drain_batch(conn, limit)
+        posted, failed = posted + p, failed + f
+        if p + f < limit:
+            return posted, failed
+
+
+def run_consumer(once=False, log=print):
+    """Poll and drain until interrupted (or the outbox is empty with once=True)."""
+    from app.db import get_mysql_connection
+
+    log(f"📮 finance outbox consumer (batch {BATCH_SIZE})")
+    while True:
+        conn = get_mysql_connection()
+        if conn is None:
+            time.sleep(POLL_INTERVAL * 5)
+            continue
+        try:
+            posted, failed = drain(conn)
+            if posted or failed:
+                log(f"📮 finance outbox: {posted} posted, {failed} failed")
+                from app.routers.dashboard import invalidate_snapshot
+                invalidate_snapshot()
+        except Exception as e:
+            print("❌ finance outbox error:", e)
+        finally:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        if once:
+            return
+        time.sleep(POLL_INTERVAL)
+
+
+# ============================================
+# Dead letters
+# ============================================
+def list_events(conn, status=STATUS_DEAD, limit=100):
+    cur = conn.cursor(dictionary=True)
+    cur.execute("""
+        SELECT id, kind, ref_id, payload, status, attempts, next_attempt_at,
+               last_error, created_at, processed_at
+        FROM finance_outbox
+        WHERE status=%s
+        ORDER BY id DESC
+        LIMIT %s
+    """, (status, limit))
+    rows = cur.fetchall()
+    cur.close()
+    for row in rows:
+        row["payload"] = json.loads(row["payload"] or "{}")
+    return rows
+
+
+def counts(conn):
+    cur = conn.cursor()
+    cur.execute("SELECT status, COUNT(*) FROM finance_outbox GROUP BY status")
+    result = {status: n for status, n in cur.fetchall()}
+    cur.close()
+    return result
+
+
+def retry(conn, outbox_id):
+    """Put a dead (or waiting) event back in line now; False if unknown / already done."""
+    cur = conn.cursor()
+    cur.execute("""
+        UPDATE finance_outbox SET status=%s, attempts=0, next_attempt_at=%s
+        WHERE id=%s AND status IN (%s, %s)
+    """, (STATUS_PENDING, datetime.utcnow(), outbox_id, STATUS_DEAD, STATUS_PENDING))
+    ok = cur.rowcount == 1
+    conn.commit()
+    cur.close()
+    return ok
@@ -0,0 +1,162 @@
+# ============================================
+# FILE: app/finance_query.py
+# One filter builder + keyset pages over finance_transactions
+# ============================================
+"""
+Every finance history screen is the same query with different fixed
+filters, so they share this module:
+
+    page = finance_query.fetch_page(cur, {"type": "EXPENSE", "category": "Rent"},
+                                    cursor=None, limit=50)
+    -> {"data": [...], "has_more": True, "next_cursor": "2025-03-02_8f1c...",
+        "totals": {"count": 1234, "amount": 98765.0}}
+
+Filters (all optional, ANDed):
+
+    type        transaction_type, "EXPENSE" or "INCOME,DEPOSIT"
+    mode        transaction_mode ("BANK" / "CASH")
+    account_id  bank_accounts.id
+    category    exact category ("ALL" = no filter)
+    from_date   YYYY-MM-DD, inclusive
+    to_date     YYYY-MM-DD, inclusive
+    q           text in description / category / student / receipt / UTR
+
+Pages are newest first on (tx_date, id). The cursor is the last row's
+"<tx_date>_<id>", so page N costs the same as page 1 on
+idx_ft_type_date / idx_ft_account_date (InnoDB appends the primary key to
+both). LIMIT 200 with no way past it is gone.
+
+Totals come from window functions on the first page (no cursor), in the
+same statement as the rows; later pages skip them since the client already
+has them.
+
+limit=None returns every matching row in one response. The self-withdrawal,
+expense and income history endpoints always did that, and mobile builds
+that send neither ?cursor= nor ?limit= still get it (only bank deposit
+history was capped at 200 before paging existed).
+"""
+
+from datetime import datetime
+
+DEFAULT_PAGE = 200      # what the mobile history screens always got
+MAX_PAGE = 500
+
+TX_COLUMNS = """
+    ft.id, ft.account_id, ba.account_name, ft.transaction_type, ft.transaction_mode,
+    ft.amount, ft.category, ft.description, ft.tx_date, ft.attachment_url,
+    ft.student_name, ft.fee_head, ft.payment_mode, ft.utr_no, ft.receipt_no
+"""
+
+TEXT_COLUMNS = ("ft.description", "ft.category", "ft.student_name", "ft.receipt_no", "ft.utr_no")
+
+FILTER_KEYS = ("type", "mode", "account_id", "category", "from_date", "to_date", "q")
+
+
+def _day(value):
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def parse_cursor(value):
+    """"<YYYY-MM-DD>_<id>" -> (date, id). Raises ValueError."""
+    day, sep, tx_id = (value or "").partition("_")
+    if not sep or not tx_id:
+        raise ValueError("bad cursor")
+    return _day(day), tx_id
+
+
+def make_cursor(row):
+    if not row.get("tx_date"):
+        return None
+    return f"{row['tx_date'].isoformat()}_{row['id']}"
+
+
+def filters_from_args(args, **fixed):
+    """Filter dict from a request's query string; `fixed` overrides the client."""
+    filters = {k: (args.get(k) or "").strip() for k in FILTER_KEYS}
+    filters.update(fixed)
+    return filters
+
+
+def build_where(filters):
+    """(where_sql, params) for a filter dict. Raises ValueError on bad dates."""
+    where, params = [], []
+
+    types = [t.strip().upper() for t in (filters.get("type") or "").split(",") if t.strip()]
+    if types:
+        where.append("ft.transaction_type IN (" + ", ".join(["%s"] * len(types)) + ")")
+        params += types
+
+    if filters.get("mode"):
+        where.append("ft.transaction_mode = %s")
+        params.append(filters["mode"].upper())
+
+    if filters.get("account_id"):
+        where.append("ft.account_id = %s")
+        params.append(filters["account_id"])
+
+    if filters.get("category") and filters["category"] != "ALL":
+        where.append("ft.category = %s")
+        params.append(filters["category"])
+
+    if filters.get("from_date"):
+        where.append("ft.tx_date >= %s")
+        params.append(_day(filters["from_date"]))
+
+    if filters.get("to_date"):
+        where.append("ft.tx_date <= %s")
+        params.append(_day(filters["to_date"]))
+
+    if filters.get("q"):
+        like = "%" + filters["q"] + "%"
+        where.append("(" + " OR ".join(f"{c} LIKE %s" for c in TEXT_COLUMNS) + ")")
+        params += [like] * len(TEXT_COLUMNS)
+
+    return where, params
+
+
+def fetch_page(cur, filters, cursor=None, limit=DEFAULT_PAGE):
+    """
+    One page of transactions (dictionary cursor). `cursor` is the
+    next_cursor of the previous page (string) or None for the first page;
+    limit=None means no page size (all rows, has_more False).
+    """
+    where, params = build_where(filters)
+    if cursor:
+        day, tx_id = parse_cursor(cursor)
+        where.append("(ft.tx_date < %s OR (ft.tx_date = %s AND ft.id < %s))")
+        params += [day, day, tx_id]
+
+    if limit is not None:
+        limit = min(max(int(limit), 1), MAX_PAGE)
+    totals_sql = "" if cursor else ", COUNT(*) OVER () AS _total_count, SUM(ft.amount) OVER () AS _total_amount"
+
+    cur.execute(f"""
+        SELECT {TX_COLUMNS} {totals_sql}
+        FROM finance_transactions ft
+        JOIN bank_accounts ba ON ft.account_id = ba.id
+        {"WHERE " + " AND ".join(where) if where else ""}
+        ORDER BY ft.tx_date DESC, ft.id DESC
+        {"" if limit is None else f"LIMIT {limit + 1}"}
+    """, tuple(params))
+    rows = cur.fetchall()
+
+    has_more = limit is not None and len(rows) > limit
+    rows = rows[:limit]
+
+    totals = None
+    if not cursor:
+        first = rows[0] if rows else {}
+        totals = {
+            "count": int(first.get("_total_count") or 0),
+            "amount": float(first.get("_total_amount") or 0),
+        }
+        for row in rows:
+            row.pop("_total_count", None)
+            row.pop("_total_amount", None)
+
+    return {
+        "data": rows,
+        "has_more": has_more,
+        "next_cursor": make_cursor(rows[-1]) if has_more else None,
+        "totals": totals,
+    }
@@ -7,6 +7,8 @@ import os
 import mysql.connector
 from dotenv import load_dotenv
 
+from app.metrics import instrument
+
 # Load .env
 load_dotenv()
 
@@ -15,13 +17,13 @@ load_dotenv()
 # ======================================
 def get_db():
     """Return a new MySQL connection."""
-    return mysql.connector.connect(
+    return instrument(mysql.connector.connect(
         host=os.getenv("MYSQL_HOST", "srv366.hstgr.io"),
         user=os.getenv("MYSQL_USER", "u514260654_testerp"),
         password=os.getenv("MYSQL_PASSWORD", "Tions@98"),
         database=os.getenv("MYSQL_DATABASE", "u514260654_test_erp"),
         auth_plugin="mysql_native_password"
-    )
+    ))
 
 
 # ======================================
@@ -0,0 +1,185 @@
+# ============================================
+# FILE: app/images.py
+# Downscaling + thumbnails for uploaded photos / scans
+# ============================================
+"""
+Post-processing for image uploads (student photos, document scans).
+
+    images.schedule(upload_dir, stored.path, relink)   # once the record is committed
+    images.thumb_url(row["photo_url"])                  # for profile / list APIs
+
+Work runs in a small background pool (IMAGE_WORKERS, default 2) so the
+upload request returns as soon as the file is stored:
+
+  * an image larger than IMAGE_MAX_DIM (1600 px) on its longest side is
+    rotated per EXIF, bounded and re-encoded; when that is smaller it is
+    stored as a blob of its own (new hash, own upload_blobs row) and
+    relink(path, mime) moves the record over to it - phone photos of
+    4000 px / 5 MB end up ~300 KB. The uploaded original is never
+    rewritten, so bytes never change under a hash name. relink drops the
+    original's reference and app.upload_gc reclaims the file once it is
+    older than GC_MIN_AGE, so the URL the upload returned keeps working
+    until then.
+  * a JPEG thumbnail (IMAGE_THUMB_DIM, 320 px) of the final image is
+    written next to it as <sha256>_thumb.jpg. It is a derived file of that
+    blob: storage.release() / purge() and the GC remove it together.
+
+thumb_url() derives the thumbnail URL from the image URL without touching
+the disk; until the thumbnail is written it is a 404 the client falls
+back from.
+
+With a remote storage backend (STORAGE_BACKEND=s3) the original is
+fetched to a temp file first and the results go to the bucket.
+
+Pillow is optional: without it uploads are stored untouched and
+thumb_url() returns None.
+"""
+
+import mimetypes
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # optional dependency
+    Image = None
+    ImageOps = None
+
+from app import storage
+
+MAX_DIM = int(os.getenv("IMAGE_MAX_DIM", "1600"))
+THUMB_DIM = int(os.getenv("IMAGE_THUMB_DIM", "320"))
+JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "82"))
+WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+
+IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".webp"}
+THUMB_SUFFIX = storage.THUMB_SUFFIX
+
+_SAVE_FORMATS = {".jpg": "JPEG", ".jpeg": "JPEG", ".png": "PNG", ".webp": "WEBP"}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+# ============================================
+# Paths
+# ============================================
+def is_image(rel_path):
+    return os.path.splitext(rel_path or "")[1].lower() in IMAGE_EXTS
+
+
+def thumb_path(rel_path):
+    """aa/bb/<sha>.jpg -> aa/bb/<sha>_thumb.jpg"""
+    return os.path.splitext(rel_path)[0] + THUMB_SUFFIX
+
+
+def thumb_url(url, url_prefix="/uploads/students/"):
+    """Thumbnail URL for a stored image URL (None without Pillow / for non-images)."""
+    if Image is None or not url or not url.startswith(url_prefix) or not is_image(url):
+        return None
+    return url_prefix + thumb_path(url[len(url_prefix):])
+
+
+# ============================================
+# Processing
+# ============================================
+def _save_atomic(img, path, fmt, **options):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+    os.close(fd)
+    try:
+        img.save(tmp, fmt, **options)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _encode_options(fmt):
+    if fmt == "JPEG":
+        return {"quality": JPEG_QUALITY, "optimize": True, "progressive": True}
+    if fmt == "PNG":
+        return {"optimize": True}
+    return {"quality": JPEG_QUALITY}
+
+
+def _thumbnail(img):
+    small = img.copy()
+    small.thumbnail((THUMB_DIM, THUMB_DIM), Image.LANCZOS)
+    if small.mode not in ("RGB", "L"):
+        small = small.convert("RGB")
+    return small
+
+
+def _write_thumb(directory, rel_path, img, tmp_dir):
+    """Thumbnail next to the blob, wherever the blob lives."""
+    thumb = thumb_path(rel_path)
+    if os.path.isfile(os.path.join(directory, *rel_path.split("/"))):
+        path = os.path.join(directory, *thumb.split("/"))
+        if not os.path.isfile(path):
+            _save_atomic(_thumbnail(img), path, "JPEG", **_encode_options("JPEG"))
+        return
+    store = storage.backend()
+    key = storage.object_key(directory, thumb)
+    if not store.exists(key):
+        tmp = os.path.join(tmp_dir, "thumb.jpg")
+        _thumbnail(img).save(tmp, "JPEG", **_encode_options("JPEG"))
+        store.put(tmp, key, "image/jpeg")
+
+
+def process(directory, rel_path, relink=None):
+    """
+    Bound the image into a blob of its own (handed to relink) and thumbnail
+    the result. Returns the path the record ends up with (None on error).
+    """
+    ext = os.path.splitext(rel_path)[1].lower()
+    fmt = _SAVE_FORMATS.get(ext)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        try:
+            path = os.path.join(directory, *rel_path.split("/"))
+            if not os.path.isfile(path):
+                path = os.path.join(tmp_dir, "original" + ext)
+                storage.backend().fetch(storage.object_key(directory, rel_path), path)
+            with Image.open(path) as src:
+                img = ImageOps.exif_transpose(src)
+                img.load()
+
+            target = rel_path
+            if relink is not None and max(img.size) > MAX_DIM:
+                bounded = img.copy()
+                bounded.thumbnail((MAX_DIM, MAX_DIM), Image.LANCZOS)
+                if fmt == "JPEG" and bounded.mode not in ("RGB", "L"):
+                    bounded = bounded.convert("RGB")
+                smaller = os.path.join(tmp_dir, "bounded" + ext)
+                bounded.save(smaller, fmt, **_encode_options(fmt))
+                if os.path.getsize(smaller) < os.path.getsize(path):
+                    target = relink(smaller, mimetypes.guess_type(smaller)[0]) or rel_path
+                    if target != rel_path:
+                        img = bounded
+
+            _write_thumb(directory, target, img, tmp_dir)
+            return target
+        except Exception as e:
+            print("❌ Image processing error:", rel_path, e)
+            return None
+
+
+def _pool():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="images")
+        return _executor
+
+
+def schedule(directory, rel_path, relink=None):
+    """
+    Queue processing for an image upload; returns the Future (or None).
+    relink(path, mime) stores the downscaled file and points the record at
+    it, returning the new stored path (None: leave the record alone).
+    """
+    if Image is None or not is_image(rel_path) or not storage.is_content_path(rel_path):
+        return None
+    return _pool().submit(process, directory, rel_path, relink)
@@ -0,0 +1,426 @@
+# ============================================
+# FILE: app/jobs.py
+# Durable background jobs (MySQL `jobs` table + worker processes)
+# ============================================
+"""
+Heavy operations (bulk import, bulk fee assignment, roll generation,
+report exports) are queued here instead of running in the request thread.
+
+    @jobs.task("fees.assign_bulk")
+    def run_assign_bulk(job, head_id, amount, student_ids, due_date=None):
+        ...
+        job.progress(done, total, "Assigning")
+        job.save_artifact("report.csv", data)   # optional downloadable result
+        return {"assigned": n}                  # stored as the job result
+
+    job_id = jobs.enqueue("fees.assign_bulk", {...}, created_by=session["username"])
+
+Workers (`python tools/run_jobs.py`, the Procfile `worker` process) claim
+queued rows one at a time; any number of them can run on any host that
+reaches the database. A claim is an UPDATE guarded by `status='queued'`,
+so two workers never run the same job.
+
+Failures are retried with exponential backoff (JOB_RETRY_DELAY * 2^n
+seconds) until max_attempts. While a job runs, a heartbeat thread renews
+its lease (JOB_LEASE seconds) every third of the lease, however long the
+task goes without calling job.progress(); a worker that dies mid-job
+stops renewing it and the job is queued again. Each claim writes its own
+lock token to locked_by and every later UPDATE of the row checks it, so
+a run whose lease was taken over can't overwrite the new run's outcome.
+
+Status / progress / artifacts are exposed by app.routers.jobs:
+
+    GET /api/jobs/<id>            status, progress, result, error
+    GET /api/jobs                 my recent jobs
+    GET /jobs/<id>/artifact       download the result file
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+from datetime import datetime, timedelta
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+ARTIFACT_DIR = os.path.join(APP_DIR, "uploads", "jobs")
+INPUT_DIR = os.path.join(ARTIFACT_DIR, "_inputs")
+
+POLL_INTERVAL = float(os.getenv("JOB_POLL", "2.0"))
+LEASE_SECONDS = int(os.getenv("JOB_LEASE", "600"))
+HEARTBEAT_SECONDS = LEASE_SECONDS / 3
+RETRY_DELAY = int(os.getenv("JOB_RETRY_DELAY", "30"))
+MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+_TASKS = {}
+
+
+# ============================================
+# Registry
+# ============================================
+def task(kind):
+    """Register `fn(job, **payload)` as the handler for jobs of `kind`."""
+    def decorator(fn):
+        _TASKS[kind] = fn
+        return fn
+    return decorator
+
+
+def registered():
+    return sorted(_TASKS)
+
+
+def wants_async():
+    """`?async=1` (query string or form field) on an endpoint that supports it."""
+    from flask import request
+    value = request.args.get("async") or request.form.get("async") or ""
+    return value.lower() in ("1", "true", "yes")
+
+
+# ============================================
+# Enqueue / read
+# ============================================
+def _connect():
+    from app.db import get_mysql_connection
+    return get_mysql_connection()
+
+
+def enqueue(kind, payload=None, created_by=None, max_attempts=None):
+    """Queue a job; returns its id. Raises RuntimeError when it can't be stored."""
+    if kind not in _TASKS:
+        raise ValueError(f"Unknown job kind: {kind}")
+
+    job_id = uuid.uuid4().hex
+    conn = _connect()
+    if conn is None:
+        raise RuntimeError("DB connection failed")
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            INSERT INTO jobs (id, kind, status, payload, attempts, max_attempts,
+                              run_after, created_by, created_at)
+            VALUES (%s, %s, %s, %s, 0, %s, %s, %s, %s)
+        """, (job_id, kind, STATUS_QUEUED, json.dumps(payload or {}, default=str),
+              max_attempts or MAX_ATTEMPTS, datetime.utcnow(), created_by, datetime.utcnow()))
+        conn.commit()
+        cur.close()
+    finally:
+        conn.close()
+    return job_id
+
+
+def save_input(file):
+    """Keep an uploaded file for a queued job; returns its path."""
+    from app import storage
+    stored = storage.save(file, INPUT_DIR, local=True)  # the worker reads it from disk
+    return os.path.join(INPUT_DIR, *stored.path.split("/"))
+
+
+def release_input(path):
+    """Drop a save_input() file once its job has succeeded."""
+    from app import storage
+    storage.release(INPUT_DIR, os.path.relpath(path, INPUT_DIR).replace(os.sep, "/"))
+
+
+JOB_COLUMNS = ("id, kind, status, progress_done, progress_total, message, result, error, "
+               "attempts, max_attempts, artifact_name, created_by, created_at, started_at, finished_at")
+
+
+def _row_to_job(cur, row):
+    job = dict(zip(cur.column_names, row))
+    if job.get("result"):
+        try:
+            job["result"] = json.loads(job["result"])
+        except ValueError:
+            pass
+    total = job.get("progress_total") or 0
+    job["percent"] = round(100.0 * (job.get("progress_done") or 0) / total, 1) if total else None
+    job["has_artifact"] = bool(job.pop("artifact_name", None))
+    return job
+
+
+def get(job_id):
+    """Job status dict (None if unknown)."""
+    conn = _connect()
+    if conn is None:
+        raise RuntimeError("DB connection failed")
+    try:
+        cur = conn.cursor()
+        cur.execute(f"SELECT {JOB_COLUMNS} FROM jobs WHERE id=%s", (job_id,))
+        row = cur.fetchone()
+        job = _row_to_job(cur, row) if row else None
+        cur.close()
+        return job
+    finally:
+        conn.close()
+
+
+def recent(created_by=None, limit=20):
+    conn = _connect()
+    if conn is None:
+        raise RuntimeError("DB connection failed")
+    try:
+        cur = conn.cursor()
+        if created_by is None:
+            cur.execute(f"SELECT {JOB_COLUMNS} FROM jobs ORDER BY created_at DESC LIMIT %s", (limit,))
+        else:
+            cur.execute(
+                f"SELECT {JOB_COLUMNS} FROM jobs WHERE created_by=%s ORDER BY created_at DESC LIMIT %s",
+                (created_by, limit),
+            )
+        jobs = [_row_to_job(cur, row) for row in cur.fetchall()]
+        cur.close()
+        return jobs
+    finally:
+        conn.close()
+
+
+def artifact(job_id):
+    """(created_by, directory, filename) of a finished job's artifact, or None."""
+    conn = _connect()
+    if conn is None:
+        raise RuntimeError("DB connection failed")
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT created_by, artifact_name FROM jobs WHERE id=%s", (job_id,))
+        row = cur.fetchone()
+        cur.close()
+    finally:
+        conn.close()
+    if not row or not row[1]:
+        return None
+    return row[0], os.path.join(ARTIFACT_DIR, job_id), row[1]
+
+
+# ============================================
+# Running a job
+# ============================================
+class Job:
+    """Handle passed to task functions (progress + artifacts)."""
+
+    def __init__(self, conn, job_id, kind, attempt, worker):
+        self.conn = conn
+        self.id = job_id
+        self.kind = kind
+        self.attempt = attempt
+        self.worker = worker          # this claim's lock token (jobs.locked_by)
+        self.artifact_name = None
+        self.lease_lost = False       # set by the heartbeat if another claim took over
+        self._last_flush = 0.0
+
+    def progress(self, done, total=None, message=None, force=False):
+        """Record progress (throttled to one UPDATE per second); renews the lease."""
+        now = time.monotonic()
+        if not force and now - self._last_flush < 1.0:
+            return
+        self._last_flush = now
+        cur = self.conn.cursor()
+        cur.execute("""
+            UPDATE jobs SET progress_done=%s,
+                            progress_total=COALESCE(%s, progress_total),
+                            message=COALESCE(%s, message),
+                            locked_at=%s
+            WHERE id=%s AND locked_by=%s
+        """, (done, total, message, datetime.utcnow(), self.id, self.worker))
+        self.conn.commit()
+        cur.close()
+
+    def save_artifact(self, name, data):
+        """Write the job's downloadable result (bytes or str)."""
+        directory = os.path.join(ARTIFACT_DIR, self.id)
+        os.makedirs(directory, exist_ok=True)
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        path = os.path.join(directory, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        from app import storage
+        if storage.backend().remote:
+            # the web worker may be on another host; serve_file redirects to the bucket
+            storage.backend().put(path, storage.object_key(directory, name))
+        self.artifact_name = name
+        return path
+
+
+def _requeue_stale(cur):
+    """Jobs whose worker stopped renewing the lease go back to the queue."""
+    cur.execute("""
+        UPDATE jobs SET status=%s, locked_by=NULL, run_after=%s,
+                        error=CONCAT(COALESCE(error, ''), 'lease expired; ')
+        WHERE status=%s AND locked_at < %s
+    """, (STATUS_QUEUED, datetime.utcnow(), STATUS_RUNNING,
+          datetime.utcnow() - timedelta(seconds=LEASE_SECONDS)))
+
+
+def _heartbeat(job, stop):
+    """Renew the job's lease until `stop` is set (own connection - job.conn belongs to the task)."""
+    from app.db import get_direct_connection
+
+    conn = None
+    while not stop.wait(HEARTBEAT_SECONDS):
+        try:
+            if conn is None:
+                conn = get_direct_connection()
+                if conn is None:
+                    continue
+            cur = conn.cursor()
+            cur.execute("UPDATE jobs SET locked_at=%s WHERE id=%s AND locked_by=%s AND status=%s",
+                        (datetime.utcnow(), job.id, job.worker, STATUS_RUNNING))
+            renewed = cur.rowcount == 1
+            conn.commit()
+            cur.close()
+            if not renewed:
+                job.lease_lost = True
+                print(f"⚠️ job {job.kind} {job.id} lost its lease")
+                break
+        except Exception as e:
+            print("❌ job heartbeat error:", e)
+            try:
+                conn.close()
+            except Exception:
+                pass
+            conn = None
+    if conn is not None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+def claim(conn, worker, kinds=None):
+    """
+    Claim the oldest runnable job; returns (id, kind, payload, attempts, lock)
+    or None. `lock` is the locked_by token of this claim (worker + nonce).
+    """
+    kinds = list(kinds or _TASKS)
+    if not kinds:
+        return None
+    cur = conn.cursor()
+    try:
+        _requeue_stale(cur)
+        conn.commit()
+
+        marks = ",".join(["%s"] * len(kinds))
+        cur.execute(f"""
+            SELECT id, kind, payload, attempts FROM jobs
+            WHERE status=%s AND run_after <= %s AND kind IN ({marks})
+            ORDER BY run_after, created_at
+            LIMIT 5
+        """, tuple([STATUS_QUEUED, datetime.utcnow()] + kinds))
+        candidates = cur.fetchall()
+        conn.commit()
+
+        for job_id, kind, payload, attempts in candidates:
+            now = datetime.utcnow()
+            # a fresh token per claim: the same worker may claim a job again
+            # after its own stale run lost the lease
+            lock = f"{worker}/{uuid.uuid4().hex[:8]}"
+            cur.execute("""
+                UPDATE jobs SET status=%s, locked_by=%s, locked_at=%s,
+                                started_at=COALESCE(started_at, %s), attempts=attempts + 1
+                WHERE id=%s AND status=%s
+            """, (STATUS_RUNNING, lock, now, now, job_id, STATUS_QUEUED))
+            conn.commit()
+            if cur.rowcount == 1:
+                return job_id, kind, json.loads(payload or "{}"), attempts + 1, lock
+        return None
+    finally:
+        cur.close()
+
+
+def _lease_lost(job):
+    print(f"⚠️ job {job.kind} {job.id} lost its lease; outcome not recorded")
+    return False
+
+
+def run_one(conn, lock, job_id, kind, payload, attempt):
+    """Run a claimed job (`lock`: its locked_by token) and record the outcome (never raises)."""
+    job = Job(conn, job_id, kind, attempt, lock)
+    stop = threading.Event()
+    threading.Thread(target=_heartbeat, args=(job, stop), name=f"job-heartbeat-{job_id}", daemon=True).start()
+    cur = conn.cursor()
+    try:
+        result = _TASKS[kind](job, **payload)
+        stop.set()
+        cur.execute("""
+            UPDATE jobs SET status=%s, result=%s, artifact_name=%s, error=NULL,
+                            progress_done=GREATEST(progress_done, progress_total),
+                            finished_at=%s, locked_by=NULL
+            WHERE id=%s AND locked_by=%s
+        """, (STATUS_DONE, json.dumps(result, default=str), job.artifact_name,
+              datetime.utcnow(), job_id, lock))
+        recorded = cur.rowcount == 1
+        conn.commit()
+        if not recorded:
+            return _lease_lost(job)
+        print(f"✅ job {kind} {job_id} done")
+        return True
+    except Exception as e:
+        stop.set()
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        error = f"{type(e).__name__}: {e}"
+        print(f"❌ job {kind} {job_id} failed (attempt {attempt}):", error)
+        traceback.print_exc()
+
+        try:
+            cur.execute("SELECT max_attempts FROM jobs WHERE id=%s", (job_id,))
+            max_attempts = (cur.fetchone() or (MAX_ATTEMPTS,))[0]
+            if attempt < max_attempts:
+                retry_at = datetime.utcnow() + timedelta(seconds=RETRY_DELAY * 2 ** (attempt - 1))
+                cur.execute("""
+                    UPDATE jobs SET status=%s, error=%s, run_after=%s, locked_by=NULL
+                    WHERE id=%s AND locked_by=%s
+                """, (STATUS_QUEUED, error[:2000], retry_at, job_id, lock))
+            else:
+                cur.execute("""
+                    UPDATE jobs SET status=%s, error=%s, finished_at=%s, locked_by=NULL
+                    WHERE id=%s AND locked_by=%s
+                """, (STATUS_FAILED, error[:2000], datetime.utcnow(), job_id, lock))
+            recorded = cur.rowcount == 1
+            conn.commit()
+            if not recorded:
+                _lease_lost(job)
+        except Exception as db_error:
+            # connection gone - the lease runs out and the job is picked up again
+            print("❌ job status update error:", db_error)
+        return False
+    finally:
+        stop.set()
+        cur.close()
+
+
+def run_worker(kinds=None, once=False, log=print):
+    """Claim and run jobs until interrupted (or the queue is empty with once=True)."""
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    log(f"🛠️  job worker {worker} ({', '.join(kinds or registered())})")
+    while True:
+        conn = _connect()
+        if conn is None:
+            time.sleep(POLL_INTERVAL * 5)
+            continue
+        try:
+            claimed = claim(conn, worker, kinds)
+            if claimed:
+                job_id, kind, payload, attempt, lock = claimed
+                run_one(conn, lock, job_id, kind, payload, attempt)
+                continue
+        except Exception as e:
+            print("❌ job worker error:", e)
+        finally:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        if once:
+            return
+        time.sleep(POLL_INTERVAL)
@@ -0,0 +1,131 @@
+# ============================================
+# FILE: app/json_provider.py
+# orjson-backed Flask JSON provider
+# ============================================
+"""
+Drop-in replacement for Flask's DefaultJSONProvider used by every
+`jsonify()` / `request.get_json()` in the app.
+
+orjson serializes lists of dicts with datetime / date / Decimal values
+several times faster than the stdlib encoder and writes bytes directly,
+so large student, receipt and ledger payloads skip the str round trip.
+When orjson is not installed the stdlib provider is used, with app.rows
+Row objects still written as objects rather than arrays.
+
+Output stays compatible with the default provider unless configured:
+
+    JSON_DATE_FORMAT  "http" (default, Flask's RFC 822 style),
+                      "iso"  (orjson native, fastest), or any strftime
+                      pattern such as "%d-%m-%Y"
+    JSON_DECIMAL      "str" (default, like Flask) or "float"
+
+Both can be set in app.config or the environment.
+"""
+
+import dataclasses
+import decimal
+import os
+import uuid
+from datetime import date, time, timedelta
+
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+def _rows_as_dicts(o):
+    """
+    app.rows Row objects are namedtuples, which the stdlib encoder writes as
+    arrays without ever calling default=; turn them into dicts first.
+    """
+    if hasattr(o, "as_dict"):
+        return {k: _rows_as_dicts(v) for k, v in o.as_dict().items()}
+    if isinstance(o, dict):
+        return {k: _rows_as_dicts(v) for k, v in o.items()}
+    if isinstance(o, (list, tuple)):
+        return [_rows_as_dicts(v) for v in o]
+    return o
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """DefaultJSONProvider with orjson dumps/loads when available."""
+
+    def _setting(self, key, default):
+        value = self._app.config.get(key)
+        if value is None:
+            value = os.getenv(key, default)
+        return str(value).strip().lower() if key == "JSON_DECIMAL" else str(value).strip()
+
+    def _options(self):
+        opts = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if self.sort_keys:
+            opts |= orjson.OPT_SORT_KEYS
+        if self.compact is False or (self.compact is None and self._app.debug):
+            opts |= orjson.OPT_INDENT_2
+
+        date_format = self._setting("JSON_DATE_FORMAT", "http")
+        if date_format.lower() != "iso":
+            # route datetime/date through _default() for http / strftime output
+            opts |= orjson.OPT_PASSTHROUGH_DATETIME
+        return opts, date_format
+
+    def _make_default(self, date_format, decimal_mode):
+        http = date_format.lower() == "http"
+
+        def default(o):
+            if isinstance(o, date):  # datetime is a date subclass
+                return http_date(o) if http else o.strftime(date_format)
+            if isinstance(o, time):
+                return o.isoformat()
+            if isinstance(o, timedelta):
+                # MySQL TIME columns come back as timedelta
+                return str(o)
+            if isinstance(o, decimal.Decimal):
+                return float(o) if decimal_mode == "float" else str(o)
+            if isinstance(o, uuid.UUID):
+                return str(o)
+            if dataclasses.is_dataclass(o):
+                return dataclasses.asdict(o)
+            if hasattr(o, "as_dict"):
+                # app.rows Row objects
+                return o.as_dict()
+            if isinstance(o, tuple):
+                return list(o)
+            if hasattr(o, "__html__"):
+                return str(o.__html__())
+            raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+        return default
+
+    def _encode(self, obj):
+        opts, date_format = self._options()
+        default = self._make_default(date_format, self._setting("JSON_DECIMAL", "str"))
+        return orjson.dumps(obj, default=default, option=opts)
+
+    # --------------------------------------------
+    # Provider API
+    # --------------------------------------------
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            # custom json.dumps arguments (e.g. the tojson filter) -> stdlib path
+            return super().dumps(_rows_as_dicts(obj), **kwargs)
+        return self._encode(obj).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        try:
+            return orjson.loads(s)
+        except orjson.JSONDecodeError:
+            # NaN / huge ints etc. that the stdlib still accepts
+            return super().loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self._encode(obj) + b"\n", mimetype=self.mimetype)
@@ -12,6 +12,9 @@ import mysql.connector
 from mysql.connector import Error
 import uuid
 
+from app.metrics import instrument
+from app.json_provider import FastJSONProvider
+
 # ======================================
 # Flask App Setup
 # ======================================
@@ -26,6 +29,10 @@ app = Flask(
     template_folder=os.path.join(BASE_DIR, "templates")
 )
 app.secret_key = os.getenv("SECRET_KEY", "tatwadarsha_secret_2025")
+
+# Fast JSON for every jsonify() (falls back to stdlib when orjson is missing)
+app.json_provider_class = FastJSONProvider
+app.json = FastJSONProvider(app)
 app.permanent_session_lifetime = timedelta(hours=6)
 
 UPLOAD_FOLDER_FINANCE = os.path.join(BASE_DIR, "uploads", "finance")
@@ -49,7 +56,7 @@ def get_db_connection():
             autocommit=False,
             auth_plugin=os.getenv("MYSQL_AUTH_PLUGIN", "mysql_native_password")
         )
-        return conn
+        return instrument(conn)
     except Error as e:
         # Use print instead of logging to make errors visible in basic consoles
         print(f"❌ MySQL Connection Error: {e}")
@@ -123,6 +130,11 @@ try:
     from app.routers.finance import finance_bp    
     from app.routers.chat import chat_bp
     from app.routers.auth import auth_bp
+    from app.routers.jobs import jobs_bp
+    from app.routers.uploads import uploads_bp
+    from app.routers.rollover import rollover_bp
+    from app.metrics import metrics_bp
+    from app.compression import compression_bp
 
     # Register blueprints only if imports succeed
     app.register_blueprint(master_bp)
@@ -134,6 +146,11 @@ try:
     app.register_blueprint(chat_bp)
     app.register_blueprint(auth_bp, url_prefix="/api")
     app.register_blueprint(finance_bp)
+    app.register_blueprint(jobs_bp)
+    app.register_blueprint(uploads_bp)
+    app.register_blueprint(rollover_bp)
+    app.register_blueprint(metrics_bp)
+    app.register_blueprint(compression_bp)
 
 except Exception as e:
     print("⚠️ Warning: Blueprint import/register failed:", e)
@@ -389,6 +406,8 @@ def mark_dropout_api():
     if not student_id:
         return jsonify({"success": False, "message": "Missing ID"}), 400
 
+    from app.routers.students import move_to_dropouts, after_students_moved
+
     conn = get_db_connection()
     if not conn:
         return jsonify({"success": False, "msg": "DB error"}), 500
@@ -396,39 +415,12 @@ def mark_dropout_api():
     cur = None
     try:
         cur = conn.cursor()
-        # fetch student
-        cur.execute("SELECT * FROM students WHERE id=%s", (student_id,))
-        row = cur.fetchone()
-        if not row:
+        # copied server-side (INSERT ... SELECT), see app/routers/students.py
+        moved = move_to_dropouts(cur, [student_id], dropout_date, reason, remarks)
+        if not moved:
             return jsonify({"success": False, "msg": "Not found"}), 404
-
-        student = dict(zip(cur.column_names, row))
-
-        # insert into dropouts
-        cols, vals = [], []
-
-        for col in DROPOUTS_COLUMNS:
-            if col == "id":
-                cols.append("id"); vals.append(student_id)
-            elif col == "dropout_date":
-                cols.append("dropout_date"); vals.append(dropout_date)
-            elif col == "dropout_reason":
-                cols.append("dropout_reason"); vals.append(reason)
-            elif col == "dropout_remarks":
-                cols.append("dropout_remarks"); vals.append(remarks)
-            elif col == "student_id":
-                cols.append("student_id"); vals.append(student_id)
-            else:
-                cols.append(col); vals.append(student.get(col))
-
-        placeholders = ", ".join(["%s"] * len(vals))
-        col_sql = ", ".join(cols)
-
-        cur.execute(f"INSERT INTO dropouts ({col_sql}) VALUES ({placeholders})", tuple(vals))
-
-        # delete from students
-        cur.execute("DELETE FROM students WHERE id=%s", (student_id,))
         conn.commit()
+        after_students_moved(moved)
 
         return jsonify({"success": True})
 
@@ -463,6 +455,8 @@ def mark_admit_api():
     data = request.get_json()
     student_id = data.get("student_id")
 
+    from app.routers.students import move_to_students, after_students_moved
+
     conn = get_db_connection()
     if not conn:
         return jsonify({"success": False}), 500
@@ -470,27 +464,11 @@ def mark_admit_api():
     cur = None
     try:
         cur = conn.cursor()
-        cur.execute("SELECT * FROM dropouts WHERE id=%s", (student_id,))
-        row = cur.fetchone()
-        if not row:
+        moved = move_to_students(cur, [student_id])
+        if not moved:
             return jsonify({"success": False, "message": "Not found"}), 404
-
-        drop_row = dict(zip(cur.column_names, row))
-
-        # prepare student data
-        student_data = {}
-        for col in STUDENTS_COLUMNS:
-            if col == "id":
-                student_data[col] = student_id
-            else:
-                student_data[col] = drop_row.get(col)
-
-        cols = ", ".join(student_data.keys())
-        placeholders = ", ".join(["%s"] * len(student_data))
-        cur.execute(f"INSERT INTO students ({cols}) VALUES ({placeholders})", tuple(student_data.values()))
-
-        cur.execute("DELETE FROM dropouts WHERE id=%s", (student_id,))
         conn.commit()
+        after_students_moved(moved, admitted=True)
         return jsonify({"success": True})
 
     except Exception as e:
@@ -528,16 +506,16 @@ with app.app_context():
 # ======================================
 # Serve Exam Paper Files
 # ======================================
-from flask import send_from_directory
+from app.file_serving import serve_file
+from werkzeug.exceptions import NotFound
 
 EXAM_PAPER_PATH = os.path.join(BASE_DIR, "static", "exam_papers")
 
 @app.route("/exam-files/<path:filename>")
 def exam_files(filename):
     try:
-        return send_from_directory(EXAM_PAPER_PATH, filename, as_attachment=False)
-    except Exception as e:
-        print("File serve error:", e)
+        return serve_file(EXAM_PAPER_PATH, filename)
+    except NotFound:
         return "File Not Found", 404
 
 # ======================================
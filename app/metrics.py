@@ -0,0 +1,318 @@
+# ============================================
+# FILE: app/metrics.py
+# Request latency + SQL accounting (Prometheus text format)
+# ============================================
+"""
+Per-request timing and query accounting.
+
+Every DB helper (app.db, master.get_db, main.get_db_connection, ...) wraps
+the connection it returns with `instrument()`, so each `cursor.execute()`
+made inside a request is counted and timed against the current endpoint.
+
+Numbers are kept per worker process; with several gunicorn workers each
+one exposes its own /metrics and Prometheus sums them per instance.
+
+/metrics lists endpoint names, latencies and slow SQL shapes, so it is
+closed by default: Prometheus scrapes with `Authorization: Bearer
+$METRICS_TOKEN`, and a logged-in ERP session may look at it in a browser.
+Anyone else gets a 404.
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+
+from flask import Blueprint, Response, abort, g, has_request_context, request, session
+
+metrics_bp = Blueprint("metrics", __name__)
+
+logger = logging.getLogger("erp.sql")
+
+# Statements slower than this are logged (normalized) as slow queries
+SLOW_QUERY_SECONDS = float(os.getenv("SLOW_QUERY_MS", "250")) / 1000.0
+
+# Bearer token for scrapers (without it only logged-in sessions see /metrics)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "").strip() or None
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+_lock = threading.Lock()
+
+# (endpoint, method) -> {"buckets": [...], "sum": float, "count": int}
+_latency = {}
+# (endpoint, method) -> {"buckets": [...], "sum": float, "count": int}
+_query_counts = {}
+# endpoint -> total seconds spent inside the DB driver
+_db_seconds = {}
+# (endpoint, method, status) -> count
+_requests = {}
+# (endpoint, normalized sql) -> count
+_slow_queries = {}
+
+
+# ============================================
+# SQL normalization (for slow query log)
+# ============================================
+_RE_STRING = re.compile(r"'(?:[^'\\]|\\.)*'")
+_RE_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_RE_PLACEHOLDER = re.compile(r"%s|%\(\w+\)s")
+_RE_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_RE_SPACE = re.compile(r"\s+")
+
+
+def normalize_sql(sql) -> str:
+    """Collapse literals/placeholders so identical query shapes group together."""
+    if isinstance(sql, (bytes, bytearray)):
+        sql = sql.decode("utf-8", "replace")
+    sql = str(sql)
+    sql = _RE_STRING.sub("?", sql)
+    sql = _RE_PLACEHOLDER.sub("?", sql)
+    sql = _RE_NUMBER.sub("?", sql)
+    sql = _RE_IN_LIST.sub("(...)", sql)
+    sql = _RE_SPACE.sub(" ", sql).strip()
+    return sql
+
+
+# ============================================
+# Recording helpers
+# ============================================
+def _current_endpoint():
+    if not has_request_context():
+        return "background"
+    return request.endpoint or "unmatched"
+
+
+def _observe(store, key, buckets, value):
+    entry = store.get(key)
+    if entry is None:
+        entry = {"buckets": [0] * len(buckets), "sum": 0.0, "count": 0}
+        store[key] = entry
+    for i, upper in enumerate(buckets):
+        if value <= upper:
+            entry["buckets"][i] += 1
+    entry["sum"] += value
+    entry["count"] += 1
+
+
+def _record_query(operation, elapsed, statements=1):
+    """Called by InstrumentedCursor after every execute()."""
+    if has_request_context():
+        g._sql_count = g.get("_sql_count", 0) + statements
+        g._sql_seconds = g.get("_sql_seconds", 0.0) + elapsed
+
+    if elapsed >= SLOW_QUERY_SECONDS:
+        endpoint = _current_endpoint()
+        shape = normalize_sql(operation)
+        with _lock:
+            key = (endpoint, shape)
+            _slow_queries[key] = _slow_queries.get(key, 0) + 1
+        logger.warning("SLOW SQL %.1fms [%s] %s", elapsed * 1000.0, endpoint, shape)
+
+
+def _record_fetch(elapsed):
+    if has_request_context():
+        g._sql_seconds = g.get("_sql_seconds", 0.0) + elapsed
+
+
+# ============================================
+# Cursor / connection wrappers
+# ============================================
+class InstrumentedCursor:
+    """Thin proxy around a mysql.connector cursor that times every call."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, operation, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._cursor.execute(operation, *args, **kwargs)
+        finally:
+            _record_query(operation, time.perf_counter() - start)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        seq_params = list(seq_params)
+        start = time.perf_counter()
+        try:
+            return self._cursor.executemany(operation, seq_params, *args, **kwargs)
+        finally:
+            _record_query(operation, time.perf_counter() - start)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        try:
+            return self._cursor.fetchone()
+        finally:
+            _record_fetch(time.perf_counter() - start)
+
+    def fetchmany(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._cursor.fetchmany(*args, **kwargs)
+        finally:
+            _record_fetch(time.perf_counter() - start)
+
+    def fetchall(self):
+        start = time.perf_counter()
+        try:
+            return self._cursor.fetchall()
+        finally:
+            _record_fetch(time.perf_counter() - start)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+        return False
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class InstrumentedConnection:
+    """Proxy that hands out InstrumentedCursor objects; everything else passes through."""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._conn.cursor(*args, **kwargs))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._conn.close()
+        return False
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def instrument(conn):
+    """Wrap a DB connection (or return None / already wrapped conn unchanged)."""
+    if conn is None or isinstance(conn, InstrumentedConnection):
+        return conn
+    return InstrumentedConnection(conn)
+
+
+# ============================================
+# Request hooks
+# ============================================
+@metrics_bp.before_app_request
+def _start_timer():
+    g._req_start = time.perf_counter()
+    g._sql_count = 0
+    g._sql_seconds = 0.0
+
+
+@metrics_bp.after_app_request
+def _stop_timer(response):
+    start = g.get("_req_start")
+    if start is None:
+        return response
+
+    elapsed = time.perf_counter() - start
+    endpoint = _current_endpoint()
+    method = request.method
+    sql_count = g.get("_sql_count", 0)
+    sql_seconds = g.get("_sql_seconds", 0.0)
+
+    if endpoint != "metrics.metrics_endpoint":
+        with _lock:
+            _observe(_latency, (endpoint, method), LATENCY_BUCKETS, elapsed)
+            _observe(_query_counts, (endpoint, method), QUERY_COUNT_BUCKETS, sql_count)
+            _db_seconds[endpoint] = _db_seconds.get(endpoint, 0.0) + sql_seconds
+            key = (endpoint, method, str(response.status_code))
+            _requests[key] = _requests.get(key, 0) + 1
+
+    # Visible in browser devtools; also read by tools/benchmark.py
+    response.headers.add(
+        "Server-Timing",
+        f'app;dur={elapsed * 1000.0:.1f}, db;dur={sql_seconds * 1000.0:.1f};desc="{sql_count} queries"',
+    )
+    return response
+
+
+# ============================================
+# /metrics (Prometheus text exposition)
+# ============================================
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(**kw) -> str:
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in kw.items()) + "}"
+
+
+def _histogram_lines(name, store, buckets, label_names):
+    lines = []
+    for key, entry in sorted(store.items()):
+        labels = dict(zip(label_names, key))
+        for upper, count in zip(buckets, entry["buckets"]):
+            lines.append(f"{name}_bucket{_labels(**labels, le=upper)} {count}")
+        lines.append(f'{name}_bucket{_labels(**labels, le="+Inf")} {entry["count"]}')
+        lines.append(f"{name}_sum{_labels(**labels)} {entry['sum']:.6f}")
+        lines.append(f"{name}_count{_labels(**labels)} {entry['count']}")
+    return lines
+
+
+def render_metrics() -> str:
+    with _lock:
+        lines = [
+            "# HELP erp_http_request_duration_seconds Request latency per endpoint.",
+            "# TYPE erp_http_request_duration_seconds histogram",
+        ]
+        lines += _histogram_lines(
+            "erp_http_request_duration_seconds", _latency, LATENCY_BUCKETS, ("endpoint", "method")
+        )
+
+        lines += [
+            "# HELP erp_http_requests_total Requests per endpoint and status.",
+            "# TYPE erp_http_requests_total counter",
+        ]
+        for (endpoint, method, status), count in sorted(_requests.items()):
+            lines.append(
+                f"erp_http_requests_total{_labels(endpoint=endpoint, method=method, status=status)} {count}"
+            )
+
+        lines += [
+            "# HELP erp_sql_statements_per_request SQL statements executed per request.",
+            "# TYPE erp_sql_statements_per_request histogram",
+        ]
+        lines += _histogram_lines(
+            "erp_sql_statements_per_request", _query_counts, QUERY_COUNT_BUCKETS, ("endpoint", "method")
+        )
+
+        lines += [
+            "# HELP erp_sql_seconds_total Time spent in the DB driver per endpoint.",
+            "# TYPE erp_sql_seconds_total counter",
+        ]
+        for endpoint, seconds in sorted(_db_seconds.items()):
+            lines.append(f"erp_sql_seconds_total{_labels(endpoint=endpoint)} {seconds:.6f}")
+
+        lines += [
+            "# HELP erp_sql_slow_queries_total Statements slower than SLOW_QUERY_MS.",
+            "# TYPE erp_sql_slow_queries_total counter",
+        ]
+        for (endpoint, shape), count in sorted(_slow_queries.items()):
+            lines.append(f"erp_sql_slow_queries_total{_labels(endpoint=endpoint, query=shape)} {count}")
+
+    return "\n".join(lines) + "\n"
+
+
+@metrics_bp.route("/metrics")
+def metrics_endpoint():
+    auth = request.headers.get("Authorization", "")
+    scraper = METRICS_TOKEN is not None and auth == f"Bearer {METRICS_TOKEN}"
+    if not scraper and not session.get("logged_in"):
+        abort(404)  # don't advertise it
+
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,164 @@
+# ============================================
+# FILE: app/queries.py
+# Server-side prepared statements for hot fixed-shape queries
+# ============================================
+"""
+Registry of the hot, fixed-shape statements and a per-connection cache of
+prepared cursors for them.
+
+mysql.connector only re-uses a server-side prepared statement when the
+*same string object* is executed again on the *same* prepared cursor, so
+each registered statement gets one cursor per physical connection, stored
+on the raw connection object. Repeated calls (per-row loops, and repeat
+requests on a pooled connection) then skip the parse/plan step and send
+parameters in the binary protocol.
+
+    from app import queries
+    row  = queries.fetchone(conn, "student_by_id", (sid,))
+    rows = queries.fetchall_rows(conn, "ledger_rows", params)
+    queries.execute(conn, "receipt_insert", (...))
+
+app.db runs the pool without session reset by default, so the cached
+statements live as long as the physical connection. With
+MYSQL_POOL_RESET_SESSION=1 every checkout wipes them (COM_RESET_CONNECTION)
+and app.db calls forget() to drop the stale cursors.
+"""
+
+from mysql.connector import Error, errorcode
+
+from app.metrics import InstrumentedCursor
+from app.rows import row_class
+
+STATEMENTS = {
+    # fees.collect_payment
+    "payment_mode_by_id": "SELECT id, name FROM payment_modes WHERE id=%s LIMIT 1",
+    "payment_mode_by_name": "SELECT id, name FROM payment_modes WHERE name=%s LIMIT 1",
+    "payments_sum": "SELECT COALESCE(SUM(amount),0) FROM fee_payments WHERE assigned_fee_id=%s",
+    "assigned_amount": "SELECT amount FROM assigned_fees WHERE id=%s",
+    "assigned_status_update": "UPDATE assigned_fees SET status=%s WHERE id=%s",
+    "receipt_insert": """
+        INSERT INTO fee_receipts (id, payment_id, receipt_no, created_at)
+        VALUES (%s,%s,%s,%s)
+    """,
+
+    # students
+    "student_by_id": "SELECT * FROM students WHERE id = %s",
+
+    # finance ledgers (cash + bank share one shape; optional filters are NULL when unused)
+    "ledger_opening": """
+        SELECT
+            COALESCE(ba.opening_balance, 0)
+            +
+            COALESCE(SUM(
+                CASE
+                    WHEN ft.transaction_type IN ('INCOME','DEPOSIT') THEN ft.amount
+                    ELSE -ft.amount
+                END
+            ), 0) AS opening
+        FROM bank_accounts ba
+        LEFT JOIN finance_transactions ft
+            ON ba.id = ft.account_id
+            AND ft.transaction_mode=%s
+            AND ft.tx_date < %s
+        WHERE ba.id=%s
+        GROUP BY ba.id, ba.opening_balance
+    """,
+    "ledger_rows": """
+        SELECT id, tx_date, DATE_FORMAT(tx_date, %s) AS display_date,
+               transaction_type, amount, description,
+               receipt_no, payment_mode, category, income_category,
+               utr_no, attachment_url
+        FROM finance_transactions
+        WHERE transaction_mode=%s
+          AND account_id=%s
+          AND tx_date BETWEEN %s AND %s
+          AND (%s IS NULL OR transaction_type=%s)
+          AND (%s IS NULL OR income_category=%s)
+          AND (%s IS NULL OR category=%s)
+        ORDER BY tx_date ASC, id ASC
+    """,
+}
+
+_CACHE_ATTR = "_erp_prepared"
+
+
+# ============================================
+# Cache plumbing
+# ============================================
+def _raw_connection(conn):
+    """Unwrap InstrumentedConnection / PooledMySQLConnection down to the socket owner."""
+    conn = getattr(conn, "_conn", conn)
+    return getattr(conn, "_cnx", conn)
+
+
+def _cursor_for(conn, name):
+    raw = _raw_connection(conn)
+    cache = getattr(raw, _CACHE_ATTR, None)
+    if cache is None:
+        cache = {}
+        setattr(raw, _CACHE_ATTR, cache)
+
+    cur = cache.get(name)
+    if cur is None:
+        cur = InstrumentedCursor(raw.cursor(prepared=True))
+        cache[name] = cur
+    return cur
+
+
+def forget(conn):
+    """
+    Drop cached cursors for this connection without touching the server
+    (used after a session reset, where the statements are already gone).
+    """
+    raw = _raw_connection(conn)
+    if getattr(raw, _CACHE_ATTR, None):
+        setattr(raw, _CACHE_ATTR, {})
+
+
+# ============================================
+# Execute helpers
+# ============================================
+def execute(conn, name, params=()):
+    """Run a registered statement; returns the (cached) cursor."""
+    sql = STATEMENTS[name]  # same str object every time -> statement is reused
+    cur = _cursor_for(conn, name)
+    try:
+        cur.execute(sql, tuple(params))
+    except Error as e:
+        if e.errno != errorcode.ER_UNKNOWN_STMT_HANDLER:
+            raise
+        # server forgot the statement (reconnect / session reset) - re-prepare once
+        getattr(_raw_connection(conn), _CACHE_ATTR).pop(name, None)
+        cur = _cursor_for(conn, name)
+        cur.execute(sql, tuple(params))
+    return cur
+
+
+def fetchall(conn, name, params=()):
+    return execute(conn, name, params).fetchall()
+
+
+def fetchone(conn, name, params=()):
+    # read the whole result so the connection is free for the next statement
+    rows = fetchall(conn, name, params)
+    return rows[0] if rows else None
+
+
+def fetchall_dict(conn, name, params=()):
+    cur = execute(conn, name, params)
+    rows = cur.fetchall()
+    cols = cur.column_names
+    return [dict(zip(cols, r)) for r in rows]
+
+
+def fetchall_rows(conn, name, params=()):
+    """Results as app.rows Row objects (no dict per row)."""
+    cur = execute(conn, name, params)
+    rows = cur.fetchall()
+    make = row_class(tuple(cur.column_names))._make
+    return [make(r) for r in rows]
+
+
+def fetchone_dict(conn, name, params=()):
+    rows = fetchall_dict(conn, name, params)
+    return rows[0] if rows else None
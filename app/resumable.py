@@ -0,0 +1,311 @@
+# ============================================
+# FILE: app/resumable.py
+# Resumable chunked uploads (init / append / complete)
+# ============================================
+"""
+Mobile clients on slow links upload attachments in chunks, so a dropped
+connection resumes from the last good byte instead of from zero, and no
+worker is held for the whole transfer:
+
+    POST  /api/uploads                    {"filename", "size", "sha256"?}
+                                          -> {"upload_id", "offset": 0, "chunk_size"}
+    PATCH /api/uploads/<id>               raw bytes, header Upload-Offset: <n>
+                                          (+ X-Chunk-Sha256: <hex> to verify the chunk)
+                                          -> {"offset": n + len}
+    GET   /api/uploads/<id>               -> {"offset", "size", "complete"}  (resume point)
+    POST  /api/uploads/<id>/complete      size (and sha256 if given) checked -> complete
+
+A chunk is written straight into <id>.part at its offset. An offset that
+doesn't match the bytes already on disk gets 409 with the real offset.
+A chunk whose checksum doesn't match is cut off again (422).
+
+The finished upload is then passed to the existing endpoints by id instead
+of a multipart file:
+
+    attachment_upload_id=<id>      (mobile bank deposit / expense / income, chat)
+    file_upload_id=<id>            (student documents; photo_upload_id for the photo)
+
+Those endpoints call request_file(field), which hands back a werkzeug
+FileStorage either way, so storage.save() and everything after it is
+unchanged. The chunk files are dropped once the endpoint has answered
+with success.
+
+State lives next to the data (<id>.json), so any worker on the host can
+take the next chunk. Unfinished uploads expire after UPLOAD_TTL seconds.
+"""
+
+import hashlib
+import json
+import os
+import re
+import time
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines: no cross-process chunk lock
+    fcntl = None
+
+from werkzeug.datastructures import FileStorage
+
+from app import storage
+
+UPLOAD_DIR = os.path.join(storage.APP_DIR, "uploads", "_resumable")
+
+CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))        # suggested to clients
+MAX_SIZE = int(os.getenv("UPLOAD_MAX_SIZE", str(100 * 1024 * 1024)))
+TTL = int(os.getenv("UPLOAD_TTL", str(24 * 3600)))
+
+_ID = re.compile(r"^[0-9a-f]{32}$")
+_SHA256 = re.compile(r"^[0-9a-f]{64}$")
+
+
+class UploadError(Exception):
+    """Protocol error with the HTTP status to answer (and the current offset)."""
+
+    def __init__(self, status, message, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.offset = offset
+
+
+# ============================================
+# State
+# ============================================
+def _paths(upload_id):
+    if not _ID.match(upload_id or ""):
+        raise UploadError(404, "Unknown upload")
+    base = os.path.join(UPLOAD_DIR, upload_id)
+    return base + ".json", base + ".part"
+
+
+def _write_state(state):
+    meta_path, _ = _paths(state["id"])
+    tmp = meta_path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, meta_path)
+
+
+def load(upload_id, owner=None):
+    """Upload state dict (with the current offset); 404 if unknown / not yours."""
+    meta_path, part_path = _paths(upload_id)
+    try:
+        with open(meta_path) as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        raise UploadError(404, "Unknown upload")
+    if owner is not None and state.get("owner") != owner:
+        raise UploadError(404, "Unknown upload")
+    state["offset"] = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    return state
+
+
+def public(state):
+    return {
+        "upload_id": state["id"],
+        "filename": state["filename"],
+        "size": state["size"],
+        "offset": state["offset"],
+        "complete": state["complete"],
+        "chunk_size": CHUNK_SIZE,
+    }
+
+
+# ============================================
+# Protocol steps
+# ============================================
+def start(filename, size, owner, sha256=None, mime=None):
+    """Open a new upload; returns its state."""
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        raise UploadError(400, "size is required")
+    if size <= 0 or size > MAX_SIZE:
+        raise UploadError(413, f"size must be between 1 and {MAX_SIZE} bytes")
+    if not filename:
+        raise UploadError(400, "filename is required")
+    sha256 = (sha256 or "").lower() or None
+    if sha256 and not _SHA256.match(sha256):
+        raise UploadError(400, "sha256 must be 64 hex characters")
+
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    purge_expired()
+
+    state = {
+        "id": uuid.uuid4().hex,
+        "filename": filename[:255],
+        "mime": mime,
+        "size": size,
+        "sha256": sha256,
+        "owner": owner,
+        "complete": False,
+        "created_at": time.time(),
+    }
+    open(_paths(state["id"])[1], "wb").close()
+    _write_state(state)
+    state["offset"] = 0
+    return state
+
+
+def append(upload_id, owner, offset, stream, chunk_sha256=None):
+    """Write one chunk at `offset`; returns the new offset."""
+    state = load(upload_id, owner)
+    if state["complete"]:
+        raise UploadError(409, "Upload already completed", state["offset"])
+    try:
+        offset = int(offset)
+    except (TypeError, ValueError):
+        raise UploadError(400, "Upload-Offset header is required", state["offset"])
+
+    _, part_path = _paths(upload_id)
+    with open(part_path, "r+b") as out:
+        if fcntl is not None:
+            try:
+                fcntl.flock(out, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                raise UploadError(409, "Another chunk is being written", state["offset"])
+
+        current = os.fstat(out.fileno()).st_size
+        if offset != current:
+            raise UploadError(409, "Offset mismatch", current)
+
+        h = hashlib.sha256()
+        written = 0
+        out.seek(offset)
+        while True:
+            chunk = stream.read(storage.CHUNK_SIZE)
+            if not chunk:
+                break
+            if offset + written + len(chunk) > state["size"]:
+                out.truncate(offset)
+                raise UploadError(413, "Chunk runs past the declared size", offset)
+            h.update(chunk)
+            out.write(chunk)
+            written += len(chunk)
+
+        if chunk_sha256 and h.hexdigest() != chunk_sha256.lower():
+            out.truncate(offset)
+            raise UploadError(422, "Chunk checksum mismatch", offset)
+        out.flush()
+        os.fsync(out.fileno())
+        return offset + written
+
+
+def complete(upload_id, owner):
+    """Check size (and the whole-file sha256 when declared); returns the state."""
+    state = load(upload_id, owner)
+    if state["complete"]:
+        return state
+    if state["offset"] != state["size"]:
+        raise UploadError(409, "Upload is incomplete", state["offset"])
+
+    _, part_path = _paths(upload_id)
+    h = hashlib.sha256()
+    with open(part_path, "rb") as f:
+        for chunk in iter(lambda: f.read(storage.CHUNK_SIZE), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+    if state["sha256"] and digest != state["sha256"]:
+        # start over: the bytes on disk are not the declared file
+        open(part_path, "wb").close()
+        raise UploadError(422, "File checksum mismatch", 0)
+
+    state.update(sha256=digest, complete=True)
+    state.pop("offset", None)
+    _write_state(state)
+    state["offset"] = state["size"]
+    return state
+
+
+def discard(upload_id):
+    for path in _paths(upload_id):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def purge_expired(now=None):
+    """Drop uploads older than TTL (finished ones nobody used, too)."""
+    now = now or time.time()
+    removed = 0
+    try:
+        names = os.listdir(UPLOAD_DIR)
+    except OSError:
+        return 0
+    for name in names:
+        upload_id, ext = os.path.splitext(name)
+        if ext != ".json" or not _ID.match(upload_id):
+            continue
+        try:
+            if now - os.path.getmtime(os.path.join(UPLOAD_DIR, name)) > TTL:
+                discard(upload_id)
+                removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+# ============================================
+# Using a finished upload from an endpoint
+# ============================================
+def request_owner():
+    """Who is uploading: web session, mobile chat user, app user or student JWT."""
+    from flask import current_app, request, session
+
+    if session.get("logged_in"):
+        return f"web:{session.get('username')}"
+    auth = request.headers.get("Authorization", "")
+    if auth.startswith("Bearer chat_"):
+        return "chat:" + auth[len("Bearer chat_"):]
+    if not auth.startswith("Bearer "):
+        return None
+
+    token = auth[len("Bearer "):]
+    from app.jwt_utils import verify_token
+    data = verify_token(token)
+    if data:
+        return f"user:{data.get('user_id')}"
+    try:
+        import jwt
+        # same key / claim as students.student_login_required
+        data = jwt.decode(token, current_app.config.get("SECRET_KEY", "tatwadarsha_secret"),
+                          algorithms=["HS256"])
+        return f"student:{data['student_id']}"
+    except Exception:
+        return None
+
+
+def request_file(field):
+    """
+    request.files[field], or the finished upload named by `<field>_upload_id`
+    (form or JSON body) as a FileStorage. None when neither was sent.
+    """
+    from flask import after_this_request, request
+
+    file = request.files.get(field)
+    if file and file.filename:
+        return file
+
+    data = request.form if request.form else (request.get_json(silent=True) or {})
+    upload_id = data.get(f"{field}_upload_id")
+    if not upload_id:
+        return file
+
+    state = load(upload_id, request_owner() or "")
+    if not state["complete"]:
+        raise UploadError(409, "Upload is not complete", state["offset"])
+
+    _, part_path = _paths(upload_id)
+    stream = open(part_path, "rb")
+
+    @after_this_request
+    def _cleanup(response):
+        stream.close()
+        if response.status_code < 400:
+            discard(upload_id)
+        return response
+
+    return FileStorage(stream=stream, filename=state["filename"], content_type=state.get("mime"))
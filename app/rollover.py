@@ -0,0 +1,374 @@
+# ============================================
+# FILE: app/rollover.py
+# Academic-year rollover (promote -> rolls -> fees -> balances), resumable
+# ============================================
+"""
+Year end used to be four screens driven one request at a time (promote,
+roll generation, fee structure assignment, balance carry-over). A rollover
+run does all of it as one background job:
+
+    POST /api/rollover {
+        "label": "2025-26",
+        "cohorts": [
+            {"match": {"session": "2024-25", "course": "BSC NURSING", "batch": "1st Year"},
+             "set":   {"session": "2025-26", "batch": "2nd Year"}},
+            ...
+        ],
+        "rolls": true, "fees": true, "balances": true,
+        "as_of": "2025-03-31"                   # balance cut-over (default: today)
+    }
+    GET  /api/rollover/<run_id>                 status + per-step checkpoints
+    POST /api/rollover/<run_id>/resume          re-queue a failed run
+
+Steps, in order (STEPS):
+
+  members   cohort membership is frozen first (INSERT IGNORE ... SELECT into
+            rollover_members), so chained cohorts (1st -> 2nd, 2nd -> 3rd)
+            can't promote a student twice; the first cohort listed wins
+  promote   UPDATE students JOIN rollover_members, one id range at a time
+  rolls     renumber every (course, batch) the promoted students ended up
+            in, one set-based UPDATE per group
+  fees      next-year structures via fee_engine (heads a student already
+            has are skipped, so this never bills anyone twice)
+  balances  closing balance per account as of `as_of` into
+            account_balance_snapshots; bank_accounts.opening_balance is NOT
+            changed - every ledger adds all transactions on top of it
+
+Every chunk (CHUNK_SIZE students, one cohort, one roll group) is its own
+transaction and moves the step's row in rollover_checkpoints in that same
+transaction. A run that dies - worker crash, lost lease, DB restart - is
+picked up again by the job retry (or /resume) and continues after the
+last committed chunk; nothing is applied twice.
+"""
+
+import json
+import uuid
+from datetime import date, datetime
+
+from app import fee_engine, jobs
+
+CHUNK_SIZE = 1000
+
+STEPS = ("members", "promote", "rolls", "fees", "balances")
+OPTIONAL_STEPS = ("rolls", "fees", "balances")
+COHORT_FIELDS = fee_engine.MATCH_FIELDS
+
+STATUS_PENDING = "pending"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+# ============================================
+# Plan
+# ============================================
+def validate_plan(plan):
+    """Normalized plan dict; raises ValueError with a user-facing message."""
+    if not isinstance(plan, dict):
+        raise ValueError("plan must be an object")
+    cohorts = plan.get("cohorts") or []
+    if not cohorts:
+        raise ValueError("at least one cohort is required")
+
+    clean = []
+    for i, cohort in enumerate(cohorts, 1):
+        match = {k: str(v).strip() for k, v in (cohort.get("match") or {}).items() if str(v or "").strip()}
+        updates = {k: str(v).strip() for k, v in (cohort.get("set") or {}).items() if str(v or "").strip()}
+        bad = (set(match) | set(updates)) - set(COHORT_FIELDS)
+        if bad:
+            raise ValueError(f"cohort {i}: unknown fields {', '.join(sorted(bad))}")
+        if not match:
+            raise ValueError(f"cohort {i}: match must name at least one of {', '.join(COHORT_FIELDS)}")
+        if not updates:
+            raise ValueError(f"cohort {i}: nothing to set")
+        clean.append({"match": match, "set": updates})
+
+    as_of = plan.get("as_of") or date.today().isoformat()
+    datetime.strptime(as_of, "%Y-%m-%d")  # ValueError on a bad date
+
+    normalized = {"label": str(plan.get("label") or "").strip()[:100], "cohorts": clean, "as_of": as_of}
+    for step in OPTIONAL_STEPS:
+        normalized[step] = bool(plan.get(step, True))
+    return normalized
+
+
+def create_run(conn, plan, created_by=None):
+    """Store a validated plan as a new run; returns its id."""
+    run_id = uuid.uuid4().hex
+    now = datetime.utcnow()
+    cur = conn.cursor()
+    cur.execute("""
+        INSERT INTO rollover_runs (id, label, plan, status, created_by, created_at, updated_at)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+    """, (run_id, plan["label"], json.dumps(plan), STATUS_PENDING, created_by, now, now))
+    conn.commit()
+    cur.close()
+    return run_id
+
+
+def get_run(conn, run_id):
+    """Run row with its plan and checkpoints, or None."""
+    cur = conn.cursor(dictionary=True)
+    cur.execute("SELECT * FROM rollover_runs WHERE id=%s", (run_id,))
+    run = cur.fetchone()
+    if run:
+        run["plan"] = json.loads(run["plan"] or "{}")
+        cur.execute("""
+            SELECT step, position, done, finished_at FROM rollover_checkpoints
+            WHERE run_id=%s
+        """, (run_id,))
+        run["steps"] = {r["step"]: r for r in cur.fetchall()}
+    cur.close()
+    return run
+
+
+# ============================================
+# Checkpoints
+# ============================================
+def _checkpoint(cur, run_id, step):
+    """(position, done, finished) for a step; creates the row on first use."""
+    cur.execute("""
+        INSERT IGNORE INTO rollover_checkpoints (run_id, step, position, done)
+        VALUES (%s, %s, NULL, 0)
+    """, (run_id, step))
+    cur.execute("""
+        SELECT position, done, finished_at FROM rollover_checkpoints
+        WHERE run_id=%s AND step=%s
+    """, (run_id, step))
+    position, done, finished_at = cur.fetchone()
+    return position, done, finished_at is not None
+
+
+def _advance(cur, run_id, step, position, done, finished=False):
+    """Move the checkpoint - same transaction as the chunk it records."""
+    cur.execute("""
+        UPDATE rollover_checkpoints
+        SET position=%s, done=%s, finished_at=%s
+        WHERE run_id=%s AND step=%s
+    """, (position, done, datetime.utcnow() if finished else None, run_id, step))
+
+
+def _set_status(conn, run_id, status, step=None, error=None):
+    cur = conn.cursor()
+    now = datetime.utcnow()
+    cur.execute("""
+        UPDATE rollover_runs
+        SET status=%s, step=%s, error=%s, updated_at=%s,
+            finished_at=IF(%s = 'done', %s, NULL)
+        WHERE id=%s
+    """, (status, step, error, now, status, now, run_id))
+    conn.commit()
+    cur.close()
+
+
+def _member_chunks(conn, cur, run_id, step, progress=None):
+    """
+    Walk rollover_members in student_id order from the step's checkpoint,
+    yielding (lo, hi, ids). The caller applies the chunk without committing;
+    the checkpoint moves to `hi` in the same transaction when it resumes.
+    """
+    cur.execute("SELECT COUNT(*) FROM rollover_members WHERE run_id=%s", (run_id,))
+    total = cur.fetchone()[0]
+    position, done, finished = _checkpoint(cur, run_id, step)
+    conn.commit()
+    if finished:
+        return
+    position = position or ""
+    while True:
+        cur.execute("""
+            SELECT student_id FROM rollover_members
+            WHERE run_id=%s AND student_id > %s
+            ORDER BY student_id
+            LIMIT %s
+        """, (run_id, position, CHUNK_SIZE))
+        ids = [r[0] for r in cur.fetchall()]
+        if not ids:
+            break
+        yield position, ids[-1], ids
+        position, done = ids[-1], done + len(ids)
+        _advance(cur, run_id, step, position, done)
+        conn.commit()
+        if progress:
+            progress(done, total, f"Rollover: {step}")
+    _advance(cur, run_id, step, position, done, finished=True)
+    conn.commit()
+
+
+# ============================================
+# Steps
+# ============================================
+def _where(fields, alias=""):
+    return " AND ".join(f"{alias}{k}=%s" for k in fields), list(fields.values())
+
+
+def step_members(conn, cur, run_id, plan, progress=None):
+    position, done, finished = _checkpoint(cur, run_id, "members")
+    conn.commit()
+    if finished:
+        return done
+    start = int(position or 0)
+    for i, cohort in enumerate(plan["cohorts"][start:], start):
+        where, params = _where(cohort["match"])
+        cur.execute(f"""
+            INSERT IGNORE INTO rollover_members (run_id, student_id, cohort)
+            SELECT %s, id, %s FROM students WHERE {where}
+        """, (run_id, i, *params))
+        done += max(cur.rowcount, 0)
+        _advance(cur, run_id, "members", i + 1, done, finished=(i + 1 == len(plan["cohorts"])))
+        conn.commit()
+        if progress:
+            progress(i + 1, len(plan["cohorts"]), "Rollover: selecting cohorts")
+    return done
+
+
+def step_promote(conn, cur, run_id, plan, progress=None):
+    for lo, hi, ids in _member_chunks(conn, cur, run_id, "promote", progress):
+        for i, cohort in enumerate(plan["cohorts"]):
+            sets = ", ".join(f"s.{k}=%s" for k in cohort["set"])
+            cur.execute(f"""
+                UPDATE students s
+                JOIN rollover_members m ON m.student_id = s.id
+                SET {sets}
+                WHERE m.run_id=%s AND m.cohort=%s AND m.student_id > %s AND m.student_id <= %s
+            """, (*cohort["set"].values(), run_id, i, lo, hi))
+    return _checkpoint(cur, run_id, "promote")[1]
+
+
+def step_rolls(conn, cur, run_id, plan, progress=None):
+    from app.routers.roll_number_allocation import renumber_rolls
+
+    position, done, finished = _checkpoint(cur, run_id, "rolls")
+    conn.commit()
+    if finished:
+        return done
+    # groups the promoted students are in now (stable once promote is done)
+    cur.execute("""
+        SELECT DISTINCT s.course, s.batch
+        FROM students s
+        JOIN rollover_members m ON m.student_id = s.id
+        WHERE m.run_id=%s AND s.course IS NOT NULL AND s.course <> ''
+          AND s.batch IS NOT NULL AND s.batch <> ''
+        ORDER BY s.course, s.batch
+    """, (run_id,))
+    groups = cur.fetchall()
+    start = int(position or 0)
+    for i, (course, batch) in enumerate(groups[start:], start):
+        done += max(renumber_rolls(cur, course, batch), 0)
+        _advance(cur, run_id, "rolls", i + 1, done)
+        conn.commit()
+        if progress:
+            progress(i + 1, len(groups), "Rollover: roll numbers")
+    _advance(cur, run_id, "rolls", len(groups), done, finished=True)
+    conn.commit()
+    return done
+
+
+def step_fees(conn, cur, run_id, plan, progress=None):
+    structures = fee_engine.load_structures(cur)
+    added = 0
+    for lo, hi, ids in _member_chunks(conn, cur, run_id, "fees", progress):
+        if structures["table"]:
+            added += fee_engine.insert_assignments(cur, fee_engine.assignments_for(cur, ids, structures))
+    if added:
+        print(f"💰 Rollover {run_id[:8]}: {added} fee rows assigned")
+    return _checkpoint(cur, run_id, "fees")[1]
+
+
+def step_balances(conn, cur, run_id, plan, progress=None):
+    _, done, finished = _checkpoint(cur, run_id, "balances")
+    conn.commit()
+    if finished:
+        return done
+    # same arithmetic as the account list's closing_balance, cut at as_of
+    cur.execute("""
+        INSERT INTO account_balance_snapshots (run_id, account_id, as_of, balance, created_at)
+        SELECT %s, ba.id, %s,
+               COALESCE(ba.opening_balance, 0) + COALESCE(SUM(
+                   CASE
+                       WHEN ft.transaction_type IN ('INCOME','DEPOSIT') THEN ft.amount
+                       ELSE -ft.amount
+                   END
+               ), 0),
+               %s
+        FROM bank_accounts ba
+        LEFT JOIN finance_transactions ft
+            ON ft.account_id = ba.id AND ft.tx_date <= %s
+        GROUP BY ba.id, ba.opening_balance
+        ON DUPLICATE KEY UPDATE balance = VALUES(balance), as_of = VALUES(as_of)
+    """, (run_id, plan["as_of"], datetime.utcnow(), plan["as_of"]))
+    cur.execute("SELECT COUNT(*) FROM account_balance_snapshots WHERE run_id=%s", (run_id,))
+    done = cur.fetchone()[0]
+    _advance(cur, run_id, "balances", None, done, finished=True)
+    conn.commit()
+    return done
+
+
+STEP_FUNCTIONS = {
+    "members": step_members,
+    "promote": step_promote,
+    "rolls": step_rolls,
+    "fees": step_fees,
+    "balances": step_balances,
+}
+
+
+# ============================================
+# Runner
+# ============================================
+def run(conn, run_id, progress=None):
+    """Run (or resume) every step of a rollover; returns {step: count}."""
+    run_row = get_run(conn, run_id)
+    if run_row is None:
+        raise ValueError("Unknown rollover run")
+    plan = run_row["plan"]
+
+    counts = {}
+    cur = conn.cursor()
+    step = None
+    try:
+        for step in STEPS:
+            if step in OPTIONAL_STEPS and not plan.get(step):
+                continue
+            _set_status(conn, run_id, STATUS_RUNNING, step)
+            counts[step] = STEP_FUNCTIONS[step](conn, cur, run_id, plan, progress)
+            print(f"🎓 Rollover {run_id[:8]} {step}: {counts[step]}")
+    except Exception as e:
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        _set_status(conn, run_id, STATUS_FAILED, step, str(e)[:1000])
+        raise
+    finally:
+        cur.close()
+
+    _set_status(conn, run_id, STATUS_DONE)
+    _after_rollover(plan)
+    return counts
+
+
+def _after_rollover(plan):
+    """Per-worker caches that saw the old classes / rolls / fees."""
+    from app import typeahead
+    from app.routers.dashboard import invalidate_snapshot
+
+    typeahead.invalidate()
+    invalidate_snapshot()
+
+
+# ============================================
+# Background job
+# ============================================
+@jobs.task("rollover.run")
+def run_rollover(job, run_id):
+    # own connection: job.progress() commits on job.conn, which must never
+    # land in the middle of a chunk
+    from app.db import get_mysql_connection
+
+    conn = get_mysql_connection()
+    if conn is None:
+        raise RuntimeError("DB connection failed")
+    try:
+        return {"run_id": run_id, "steps": run(conn, run_id, progress=job.progress)}
+    finally:
+        conn.close()
@@ -9,13 +9,16 @@ from flask import (
     session,
     flash,
     current_app,
-    send_from_directory,
-    jsonify
+    jsonify,
+    Response,
+    stream_with_context
 )
 from app.routers.master import get_db
+from app import chat_bus, resumable, storage
+from app.file_serving import serve_file
 import os
-import uuid
-from werkzeug.utils import secure_filename
+import time
+from urllib.parse import quote
 from functools import wraps
 
 chat_bp = Blueprint("chat", __name__)
@@ -38,6 +41,11 @@ def is_admin():
     return session.get("chat_role") == "admin"
 
 
+def wants_json():
+    """fetch() callers send Accept: application/json and get JSON instead of a redirect."""
+    return request.accept_mimetypes.best == "application/json"
+
+
 def ensure_upload_folder():
     upload_folder = os.path.join(
         current_app.root_path, "static", "chat_uploads"
@@ -54,6 +62,238 @@ def get_db_safe():
     return db
 
 
+# ---------- Message cursors ----------
+# Clients keep the last id they have and ask only for newer rows
+# (?after_id= / ?since=); history is paged newest-first with ?before_id=.
+# Both walk idx_fc_request_id (request_id, id).
+
+CHAT_PAGE_SIZE = 50
+CHAT_MAX_PAGE = 500
+
+# created_at is stored in UTC; formatted in SQL instead of per row in Python
+SQL_IST_ISO = "%Y-%m-%dT%H:%i:%s+05:30"
+SQL_DT_PLAIN = "%Y-%m-%d %H:%i:%s"
+
+
+def message_cursor_args(default_limit=None):
+    """(after_id, before_id, limit) from the query string."""
+    after_id = request.args.get("after_id", type=int)
+    if after_id is None:
+        after_id = request.args.get("since", type=int)
+    before_id = request.args.get("before_id", type=int)
+    limit = request.args.get("limit", type=int) or default_limit
+    if limit is not None:
+        limit = max(1, min(limit, CHAT_MAX_PAGE))
+    return after_id, before_id, limit
+
+
+def fetch_chat_messages(cur, req_id, columns, params=(),
+                        after_id=None, before_id=None, limit=None):
+    """
+    Messages of one request in ascending id order.
+
+    after_id  -> rows newer than the cursor (oldest first)
+    before_id -> the `limit` rows just older than the cursor
+    neither   -> the latest `limit` rows (all rows when limit is None)
+
+    Returns (rows, has_more); has_more means further rows exist beyond this
+    page in the direction being read. `params` are bound ahead of the WHERE
+    clause (DATE_FORMAT patterns in `columns`).
+    """
+    sql = f"SELECT {columns} FROM finance_chat WHERE request_id=%s"
+    args = list(params) + [req_id]
+
+    if after_id is not None:
+        sql += " AND id > %s ORDER BY id ASC"
+        args.append(after_id)
+        newest_first = False
+    elif before_id is not None or limit is not None:
+        if before_id is not None:
+            sql += " AND id < %s"
+            args.append(before_id)
+        sql += " ORDER BY id DESC"
+        newest_first = True
+    else:
+        sql += " ORDER BY id ASC"
+        newest_first = False
+
+    if limit is not None:
+        sql += " LIMIT %s"
+        args.append(limit + 1)  # one extra row tells us whether more exist
+
+    cur.execute(sql, tuple(args))
+    rows = cur.fetchall()
+
+    has_more = limit is not None and len(rows) > limit
+    if has_more:
+        rows = rows[:limit]
+    if newest_first:
+        rows.reverse()
+    return rows, has_more
+
+
+def message_page(rows, has_more, after_id=None):
+    """Common cursor fields for the JSON responses."""
+    first_id = rows[0]["id"] if rows else None
+    last_id = rows[-1]["id"] if rows else after_id
+    return {
+        "data": rows,
+        "first_id": first_id,
+        "last_id": last_id,
+        "next_cursor": last_id,
+        "has_more": has_more,
+    }
+
+
+def attachment_base():
+    """External URL prefix of chat_attachment (built once per response)."""
+    return url_for("chat.chat_attachment", filename="x", _external=True)[:-1]
+
+
+def attachment_url(file_url, base):
+    if not file_url:
+        return None
+    return base + quote(file_url.replace("/static/chat_uploads/", ""))
+
+
+# ---------- Message counters ----------
+# finance_requests.msg_count is bumped in the same transaction as every
+# finance_chat insert; finance_chat_reads holds how many of them each user
+# has seen, so unread = msg_count - read_count with no COUNT(*) per row.
+
+REQUEST_LIST_SQL = """
+    SELECT fr.*, fr.msg_count - COALESCE(r.read_count, 0) AS unread
+    FROM finance_requests fr
+    LEFT JOIN finance_chat_reads r ON r.user_id = %s AND r.request_id = fr.id
+    {where}
+    ORDER BY fr.created_at DESC
+"""
+
+
+def request_list(cur, user_id, admin, columns="fr.*"):
+    """Requests visible to the user with msg_count + unread (one indexed scan)."""
+    sql = REQUEST_LIST_SQL.replace("fr.*", columns, 1)
+    if admin:
+        cur.execute(sql.format(where=""), (user_id,))
+    else:
+        cur.execute(sql.format(where="WHERE fr.requester_id = %s"), (user_id, user_id))
+    return cur.fetchall()
+
+
+def count_message(cur, request_id, message_id, sender_id):
+    """Bump the request's counter and mark it read for the sender (caller commits)."""
+    cur.execute("""
+        UPDATE finance_requests
+        SET msg_count = msg_count + 1, last_message_id = %s
+        WHERE id = %s
+    """, (message_id, request_id))
+    mark_read(cur, sender_id, request_id)
+
+
+def mark_read(cur, user_id, request_id):
+    """Record that `user_id` has seen every message of the request so far."""
+    cur.execute("""
+        INSERT INTO finance_chat_reads (user_id, request_id, read_count, last_read_id)
+        SELECT %s, id, msg_count, last_message_id FROM finance_requests WHERE id = %s
+        ON DUPLICATE KEY UPDATE read_count = VALUES(read_count), last_read_id = VALUES(last_read_id)
+    """, (user_id, request_id))
+
+
+# ---------- Live updates (SSE) ----------
+# chat_send / mobile_chat_send / approve / reject publish to app.chat_bus;
+# /chat/stream and /api/mobile/chat/stream push those events to open pages
+# and apps. Needs a threaded worker (Procfile uses gthread) since each open
+# stream holds a thread, never a DB connection. At most CHAT_SSE_MAX_STREAMS
+# streams run per worker (default: half of the 16 gthread threads); beyond
+# that the stream answers 503 and the client retries. For many concurrent
+# chat users run the streams on an async worker (gevent / eventlet) instead.
+
+SSE_HEARTBEAT = int(os.getenv("CHAT_SSE_HEARTBEAT", "15"))
+SSE_MAX_AGE = int(os.getenv("CHAT_SSE_MAX_AGE", "300"))
+SSE_MAX_STREAMS = int(os.getenv("CHAT_SSE_MAX_STREAMS", "8"))
+SSE_RETRY_MS = 3000
+
+
+def publish_message(db, message_id):
+    """Push a freshly inserted finance_chat row to its request channel."""
+    cur = db.cursor(dictionary=True)
+    cur.execute("""
+        SELECT id, request_id, sender_id, sender_name, message, file_url,
+               DATE_FORMAT(created_at, %s) AS created_at,
+               DATE_FORMAT(DATE_ADD(created_at, INTERVAL 330 MINUTE), %s) AS created_at_ist
+        FROM finance_chat WHERE id=%s
+    """, (SQL_DT_PLAIN, SQL_IST_ISO, message_id))
+    row = cur.fetchone()
+    cur.close()
+    if not row:
+        return
+    row["attachment"] = attachment_url(row["file_url"], attachment_base())
+    chat_bus.publish([f"request:{row['request_id']}"], "message", row, db=db)
+
+
+def publish_status(db, req_id, status, remarks=None):
+    """Approval / rejection -> the request, its requester and all admins."""
+    cur = db.cursor()
+    cur.execute("SELECT requester_id FROM finance_requests WHERE id=%s", (req_id,))
+    row = cur.fetchone()
+    cur.close()
+    if not row:
+        return
+    chat_bus.publish(
+        [f"request:{req_id}", f"user:{row[0]}", "admin"],
+        "status",
+        {"request_id": int(req_id), "status": status, "remarks": remarks},
+        db=db,
+    )
+
+
+def _shape_event(event, client):
+    data = dict(event.data)
+    if event.kind == "message":
+        if client == "mobile":
+            data["created_at"] = data.pop("created_at_ist")
+            data.pop("file_url", None)
+        else:
+            data.pop("created_at_ist", None)
+            data.pop("attachment", None)
+    return data
+
+
+def sse_response(channels, client):
+    """text/event-stream of bus events on `channels`, resuming from Last-Event-ID."""
+    last = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    cursor = int(last) if last and last.isdigit() else chat_bus.last_id()
+    dumps = current_app.json.dumps
+
+    # each open stream holds a worker thread - keep some for everything else
+    if not chat_bus.subscribe(limit=SSE_MAX_STREAMS):
+        response = jsonify({"success": False, "message": "Too many open streams", "retry": SSE_RETRY_MS})
+        response.status_code = 503
+        response.headers["Retry-After"] = str(max(1, SSE_RETRY_MS // 1000))
+        return response
+
+    def generate():
+        nonlocal cursor
+        yield f"retry: {SSE_RETRY_MS}\n\n"
+        # streams end after SSE_MAX_AGE; EventSource reconnects with Last-Event-ID
+        deadline = time.monotonic() + SSE_MAX_AGE
+        while time.monotonic() < deadline:
+            events, cursor, gap = chat_bus.wait(channels, cursor, SSE_HEARTBEAT)
+            if gap:
+                yield f"id: {cursor}\nevent: resync\ndata: {{}}\n\n"
+            for e in events:
+                yield f"id: {e.id}\nevent: {e.kind}\ndata: {dumps(_shape_event(e, client))}\n\n"
+            if not events and not gap:
+                yield ": ping\n\n"
+
+    response = Response(stream_with_context(generate()), mimetype="text/event-stream")
+    # runs when the server closes the stream, even if it never started iterating
+    response.call_on_close(chat_bus.unsubscribe)
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"  # nginx: don't buffer the stream
+    return response
+
+
 # ---------- Login / Logout ----------
 
 @chat_bp.route("/chat/login", methods=["GET", "POST"])
@@ -103,50 +343,98 @@ def chat_room():
     user_id = session["chat_user_id"]
     role = session["chat_role"]
 
-    # All requests list (for left side)
-    if role == "admin":
-        cursor.execute("""
-            SELECT fr.*, 
-                   (SELECT COUNT(*) FROM finance_chat fc WHERE fc.request_id = fr.id) AS msg_count
-            FROM finance_requests fr
-            ORDER BY fr.created_at DESC
-        """)
-    else:
-        cursor.execute("""
-            SELECT fr.*, 
-                   (SELECT COUNT(*) FROM finance_chat fc WHERE fc.request_id = fr.id) AS msg_count
-            FROM finance_requests fr
-            WHERE fr.requester_id = %s
-            ORDER BY fr.created_at DESC
-        """, (user_id,))
-    requests_list = cursor.fetchall()
-
     # Current selected request
     req_id = request.args.get("request_id", type=int)
     selected_request = None
     chat_messages = []
+    has_older = False
 
     if req_id:
         cursor.execute("SELECT * FROM finance_requests WHERE id=%s", (req_id,))
         selected_request = cursor.fetchone()
 
         if selected_request:
-            cursor.execute("""
-                SELECT * FROM finance_chat 
-                WHERE request_id=%s
-                ORDER BY created_at ASC
-            """, (req_id,))
-            chat_messages = cursor.fetchall()
+            # opening the conversation clears its unread badge
+            mark_read(cursor, user_id, req_id)
+            db.commit()
+
+            # only the latest page; older pages and new messages come from chat_messages_json
+            chat_messages, has_older = fetch_chat_messages(
+                cursor, req_id, "*", limit=CHAT_PAGE_SIZE
+            )
+
+    # All requests list (for left side) - msg_count / unread are maintained columns
+    requests_list = request_list(cursor, user_id, role == "admin")
 
     return render_template(
         "chat_room.html",
         requests_list=requests_list,
         selected_request=selected_request,
         chat_messages=chat_messages,
+        has_older=has_older,
+        last_message_id=chat_messages[-1]["id"] if chat_messages else 0,
         role=role
     )
 
 
+@chat_bp.route("/chat/messages/<int:req_id>")
+@chat_login_required
+def chat_messages_json(req_id):
+    """Delta / history feed for the chat room page (?after_id= or ?before_id=)."""
+    after_id, before_id, limit = message_cursor_args(CHAT_PAGE_SIZE)
+
+    db = get_db()
+    cur = db.cursor(dictionary=True)
+
+    if not is_admin():
+        cur.execute("SELECT requester_id FROM finance_requests WHERE id=%s", (req_id,))
+        owner = cur.fetchone()
+        if not owner or str(owner["requester_id"]) != str(session["chat_user_id"]):
+            cur.close()
+            db.close()
+            return jsonify({"success": False}), 403
+
+    rows, has_more = fetch_chat_messages(
+        cur, req_id,
+        "id, sender_id, sender_name, message, file_url, DATE_FORMAT(created_at, %s) AS created_at",
+        (SQL_DT_PLAIN,),
+        after_id=after_id, before_id=before_id, limit=limit,
+    )
+    if rows and before_id is None and not has_more:
+        mark_read(cur, session["chat_user_id"], req_id)
+        db.commit()
+    cur.close()
+    db.close()
+
+    return jsonify({"success": True, **message_page(rows, has_more, after_id)})
+
+
+@chat_bp.route("/chat/stream")
+@chat_login_required
+def chat_stream():
+    """SSE feed for the chat room page (new messages + status changes)."""
+    req_id = request.args.get("request_id", type=int)
+    user_id = session["chat_user_id"]
+
+    if is_admin():
+        channels = ["admin"]
+    else:
+        channels = [f"user:{user_id}"]
+        if req_id:
+            db = get_db()
+            cur = db.cursor()
+            cur.execute("SELECT requester_id FROM finance_requests WHERE id=%s", (req_id,))
+            owner = cur.fetchone()
+            cur.close()
+            db.close()
+            if not owner or str(owner[0]) != str(user_id):
+                return jsonify({"success": False}), 403
+
+    if req_id:
+        channels.append(f"request:{req_id}")
+    return sse_response(channels, "web")
+
+
 # ---------- Create New Request (Accountant only) ----------
 
 @chat_bp.route("/chat/request/create", methods=["POST"])
@@ -164,17 +452,15 @@ def create_request():
         flash("Amount and purpose are required.", "danger")
         return redirect(url_for("chat.chat_room"))
 
-    attachment_path = None
-    if file and file.filename:
-        upload_folder = ensure_upload_folder()
-        filename = secure_filename(file.filename)
-        save_path = os.path.join(upload_folder, filename)
-        file.save(save_path)
-        attachment_path = f"/static/chat_uploads/{filename}"
-
     db = get_db()
     cursor = db.cursor()
 
+    attachment_path = None
+    if file and file.filename:
+        # counted in this transaction: no reference left behind if the INSERT fails
+        stored = storage.save(file, ensure_upload_folder(), cur=cursor)
+        attachment_path = f"/static/chat_uploads/{stored.path}"
+
     requester_id = session["chat_user_id"]
     requester_name = session.get("chat_full_name") or session.get("chat_username")
 
@@ -198,24 +484,25 @@ def chat_send():
     file = request.files.get("file")
 
     if not request_id:
+        if wants_json():
+            return jsonify({"success": False, "message": "No request selected."}), 400
         flash("No request selected.", "danger")
         return redirect(url_for("chat.chat_room"))
 
-    file_url = None
-    if file and file.filename:
-        upload_folder = ensure_upload_folder()
-        filename = secure_filename(file.filename)
-        save_path = os.path.join(upload_folder, filename)
-        file.save(save_path)
-        file_url = f"/static/chat_uploads/{filename}"
-
-    if not message_text and not file_url:
+    if not message_text and not (file and file.filename):
+        if wants_json():
+            return jsonify({"success": False, "message": "Message or file required."}), 400
         flash("Message or file required.", "warning")
         return redirect(url_for("chat.chat_room", request_id=request_id))
 
     db = get_db()
     cursor = db.cursor()
 
+    file_url = None
+    if file and file.filename:
+        stored = storage.save(file, ensure_upload_folder(), cur=cursor)
+        file_url = f"/static/chat_uploads/{stored.path}"
+
     sender_id = session["chat_user_id"]
     sender_name = session.get("chat_full_name") or session.get("chat_username")
 
@@ -223,7 +510,14 @@ def chat_send():
         INSERT INTO finance_chat (request_id, sender_id, sender_name, message, file_url)
         VALUES (%s, %s, %s, %s, %s)
     """, (request_id, sender_id, sender_name, message_text, file_url))
+    message_id = cursor.lastrowid
+    count_message(cursor, request_id, message_id, sender_id)
     db.commit()
+    publish_message(db, message_id)
+
+    if wants_json():
+        # the chat room page posts with fetch() and pulls the delta itself
+        return jsonify({"success": True, "id": message_id})
 
     return redirect(url_for("chat.chat_room", request_id=request_id))
 
@@ -246,6 +540,7 @@ def approve_request(req_id):
         WHERE id=%s
     """, (remarks, req_id))
     db.commit()
+    publish_status(db, req_id, "approved", remarks)
 
     flash("Request approved.", "success")
     return redirect(url_for("chat.chat_room", request_id=req_id))
@@ -267,6 +562,7 @@ def reject_request(req_id):
         WHERE id=%s
     """, (remarks, req_id))
     db.commit()
+    publish_status(db, req_id, "rejected", remarks)
 
     flash("Request rejected.", "warning")
     return redirect(url_for("chat.chat_room", request_id=req_id))
@@ -322,21 +618,10 @@ def mobile_chat_requests():
         db.close()
         return jsonify({"success": False}), 401
 
-    if user["role"] == "admin":
-        cur.execute("""
-            SELECT id, amount, purpose, status
-            FROM finance_requests
-            ORDER BY created_at DESC
-        """)
-    else:
-        cur.execute("""
-            SELECT id, amount, purpose, status
-            FROM finance_requests
-            WHERE requester_id=%s
-            ORDER BY created_at DESC
-        """, (user_id,))
-
-    rows = cur.fetchall()
+    rows = request_list(
+        cur, user_id, user["role"] == "admin",
+        columns="fr.id, fr.amount, fr.purpose, fr.status, fr.msg_count, fr.last_message_id"
+    )
     cur.close()
     db.close()
 
@@ -360,52 +645,73 @@ def mobile_chat_messages(req_id):
     if not db:
         return jsonify({"success": False}), 503
 
+    after_id, before_id, limit = message_cursor_args()
+    if limit is None and before_id is not None:
+        limit = CHAT_PAGE_SIZE
+
     cur = db.cursor(dictionary=True)
 
-    cur.execute("""
-        SELECT
-            sender_id,
-            sender_name,
-            message,
-            file_url,
-            created_at
-        FROM finance_chat
-        WHERE request_id=%s
-        ORDER BY created_at ASC
-    """, (req_id,))
+    # No cursor -> full history (older app builds); ?after_id= -> only new rows
+    # ✅ IST conversion done in SQL (Flutter safe ISO string)
+    rows, has_more = fetch_chat_messages(
+        cur, req_id,
+        """id, sender_id, sender_name, message, file_url,
+           DATE_FORMAT(DATE_ADD(created_at, INTERVAL 330 MINUTE), %s) AS created_at""",
+        (SQL_IST_ISO,),
+        after_id=after_id, before_id=before_id, limit=limit,
+    )
 
-    rows = cur.fetchall()
+    # client now holds the newest message -> clear its unread count
+    user_id = auth.replace("Bearer chat_", "")
+    if rows and before_id is None and not has_more and user_id.isdigit():
+        mark_read(cur, int(user_id), req_id)
+        db.commit()
+
+    cur.close()
+    db.close()
 
+    # ✅ Map DB column → Flutter expected key (attachment base built once)
+    base = attachment_base()
     for r in rows:
-        # ✅ Convert datetime → IST (Flutter safe)
-        if r["created_at"]:
-            r["created_at"] = (
-                r["created_at"]
-                .replace(tzinfo=timezone.utc)
-                .astimezone(IST)
-                .isoformat()
-            )
+        r["attachment"] = attachment_url(r.pop("file_url", None), base)
 
-        # ✅ Map DB column → Flutter expected key
-        if r["file_url"]:
-            r["attachment"] = url_for(
-                "chat.chat_attachment",
-                filename=r["file_url"].replace("/static/chat_uploads/", ""),
-                _external=True
-            )
-        else:
-            r["attachment"] = None
+    return jsonify({"success": True, **message_page(rows, has_more, after_id)})
+
+
+@chat_bp.route("/api/mobile/chat/stream", methods=["GET"])
+def mobile_chat_stream():
+    """SSE: ?request_id= for one conversation, otherwise the user's status updates."""
+    auth = request.headers.get("Authorization", "")
+    if not auth.startswith("Bearer chat_"):
+        return jsonify({"success": False}), 401
+
+    user_id = auth.replace("Bearer chat_", "")
+    req_id = request.args.get("request_id", type=int)
 
-        # ❌ Remove raw DB column
-        r.pop("file_url", None)
+    db = get_db_safe()
+    if not db:
+        return jsonify({"success": False}), 503
 
+    cur = db.cursor(dictionary=True)
+    cur.execute("SELECT role FROM chat_users WHERE user_id=%s", (user_id,))
+    user = cur.fetchone()
+    owner = None
+    if user and user["role"] != "admin" and req_id:
+        cur.execute("SELECT requester_id FROM finance_requests WHERE id=%s", (req_id,))
+        owner = cur.fetchone()
     cur.close()
-    db.close()
+    db.close()  # the stream itself never touches the DB
 
-    return jsonify({
-        "success": True,
-        "data": rows
-    })
+    if not user:
+        return jsonify({"success": False}), 401
+    if user["role"] != "admin" and req_id:
+        if not owner or str(owner["requester_id"]) != str(user_id):
+            return jsonify({"success": False}), 403
+
+    channels = ["admin"] if user["role"] == "admin" else [f"user:{user_id}"]
+    if req_id:
+        channels.append(f"request:{req_id}")
+    return sse_response(channels, "mobile")
 
 
 @chat_bp.route("/api/mobile/chat/request/add", methods=["POST"])
@@ -439,10 +745,8 @@ def mobile_chat_request_add():
         file = request.files["attachment"]
         if file and file.filename:
             upload_dir = os.path.join(current_app.static_folder, CHAT_UPLOAD_DIR)
-            os.makedirs(upload_dir, exist_ok=True)
-            filename = f"{uuid.uuid4().hex}_{secure_filename(file.filename)}"
-            file.save(os.path.join(upload_dir, filename))
-            attachment = f"/static/{CHAT_UPLOAD_DIR}/{filename}"
+            stored = storage.save(file, upload_dir, cur=cur)
+            attachment = f"/static/{CHAT_UPLOAD_DIR}/{stored.path}"
 
     cur.execute("""
         INSERT INTO finance_requests
@@ -496,6 +800,7 @@ def mobile_chat_request_status():
     """, (status, req_id))
 
     db.commit()
+    publish_status(db, req_id, status)
     cur.close()
     db.close()
 
@@ -514,7 +819,8 @@ def mobile_chat_send():
     if not request_id:
         return jsonify({"success": False, "message": "request_id required"}), 400
 
-    if not message and "attachment" not in request.files:
+    file = resumable.request_file("attachment")
+    if not message and not (file and file.filename):
         return jsonify({
             "success": False,
             "message": "Message or attachment required"
@@ -539,17 +845,9 @@ def mobile_chat_send():
 
     file_url = None
 
-    if "attachment" in request.files:
-        file = request.files["attachment"]
-        if file and file.filename:
-            upload_dir = os.path.join(
-                current_app.root_path, "static", "chat_uploads"
-            )
-            os.makedirs(upload_dir, exist_ok=True)
-
-            filename = f"{uuid.uuid4().hex}_{secure_filename(file.filename)}"
-            file.save(os.path.join(upload_dir, filename))
-            file_url = f"/static/chat_uploads/{filename}"
+    if file and file.filename:
+        stored = storage.save(file, ensure_upload_folder(), cur=cur)
+        file_url = f"/static/chat_uploads/{stored.path}"
 
     # ✅ CORRECT INSERT
     cur.execute("""
@@ -563,16 +861,16 @@ def mobile_chat_send():
         message,
         file_url
     ))
+    message_id = cur.lastrowid
+    count_message(cur, request_id, message_id, user_id)
 
     db.commit()
     cur.close()
+    publish_message(db, message_id)
     db.close()
 
-    return jsonify({"success": True})
+    return jsonify({"success": True, "id": message_id})
 
 @chat_bp.route("/chat/attachment/<path:filename>")
 def chat_attachment(filename):
-    upload_dir = os.path.join(
-        current_app.root_path, "static", "chat_uploads"
-    )
-    return send_from_directory(upload_dir, filename, as_attachment=False)
+    return serve_file(ensure_upload_folder(), filename)
@@ -4,8 +4,13 @@
 # ============================================
 
 from flask import Blueprint, render_template, session, redirect, url_for
+from datetime import datetime, timedelta
 import mysql.connector
 import os
+import threading
+import time
+
+from app.metrics import instrument
 
 dashboard_bp = Blueprint("dashboard", __name__)
 
@@ -14,85 +19,138 @@ dashboard_bp = Blueprint("dashboard", __name__)
 # --------------------------------------------
 def get_db():
     """Return a fresh MySQL connection."""
-    return mysql.connector.connect(
+    return instrument(mysql.connector.connect(
         host=os.getenv("MYSQL_HOST", "srv366.hstgr.io"),
         user=os.getenv("MYSQL_USER", "u514260654_testerp"),
         password=os.getenv("MYSQL_PASSWORD", "Tions@98"),
         database=os.getenv("MYSQL_DATABASE", "u514260654_test_erp"),
         auth_plugin="mysql_native_password"
-    )
+    ))
 
 # ============================================
-#  Dashboard Route
+#  Snapshot (one aggregate query + fee totals, cached)
 # ============================================
-@dashboard_bp.route("/dashboard")
-def dashboard():
-    """Render Dashboard statistics & charts."""
-
-    if not session.get("logged_in"):
-        return redirect(url_for("login"))
-
+# The landing page is hit far more often than students / fees change, so
+# its numbers are computed once and kept here. A snapshot older than
+# DASHBOARD_TTL is still served while a background thread rebuilds it;
+# invalidate_snapshot() (called after student / payment writes) makes the
+# next visit rebuild it first.
+SNAPSHOT_TTL = int(os.getenv("DASHBOARD_TTL", "60"))
+IST = timedelta(hours=5, minutes=30)
+
+BSC_COURSES = ("BSC NURSING YEARLY", "BSC NURSING SEM", "BSC NURSING")
+MSC_COURSES = ("MSC NURSING",)
+
+_snapshot = {"data": None, "built_at": 0.0, "version": 0, "built_version": 0, "refreshing": False}
+_snapshot_lock = threading.Lock()
+
+EMPTY_SNAPSHOT = {
+    "total_students": 0, "dropout_students": 0, "bsc_students": 0, "msc_students": 0,
+    "chart_labels": [], "chart_values": [],
+    "today_collected": 0.0, "today_payments": 0, "pending_fees": 0.0,
+    "snapshot_at": None,
+}
+
+
+def build_snapshot(cur):
+    """All dashboard numbers in two round trips."""
+    bsc_marks = ", ".join(["%s"] * len(BSC_COURSES))
+    msc_marks = ", ".join(["%s"] * len(MSC_COURSES))
+
+    # per-batch counts; WITH ROLLUP appends the grand total as the last row.
+    # NULL and '' batches are one "Unknown" group, as before
+    cur.execute(f"""
+        SELECT COALESCE(batch, '') AS batch,
+               COUNT(*) AS students,
+               COALESCE(SUM(course IN ({bsc_marks})), 0) AS bsc,
+               COALESCE(SUM(course IN ({msc_marks})), 0) AS msc
+        FROM students
+        GROUP BY COALESCE(batch, '') WITH ROLLUP
+    """, BSC_COURSES + MSC_COURSES)
+    rows = cur.fetchall()
+    total = rows.pop() if rows else {"students": 0, "bsc": 0, "msc": 0}
+    rows.sort(key=lambda r: r["batch"])
+
+    today = (datetime.utcnow() + IST).date()
+    cur.execute("""
+        SELECT
+            (SELECT COUNT(*) FROM dropouts) AS dropouts,
+            (SELECT COALESCE(SUM(amount), 0) FROM fee_payments
+              WHERE paid_on >= %s AND paid_on < %s) AS today_collected,
+            (SELECT COUNT(*) FROM fee_payments
+              WHERE paid_on >= %s AND paid_on < %s) AS today_payments,
+            (SELECT COALESCE(SUM(af.amount), 0) FROM assigned_fees af
+              WHERE af.status <> 'Paid') AS open_assigned,
+            (SELECT COALESCE(SUM(fp.amount), 0) FROM fee_payments fp
+              JOIN assigned_fees af ON af.id = fp.assigned_fee_id
+              WHERE af.status <> 'Paid') AS open_paid
+    """, (today, today + timedelta(days=1), today, today + timedelta(days=1)))
+    fees = cur.fetchone()
+
+    return {
+        "total_students": int(total["students"]),
+        "dropout_students": int(fees["dropouts"]),
+        "bsc_students": int(total["bsc"]),
+        "msc_students": int(total["msc"]),
+        "chart_labels": [(r["batch"] or "Unknown") for r in rows],
+        "chart_values": [int(r["students"]) for r in rows],
+        "today_collected": float(fees["today_collected"]),
+        "today_payments": int(fees["today_payments"]),
+        "pending_fees": max(float(fees["open_assigned"]) - float(fees["open_paid"]), 0.0),
+        "snapshot_at": (datetime.utcnow() + IST).strftime("%d-%m-%Y %I:%M %p"),
+    }
+
+
+def _refresh():
+    """Rebuild and store the snapshot; returns it (None on DB errors)."""
+    version = _snapshot["version"]
+    db = None
     try:
         db = get_db()
         cur = db.cursor(dictionary=True)
-
-        # TOTAL STUDENTS
-        cur.execute("SELECT COUNT(*) AS total FROM students")
-        total_students = cur.fetchone()["total"]
-
-        # DROPOUT STUDENTS
-        cur.execute("SELECT COUNT(*) AS total FROM dropouts")
-        dropout_students = cur.fetchone()["total"]
-
-        # BSC NURSING (Yearly + Sem)
-        cur.execute("""
-            SELECT COUNT(*) AS total FROM students
-            WHERE course IN ('BSC NURSING YEARLY', 'BSC NURSING SEM', 'BSC NURSING')
-        """)
-        bsc_students = cur.fetchone()["total"]
-
-        # MSC NURSING
-        cur.execute("SELECT COUNT(*) AS total FROM students WHERE course = 'MSC NURSING'")
-        msc_students = cur.fetchone()["total"]
-
-        # BATCH CHART
-        cur.execute("""
-            SELECT COALESCE(batch, '') AS batch, COUNT(*) AS count
-            FROM students
-            GROUP BY batch
-            ORDER BY batch ASC
-        """)
-        rows = cur.fetchall()
-        chart_labels = [(r["batch"] or "Unknown") for r in rows]
-        chart_values = [r["count"] for r in rows]
-
+        data = build_snapshot(cur)
         cur.close()
-        db.close()
-
-        return render_template(
-            "dashboard.html",
-            title="Dashboard",
-            total_students=total_students,
-            dropout_students=dropout_students,
-            bsc_students=bsc_students,
-            msc_students=msc_students,
-            chart_labels=chart_labels,
-            chart_values=chart_values
-        )
-
     except Exception as e:
-        print("DASHBOARD ERROR:", e)
-
+        print("DASHBOARD SNAPSHOT ERROR:", e)
+        return None
+    finally:
         try: db.close()
         except: pass
+        _snapshot["refreshing"] = False
+
+    with _snapshot_lock:
+        _snapshot.update(data=data, built_at=time.monotonic(), built_version=version)
+    return data
+
+
+def get_snapshot():
+    data = _snapshot["data"]
+    if data is None or _snapshot["built_version"] != _snapshot["version"]:
+        return _refresh() or data or EMPTY_SNAPSHOT
+
+    if time.monotonic() - _snapshot["built_at"] > SNAPSHOT_TTL:
+        with _snapshot_lock:
+            start = not _snapshot["refreshing"]
+            _snapshot["refreshing"] = True
+        if start:
+            threading.Thread(target=_refresh, name="dashboard-snapshot", daemon=True).start()
+    return data
+
+
+def invalidate_snapshot():
+    """Student / fee data changed - rebuild on the next dashboard visit."""
+    with _snapshot_lock:
+        _snapshot["version"] += 1
+
+
+# ============================================
+#  Dashboard Route
+# ============================================
+@dashboard_bp.route("/dashboard")
+def dashboard():
+    """Render Dashboard statistics & charts."""
+
+    if not session.get("logged_in"):
+        return redirect(url_for("login"))
 
-        return render_template(
-            "dashboard.html",
-            title="Dashboard",
-            total_students=0,
-            dropout_students=0,
-            bsc_students=0,
-            msc_students=0,
-            chart_labels=[],
-            chart_values=[]
-        )
+    return render_template("dashboard.html", title="Dashboard", **get_snapshot())
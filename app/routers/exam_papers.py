@@ -7,10 +7,12 @@ from flask import (
     flash, redirect, url_for, send_from_directory
 )
 from werkzeug.utils import secure_filename
-from datetime import datetime
+from datetime import datetime, timedelta
 import os
 
 from app.main import get_db_connection  # uses your existing DB helper
+from app import search, storage, typeahead
+from app.file_serving import serve_file
 
 # -------------------------------------------------------------------
 # Paths & config
@@ -58,41 +60,43 @@ def view_exam_paper(filename):
     Send the stored file from PROJECT_ROOT/static/exam_papers.
     `filename` is just the stored file name (column file_url).
     """
-    full_path = os.path.join(UPLOAD_FOLDER, filename)
-
-    if not os.path.isfile(full_path):
-        # Helpful debug in console
-        print("⚠️ Exam paper not found on disk:", full_path)
-        return "File Not Found", 404
-
-    return send_from_directory(UPLOAD_FOLDER, filename, as_attachment=False)
+    # Range / ETag / proxy offload / bucket redirect handled by the shared
+    # serving layer (404 when the file is missing)
+    return serve_file(UPLOAD_FOLDER, filename)
 
 
 # -------------------------------------------------------------------
 # API: Search Student
 # -------------------------------------------------------------------
+SEARCH_LIMIT = 20
+PAPERS_PAGE_SIZE = 50
+PAPERS_MAX_PAGE = 200
+
+
 @exam_papers_bp.route("/api/search_student")
 def api_search_student():
-    q = (request.args.get("q") or "").lower().strip()
+    q = (request.args.get("q") or "").strip()
     if not q:
         return jsonify({"success": False, "students": [], "msg": "Empty query"}), 400
 
+    # per-worker prefix index; SQL below only when it can't be loaded
+    students = typeahead.search(q, SEARCH_LIMIT)
+    if students is not None:
+        return jsonify({"success": True, "students": students})
+
     conn = get_db_connection()
     if not conn:
         return jsonify({"success": False, "students": [], "msg": "DB error"}), 500
 
     cur = conn.cursor()
     try:
+        # roll / register prefix + name FULLTEXT, each on its own index (app/search.py)
+        match_sql, params = search.student_match_sql(
+            q, "id, name, register_number, roll_no, batch, course", limit=SEARCH_LIMIT
+        )
         cur.execute(
-            """
-            SELECT id, name, register_number, roll_no, batch, course
-            FROM students
-            WHERE LOWER(name) LIKE %s
-               OR LOWER(register_number) LIKE %s
-               OR LOWER(roll_no) LIKE %s
-            LIMIT 20
-            """,
-            (f"%{q}%", f"%{q}%", f"%{q}%"),
+            f"SELECT * FROM ({match_sql}) m ORDER BY name LIMIT {SEARCH_LIMIT}",
+            tuple(params),
         )
         rows = cur.fetchall()
         students = [dict(zip(cur.column_names, row)) for row in rows]
@@ -105,11 +109,31 @@ def api_search_student():
 # -------------------------------------------------------------------
 # API: Get papers for a student (LIST)
 # -------------------------------------------------------------------
+def _parse_day(value):
+    return datetime.strptime(value, "%Y-%m-%d") if value else None
+
+
+def _parse_cursor(value):
+    """"<uploaded_at ISO>_<id>" -> (datetime, id)."""
+    stamp, _, paper_id = value.rpartition("_")
+    return datetime.fromisoformat(stamp), int(paper_id)
+
+
 @exam_papers_bp.route("/api/get_all")
 def api_get_all_papers():
-    q = (request.args.get("q") or "").lower()
-    from_date = request.args.get("from")  # YYYY-MM-DD
-    to_date = request.args.get("to")      # YYYY-MM-DD
+    """
+    Newest first, PAPERS_PAGE_SIZE per page.
+    ?q=  name / roll / register   ?from= ?to=  YYYY-MM-DD (inclusive)
+    ?limit=  ?cursor=  (next_cursor of the previous page)
+    """
+    q = (request.args.get("q") or "").strip()
+    try:
+        from_date = _parse_day(request.args.get("from"))
+        to_date = _parse_day(request.args.get("to"))
+        cursor = _parse_cursor(request.args["cursor"]) if request.args.get("cursor") else None
+        limit = min(max(int(request.args.get("limit") or PAPERS_PAGE_SIZE), 1), PAPERS_MAX_PAGE)
+    except ValueError:
+        return jsonify({"success": False, "papers": [], "msg": "Invalid date / cursor / limit"}), 400
 
     conn = get_db_connection()
     if not conn:
@@ -117,40 +141,52 @@ def api_get_all_papers():
     cur = conn.cursor()
 
     try:
-        query = """
-            SELECT ep.id, ep.subject, ep.exam_name, ep.year,
-                   ep.uploaded_at, ep.file_url,
-                   s.name, s.roll_no
-            FROM exam_papers ep
-            LEFT JOIN students s ON ep.student_id = s.id
-            WHERE 1=1
-        """
-
+        where = []
         params = []
 
         if q:
-            query += """ AND (
-                LOWER(s.name) LIKE %s
-                OR LOWER(s.roll_no) LIKE %s
-                OR LOWER(s.register_number) LIKE %s
-            )"""
-            params += [f"%{q}%", f"%{q}%", f"%{q}%"]
+            student_ids = search.matching_student_ids(cur, q)
+            if not student_ids:
+                return jsonify({"success": True, "papers": [], "has_more": False, "next_cursor": None})
+            where.append("ep.student_id IN (" + ",".join(["%s"] * len(student_ids)) + ")")
+            params += student_ids
 
+        # ranges on the bare column so idx_ep_uploaded / idx_ep_student apply
         if from_date:
-            query += " AND DATE(ep.uploaded_at) >= %s"
+            where.append("ep.uploaded_at >= %s")
             params.append(from_date)
 
         if to_date:
-            query += " AND DATE(ep.uploaded_at) <= %s"
-            params.append(to_date)
+            where.append("ep.uploaded_at < %s")
+            params.append(to_date + timedelta(days=1))
+
+        if cursor:
+            where.append("(ep.uploaded_at < %s OR (ep.uploaded_at = %s AND ep.id < %s))")
+            params += [cursor[0], cursor[0], cursor[1]]
 
-        query += " ORDER BY ep.uploaded_at DESC"
+        query = f"""
+            SELECT ep.id, ep.subject, ep.exam_name, ep.year,
+                   ep.uploaded_at, ep.file_url,
+                   s.name, s.roll_no
+            FROM exam_papers ep
+            LEFT JOIN students s ON ep.student_id = s.id
+            {"WHERE " + " AND ".join(where) if where else ""}
+            ORDER BY ep.uploaded_at DESC, ep.id DESC
+            LIMIT {limit + 1}
+        """
 
-        cur.execute(query, params)
+        cur.execute(query, tuple(params))
         rows = cur.fetchall()
-        papers = [dict(zip(cur.column_names, row)) for row in rows]
+        has_more = len(rows) > limit
+        papers = [dict(zip(cur.column_names, row)) for row in rows[:limit]]
 
-        return jsonify({"success": True, "papers": papers})
+        next_cursor = None
+        if has_more and papers[-1]["uploaded_at"]:
+            last = papers[-1]
+            next_cursor = f"{last['uploaded_at'].isoformat()}_{last['id']}"
+
+        return jsonify({"success": True, "papers": papers,
+                        "has_more": has_more, "next_cursor": next_cursor})
 
     except Exception as e:
         print("❌ api_get_all_papers error:", e)
@@ -211,21 +247,19 @@ def api_upload_exam_paper():
     if not allowed_file(file.filename):
         return jsonify({"success": False, "msg": "Invalid file type"}), 400
 
-    # Unique safe filename
-    timestamp = datetime.utcnow().strftime("%Y%m%d%H%M%S")
-    fname = f"{timestamp}_{secure_filename(file.filename)}"
-    save_path = os.path.join(UPLOAD_FOLDER, fname)
-    file.save(save_path)
-
-    # We store ONLY the filename, not the whole path
-    file_url_value = fname
-
     conn = get_db_connection()
     if not conn:
         return jsonify({"success": False, "msg": "DB error"}), 500
 
     cur = conn.cursor()
     try:
+        # Content-addressed name (aa/bb/<sha256>.pdf) - re-uploads share one file;
+        # counted in this transaction, so a failed INSERT leaves no reference
+        stored = storage.save(file, UPLOAD_FOLDER, cur=cur)
+
+        # We store ONLY the path inside UPLOAD_FOLDER, not the whole path
+        file_url_value = stored.path
+
         cur.execute(
             """
             INSERT INTO exam_papers (student_id, subject, exam_name, year, file_url)
@@ -306,16 +340,13 @@ def api_delete_paper():
             return jsonify({"success": False, "msg": "Record not found"}), 404
 
         filename = row[0]
-        file_path = os.path.join(UPLOAD_FOLDER, filename)
-        try:
-            if os.path.isfile(file_path):
-                os.remove(file_path)
-        except Exception as e:
-            # not fatal, but log
-            print("⚠️ Could not delete file from disk:", e)
 
         cur.execute("DELETE FROM exam_papers WHERE id = %s", (paper_id,))
+        # shared blobs are only unlinked once nothing references them
+        last = storage.release(UPLOAD_FOLDER, filename, cur=cur)
         conn.commit()
+        if last:
+            storage.purge(UPLOAD_FOLDER, filename)
 
         return jsonify({"success": True})
     except Exception as e:
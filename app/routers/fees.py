@@ -6,8 +6,14 @@ import json
 - Works with main.py's blueprint registration
 """
 
-from flask import Blueprint, render_template, request, jsonify, redirect, url_for, session, current_app
+from flask import Blueprint, render_template, request, jsonify, redirect, url_for, session, current_app, make_response
 from app.routers.master import get_db
+from app import fee_engine, finance_outbox, jobs, queries, storage, typeahead
+from app.file_serving import serve_file
+from app.routers.dashboard import invalidate_snapshot
+from app.routers.jobs import enqueue_response
+import csv
+import io
 import uuid
 from datetime import datetime
 import os
@@ -44,6 +50,13 @@ def fetchone_dict(cur):
     cols = [c[0] for c in cur.description]
     return dict(zip(cols, row))
 
+# MySQL DATE_FORMAT patterns for list endpoints. Passed as query parameters
+# (not literals) so the SQL never needs %% escaping for the driver.
+SQL_DT_DISPLAY = "%d-%m-%Y %h:%i %p"   # 05-01-2025 03:04 PM
+SQL_DT_MINUTE = "%Y-%m-%d %H:%i"       # 2025-01-05 15:04
+SQL_DATE = "%Y-%m-%d"
+SQL_TIME_HM = "%H:%i"
+
 def make_receipt_no(prefix="REC"):
     ts = datetime.utcnow().strftime("%Y%m%d%H%M%S")
     suf = uuid.uuid4().hex[:4].upper()
@@ -231,6 +244,49 @@ def api_heads_delete(head_id):
 # -----------------------
 # Assign Fees (NO ROUTE CONFLICT)
 # -----------------------
+def assign_fee_rows(db, cur, student_ids, head_id, amount, due_date, progress=None):
+    """Insert one "Not Paid" assigned_fees row per student (single commit)."""
+    count = 0
+    for sid in student_ids:
+        aid = gen_uuid()
+        cur.execute("""
+            INSERT INTO assigned_fees (id, student_id, head_id, amount, due_date, status, created_at)
+            VALUES (%s,%s,%s,%s,%s,%s,%s)
+        """, (aid, sid, head_id, amount, due_date, "Not Paid", datetime.utcnow()))
+        count += 1
+        if progress:
+            progress(count, len(student_ids), "Assigning fees")
+
+    db.commit()
+    invalidate_snapshot()
+    return count
+
+
+@jobs.task("fees.assign_bulk")
+def run_assign_bulk(job, student_ids, head_id, amount, due_date=None):
+    db = get_db()
+    cur = db.cursor()
+    try:
+        return {"assigned": assign_fee_rows(db, cur, student_ids, head_id, amount, due_date, progress=job.progress)}
+    finally:
+        cur.close()
+        db.close()
+
+
+@jobs.task("fees.assign_structure")
+def run_assign_structure(job, structure_id, filter_ids=None):
+    db = get_db()
+    cur = db.cursor()
+    try:
+        found = structure_students(cur, structure_id, filter_ids)
+        if found is None:
+            raise ValueError("Structure not found")
+        return {"assigned": assign_structure_rows(db, cur, structure_id, *found, progress=job.progress)}
+    finally:
+        cur.close()
+        db.close()
+
+
 @fees_bp.route("/assign/save", methods=["POST"])
 def assign_save():
     """Handles both single & bulk assignment."""
@@ -264,6 +320,7 @@ def assign_save():
             """, (aid, student_id, head_id, amount_val, due_date, "Not Paid", datetime.utcnow()))
 
             db.commit()
+            invalidate_snapshot()
             return jsonify({"success": True, "id": aid})
 
         # BULK assignment
@@ -277,19 +334,15 @@ def assign_save():
                 return jsonify({"success": False, "message": "Missing fields"}), 400
 
             amount_val = float(amount)
-            ids = student_ids.split(",")
-
-            for sid in ids:
-                sid = sid.strip()
-                if not sid:
-                    continue
-                aid = gen_uuid()
-                cur.execute("""
-                    INSERT INTO assigned_fees (id, student_id, head_id, amount, due_date, status, created_at)
-                    VALUES (%s,%s,%s,%s,%s,%s,%s)
-                """, (aid, sid, head_id, amount_val, due_date, "Not Paid", datetime.utcnow()))
+            ids = [sid.strip() for sid in student_ids.split(",") if sid.strip()]
 
-            db.commit()
+            if jobs.wants_async():
+                return enqueue_response("fees.assign_bulk", {
+                    "student_ids": ids, "head_id": head_id,
+                    "amount": amount_val, "due_date": due_date,
+                })
+
+            assign_fee_rows(db, cur, ids, head_id, amount_val, due_date)
             return jsonify({"success": True})
 
         return jsonify({"success": False, "message": "Unknown action"}), 400
@@ -375,14 +428,12 @@ def collect_payment():
         # If client sent an id, try to find by id, otherwise try by name
         payment_mode_id = None
         # if mode_name looks like uuid/id and exists in DB
-        cur.execute("SELECT id, name FROM payment_modes WHERE id=%s LIMIT 1", (mode_name,))
-        row = cur.fetchone()
+        row = queries.fetchone(db, "payment_mode_by_id", (mode_name,))
         if row:
             payment_mode_id = row[0]
             payment_mode_name = row[1]
         else:
-            cur.execute("SELECT id, name FROM payment_modes WHERE name=%s LIMIT 1", (mode_name,))
-            row = cur.fetchone()
+            row = queries.fetchone(db, "payment_mode_by_name", (mode_name,))
             if row:
                 payment_mode_id = row[0]
                 payment_mode_name = row[1]
@@ -399,10 +450,9 @@ def collect_payment():
             ext = os.path.splitext(filename)[1].lower()
             if ext not in ALLOWED_EXT:
                 return jsonify({"success": False, "message": "File type not allowed"}), 400
-            # ensure unique filename
-            safe_name = f"{uuid.uuid4().hex}_{filename}"
-            save_path = os.path.join(UPLOAD_FOLDER, safe_name)
-            file.save(save_path)
+            # content-addressed: identical proofs share one file
+            stored = storage.save(file, UPLOAD_FOLDER, cur=cur)  # counted with the payment
+            save_path = os.path.join(UPLOAD_FOLDER, stored.path)
             # store relative path from project root (uploads/payments/...)
             rel_path = os.path.relpath(save_path, BASE_DIR)
             file_path_db = rel_path.replace("\\", "/")
@@ -434,10 +484,8 @@ def collect_payment():
         ))
 
         # Recalculate status and update assigned_fees
-        cur.execute("SELECT COALESCE(SUM(amount),0) FROM fee_payments WHERE assigned_fee_id=%s", (assigned_id,))
-        paid_sum = cur.fetchone()[0] or 0
-        cur.execute("SELECT amount FROM assigned_fees WHERE id=%s", (assigned_id,))
-        total_amount_row = cur.fetchone()
+        paid_sum = queries.fetchone(db, "payments_sum", (assigned_id,))[0] or 0
+        total_amount_row = queries.fetchone(db, "assigned_amount", (assigned_id,))
         total_amount = total_amount_row[0] if total_amount_row else 0
 
         if paid_sum >= total_amount:
@@ -447,106 +495,32 @@ def collect_payment():
         else:
             new_status = "Not Paid"
 
-        cur.execute("UPDATE assigned_fees SET status=%s WHERE id=%s", (new_status, assigned_id))
+        queries.execute(db, "assigned_status_update", (new_status, assigned_id))
 
         # Create receipt
         receipt_id = gen_uuid()
         receipt_no = make_receipt_no()
-        cur.execute("""
-            INSERT INTO fee_receipts (id, payment_id, receipt_no, created_at)
-            VALUES (%s,%s,%s,%s)
-        """, (receipt_id, payid, receipt_no, datetime.utcnow()))
+        queries.execute(db, "receipt_insert", (receipt_id, payid, receipt_no, datetime.utcnow()))
 
         # ------------------------------------------------
-        # NEW: Finance Integration — insert INCOME record
+        # Finance Integration — INCOME record via the outbox
+        # (posted by tools/run_outbox.py, see app/finance_outbox.py)
         # ------------------------------------------------
-        try:
-            # Get student name & fee head for description
-            cur.execute("""
-                SELECT 
-                    s.name AS student_name,
-                    fh.name AS head_name
-                FROM assigned_fees af
-                LEFT JOIN students s ON af.student_id = s.id
-                LEFT JOIN fee_heads fh ON af.head_id = fh.id
-                WHERE af.id = %s
-                LIMIT 1
-            """, (assigned_id,))
-            info_row = cur.fetchone()
-            if info_row:
-                student_name = info_row[0] or ""
-                fee_head_name = info_row[1] or ""
-            else:
-                student_name = ""
-                fee_head_name = ""
-
-            # Get account_type from bank_accounts for transaction_mode (CASH/BANK etc.)
-            cur.execute("SELECT account_type FROM bank_accounts WHERE id=%s LIMIT 1", (account_id,))
-            acc_row = cur.fetchone()
-            transaction_mode = (acc_row[0] if acc_row and acc_row[0] else "BANK")
-
-            # UTR / reference
-            utr_no = (
-                meta.get("utr")
-                or meta.get("reference_no")
-                or data.get("reference_no")
-                or ""
-            )
-
-            # Remark
-            remark_text = remark or meta.get("remark") or ""
-
-            # tx_date for finance (use payment_date if provided, else today)
-            tx_date_val = payment_date or datetime.utcnow().strftime("%Y-%m-%d")
-
-            finance_id = gen_uuid()
+        finance_outbox.add_fee_payment(cur, payid, {
+            "assigned_id": assigned_id,
+            "account_id": account_id,
+            "amount": float(amount),
+            "tx_date": payment_date or datetime.utcnow().strftime("%Y-%m-%d"),
+            "payment_mode": payment_mode_name,
+            "utr": meta.get("utr") or meta.get("reference_no") or data.get("reference_no") or "",
+            "remark": remark or meta.get("remark") or "",
+            "receipt_no": receipt_no,
+            "file": file_path_db,
+        })
 
-            cur.execute("""
-                INSERT INTO finance_transactions
-                (id,
-                 account_id,
-                 transaction_mode,
-                 transaction_type,
-                 amount,
-                 category,
-                 description,
-                 attachment_url,
-                 tx_date,
-                 created_at,
-                 student_name,
-                 fee_head,
-                 payment_mode,
-                 utr_no,
-                 remark,
-                 receipt_no,
-                 income_category)
-                VALUES
-                (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
-            """, (
-                finance_id,
-                account_id,
-                transaction_mode,
-                "INCOME",
-                float(amount),
-                "Fee",
-                f"{student_name} - {fee_head_name}" if (student_name or fee_head_name) else "Fee Collection",
-                file_path_db,
-                tx_date_val,
-                datetime.utcnow(),
-                student_name,
-                fee_head_name,
-                payment_mode_name,
-                utr_no,
-                remark_text,
-                receipt_no,
-                "Fee Collection"
-            ))
-        except Exception as fe:
-            # Do NOT break student payment if finance insert fails
-            print("Finance integration error:", str(fe))
-
-        # Finish Main Commit (fee + finance)
+        # Finish Main Commit (payment + its finance outbox event)
         db.commit()
+        invalidate_snapshot()
 
         # For developer convenience: return saved file path (if any) as file_url
         file_url = file_path_db if file_path_db else None
@@ -590,9 +564,9 @@ def api_receipts_list():
             SELECT 
                 r.id AS receipt_id,
                 r.receipt_no,
-                r.created_at,
+                DATE_FORMAT(r.created_at, %s) AS created_at,
 
-                fp.paid_on,
+                DATE_FORMAT(fp.paid_on, %s) AS paid_on,
                 fp.amount AS paid_amount,
 
                 pm.name AS payment_mode,
@@ -612,7 +586,7 @@ def api_receipts_list():
             WHERE 1=1
         """
 
-        params = []
+        params = [SQL_DT_DISPLAY, SQL_DT_DISPLAY]
 
         if session_v and session_v != "all":
             q += " AND s.session=%s"
@@ -631,22 +605,23 @@ def api_receipts_list():
             params.append(batch)
 
         if keyword:
-            k = f"%{keyword}%"
-            q += " AND (s.name LIKE %s OR s.register_number LIKE %s OR s.phone LIKE %s)"
-            params.extend([k, k, k])
+            # name word / register no / phone prefix from the typeahead index
+            ids = typeahead.match_ids(keyword)
+            if ids is None:
+                k = f"%{keyword}%"
+                q += " AND (s.name LIKE %s OR s.register_number LIKE %s OR s.phone LIKE %s)"
+                params.extend([k, k, k])
+            elif not ids:
+                return jsonify({"success": True, "items": []})
+            else:
+                q += " AND s.id IN (" + ",".join(["%s"] * len(ids)) + ")"
+                params.extend(ids)
 
         q += " ORDER BY r.created_at DESC LIMIT 200"
 
         cur.execute(q, tuple(params))
         rows = fetchall_dict(cur)
 
-        # Fix date format for frontend
-        for r in rows:
-            if r["paid_on"]:
-                r["paid_on"] = r["paid_on"].strftime("%d-%m-%Y %I:%M %p")
-            if r["created_at"]:
-                r["created_at"] = r["created_at"].strftime("%d-%m-%Y %I:%M %p")
-
         return jsonify({"success": True, "items": rows})
 
     finally:
@@ -788,18 +763,19 @@ def api_reports_summary():
 # NEW: Detailed Reports APIs used by reports.html
 # -----------------------
 
-def _build_common_filters():
+def _build_common_filters(args=None):
     """
-    Read common filter params from request and build WHERE parts & params
-    (for students table + fee_heads)
+    Read common filter params from request (or `args` in a job) and build
+    WHERE parts & params (for students table + fee_heads)
     """
-    session_v = request.args.get("session") or None
-    course = request.args.get("course") or None
-    branch = request.args.get("branch") or None
-    department = request.args.get("department") or None
-    batch = request.args.get("batch") or None
-    head = request.args.get("head") or None
-    student = request.args.get("student") or None
+    args = request.args if args is None else args
+    session_v = args.get("session") or None
+    course = args.get("course") or None
+    branch = args.get("branch") or None
+    department = args.get("department") or None
+    batch = args.get("batch") or None
+    head = args.get("head") or None
+    student = args.get("student") or None
 
     where = ["1=1"]
     params = []
@@ -830,68 +806,177 @@ def _build_common_filters():
 
     return " AND ".join(where), params
 
-@fees_bp.route("/api/reports/students", methods=["GET"])
-def api_reports_students():
+
+def report_students(cur, args):
+    where, params = _build_common_filters(args)
+
+    q = f"""
+        SELECT
+            s.id AS id,
+            s.name AS name,
+            s.roll_no AS roll,
+            s.register_number AS enrolment,
+            COALESCE(SUM(af.amount),0) AS assigned,
+            COALESCE(SUM(fp.amount),0) AS paid,
+            DATE_FORMAT(MAX(fp.paid_on), %s) AS last_payment
+        FROM students s
+        LEFT JOIN assigned_fees af ON af.student_id = s.id
+        LEFT JOIN fee_heads fh ON af.head_id = fh.id
+        LEFT JOIN fee_payments fp ON fp.assigned_fee_id = af.id
+        WHERE {where}
+        GROUP BY s.id, s.name, s.roll_no, s.register_number
+        HAVING COALESCE(SUM(af.amount),0) > 0
+        ORDER BY s.name
     """
-    Student-wise snapshot for reports.html (Student-wise tab)
-    Returns:
-      [
-        {id, name, roll, enrolment, assigned, paid, last_payment}
-      ]
+
+    cur.execute(q, tuple([SQL_DT_MINUTE] + params))
+    return fetchall_dict(cur)
+
+
+def report_batches(cur, args):
+    where, params = _build_common_filters(args)
+
+    q = f"""
+        SELECT
+            s.batch AS batch_name,
+            COUNT(DISTINCT s.id) AS students,
+            COALESCE(SUM(af.amount),0) AS assigned,
+            COALESCE(SUM(fp.amount),0) AS collected
+        FROM students s
+        LEFT JOIN assigned_fees af ON af.student_id = s.id
+        LEFT JOIN fee_heads fh ON af.head_id = fh.id
+        LEFT JOIN fee_payments fp ON fp.assigned_fee_id = af.id
+        WHERE {where}
+        GROUP BY s.batch
+        HAVING COALESCE(SUM(af.amount),0) > 0
+        ORDER BY s.batch
+    """
+    cur.execute(q, tuple(params))
+    return fetchall_dict(cur)
+
+
+def report_collections(cur, args, limit=1000):
+    date_single = args.get("date")
+    date_from = args.get("from")
+    date_to = args.get("to")
+
+    where, params = _build_common_filters(args)
+
+    # base
+    q = f"""
+        SELECT
+            r.receipt_no,
+            s.name AS student_name,
+            fp.amount,
+            pm.name AS mode,
+            DATE_FORMAT(fp.paid_on, %s) AS date,
+            DATE_FORMAT(fp.paid_on, %s) AS time
+        FROM fee_receipts r
+        JOIN fee_payments fp ON r.payment_id = fp.id
+        JOIN assigned_fees af ON fp.assigned_fee_id = af.id
+        JOIN students s ON af.student_id = s.id
+        LEFT JOIN fee_heads fh ON af.head_id = fh.id
+        LEFT JOIN payment_modes pm ON fp.payment_mode_id = pm.id
+        WHERE {where}
     """
-    if not _is_logged_in():
-        return jsonify([]), 401
 
-    db = None
-    cur = None
+    if date_single:
+        q += " AND DATE(fp.paid_on) = %s"
+        params.append(date_single)
+    else:
+        if date_from:
+            q += " AND DATE(fp.paid_on) >= %s"
+            params.append(date_from)
+        if date_to:
+            q += " AND DATE(fp.paid_on) <= %s"
+            params.append(date_to)
+
+    q += " ORDER BY fp.paid_on DESC"
+    if limit:
+        q += f" LIMIT {int(limit)}"
+
+    cur.execute(q, tuple([SQL_DATE, SQL_TIME_HM] + params))
+    return fetchall_dict(cur)
+
+
+def report_heads(cur, args):
+    where, params = _build_common_filters(args)
+
+    q = f"""
+        SELECT
+            fh.id AS id,
+            fh.name AS name,
+            COALESCE(SUM(af.amount),0) AS assigned,
+            COALESCE(SUM(fp.amount),0) AS collected
+        FROM fee_heads fh
+        LEFT JOIN assigned_fees af ON af.head_id = fh.id
+        LEFT JOIN students s ON af.student_id = s.id
+        LEFT JOIN fee_payments fp ON fp.assigned_fee_id = af.id
+        WHERE {where.replace('fh.id=%s', 'fh.id=%s')}  -- same filters apply
+        GROUP BY fh.id, fh.name
+        HAVING COALESCE(SUM(af.amount),0) > 0 OR COALESCE(SUM(fp.amount),0) > 0
+        ORDER BY fh.name
+    """
+
+    cur.execute(q, tuple(params))
+    return fetchall_dict(cur)
+
+
+def report_defaulters(cur, args):
+    threshold = args.get("threshold") or "0"
     try:
-        db = get_db()
-        cur = db.cursor()
+        thr_val = float(threshold)
+    except:
+        thr_val = 0.0
 
-        where, params = _build_common_filters()
+    where, params = _build_common_filters(args)
+
+    q = f"""
+        SELECT
+            s.id AS id,
+            s.name AS name,
+            COALESCE(SUM(af.amount),0) AS assigned,
+            COALESCE(SUM(fp.amount),0) AS paid,
+            DATE_FORMAT(MAX(fp.paid_on), %s) AS last_payment
+        FROM students s
+        LEFT JOIN assigned_fees af ON af.student_id = s.id
+        LEFT JOIN fee_heads fh ON af.head_id = fh.id
+        LEFT JOIN fee_payments fp ON fp.assigned_fee_id = af.id
+        WHERE {where}
+        GROUP BY s.id, s.name
+    """
 
-        q = f"""
-            SELECT
-                s.id AS id,
-                s.name AS name,
-                s.roll_no AS roll,
-                s.register_number AS enrolment,
-                COALESCE(SUM(af.amount),0) AS assigned,
-                COALESCE(SUM(fp.amount),0) AS paid,
-                MAX(fp.paid_on) AS last_payment
-            FROM students s
-            LEFT JOIN assigned_fees af ON af.student_id = s.id
-            LEFT JOIN fee_heads fh ON af.head_id = fh.id
-            LEFT JOIN fee_payments fp ON fp.assigned_fee_id = af.id
-            WHERE {where}
-            GROUP BY s.id, s.name, s.roll_no, s.register_number
-            HAVING COALESCE(SUM(af.amount),0) > 0
-            ORDER BY s.name
-        """
+    cur.execute(q, tuple([SQL_DT_MINUTE] + params))
+    raw_rows = fetchall_dict(cur)
+
+    result = []
+    for r in raw_rows:
+        assigned = float(r.get("assigned") or 0)
+        paid = float(r.get("paid") or 0)
+        pending = assigned - paid
+        if pending <= 0:
+            continue
+        if pending < thr_val:
+            continue
+        result.append({
+            "id": r["id"],
+            "name": r["name"],
+            "pending": pending,
+            "last_payment": r.get("last_payment")
+        })
+    return result
 
-        cur.execute(q, tuple(params))
-        rows = fetchall_dict(cur)
 
-        # convert datetime to string
-        for r in rows:
-            lp = r.get("last_payment")
-            if isinstance(lp, (datetime,)):
-                r["last_payment"] = lp.strftime("%Y-%m-%d %H:%M")
-            elif lp is None:
-                r["last_payment"] = None
+REPORTS = {
+    "students": report_students,
+    "batches": report_batches,
+    "collections": report_collections,
+    "heads": report_heads,
+    "defaulters": report_defaulters,
+}
 
-        return jsonify(rows)
-    finally:
-        if cur: cur.close()
-        if db: db.close()
 
-@fees_bp.route("/api/reports/batches", methods=["GET"])
-def api_reports_batches():
-    """
-    Batch-wise summary.
-    Returns:
-      [{batch_name, students, assigned, collected}]
-    """
+def _report_response(kind):
     if not _is_logged_in():
         return jsonify([]), 401
 
@@ -900,31 +985,32 @@ def api_reports_batches():
     try:
         db = get_db()
         cur = db.cursor()
-
-        where, params = _build_common_filters()
-
-        q = f"""
-            SELECT
-                s.batch AS batch_name,
-                COUNT(DISTINCT s.id) AS students,
-                COALESCE(SUM(af.amount),0) AS assigned,
-                COALESCE(SUM(fp.amount),0) AS collected
-            FROM students s
-            LEFT JOIN assigned_fees af ON af.student_id = s.id
-            LEFT JOIN fee_heads fh ON af.head_id = fh.id
-            LEFT JOIN fee_payments fp ON fp.assigned_fee_id = af.id
-            WHERE {where}
-            GROUP BY s.batch
-            HAVING COALESCE(SUM(af.amount),0) > 0
-            ORDER BY s.batch
-        """
-        cur.execute(q, tuple(params))
-        rows = fetchall_dict(cur)
-        return jsonify(rows)
+        return jsonify(REPORTS[kind](cur, request.args))
     finally:
         if cur: cur.close()
         if db: db.close()
 
+
+@fees_bp.route("/api/reports/students", methods=["GET"])
+def api_reports_students():
+    """
+    Student-wise snapshot for reports.html (Student-wise tab)
+    Returns:
+      [
+        {id, name, roll, enrolment, assigned, paid, last_payment}
+      ]
+    """
+    return _report_response("students")
+
+@fees_bp.route("/api/reports/batches", methods=["GET"])
+def api_reports_batches():
+    """
+    Batch-wise summary.
+    Returns:
+      [{batch_name, students, assigned, collected}]
+    """
+    return _report_response("batches")
+
 @fees_bp.route("/api/reports/collections", methods=["GET"])
 def api_reports_collections():
     """
@@ -934,68 +1020,7 @@ def api_reports_collections():
     Returns:
       [{receipt_no, student_name, amount, mode, date, time}]
     """
-    if not _is_logged_in():
-        return jsonify([]), 401
-
-    date_single = request.args.get("date")
-    date_from = request.args.get("from")
-    date_to = request.args.get("to")
-
-    db = None
-    cur = None
-    try:
-        db = get_db()
-        cur = db.cursor()
-
-        where, params = _build_common_filters()
-
-        # base
-        q = f"""
-            SELECT
-                r.receipt_no,
-                s.name AS student_name,
-                fp.amount,
-                pm.name AS mode,
-                DATE(fp.paid_on) AS date,
-                TIME(fp.paid_on) AS time
-            FROM fee_receipts r
-            JOIN fee_payments fp ON r.payment_id = fp.id
-            JOIN assigned_fees af ON fp.assigned_fee_id = af.id
-            JOIN students s ON af.student_id = s.id
-            LEFT JOIN fee_heads fh ON af.head_id = fh.id
-            LEFT JOIN payment_modes pm ON fp.payment_mode_id = pm.id
-            WHERE {where}
-        """
-
-        if date_single:
-            q += " AND DATE(fp.paid_on) = %s"
-            params.append(date_single)
-        else:
-            if date_from:
-                q += " AND DATE(fp.paid_on) >= %s"
-                params.append(date_from)
-            if date_to:
-                q += " AND DATE(fp.paid_on) <= %s"
-                params.append(date_to)
-
-        q += " ORDER BY fp.paid_on DESC LIMIT 1000"
-
-        cur.execute(q, tuple(params))
-        rows = fetchall_dict(cur)
-
-        # stringify date/time
-        for r in rows:
-            d = r.get("date")
-            t = r.get("time")
-            if isinstance(d, datetime):
-                r["date"] = d.strftime("%Y-%m-%d")
-            if isinstance(t, datetime):
-                r["time"] = t.strftime("%H:%M")
-
-        return jsonify(rows)
-    finally:
-        if cur: cur.close()
-        if db: db.close()
+    return _report_response("collections")
 
 @fees_bp.route("/api/reports/heads", methods=["GET"])
 def api_reports_heads():
@@ -1004,39 +1029,7 @@ def api_reports_heads():
     Returns:
       [{id, name, assigned, collected}]
     """
-    if not _is_logged_in():
-        return jsonify([]), 401
-
-    db = None
-    cur = None
-    try:
-        db = get_db()
-        cur = db.cursor()
-
-        where, params = _build_common_filters()
-
-        q = f"""
-            SELECT
-                fh.id AS id,
-                fh.name AS name,
-                COALESCE(SUM(af.amount),0) AS assigned,
-                COALESCE(SUM(fp.amount),0) AS collected
-            FROM fee_heads fh
-            LEFT JOIN assigned_fees af ON af.head_id = fh.id
-            LEFT JOIN students s ON af.student_id = s.id
-            LEFT JOIN fee_payments fp ON fp.assigned_fee_id = af.id
-            WHERE {where.replace('fh.id=%s', 'fh.id=%s')}  -- same filters apply
-            GROUP BY fh.id, fh.name
-            HAVING COALESCE(SUM(af.amount),0) > 0 OR COALESCE(SUM(fp.amount),0) > 0
-            ORDER BY fh.name
-        """
-
-        cur.execute(q, tuple(params))
-        rows = fetchall_dict(cur)
-        return jsonify(rows)
-    finally:
-        if cur: cur.close()
-        if db: db.close()
+    return _report_response("heads")
 
 @fees_bp.route("/api/reports/defaulters", methods=["GET"])
 def api_reports_defaulters():
@@ -1047,64 +1040,57 @@ def api_reports_defaulters():
     Returns:
       [{id, name, pending, last_payment}]
     """
-    if not _is_logged_in():
-        return jsonify([]), 401
+    return _report_response("defaulters")
 
-    threshold = request.args.get("threshold") or "0"
-    try:
-        thr_val = float(threshold)
-    except:
-        thr_val = 0.0
+# -----------------------
+# Report Export (CSV; ?async=1 builds it in a background job)
+# -----------------------
+def report_csv(rows):
+    out = io.StringIO()
+    if rows:
+        writer = csv.DictWriter(out, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+    return out.getvalue()
 
-    db = None
-    cur = None
+
+def export_report(kind, args):
+    """Full report rows (no 1000-row cap on collections)."""
+    db = get_db()
+    cur = db.cursor()
     try:
-        db = get_db()
-        cur = db.cursor()
+        if kind == "collections":
+            return report_collections(cur, args, limit=None)
+        return REPORTS[kind](cur, args)
+    finally:
+        cur.close()
+        db.close()
 
-        where, params = _build_common_filters()
 
-        q = f"""
-            SELECT
-                s.id AS id,
-                s.name AS name,
-                COALESCE(SUM(af.amount),0) AS assigned,
-                COALESCE(SUM(fp.amount),0) AS paid,
-                MAX(fp.paid_on) AS last_payment
-            FROM students s
-            LEFT JOIN assigned_fees af ON af.student_id = s.id
-            LEFT JOIN fee_heads fh ON af.head_id = fh.id
-            LEFT JOIN fee_payments fp ON fp.assigned_fee_id = af.id
-            WHERE {where}
-            GROUP BY s.id, s.name
-        """
+@jobs.task("fees.report_export")
+def run_report_export(job, kind, args):
+    job.progress(0, None, f"Building {kind} report", force=True)
+    rows = export_report(kind, args)
+    job.save_artifact(f"fees_{kind}_report.csv", report_csv(rows))
+    return {"rows": len(rows)}
 
-        cur.execute(q, tuple(params))
-        raw_rows = fetchall_dict(cur)
 
-        result = []
-        for r in raw_rows:
-            assigned = float(r.get("assigned") or 0)
-            paid = float(r.get("paid") or 0)
-            pending = assigned - paid
-            if pending <= 0:
-                continue
-            if pending < thr_val:
-                continue
-            lp = r.get("last_payment")
-            if isinstance(lp, datetime):
-                lp = lp.strftime("%Y-%m-%d %H:%M")
-            result.append({
-                "id": r["id"],
-                "name": r["name"],
-                "pending": pending,
-                "last_payment": lp
-            })
+@fees_bp.route("/api/reports/<kind>/export", methods=["GET"])
+def api_reports_export(kind):
+    """CSV download of one report tab, same filters as /api/reports/<kind>."""
+    if not _is_logged_in():
+        return jsonify({"success": False}), 401
+    if kind not in REPORTS:
+        return jsonify({"success": False, "message": "Unknown report"}), 404
 
-        return jsonify(result)
-    finally:
-        if cur: cur.close()
-        if db: db.close()
+    args = {k: v for k, v in request.args.items() if k != "async"}
+    if jobs.wants_async():
+        return enqueue_response("fees.report_export", {"kind": kind, "args": args})
+
+    response = make_response(report_csv(export_report(kind, args)))
+    response.headers["Content-Type"] = "text/csv; charset=utf-8"
+    response.headers["Content-Disposition"] = f'attachment; filename="fees_{kind}_report.csv"'
+    return response
 
 # -----------------------
 # Receipt Print View
@@ -1311,6 +1297,53 @@ def api_structures_delete(sid):
         if db: db.close()
 
 # Assign students from fee_structure (bulk apply a structure to matching students)
+def structure_students(cur, structure_id, filter_ids=None):
+    """(student_ids, head_id, amount) for a fee structure, None if it doesn't exist."""
+    # fetch structure
+    cur.execute("SELECT course, session, branch, department, batch, head_id, amount FROM fee_structures WHERE id=%s", (structure_id,))
+    srow = cur.fetchone()
+    if not srow:
+        return None
+    course, session_v, branch, department, batch, head_id, amount = srow
+
+    # build student filter
+    where = []
+    params = []
+    if course:
+        where.append("course=%s"); params.append(course)
+    if session_v:
+        where.append("session=%s"); params.append(session_v)
+    if branch:
+        where.append("branch=%s"); params.append(branch)
+    if department:
+        where.append("department=%s"); params.append(department)
+    if batch:
+        where.append("batch=%s"); params.append(batch)
+    if filter_ids:
+        ids = [i.strip() for i in filter_ids.split(",") if i.strip()]
+        if ids:
+            where.append("id IN (" + ",".join(["%s"]*len(ids)) + ")")
+            params.extend(ids)
+
+    condition = ("WHERE " + " AND ".join(where)) if where else ""
+    # select students
+    cur.execute(f"SELECT id FROM students {condition}", tuple(params))
+    return [r[0] for r in cur.fetchall()], head_id, amount
+
+
+def assign_structure_rows(db, cur, structure_id, student_ids, head_id, amount, progress=None):
+    """Batched structure assignment; students who already have the fee head are skipped."""
+    rows = [(sid, structure_id, head_id, amount) for sid in student_ids]
+    count = 0
+    for start in range(0, len(rows), fee_engine.BATCH_SIZE):
+        count += fee_engine.insert_assignments(cur, rows[start:start + fee_engine.BATCH_SIZE])
+        db.commit()
+        if progress:
+            progress(min(start + fee_engine.BATCH_SIZE, len(rows)), len(rows), "Assigning fees")
+    invalidate_snapshot()
+    return count
+
+
 @fees_bp.route("/assign/from-structure", methods=["POST"])
 def assign_from_structure():
     """
@@ -1328,58 +1361,73 @@ def assign_from_structure():
     if not structure_id:
         return jsonify({"success": False, "message": "structure_id required"}), 400
 
+    if jobs.wants_async():
+        return enqueue_response("fees.assign_structure",
+                                {"structure_id": structure_id, "filter_ids": filter_ids})
+
     db = None
     cur = None
     try:
         db = get_db()
         cur = db.cursor()
-        # fetch structure
-        cur.execute("SELECT course, session, branch, department, batch, head_id, amount FROM fee_structures WHERE id=%s", (structure_id,))
-        srow = cur.fetchone()
-        if not srow:
+        found = structure_students(cur, structure_id, filter_ids)
+        if found is None:
             return jsonify({"success": False, "message": "Structure not found"}), 404
-        course, session_v, branch, department, batch, head_id, amount = srow
-
-        # build student filter
-        where = []
-        params = []
-        if course:
-            where.append("course=%s"); params.append(course)
-        if session_v:
-            where.append("session=%s"); params.append(session_v)
-        if branch:
-            where.append("branch=%s"); params.append(branch)
-        if department:
-            where.append("department=%s"); params.append(department)
-        if batch:
-            where.append("batch=%s"); params.append(batch)
-        if filter_ids:
-            ids = [i.strip() for i in filter_ids.split(",") if i.strip()]
-            if ids:
-                where.append("id IN (" + ",".join(["%s"]*len(ids)) + ")")
-                params.extend(ids)
-
-        condition = ("WHERE " + " AND ".join(where)) if where else ""
-        # select students
-        cur.execute(f"SELECT id FROM students {condition}", tuple(params))
-        studs = [r[0] for r in cur.fetchall()]
-
-        count = 0
-        for sid in studs:
-            aid = gen_uuid()
-            cur.execute("""
-                INSERT INTO assigned_fees (id, student_id, head_id, amount, due_date, status, created_at)
-                VALUES (%s,%s,%s,%s,%s,%s,%s)
-            """, (aid, sid, head_id, amount, None, "Not Paid", datetime.utcnow()))
-            count += 1
 
-        db.commit()
+        count = assign_structure_rows(db, cur, structure_id, *found)
         return jsonify({"success": True, "assigned": count})
 
     finally:
         if cur: cur.close()
         if db: db.close()
 
+
+@jobs.task("fees.auto_apply")
+def run_auto_apply(job, student_ids=None, all_students=False):
+    db = get_db()
+    try:
+        if all_students:
+            cur = db.cursor()
+            cur.execute("SELECT id FROM students")
+            student_ids = [r[0] for r in cur.fetchall()]
+            cur.close()
+        added = fee_engine.apply_to_students(db, student_ids or [], progress=job.progress)
+        invalidate_snapshot()
+        return {"assigned": added}
+    finally:
+        db.close()
+
+
+@fees_bp.route("/assign/auto", methods=["POST"])
+def assign_auto():
+    """
+    Apply every matching fee structure to students: comma separated
+    student_ids, or all=1 for every student (always a background job).
+    A student who already has a row for a fee head - from a structure or
+    assigned by hand - is not billed for that head again.
+    """
+    if not _is_logged_in():
+        return jsonify({"success": False}), 401
+
+    raw = request.form.get("student_ids") or ""
+    student_ids = [i.strip() for i in raw.split(",") if i.strip()]
+    all_students = (request.form.get("all") or "").lower() in ("1", "true", "yes")
+
+    if all_students:
+        return enqueue_response("fees.auto_apply", {"all_students": True})
+    if not student_ids:
+        return jsonify({"success": False, "message": "student_ids required (or all=1)"}), 400
+    if jobs.wants_async():
+        return enqueue_response("fees.auto_apply", {"student_ids": student_ids})
+
+    db = get_db()
+    try:
+        added = fee_engine.apply_to_students(db, student_ids)
+        invalidate_snapshot()
+        return jsonify({"success": True, "assigned": added})
+    finally:
+        db.close()
+
 # -----------------------
 # Pending Fees & Defaulter (basic)
 # -----------------------
@@ -1433,8 +1481,7 @@ def api_pending_list():
             rd = dict(zip(cols, row))
             aid = rd["assigned_id"]
             # calculate paid sum
-            cur.execute("SELECT COALESCE(SUM(amount),0) FROM fee_payments WHERE assigned_fee_id=%s", (aid,))
-            paid = cur.fetchone()[0] or 0
+            paid = queries.fetchone(db, "payments_sum", (aid,))[0] or 0
             balance = (rd["due_amount"] or 0) - paid
             rd["paid_sum"] = float(paid)
             rd["balance"] = float(balance)
@@ -1586,25 +1633,20 @@ def api_student_detail(student_id):
         cur.execute("""
             SELECT
                 fp.amount,
-                fp.paid_on,
+                DATE_FORMAT(fp.paid_on, %s) AS paid_on,
                 pm.name AS mode
             FROM fee_payments fp
             JOIN assigned_fees af ON fp.assigned_fee_id = af.id
             LEFT JOIN payment_modes pm ON fp.payment_mode_id = pm.id
             WHERE af.student_id=%s
             ORDER BY fp.paid_on DESC
-        """, (student_id,))
+        """, (SQL_DT_MINUTE, student_id))
         pay_rows = fetchall_dict(cur)
 
         payments = []
         for p in pay_rows:
-            pd = p.get("paid_on")
-            if isinstance(pd, datetime):
-                pd_str = pd.strftime("%Y-%m-%d %H:%M")
-            else:
-                pd_str = str(pd) if pd else None
             payments.append({
-                "payment_date": pd_str,
+                "payment_date": p.get("paid_on"),
                 "amount": float(p.get("amount") or 0),
                 "mode": p.get("mode") or ""
             })
@@ -1656,22 +1698,20 @@ def api_pm_add():
     if not name:
         return jsonify({"success": False, "message": "Name required"}), 400
 
-    # File upload handling
+    db = get_db()
+    cur = db.cursor()
+    pid = gen_uuid()
+
+    # File upload handling (counted with the payment mode row)
     file = request.files.get("file")
     file_path = None
     if file and file.filename:
-        filename = secure_filename(file.filename)
-        stored = f"{uuid.uuid4().hex}_{filename}"
-        save_path = os.path.join(UPLOAD_FOLDER, stored)
-        file.save(save_path)
+        stored = storage.save(file, UPLOAD_FOLDER, cur=cur)
+        save_path = os.path.join(UPLOAD_FOLDER, stored.path)
 
         # Store relative path
         file_path = os.path.relpath(save_path, BASE_DIR).replace("\\", "/")
 
-    db = get_db()
-    cur = db.cursor()
-    pid = gen_uuid()
-
     cur.execute("""
         INSERT INTO payment_modes (id, name, fields, file_path, created_at)
         VALUES (%s, %s, %s, %s, %s)
@@ -1723,20 +1763,16 @@ def mobile_student_summary():
             SELECT
                 fp.id AS payment_id,
                 fp.amount,
-                fp.paid_on,
+                DATE_FORMAT(fp.paid_on, %s) AS paid_on,
                 pm.name AS mode
             FROM fee_payments fp
             JOIN assigned_fees af ON fp.assigned_fee_id = af.id
             LEFT JOIN payment_modes pm ON fp.payment_mode_id = pm.id
             WHERE af.student_id=%s
             ORDER BY fp.paid_on DESC
-        """, (student_id,))
+        """, (SQL_DT_DISPLAY, student_id))
         payments = fetchall_dict(cur)
 
-        for p in payments:
-            if isinstance(p["paid_on"], datetime):
-                p["paid_on"] = p["paid_on"].strftime("%d-%m-%Y %I:%M %p")
-
         return jsonify({
             "success": True,
             "assigned": float(totals["assigned"]),
@@ -1854,11 +1890,8 @@ def mobile_payment_file(payment_id):
         if not row or not row[0]:
             return jsonify({"success": False, "message": "File not found"}), 404
 
-        full_path = os.path.join(BASE_DIR, row[0])
-        directory = os.path.dirname(full_path)
-        filename = os.path.basename(full_path)
-
-        return send_from_directory(directory, filename, as_attachment=True)
+        # file_path is relative to BASE_DIR (uploads/payments/...)
+        return serve_file(BASE_DIR, row[0], as_attachment=True)
 
     finally:
         if cur: cur.close()
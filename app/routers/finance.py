@@ -8,6 +8,9 @@ from app.jwt_utils import verify_token
 
 from flask import Blueprint, render_template, request, redirect, url_for, jsonify, flash, session
 from app.db import get_mysql_connection
+from app import finance_outbox, finance_query, queries, resumable, storage
+from app.file_serving import serve_file
+from app.rows import parse_fields
 
 finance_bp = Blueprint("finance", __name__)
 
@@ -122,6 +125,32 @@ def allowed_file(filename):
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+def save_attachment(file, cur=None):
+    """
+    Store an upload in UPLOAD_FOLDER_FINANCE; returns the attachment_url value.
+    Pass the cursor of the INSERT / UPDATE that records it, so the blob is
+    only counted if that commits.
+    """
+    return storage.save(file, current_app.config["UPLOAD_FOLDER_FINANCE"], cur=cur).path
+
+
+def delete_attachment(attachment_url, cur=None):
+    """
+    Drop a transaction's reference to its file (shared blobs stay until unused).
+    With `cur` the reference goes in the caller's transaction; the returned
+    callable unlinks the file if needed - call it after the commit.
+    """
+    if not attachment_url:
+        return lambda: None
+    folder = current_app.config["UPLOAD_FOLDER_FINANCE"]
+    if cur is None:
+        storage.release(folder, attachment_url)
+        return lambda: None
+    if storage.release(folder, attachment_url, cur=cur):
+        return lambda: storage.purge(folder, attachment_url)
+    return lambda: None
+
+
 # ---------------------------------------
 # Bank Deposit (With Date Filters)
 # ---------------------------------------
@@ -150,11 +179,7 @@ def bank_deposit():
         # File Upload
         file = request.files.get("attachment")
         if file and allowed_file(file.filename):
-            filename = secure_filename(f"{tx_id}_{file.filename}")
-            upload_dir = current_app.config["UPLOAD_FOLDER_FINANCE"]
-            os.makedirs(upload_dir, exist_ok=True)
-            file.save(os.path.join(upload_dir, filename))
-            attachment_url = filename
+            attachment_url = save_attachment(file, cur)
 
         try:
             # Insert Transaction (DEPOSIT to BANK)
@@ -289,11 +314,7 @@ def self_withdrawal():
         attachment_url = None
         file = request.files.get("attachment")
         if file and allowed_file(file.filename):
-            filename = secure_filename(f"{uuid.uuid4().hex}_{file.filename}")
-            upload_path = os.path.join(current_app.config["UPLOAD_FOLDER_FINANCE"], filename)
-            os.makedirs(upload_path.rsplit(os.sep, 1)[0], exist_ok=True)
-            file.save(upload_path)
-            attachment_url = filename
+            attachment_url = save_attachment(file, cur)
 
         try:
             # Record BANK side withdrawal (money moving out of bank)
@@ -478,13 +499,7 @@ def expense_entry():
                     # file update
                     file = request.files.get("attachment")
                     if file and allowed_file(file.filename):
-                        filename = secure_filename(f"{uuid.uuid4().hex}_{file.filename}")
-                        upload_path = os.path.join(
-                            current_app.config["UPLOAD_FOLDER_FINANCE"], filename
-                        )
-                        os.makedirs(upload_path.rsplit(os.sep, 1)[0], exist_ok=True)
-                        file.save(upload_path)
-                        new_attach = filename
+                        new_attach = save_attachment(file, cur)
                     else:
                         new_attach = old_attach
 
@@ -544,13 +559,7 @@ def expense_entry():
                 file = request.files.get("attachment")
                 attachment_url = None
                 if file and allowed_file(file.filename):
-                    filename = secure_filename(f"{uuid.uuid4().hex}_{file.filename}")
-                    upload_path = os.path.join(
-                        current_app.config["UPLOAD_FOLDER_FINANCE"], filename
-                    )
-                    os.makedirs(upload_path.rsplit(os.sep, 1)[0], exist_ok=True)
-                    file.save(upload_path)
-                    attachment_url = filename
+                    attachment_url = save_attachment(file, cur)
 
                 # insert transaction only
                 cur.execute(
@@ -680,17 +689,8 @@ import os
 
 @finance_bp.route('/finance/attachment/<path:filename>', methods=['GET'])
 def finance_attachment_public(filename):
-    uploads_dir = current_app.config["UPLOAD_FOLDER_FINANCE"]
-    file_path = os.path.join(uploads_dir, filename)
-
-    if not os.path.isfile(file_path):
-        return abort(404)
-
-    return send_from_directory(
-        uploads_dir,
-        filename,
-        as_attachment=False
-    )
+    # 404s on missing files; Range / ETag / proxy offload in app.file_serving
+    return serve_file(current_app.config["UPLOAD_FOLDER_FINANCE"], filename)
 
 
 # ---------------------------------------
@@ -766,11 +766,7 @@ def income_entry():
                 attachment_url = None
                 file = request.files.get("attachment")
                 if file and allowed_file(file.filename):
-                    filename = secure_filename(f"{uuid.uuid4().hex}_{file.filename}")
-                    upload_path = os.path.join(current_app.config["UPLOAD_FOLDER_FINANCE"], filename)
-                    os.makedirs(upload_path.rsplit(os.sep, 1)[0], exist_ok=True)
-                    file.save(upload_path)
-                    attachment_url = filename
+                    attachment_url = save_attachment(file, cur)
 
                 tx_id = uuid.uuid4().hex
 
@@ -984,11 +980,24 @@ def api_income_categories():
 # ---------------------------------------
 # 🧮 Helper – Build ledger response
 # ---------------------------------------
-def build_ledger_response(rows, opening_balance):
+# DATE_FORMAT pattern for display_date (bound as a parameter, no %% escaping)
+LEDGER_DATE_FORMAT = "%d-%m-%Y"
+
+# Keys a ledger row can be projected to with ?fields=
+LEDGER_FIELDS = (
+    "id", "tx_date", "transaction_type", "amount", "description", "receipt_no",
+    "payment_mode", "category", "income_category", "utr_no", "attachment_url",
+    "display_date", "in_amount", "out_amount", "running_balance",
+)
+
+def build_ledger_response(rows, opening_balance, fields=None):
     """
     Correct opening balance handling:
     - Start from actual DB stored opening_balance
     - DO NOT add any first transaction inside filtered date range into opening
+
+    rows may be dicts or app.rows Row objects; with `fields` (see
+    LEDGER_FIELDS) each output row only carries those keys.
     """
     if opening_balance is None:
         opening_balance = 0.0
@@ -996,41 +1005,53 @@ def build_ledger_response(rows, opening_balance):
     balance = float(opening_balance)
     total_in = 0.0
     total_out = 0.0
+    out_rows = []
 
     for r in rows:
         amt = float(r.get("amount") or 0)
         tx_type = (r.get("transaction_type") or "").upper()
 
-        # Format display date
-        txd = r.get("tx_date")
-        try:
-            if isinstance(txd, (datetime, date)):
-                r["display_date"] = txd.strftime("%d-%m-%Y")
-            else:
-                r["display_date"] = datetime.strptime(str(txd), "%Y-%m-%d").strftime("%d-%m-%Y")
-        except:
-            r["display_date"] = str(txd)
+        # Display date normally comes pre-formatted from SQL (LEDGER_DATE_FORMAT)
+        display_date = r.get("display_date")
+        if display_date is None:
+            txd = r.get("tx_date")
+            try:
+                if isinstance(txd, (datetime, date)):
+                    display_date = txd.strftime("%d-%m-%Y")
+                else:
+                    display_date = datetime.strptime(str(txd), "%Y-%m-%d").strftime("%d-%m-%Y")
+            except:
+                display_date = str(txd)
 
         # Apply as running transactions (NOT opening)
         if tx_type in ("INCOME", "DEPOSIT"):
             total_in += amt
             balance += amt
-            r["in_amount"] = amt
-            r["out_amount"] = 0.0
+            in_amount, out_amount = amt, 0.0
         else:
             total_out += amt
             balance -= amt
-            r["in_amount"] = 0.0
-            r["out_amount"] = amt
-
-        r["running_balance"] = balance
+            in_amount, out_amount = 0.0, amt
+
+        computed = {
+            "display_date": display_date,
+            "in_amount": in_amount,
+            "out_amount": out_amount,
+            "running_balance": balance,
+        }
+        if fields:
+            item = {f: (computed[f] if f in computed else r.get(f)) for f in fields}
+        else:
+            item = r.as_dict() if hasattr(r, "as_dict") else r
+            item.update(computed)
+        out_rows.append(item)
 
     return jsonify({
         "opening_balance": round(opening_balance, 2),
         "total_in": round(total_in, 2),
         "total_out": round(total_out, 2),
         "closing_balance": round(balance, 2),
-        "rows": rows
+        "rows": out_rows
     })
 
 # ---------------------------------------
@@ -1052,67 +1073,30 @@ def api_cash_report():
         return jsonify({"error": "Missing filters"}), 400
 
     conn = get_mysql_connection()
-    cur = conn.cursor(dictionary=True)
 
     try:
         conn.ping(reconnect=True)
     except:
         conn = get_mysql_connection()
-        cur = conn.cursor(dictionary=True)
 
     # Opening balance (static opening_balance + transactions BEFORE from_date)
-    cur.execute("""
-    SELECT 
-        COALESCE(ba.opening_balance, 0)
-        +
-        COALESCE(SUM(
-            CASE 
-                WHEN ft.transaction_type IN ('INCOME','DEPOSIT') THEN ft.amount
-                ELSE -ft.amount
-            END
-        ), 0) AS opening
-    FROM bank_accounts ba
-    LEFT JOIN finance_transactions ft 
-        ON ba.id = ft.account_id
-        AND ft.transaction_mode='CASH'
-        AND ft.tx_date < %s
-    WHERE ba.id=%s
-    """, (from_date, account_id))
-
-    opening = float(cur.fetchone()["opening"] or 0)
-
-    # Transactions
-    query = """
-        SELECT id, tx_date, transaction_type, amount, description,
-               receipt_no, payment_mode, category, income_category,
-               utr_no, attachment_url
-        FROM finance_transactions
-        WHERE transaction_mode='CASH'
-          AND account_id=%s
-          AND tx_date BETWEEN %s AND %s
-    """
-    params = [account_id, from_date, to_date]
-
-    if tx_type != "ALL":
-        query += " AND transaction_type=%s"
-        params.append(tx_type)
-
-    if tx_type == "INCOME" and income_cat != "ALL":
-        query += " AND income_category=%s"
-        params.append(income_cat)
-
-    if tx_type == "EXPENSE" and expense_cat != "ALL":
-        query += " AND category=%s"
-        params.append(expense_cat)
-
-    query += " ORDER BY tx_date ASC, id ASC"
-
-    cur.execute(query, params)
-    rows = cur.fetchall()
-    cur.close()
+    row = queries.fetchone(conn, "ledger_opening", ("CASH", from_date, account_id))
+    opening = float((row[0] if row else 0) or 0)
+
+    # Transactions (optional filters pass NULL when unused)
+    type_filter = tx_type if tx_type != "ALL" else None
+    income_filter = income_cat if (tx_type == "INCOME" and income_cat != "ALL") else None
+    expense_filter = expense_cat if (tx_type == "EXPENSE" and expense_cat != "ALL") else None
+
+    rows = queries.fetchall_rows(conn, "ledger_rows", (
+        LEDGER_DATE_FORMAT, "CASH", account_id, from_date, to_date,
+        type_filter, type_filter,
+        income_filter, income_filter,
+        expense_filter, expense_filter,
+    ))
     conn.close()
 
-    return build_ledger_response(rows, opening)
+    return build_ledger_response(rows, opening, parse_fields(request.args.get("fields"), LEDGER_FIELDS))
 
 
 # ---------------------------------------
@@ -1134,67 +1118,65 @@ def api_bank_report():
         return jsonify({"error": "Missing filters"}), 400
 
     conn = get_mysql_connection()
-    cur = conn.cursor(dictionary=True)
 
     try:
         conn.ping(reconnect=True)
     except:
         conn = get_mysql_connection()
-        cur = conn.cursor(dictionary=True)
 
     # Opening balance (static opening_balance + transactions BEFORE from_date)
-    cur.execute("""
-    SELECT 
-        COALESCE(ba.opening_balance, 0)
-        +
-        COALESCE(SUM(
-            CASE 
-                WHEN ft.transaction_type IN ('INCOME','DEPOSIT') THEN ft.amount
-                ELSE -ft.amount
-            END
-        ), 0) AS opening
-    FROM bank_accounts ba
-    LEFT JOIN finance_transactions ft 
-        ON ba.id = ft.account_id
-        AND ft.transaction_mode='BANK'
-        AND ft.tx_date < %s
-    WHERE ba.id=%s
-    """, (from_date, account_id))
+    row = queries.fetchone(conn, "ledger_opening", ("BANK", from_date, account_id))
+    opening = float((row[0] if row else 0) or 0)
+
+    # Transactions (optional filters pass NULL when unused)
+    type_filter = tx_type if tx_type != "ALL" else None
+    income_filter = income_cat if (tx_type == "INCOME" and income_cat != "ALL") else None
+    expense_filter = expense_cat if (tx_type == "EXPENSE" and expense_cat != "ALL") else None
+
+    rows = queries.fetchall_rows(conn, "ledger_rows", (
+        LEDGER_DATE_FORMAT, "BANK", account_id, from_date, to_date,
+        type_filter, type_filter,
+        income_filter, income_filter,
+        expense_filter, expense_filter,
+    ))
+    conn.close()
 
-    opening = float(cur.fetchone()["opening"] or 0)
+    return build_ledger_response(rows, opening, parse_fields(request.args.get("fields"), LEDGER_FIELDS))
 
-    # Transactions
-    query = """
-        SELECT id, tx_date, transaction_type, amount, description,
-               receipt_no, payment_mode, category, income_category,
-               utr_no, attachment_url
-        FROM finance_transactions
-        WHERE transaction_mode='BANK'
-          AND account_id=%s
-          AND tx_date BETWEEN %s AND %s
+# ---------------------------------------------
+# 📱 MOBILE: Transaction history (shared query, keyset pages)
+# ---------------------------------------------
+def transactions_page_response(first_page=finance_query.DEFAULT_PAGE, **fixed):
     """
-    params = [account_id, from_date, to_date]
-
-    if tx_type != "ALL":
-        query += " AND transaction_type=%s"
-        params.append(tx_type)
+    Filters / paging from the query string (see app/finance_query.py):
+    ?type= ?mode= ?account_id= ?category= ?from_date= ?to_date= ?q=
+    ?limit= ?cursor=   `fixed` filters can't be overridden by the client.
+    `first_page` is the size when the client sends neither ?limit= nor
+    ?cursor= (None = every row, for endpoints that were never capped).
+    """
+    filters = finance_query.filters_from_args(request.args, **fixed)
+    cursor = request.args.get("cursor") or None
+    limit = request.args.get("limit") or (finance_query.DEFAULT_PAGE if cursor else first_page)
 
-    if tx_type == "INCOME" and income_cat != "ALL":
-        query += " AND income_category=%s"
-        params.append(income_cat)
+    conn = get_mysql_connection()
+    if not conn:
+        return jsonify({"success": False, "message": "DB connection failed"}), 500
+    cur = conn.cursor(dictionary=True)
+    try:
+        page = finance_query.fetch_page(cur, filters, cursor, limit)
+    except ValueError:
+        return jsonify({"success": False, "message": "Invalid date / cursor / limit"}), 400
+    finally:
+        cur.close()
+        conn.close()
 
-    if tx_type == "EXPENSE" and expense_cat != "ALL":
-        query += " AND category=%s"
-        params.append(expense_cat)
+    return jsonify({"success": True, **page}), 200
 
-    query += " ORDER BY tx_date ASC, id ASC"
 
-    cur.execute(query, params)
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
+@finance_bp.route("/api/mobile/finance/transactions", methods=["GET"])
+def mobile_transactions():
+    return transactions_page_response()
 
-    return build_ledger_response(rows, opening)
 
 # ---------------------------------------
 # 📱 MOBILE API - Cash & Bank Accounts CRUD
@@ -1326,7 +1308,7 @@ def mobile_delete_account(account_id):
 @finance_bp.route("/api/mobile/finance/bank-deposit", methods=["POST"])
 def mobile_bank_deposit():
     data = request.form.to_dict()  # Because Flutter sends multipart
-    file = request.files.get("attachment")
+    file = resumable.request_file("attachment")
 
     required = ["account_id", "amount", "description", "tx_date"]
     if any(x not in data or not data[x] for x in required):
@@ -1339,11 +1321,7 @@ def mobile_bank_deposit():
     attachment_url = None
 
     if file and allowed_file(file.filename):
-        filename = secure_filename(f"{tx_id}_{file.filename}")
-        upload_dir = current_app.config["UPLOAD_FOLDER_FINANCE"]
-        os.makedirs(upload_dir, exist_ok=True)
-        file.save(os.path.join(upload_dir, filename))
-        attachment_url = filename
+        attachment_url = save_attachment(file, cur)
 
     try:
         cur.execute("""
@@ -1376,51 +1354,7 @@ def mobile_bank_deposit():
 # ---------------------------------------------
 @finance_bp.route("/api/mobile/finance/bank-deposit/history", methods=["GET"])
 def mobile_bank_deposit_history():
-    conn = get_mysql_connection()
-    cur = conn.cursor(dictionary=True)
-
-    from_date = request.args.get("from_date")  # 'YYYY-MM-DD' or None
-    to_date = request.args.get("to_date")      # 'YYYY-MM-DD' or None
-    account_id = request.args.get("account_id")
-
-    query = """
-        SELECT 
-            ft.id,
-            ft.account_id,
-            ba.account_name,
-            ft.amount,
-            ft.description,
-            ft.tx_date,
-            ft.attachment_url
-        FROM finance_transactions ft
-        JOIN bank_accounts ba ON ft.account_id = ba.id
-        WHERE ft.transaction_type = 'DEPOSIT'
-          AND ft.transaction_mode = 'BANK'
-    """
-
-    values = []
-
-    if account_id:
-        query += " AND ft.account_id = %s"
-        values.append(account_id)
-
-    if from_date:
-        query += " AND ft.tx_date >= %s"
-        values.append(from_date)
-
-    if to_date:
-        query += " AND ft.tx_date <= %s"
-        values.append(to_date)
-
-    query += " ORDER BY ft.tx_date DESC LIMIT 200"
-
-    cur.execute(query, tuple(values))
-    rows = cur.fetchall()
-
-    cur.close()
-    conn.close()
-
-    return jsonify({"success": True, "data": rows}), 200
+    return transactions_page_response(type="DEPOSIT", mode="BANK")
 
 # ---------------------------------------------
 # 📱 MOBILE: Delete Bank Deposit
@@ -1450,17 +1384,8 @@ def mobile_bank_deposit_delete(tx_id):
         cur.execute("DELETE FROM finance_transactions WHERE id = %s", (tx_id,))
         conn.commit()
 
-        # Optionally delete file from disk
-        if attachment_url:
-            upload_dir = current_app.config.get("UPLOAD_FOLDER_FINANCE")
-            if upload_dir:
-                file_path = os.path.join(upload_dir, attachment_url)
-                if os.path.exists(file_path):
-                    try:
-                        os.remove(file_path)
-                    except Exception:
-                        # Don't fail API just because file delete failed
-                        pass
+        # Optionally delete file from disk (never fails the API)
+        delete_attachment(attachment_url)
 
         return jsonify({"success": True, "message": "Deposit deleted"}), 200
 
@@ -1540,25 +1465,14 @@ def mobile_bank_deposit_update(tx_id):
 
     # Handle attachment (replace old if new uploaded)
     new_attachment = old_attachment
+    purge_old = lambda: None
     if file and allowed_file(file.filename):
-        tx_prefix = tx_id or uuid.uuid4().hex  # reuse id
-        filename = secure_filename(f"{tx_prefix}_{file.filename}")
-        upload_dir = current_app.config["UPLOAD_FOLDER_FINANCE"]
-        os.makedirs(upload_dir, exist_ok=True)
-        file.save(os.path.join(upload_dir, filename))
-
-        new_attachment = filename
+        new_attachment = save_attachment(file, cur)
         fields.append("attachment_url = %s")
         values.append(new_attachment)
 
-        # Optionally delete old file
-        if old_attachment:
-            try:
-                old_path = os.path.join(upload_dir, old_attachment)
-                if os.path.exists(old_path):
-                    os.remove(old_path)
-            except Exception:
-                pass
+        # Optionally delete old file (once the update is committed)
+        purge_old = delete_attachment(old_attachment, cur)
 
     if not fields:  # nothing changed
         cur.close()
@@ -1575,6 +1489,7 @@ def mobile_bank_deposit_update(tx_id):
     try:
         cur.execute(query, tuple(values))
         conn.commit()
+        purge_old()
         return jsonify({"success": True, "message": "Deposit updated"}), 200
 
     except Exception as e:
@@ -1606,11 +1521,7 @@ def mobile_self_withdrawal():
 
         attachment_url = None
         if file and allowed_file(file.filename):
-            filename = secure_filename(f"{uuid.uuid4().hex}_{file.filename}")
-            upload_dir = current_app.config["UPLOAD_FOLDER_FINANCE"]
-            os.makedirs(upload_dir, exist_ok=True)
-            file.save(os.path.join(upload_dir, filename))
-            attachment_url = filename
+            attachment_url = save_attachment(file, cur)
 
         cur.execute("""
             INSERT INTO finance_transactions
@@ -1634,45 +1545,7 @@ def mobile_self_withdrawal():
 
 @finance_bp.route("/api/mobile/finance/self-withdrawal/history", methods=["GET"])
 def mobile_self_withdrawal_history():
-    conn = get_mysql_connection()
-    cur = conn.cursor(dictionary=True)
-
-    account_id = request.args.get("account_id")
-    from_date = request.args.get("from_date")
-    to_date = request.args.get("to_date")
-
-    query = """
-        SELECT ft.id, ba.account_name, ft.amount,
-               ft.description, ft.tx_date, ft.attachment_url
-        FROM finance_transactions ft
-        JOIN bank_accounts ba ON ft.account_id = ba.id
-        WHERE ft.transaction_type='WITHDRAWAL'
-          AND ft.transaction_mode='BANK'
-    """
-
-    params = []
-
-    if account_id:
-        query += " AND ft.account_id=%s"
-        params.append(account_id)
-
-    if from_date:
-        query += " AND ft.tx_date >= %s"
-        params.append(from_date)
-
-    if to_date:
-        query += " AND ft.tx_date <= %s"
-        params.append(to_date)
-
-    query += " ORDER BY ft.tx_date DESC"
-
-    cur.execute(query, params)
-    rows = cur.fetchall()
-
-    cur.close()
-    conn.close()
-
-    return jsonify({"success": True, "data": rows}), 200
+    return transactions_page_response(first_page=None, type="WITHDRAWAL", mode="BANK")
 
 @finance_bp.route("/api/mobile/finance/self-withdrawal/<string:tx_id>", methods=["DELETE"])
 def mobile_self_withdrawal_delete(tx_id):
@@ -1695,13 +1568,7 @@ def mobile_self_withdrawal_delete(tx_id):
         cur.execute("DELETE FROM finance_transactions WHERE id=%s", (tx_id,))
         conn.commit()
 
-        if row["attachment_url"]:
-            path = os.path.join(
-                current_app.config["UPLOAD_FOLDER_FINANCE"],
-                row["attachment_url"]
-            )
-            if os.path.exists(path):
-                os.remove(path)
+        delete_attachment(row["attachment_url"])
 
         return jsonify({"success": True, "message": "Deleted"}), 200
 
@@ -1777,49 +1644,7 @@ def mobile_delete_expense_category(cid):
 # ---------------------------------------------
 @finance_bp.route("/api/mobile/finance/expense/history", methods=["GET"])
 def mobile_expense_history():
-    conn = get_mysql_connection()
-    cur = conn.cursor(dictionary=True)
-
-    from_date = request.args.get("from_date")
-    to_date = request.args.get("to_date")
-    category = request.args.get("category")
-
-    query = """
-        SELECT 
-            ft.id,
-            ft.tx_date,
-            ft.amount,
-            ft.category,
-            ft.description,
-            ft.attachment_url,
-            ba.account_name
-        FROM finance_transactions ft
-        JOIN bank_accounts ba ON ft.account_id = ba.id
-        WHERE ft.transaction_type='EXPENSE'
-    """
-    params = []
-
-    if from_date:
-        query += " AND ft.tx_date >= %s"
-        params.append(from_date)
-
-    if to_date:
-        query += " AND ft.tx_date <= %s"
-        params.append(to_date)
-
-    if category and category != "ALL":
-        query += " AND ft.category = %s"
-        params.append(category)
-
-    query += " ORDER BY ft.tx_date DESC"
-
-    cur.execute(query, params)
-    rows = cur.fetchall()
-
-    cur.close()
-    conn.close()
-
-    return jsonify({"success": True, "data": rows}), 200
+    return transactions_page_response(first_page=None, type="EXPENSE")
 
 # ---------------------------------------------
 # 📱 MOBILE: Delete Expense
@@ -1843,13 +1668,7 @@ def mobile_delete_expense(tx_id):
         cur.execute("DELETE FROM finance_transactions WHERE id=%s", (tx_id,))
         conn.commit()
 
-        if row["attachment_url"]:
-            path = os.path.join(
-                current_app.config["UPLOAD_FOLDER_FINANCE"],
-                row["attachment_url"]
-            )
-            if os.path.exists(path):
-                os.remove(path)
+        delete_attachment(row["attachment_url"])
 
         return jsonify({"success": True, "message": "Expense deleted"}), 200
 
@@ -1867,7 +1686,7 @@ def mobile_delete_expense(tx_id):
 @finance_bp.route("/api/mobile/finance/expense", methods=["POST"])
 def mobile_add_expense():
     data = request.form
-    file = request.files.get("attachment")
+    file = resumable.request_file("attachment")
 
     required = ["account_id", "amount", "category", "tx_date"]
     if any(not data.get(k) for k in required):
@@ -1878,11 +1697,7 @@ def mobile_add_expense():
 
     attachment_url = None
     if file and allowed_file(file.filename):
-        filename = secure_filename(f"{uuid.uuid4().hex}_{file.filename}")
-        upload_dir = current_app.config["UPLOAD_FOLDER_FINANCE"]
-        os.makedirs(upload_dir, exist_ok=True)
-        file.save(os.path.join(upload_dir, filename))
-        attachment_url = filename
+        attachment_url = save_attachment(file, cur)
 
     try:
         cur.execute("""
@@ -2005,7 +1820,7 @@ def mobile_delete_income_category(cid):
 @finance_bp.route("/api/mobile/finance/income", methods=["POST"])
 def mobile_add_income():
     data = request.form
-    file = request.files.get("attachment")
+    file = resumable.request_file("attachment")
 
     required = ["account_id", "amount", "category", "tx_date"]
     if any(not data.get(k) for k in required):
@@ -2016,10 +1831,7 @@ def mobile_add_income():
 
     attachment_url = None
     if file and allowed_file(file.filename):
-        filename = secure_filename(f"{uuid.uuid4().hex}_{file.filename}")
-        upload_dir = current_app.config["UPLOAD_FOLDER_FINANCE"]
-        file.save(os.path.join(upload_dir, filename))
-        attachment_url = filename
+        attachment_url = save_attachment(file, cur)
 
     try:
         cur.execute("""
@@ -2052,49 +1864,8 @@ def mobile_add_income():
 # ---------------------------------------------
 @finance_bp.route("/api/mobile/finance/income/history", methods=["GET"])
 def mobile_income_history():
-    conn = get_mysql_connection()
-    cur = conn.cursor(dictionary=True)
-
-    from_date = request.args.get("from_date")
-    to_date = request.args.get("to_date")
-    category = request.args.get("category")
+    return transactions_page_response(first_page=None, type="INCOME")
 
-    query = """
-        SELECT
-            ft.id,
-            ft.tx_date,
-            ft.amount,
-            ft.category,
-            ft.description,
-            ft.attachment_url,
-            ba.account_name
-        FROM finance_transactions ft
-        JOIN bank_accounts ba ON ft.account_id = ba.id
-        WHERE ft.transaction_type = 'INCOME'
-    """
-    params = []
-
-    if from_date:
-        query += " AND ft.tx_date >= %s"
-        params.append(from_date)
-
-    if to_date:
-        query += " AND ft.tx_date <= %s"
-        params.append(to_date)
-
-    if category and category != "ALL":
-        query += " AND ft.category = %s"
-        params.append(category)
-
-    query += " ORDER BY ft.tx_date DESC"
-
-    cur.execute(query, params)
-    rows = cur.fetchall()
-
-    cur.close()
-    conn.close()
-
-    return jsonify({"success": True, "data": rows}), 200
 # ---------------------------------------------
 # 📱 MOBILE: Delete Income
 # ---------------------------------------------
@@ -2123,13 +1894,7 @@ def mobile_delete_income(tx_id):
         )
         conn.commit()
 
-        if row["attachment_url"]:
-            path = os.path.join(
-                current_app.config["UPLOAD_FOLDER_FINANCE"],
-                row["attachment_url"]
-            )
-            if os.path.exists(path):
-                os.remove(path)
+        delete_attachment(row["attachment_url"])
 
         return jsonify({"success": True}), 200
 
@@ -2178,14 +1943,15 @@ def mobile_cash_ledger():
     opening = float(cur.fetchone()["opening"] or 0)
 
     query = """
-        SELECT id, tx_date, transaction_type, amount, description,
+        SELECT id, tx_date, DATE_FORMAT(tx_date, %s) AS display_date,
+               transaction_type, amount, description,
                category, attachment_url
         FROM finance_transactions
         WHERE transaction_mode='CASH'
           AND account_id=%s
           AND tx_date BETWEEN %s AND %s
     """
-    params = [account_id, from_date, to_date]
+    params = [LEDGER_DATE_FORMAT, account_id, from_date, to_date]
 
     if tx_type != "ALL":
         query += " AND transaction_type=%s"
@@ -2207,7 +1973,7 @@ def mobile_cash_ledger():
     cur.close()
     conn.close()
 
-    return build_ledger_response(rows, opening)
+    return build_ledger_response(rows, opening, parse_fields(request.args.get("fields"), LEDGER_FIELDS))
 
 @finance_bp.route("/api/mobile/finance/bank-ledger", methods=["GET"])
 def mobile_bank_ledger():
@@ -2245,14 +2011,15 @@ def mobile_bank_ledger():
     opening = float(cur.fetchone()["opening"] or 0)
 
     query = """
-        SELECT id, tx_date, transaction_type, amount, description,
+        SELECT id, tx_date, DATE_FORMAT(tx_date, %s) AS display_date,
+               transaction_type, amount, description,
                category, attachment_url
         FROM finance_transactions
         WHERE transaction_mode='BANK'
           AND account_id=%s
           AND tx_date BETWEEN %s AND %s
     """
-    params = [account_id, from_date, to_date]
+    params = [LEDGER_DATE_FORMAT, account_id, from_date, to_date]
 
     if tx_type != "ALL":
         query += " AND transaction_type=%s"
@@ -2274,4 +2041,51 @@ def mobile_bank_ledger():
     cur.close()
     conn.close()
 
-    return build_ledger_response(rows, opening)
+    return build_ledger_response(rows, opening, parse_fields(request.args.get("fields"), LEDGER_FIELDS))
+
+
+# ---------------------------------------
+# Fee -> finance outbox (dead letters / retry)
+# ---------------------------------------
+@finance_bp.route("/api/finance/outbox", methods=["GET"])
+def finance_outbox_list():
+    if not is_logged_in():
+        return jsonify({"success": False, "message": "Unauthorized"}), 401
+
+    status = request.args.get("status") or finance_outbox.STATUS_DEAD
+    if status not in (finance_outbox.STATUS_PENDING, finance_outbox.STATUS_DEAD, finance_outbox.STATUS_DONE):
+        return jsonify({"success": False, "message": "status must be pending, dead or done"}), 400
+    try:
+        limit = min(int(request.args.get("limit") or 100), 500)
+    except ValueError:
+        limit = 0
+    if limit < 1:
+        return jsonify({"success": False, "message": "limit must be a number from 1 to 500"}), 400
+
+    conn = get_mysql_connection()
+    if not conn:
+        return jsonify({"success": False, "message": "DB connection failed"}), 500
+    try:
+        return jsonify({
+            "success": True,
+            "counts": finance_outbox.counts(conn),
+            "data": finance_outbox.list_events(conn, status, limit),
+        })
+    finally:
+        conn.close()
+
+
+@finance_bp.route("/api/finance/outbox/<int:outbox_id>/retry", methods=["POST"])
+def finance_outbox_retry(outbox_id):
+    if not is_logged_in():
+        return jsonify({"success": False, "message": "Unauthorized"}), 401
+
+    conn = get_mysql_connection()
+    if not conn:
+        return jsonify({"success": False, "message": "DB connection failed"}), 500
+    try:
+        if not finance_outbox.retry(conn, outbox_id):
+            return jsonify({"success": False, "message": "Event not found or already posted"}), 404
+        return jsonify({"success": True})
+    finally:
+        conn.close()
@@ -0,0 +1,88 @@
+# ============================================
+# FILE: app/routers/jobs.py
+# Background job status / progress / artifacts
+# ============================================
+
+from flask import Blueprint, jsonify, session
+
+from app import jobs
+from app.file_serving import serve_file
+
+jobs_bp = Blueprint("jobs", __name__)
+
+
+def _is_logged_in():
+    return session.get("logged_in", False)
+
+
+def _owns(created_by):
+    """Jobs (and their artifacts) are only visible to the user who queued them."""
+    username = session.get("username")
+    return bool(username) and created_by == username
+
+
+def enqueue_response(kind, payload):
+    """Queue a job for the logged-in user; 202 + job id (500 if it can't be stored)."""
+    try:
+        job_id = jobs.enqueue(kind, payload, created_by=session.get("username"))
+    except Exception as e:
+        print("❌ Job enqueue error:", e)
+        return jsonify({"success": False, "message": "Could not queue job"}), 500
+    return jsonify({
+        "success": True,
+        "job_id": job_id,
+        "status": jobs.STATUS_QUEUED,
+        "status_url": f"/api/jobs/{job_id}",
+    }), 202
+
+
+# ======================================
+# 🔹 Job status (poll until done / failed)
+# ======================================
+@jobs_bp.route("/api/jobs/<job_id>", methods=["GET"])
+def api_job_status(job_id):
+    if not _is_logged_in():
+        return jsonify({"success": False, "message": "Unauthorized"}), 401
+    try:
+        job = jobs.get(job_id)
+    except Exception as e:
+        print("❌ Job status error:", e)
+        return jsonify({"success": False, "message": "DB connection failed"}), 500
+    if not job or not _owns(job.get("created_by")):
+        return jsonify({"success": False, "message": "Job not found"}), 404
+    if job["has_artifact"]:
+        job["artifact_url"] = f"/jobs/{job_id}/artifact"
+    return jsonify({"success": True, "job": job})
+
+
+# ======================================
+# 🔹 My recent jobs
+# ======================================
+@jobs_bp.route("/api/jobs", methods=["GET"])
+def api_jobs_list():
+    if not _is_logged_in():
+        return jsonify({"success": False, "message": "Unauthorized"}), 401
+    try:
+        rows = jobs.recent(created_by=session.get("username"))
+    except Exception as e:
+        print("❌ Job list error:", e)
+        return jsonify({"success": False, "message": "DB connection failed"}), 500
+    return jsonify({"success": True, "jobs": rows})
+
+
+# ======================================
+# 🔹 Download job result file
+# ======================================
+@jobs_bp.route("/jobs/<job_id>/artifact", methods=["GET"])
+def job_artifact(job_id):
+    if not _is_logged_in():
+        return jsonify({"success": False, "message": "Unauthorized"}), 401
+    try:
+        found = jobs.artifact(job_id)
+    except Exception as e:
+        print("❌ Job artifact error:", e)
+        return jsonify({"success": False, "message": "DB connection failed"}), 500
+    if not found or not _owns(found[0]):
+        return jsonify({"success": False, "message": "No artifact for this job"}), 404
+    _, directory, name = found
+    return serve_file(directory, name, as_attachment=True)
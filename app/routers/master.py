@@ -9,6 +9,8 @@ import os
 import uuid
 from datetime import datetime
 
+from app.metrics import instrument
+
 master_bp = Blueprint("master", __name__, url_prefix="/master")
 
 
@@ -28,14 +30,14 @@ def get_db():
     if not (host and user and password and database):
         raise RuntimeError("❌ Missing MySQL environment variables.")
 
-    return mysql.connector.connect(
+    return instrument(mysql.connector.connect(
         host=host,
         user=user,
         password=password,
         database=database,
         auth_plugin="mysql_native_password",
         connection_timeout=10
-    )
+    ))
 
 
 # ============================================
@@ -7,20 +7,26 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 import mysql.connector
 import os
 
+from app import jobs, typeahead
+from app.metrics import instrument
+from app.routers.jobs import enqueue_response
+
 roll_bp = Blueprint("roll_allocation", __name__, url_prefix="/students")
 
+ROLL_PREFIX = "TIONS"
+
 
 # --------------------------------------------
 #  MYSQL CONNECTION  (FIXED 🔥)
 # --------------------------------------------
 def get_db():
-    return mysql.connector.connect(
+    return instrument(mysql.connector.connect(
         host=os.getenv("MYSQL_HOST", "srv366.hstgr.io"),
         user=os.getenv("MYSQL_USER", "u514260654_test_erp"),
         password=os.getenv("MYSQL_PASSWORD", "Tions@98"),
         database=os.getenv("MYSQL_DATABASE", "u514260654_test_erp"),
         auth_plugin="mysql_native_password"
-    )
+    ))
 
 
 # --------------------------------------------
@@ -141,6 +147,7 @@ def save_roll_allocation():
         db.commit()
         cur.close()
         db.close()
+        typeahead.invalidate()
 
         return jsonify({"success": True, "updated": updated_count})
 
@@ -152,6 +159,81 @@ def save_roll_allocation():
 # ===================================================
 # 🔹 Auto Generate TIONS1, TIONS2 ...
 # ===================================================
+def generate_rolls(db, course, batch, progress=None):
+    """Number the course/batch students by name; returns how many were updated."""
+    cur = db.cursor(dictionary=True)
+
+    # Filter students
+    cur.execute("""
+        SELECT id FROM students
+        WHERE course=%s AND batch=%s
+        ORDER BY name ASC
+    """, (course, batch))
+
+    students = cur.fetchall()
+
+    prefix = ROLL_PREFIX
+    counter = 1
+    updated_count = 0
+
+    cur2 = db.cursor()
+
+    for stu in students:
+        roll_val = f"{prefix}{counter}"
+
+        cur2.execute("""
+            UPDATE students
+            SET roll_no=%s, enrollment_no=%s, register_number=%s
+            WHERE id=%s
+        """, (roll_val, roll_val, roll_val, stu["id"]))
+
+        counter += 1
+        updated_count += 1
+        if progress:
+            progress(updated_count, len(students), "Generating roll numbers")
+
+    db.commit()
+    cur.close()
+    cur2.close()
+    typeahead.invalidate()
+    return updated_count
+
+
+def renumber_rolls(cur, course, batch):
+    """
+    Same numbering as generate_rolls() in one UPDATE (ROW_NUMBER over
+    name); caller commits. Used by the year-end rollover (app/rollover.py).
+    Returns the number of students in the group, like generate_rolls()
+    (rowcount skips rows whose numbers were already right).
+    """
+    cur.execute(
+        "SELECT COUNT(*) FROM students WHERE course=%s AND batch=%s",
+        (course, batch)
+    )
+    group_size = cur.fetchone()[0]
+    cur.execute("""
+        UPDATE students s
+        JOIN (
+            SELECT id, ROW_NUMBER() OVER (ORDER BY name ASC, id ASC) AS rn
+            FROM students
+            WHERE course=%s AND batch=%s
+        ) r ON r.id = s.id
+        SET s.roll_no = CONCAT(%s, r.rn),
+            s.enrollment_no = CONCAT(%s, r.rn),
+            s.register_number = CONCAT(%s, r.rn)
+    """, (course, batch, ROLL_PREFIX, ROLL_PREFIX, ROLL_PREFIX))
+    return group_size
+
+
+@jobs.task("roll.generate")
+def run_generate_rolls(job, course, batch):
+    db = get_db()
+    try:
+        return {"updated": generate_rolls(db, course, batch, progress=job.progress)}
+    finally:
+        db.close()
+
+
 @roll_bp.route("/roll_allocation/generate", methods=["POST"])
 def auto_generate_rolls():
     if not session.get("logged_in"):
@@ -165,39 +247,11 @@ def auto_generate_rolls():
         if not course or not batch:
             return jsonify({"success": False, "message": "Invalid filters"}), 400
 
-        db = get_db()
-        cur = db.cursor(dictionary=True)
-
-        # Filter students
-        cur.execute("""
-            SELECT id FROM students
-            WHERE course=%s AND batch=%s
-            ORDER BY name ASC
-        """, (course, batch))
-
-        students = cur.fetchall()
-
-        prefix = "TIONS"
-        counter = 1
-        updated_count = 0
-
-        cur2 = db.cursor()
-
-        for stu in students:
-            roll_val = f"{prefix}{counter}"
+        if jobs.wants_async() or data.get("async"):
+            return enqueue_response("roll.generate", {"course": course, "batch": batch})
 
-            cur2.execute("""
-                UPDATE students
-                SET roll_no=%s, enrollment_no=%s, register_number=%s
-                WHERE id=%s
-            """, (roll_val, roll_val, roll_val, stu["id"]))
-
-            counter += 1
-            updated_count += 1
-
-        db.commit()
-        cur.close()
-        cur2.close()
+        db = get_db()
+        updated_count = generate_rolls(db, course, batch)
         db.close()
 
         return jsonify({"success": True, "updated": updated_count})
@@ -0,0 +1,95 @@
+# ============================================
+# FILE: app/routers/rollover.py
+# Academic-year rollover runs (pipeline in app/rollover.py)
+# ============================================
+
+from flask import Blueprint, jsonify, request, session
+
+from app import rollover
+from app.db import get_mysql_connection
+from app.routers.jobs import enqueue_response
+
+rollover_bp = Blueprint("rollover", __name__)
+
+
+def _is_logged_in():
+    return session.get("logged_in", False)
+
+
+# ======================================
+# 🔹 Start a rollover (background job)
+# ======================================
+@rollover_bp.route("/api/rollover", methods=["POST"])
+def rollover_start():
+    if not _is_logged_in():
+        return jsonify({"success": False, "message": "Unauthorized"}), 401
+
+    try:
+        plan = rollover.validate_plan(request.get_json(silent=True) or {})
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+    conn = get_mysql_connection()
+    if not conn:
+        return jsonify({"success": False, "message": "DB connection failed"}), 500
+    try:
+        run_id = rollover.create_run(conn, plan, created_by=session.get("username"))
+    finally:
+        conn.close()
+
+    response, status = enqueue_response("rollover.run", {"run_id": run_id})
+    body = dict(response.get_json(), run_id=run_id, run_url=f"/api/rollover/{run_id}")
+    return jsonify(body), status
+
+
+# ======================================
+# 🔹 Run status + checkpoints (+ balance snapshot when done)
+# ======================================
+@rollover_bp.route("/api/rollover/<run_id>", methods=["GET"])
+def rollover_status(run_id):
+    if not _is_logged_in():
+        return jsonify({"success": False, "message": "Unauthorized"}), 401
+
+    conn = get_mysql_connection()
+    if not conn:
+        return jsonify({"success": False, "message": "DB connection failed"}), 500
+    try:
+        run = rollover.get_run(conn, run_id)
+        if not run:
+            return jsonify({"success": False, "message": "Rollover run not found"}), 404
+        cur = conn.cursor(dictionary=True)
+        cur.execute("""
+            SELECT s.account_id, ba.account_name, s.as_of, s.balance
+            FROM account_balance_snapshots s
+            LEFT JOIN bank_accounts ba ON ba.id = s.account_id
+            WHERE s.run_id=%s
+            ORDER BY s.account_id
+        """, (run_id,))
+        run["balances"] = cur.fetchall()
+        cur.close()
+    finally:
+        conn.close()
+    return jsonify({"success": True, "run": run})
+
+
+# ======================================
+# 🔹 Resume a failed run from its checkpoints
+# ======================================
+@rollover_bp.route("/api/rollover/<run_id>/resume", methods=["POST"])
+def rollover_resume(run_id):
+    if not _is_logged_in():
+        return jsonify({"success": False, "message": "Unauthorized"}), 401
+
+    conn = get_mysql_connection()
+    if not conn:
+        return jsonify({"success": False, "message": "DB connection failed"}), 500
+    try:
+        run = rollover.get_run(conn, run_id)
+    finally:
+        conn.close()
+    if not run:
+        return jsonify({"success": False, "message": "Rollover run not found"}), 404
+    if run["status"] != rollover.STATUS_FAILED:
+        return jsonify({"success": False, "message": f"Run is {run['status']}, only failed runs can be resumed"}), 409
+
+    return enqueue_response("rollover.run", {"run_id": run_id})
@@ -1,6 +1,6 @@
 
 # FILE: app/routers/students.py
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, session, send_from_directory
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, session, send_from_directory, abort
 import pandas as pd
 import os
 import uuid
@@ -9,12 +9,18 @@ import mysql.connector
 from mysql.connector import Error
 from dotenv import load_dotenv
 from flask import Blueprint, request, jsonify, current_app
+from werkzeug.datastructures import FileStorage
 from functools import wraps
 import jwt
 from datetime import datetime, timedelta
 
 # Use the pooled connection (must exist at app/db.py)
 from app.db import get_mysql_connection
+from app import fee_engine, images, jobs, queries, resumable, storage, typeahead
+from app.file_serving import serve_file
+from app.routers.jobs import enqueue_response
+from app.routers.dashboard import invalidate_snapshot
+from app.rows import fetch_rows, parse_fields, project
 
 # Load .env (so this module can connect independently)
 load_dotenv(os.path.join(os.path.dirname(__file__), "..", ".env"))
@@ -57,6 +63,9 @@ DROPOUTS_COLUMNS = [
     "migration_url", "photo_url", "tc_url", "created_at"
 ]
 
+# ?fields= for student lists: real columns + derived photo_thumb_url
+STUDENT_LIST_FIELDS = STUDENTS_COLUMNS + ["photo_thumb_url"]
+
 # ======================================
 # 🔹 Helper Function
 # ======================================
@@ -64,9 +73,17 @@ def is_logged_in():
     """Check login session."""
     return session.get("logged_in", False)
 
+def project_student(row, fields):
+    """project() plus the derived photo_thumb_url field."""
+    out = project(row, fields)
+    if "photo_thumb_url" in out:
+        out["photo_thumb_url"] = images.thumb_url(row.get("photo_url"))
+    return out
+
+
 def build_nested_student_from_row(rowd):
     """
-    Take a flat student row dict and return nested structure:
+    Take a flat student row (dict or app.rows Row) and return nested structure:
     {
       personal: {...},
       academic: {...},
@@ -129,6 +146,7 @@ def build_nested_student_from_row(rowd):
 
     documents = {
         "photo_url": rowd.get("photo_url"),
+        "photo_thumb_url": images.thumb_url(rowd.get("photo_url")),
         "marksheet_url": rowd.get("marksheet_url"),
         "aadhaar_url": rowd.get("aadhaar_url"),
         "tc_url": rowd.get("tc_url"),
@@ -357,6 +375,9 @@ def add_student():
         cur.execute(f"INSERT INTO students ({col_sql}) VALUES ({placeholders})", tuple(vals))
         conn.commit()
         cur.close()
+        typeahead.refresh(conn, student_id)
+        fee_engine.auto_apply(conn, [student_id])
+        invalidate_snapshot()
 
         flash("✅ Student added successfully!", "success")
         print("✅ Student added successfully!")
@@ -390,17 +411,11 @@ def edit_student(student_id):
         return redirect(url_for("students.view_students"))
 
     try:
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM students WHERE id = %s", (student_id,))
-        row = cur.fetchone()
-        if not row:
-            cur.close()
+        rowd = queries.fetchone_dict(conn, "student_by_id", (student_id,))
+        if not rowd:
             flash("⚠️ Student not found!", "danger")
             return redirect(url_for("students.view_students"))
-        cols = [d[0] for d in cur.description]
-        rowd = dict(zip(cols, row))
         nested = build_nested_student_from_row(rowd)
-        cur.close()
         return render_template(
             "students/add_student.html",
             title="Edit Student",
@@ -435,15 +450,11 @@ def update_student(student_id):
         flat = flatten_collections_from_form(request.form)
 
         # Fetch existing DB record — prevents overwriting with blank values
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM students WHERE id = %s", (student_id,))
-        existing_row = cur.fetchone()
-        if not existing_row:
-            cur.close()
+        existing = queries.fetchone_dict(conn, "student_by_id", (student_id,))
+        if not existing:
             flash("⚠️ Student not found!", "danger")
             return redirect(url_for("students.view_students"))
-        cols = [d[0] for d in cur.description]
-        existing = dict(zip(cols, existing_row))
+        cur = conn.cursor()
 
         # Merge new values with existing
         updates = []
@@ -466,6 +477,8 @@ def update_student(student_id):
         cur.execute(f"UPDATE students SET {', '.join(updates)} WHERE id = %s", tuple(params))
         conn.commit()
         cur.close()
+        typeahead.refresh(conn, student_id)
+        invalidate_snapshot()
 
         flash("🔄 Student updated successfully!", "success")
         print(f"📝 Updated student {student_id}")
@@ -503,6 +516,8 @@ def delete_student(student_id):
         cur.execute("DELETE FROM students WHERE id = %s", (student_id,))
         conn.commit()
         cur.close()
+        typeahead.remove(student_id)
+        invalidate_snapshot()
         print(f"🗑️ Deleted student {student_id}")
         flash("🗑️ Student deleted successfully!", "success")
         return redirect(url_for("students.view_students"))
@@ -603,9 +618,81 @@ def download_sample():
 # ======================================
 # 🔹 Bulk Upload Students
 # ======================================
+BULK_REQUIRED_COLS = ["Name", "Roll No", "Department", "Course", "Branch", "Batch", "Session"]
+
+
+def read_student_sheet(file, filename):
+    """DataFrame from an uploaded .xlsx / .csv (None for other types)."""
+    if filename.endswith(".xlsx"):
+        return pd.read_excel(file)
+    if filename.endswith(".csv"):
+        return pd.read_csv(file)
+    return None
+
+
+def import_students(conn, df, progress=None):
+    """
+    Insert one student per sheet row (single commit), then auto-assign
+    matching fee structures. Returns (students added, fee rows assigned).
+    """
+    added = 0
+    new_ids = []
+    total = len(df)
+    cur = conn.cursor()
+    for _, row in df.iterrows():
+        # Build flat record
+        flat = {
+            "name": str(row.get("Name", "")).strip(),
+            "roll_no": str(row.get("Roll No", "")).strip(),
+            "department": str(row.get("Department", "")).strip(),
+            "course": str(row.get("Course", "")).strip(),
+            "branch": str(row.get("Branch", "")).strip(),
+            "batch": str(row.get("Batch", "")).strip(),
+            "session": str(row.get("Session", "")).strip(),
+            "register_number": str(row.get("Register Number", "")).strip() if "Register Number" in row else ""
+        }
+        student_id = uuid.uuid4().hex
+        cols = ["id"] + list(flat.keys()) + ["created_at"]
+        vals = [student_id] + [flat[k] for k in flat.keys()] + [datetime.utcnow()]
+        placeholders = ", ".join(["%s"] * len(vals))
+        col_sql = ", ".join(cols)
+        cur.execute(f"INSERT INTO students ({col_sql}) VALUES ({placeholders})", tuple(vals))
+        new_ids.append(student_id)
+        added += 1
+        if progress:
+            progress(added, total, "Importing students")
+
+    conn.commit()
+    cur.close()
+    typeahead.invalidate()
+    assigned = fee_engine.auto_apply(conn, new_ids)
+    invalidate_snapshot()
+    return added, assigned
+
+
+@jobs.task("students.bulk_import")
+def run_bulk_import(job, path, filename):
+    df = read_student_sheet(path, filename)
+    if df is None or any(col not in df.columns for col in BULK_REQUIRED_COLS):
+        raise ValueError("Invalid file format. Use the sample template!")
+
+    conn = get_mysql_connection()
+    if not conn:
+        raise RuntimeError("DB connection failed")
+    try:
+        added, assigned = import_students(conn, df, progress=job.progress)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    jobs.release_input(path)
+    return {"added": added, "fees_assigned": assigned}
+
+
 @students_bp.route("/students/bulk_upload", methods=["GET", "POST"])
 def bulk_upload_students():
-    """Bulk upload students via Excel/CSV."""
+    """Bulk upload students via Excel/CSV (?async=1 queues a job)."""
     if not is_logged_in():
         return redirect(url_for("login"))
 
@@ -617,52 +704,31 @@ def bulk_upload_students():
         flash("⚠️ Please select an Excel or CSV file!", "danger")
         return redirect(url_for("students.bulk_upload_students"))
 
+    if jobs.wants_async():
+        if not file.filename.endswith((".xlsx", ".csv")):
+            return jsonify({"success": False, "message": "Invalid file type! Please upload .xlsx or .csv"}), 400
+        return enqueue_response("students.bulk_import",
+                                {"path": jobs.save_input(file), "filename": file.filename})
+
     conn = get_mysql_connection()
     if not conn:
         flash("⚠️ DB connection failed.", "danger")
         return redirect(url_for("students.bulk_upload_students"))
 
     try:
-        if file.filename.endswith(".xlsx"):
-            df = pd.read_excel(file)
-        elif file.filename.endswith(".csv"):
-            df = pd.read_csv(file)
-        else:
+        df = read_student_sheet(file, file.filename)
+        if df is None:
             flash("❌ Invalid file type! Please upload .xlsx or .csv", "danger")
             return redirect(url_for("students.bulk_upload_students"))
 
-        required_cols = ["Name", "Roll No", "Department", "Course", "Branch", "Batch", "Session"]
-        for col in required_cols:
+        for col in BULK_REQUIRED_COLS:
             if col not in df.columns:
                 flash("❌ Invalid file format. Use the sample template!", "danger")
                 return redirect(url_for("students.bulk_upload_students"))
 
-        added = 0
-        cur = conn.cursor()
-        for _, row in df.iterrows():
-            # Build flat record
-            flat = {
-                "name": str(row.get("Name", "")).strip(),
-                "roll_no": str(row.get("Roll No", "")).strip(),
-                "department": str(row.get("Department", "")).strip(),
-                "course": str(row.get("Course", "")).strip(),
-                "branch": str(row.get("Branch", "")).strip(),
-                "batch": str(row.get("Batch", "")).strip(),
-                "session": str(row.get("Session", "")).strip(),
-                "register_number": str(row.get("Register Number", "")).strip() if "Register Number" in row else ""
-            }
-            student_id = uuid.uuid4().hex
-            cols = ["id"] + list(flat.keys()) + ["created_at"]
-            vals = [student_id] + [flat[k] for k in flat.keys()] + [datetime.utcnow()]
-            placeholders = ", ".join(["%s"] * len(vals))
-            col_sql = ", ".join(cols)
-            cur.execute(f"INSERT INTO students ({col_sql}) VALUES ({placeholders})", tuple(vals))
-            added += 1
-
-        conn.commit()
-        cur.close()
+        added, assigned = import_students(conn, df)
 
-        flash(f"✅ Successfully uploaded {added} students!", "success")
+        flash(f"✅ Successfully uploaded {added} students! ({assigned} fee rows auto-assigned)", "success")
         return redirect(url_for("students.bulk_upload_students"))
 
     except Exception as e:
@@ -679,6 +745,28 @@ def bulk_upload_students():
         except Exception:
             pass
 
+# ======================================
+# 🔹 Student typeahead (in-memory, see app/typeahead.py)
+# ======================================
+@students_bp.route("/api/students/typeahead", methods=["GET"])
+def api_students_typeahead():
+    if not is_logged_in():
+        return jsonify({"success": False, "message": "Unauthorized"}), 403
+
+    q = (request.args.get("q") or "").strip()
+    try:
+        limit = min(max(int(request.args.get("limit") or 10), 1), 50)
+    except ValueError:
+        limit = 10
+    if not q:
+        return jsonify({"success": True, "students": []})
+
+    students = typeahead.search(q, limit)
+    if students is None:
+        return jsonify({"success": False, "message": "DB connection failed", "students": []}), 500
+    return jsonify({"success": True, "students": students})
+
+
 # ======================================
 # 🔹 DROPOUT STUDENTS PAGE (HTML PAGE)
 # ======================================
@@ -706,6 +794,11 @@ def api_get_students():
         batch_f       = request.args.get("year", "").strip()
         search_f      = request.args.get("search", "").strip().lower()
 
+        # Optional flat projection (?fields=id,name,register_number) and
+        # ?dropouts=0 for pickers that only need active students
+        fields = parse_fields(request.args.get("fields"), STUDENT_LIST_FIELDS)
+        include_dropouts = request.args.get("dropouts", "1") != "0"
+
         conn = get_mysql_connection()
         if not conn:
             return jsonify({"success": False, "message": "DB connection failed"}), 500
@@ -732,37 +825,49 @@ def api_get_students():
         # ------------------------
         # ACTIVE STUDENTS
         # ------------------------
-        cur.execute(f"SELECT * FROM students {where_sql}", tuple(params))
-        student_rows = cur.fetchall()
-        cols = [d[0] for d in cur.description]
+        if fields:
+            # column names are whitelisted by parse_fields(); search needs these three
+            select_cols = [f for f in fields if f in STUDENTS_COLUMNS]
+            if "photo_thumb_url" in fields:
+                select_cols.append("photo_url")  # thumbnail is derived from it
+            select_cols = list(dict.fromkeys(select_cols + ["id", "name", "register_number", "phone"]))
+            select_sql = ", ".join(select_cols)
+        else:
+            select_sql = "*"
+
+        cur.execute(f"SELECT {select_sql} FROM students {where_sql}", tuple(params))
+        student_rows = fetch_rows(cur)
 
         students_list = []
         for row in student_rows:
-            rowd = dict(zip(cols, row))
-            nested = build_nested_student_from_row(rowd)
-
             # search
-            hay = " ".join([
-                (nested.get("personal") or {}).get("name", ""),
-                (nested.get("academic") or {}).get("register_number", ""),
-                (nested.get("personal") or {}).get("phone", "")
-            ]).lower()
-
-            if search_f and search_f not in hay:
-                continue
-
-            students_list.append(nested)
+            if search_f:
+                hay = " ".join([
+                    row.get("name") or "",
+                    row.get("register_number") or "",
+                    row.get("phone") or ""
+                ]).lower()
+                if search_f not in hay:
+                    continue
+
+            if fields:
+                students_list.append(project_student(row, fields))
+            else:
+                students_list.append(build_nested_student_from_row(row))
 
         # ------------------------
         # DROPOUT STUDENTS (with FULL DETAILS)
         # ------------------------
-        cur.execute("SELECT * FROM dropouts")
-        drop_rows = cur.fetchall()
-        dcols = [d[0] for d in cur.description]
-
         dropouts = []
-        for drow in drop_rows:
-            d = dict(zip(dcols, drow))
+        drop_rows = []
+        if include_dropouts:
+            cur.execute("SELECT * FROM dropouts")
+            drop_rows = fetch_rows(cur)
+
+        for d in drop_rows:
+            if fields:
+                dropouts.append(project_student(d, fields))
+                continue
 
             dropouts.append({
                 "id": d.get("id"),
@@ -820,6 +925,7 @@ def api_get_students():
 
                 "documents": {
                     "photo_url": d.get("photo_url"),
+                    "photo_thumb_url": images.thumb_url(d.get("photo_url")),
                     "aadhaar_url": d.get("aadhaar_url"),
                     "marksheet_url": d.get("marksheet_url"),
                     "migration_url": d.get("migration_url"),
@@ -851,86 +957,132 @@ def api_get_students():
 
 
 # ======================================
-# 🔹 Mark Student as Dropped
+# 🔹 Move students <-> dropouts (server-side copy)
 # ======================================
-@students_bp.route("/api/mark_dropout", methods=["POST"])
-def mark_dropout():
-    if not is_logged_in():
-        return jsonify({"success": False, "message": "Unauthorized"}), 403
+# Columns shared by both tables; rows are copied by MySQL with
+# INSERT ... SELECT instead of being read into Python and re-inserted.
+MOVE_COLUMNS = [c for c in STUDENTS_COLUMNS if c != "id"]
+BULK_MOVE_MAX = 5000
 
-    try:
-        data = request.get_json(force=True)
-        student_id = data.get("student_id")
-        dropout_date = data.get("date") or data.get("dropout_date")
-        reason = data.get("reason") or data.get("dropout_reason")
-        remarks = data.get("remarks") or data.get("dropout_remarks")
 
-        if not student_id:
-            return jsonify({"success": False, "message": "Missing student ID"}), 400
-        if not dropout_date:
-            return jsonify({"success": False, "message": "Missing dropout date"}), 400
+def _lock_ids(cur, table, ids):
+    """Ids from `ids` present in `table`, row-locked until commit."""
+    marks = ", ".join(["%s"] * len(ids))
+    cur.execute(f"SELECT id FROM {table} WHERE id IN ({marks}) FOR UPDATE", tuple(ids))
+    return [r[0] for r in cur.fetchall()]
 
-        conn = get_mysql_connection()
-        if not conn:
-            return jsonify({"success": False, "message": "DB connection failed"}), 500
-
-        cur = conn.cursor()
 
-        # Fetch student
-        cur.execute("SELECT * FROM students WHERE id = %s", (student_id,))
-        row = cur.fetchone()
-        if not row:
-            cur.close()
-            try: conn.close()
-            except: pass
-            return jsonify({"success": False, "message": "Student not found"}), 404
+def move_to_dropouts(cur, ids, dropout_date, reason=None, remarks=None):
+    """
+    students -> dropouts for every id that exists (caller commits).
+    Returns the ids that were moved.
+    """
+    found = _lock_ids(cur, "students", ids)
+    if not found:
+        return []
+    marks = ", ".join(["%s"] * len(found))
+    cols = ", ".join(MOVE_COLUMNS)
+    cur.execute(f"""
+        INSERT INTO dropouts (id, dropout_date, dropout_reason, dropout_remarks, student_id, {cols})
+        SELECT id, %s, %s, %s, id, {cols} FROM students WHERE id IN ({marks})
+    """, tuple([dropout_date, reason, remarks] + found))
+    cur.execute(f"DELETE FROM students WHERE id IN ({marks})", tuple(found))
+    return found
+
+
+def move_to_students(cur, ids):
+    """dropouts -> students (re-admission); same contract as move_to_dropouts."""
+    found = _lock_ids(cur, "dropouts", ids)
+    if not found:
+        return []
+    marks = ", ".join(["%s"] * len(found))
+    cols = ", ".join(MOVE_COLUMNS)
+    cur.execute(f"""
+        INSERT INTO students (id, {cols})
+        SELECT id, {cols} FROM dropouts WHERE id IN ({marks})
+    """, tuple(found))
+    cur.execute(f"DELETE FROM dropouts WHERE id IN ({marks})", tuple(found))
+    return found
+
+
+def after_students_moved(ids, admitted=False):
+    """Keep the typeahead index and dashboard snapshot in step."""
+    if not admitted:
+        for sid in ids:
+            typeahead.remove(sid)
+    elif len(ids) > 50:
+        typeahead.invalidate()
+    elif ids:
+        conn = get_mysql_connection()
+        if conn:
+            try:
+                for sid in ids:
+                    typeahead.refresh(conn, sid)
+            finally:
+                conn.close()
+        else:
+            typeahead.invalidate()
+    invalidate_snapshot()
 
-        cols = [d[0] for d in cur.description]
-        student_row = dict(zip(cols, row))
-
-        # Insert into dropouts
-        cols = []
-        vals = []
-
-        for c in DROPOUTS_COLUMNS:
-            if c == "id":
-                cols.append("id"); vals.append(student_id)
-            elif c == "dropout_date":
-                cols.append("dropout_date"); vals.append(dropout_date)
-            elif c == "dropout_reason":
-                cols.append("dropout_reason"); vals.append(reason)
-            elif c == "dropout_remarks":
-                cols.append("dropout_remarks"); vals.append(remarks)
-            elif c == "student_id":
-                cols.append("student_id"); vals.append(student_id)
-            else:
-                cols.append(c); vals.append(student_row.get(c))
 
-        placeholders = ", ".join(["%s"] * len(vals))
-        col_sql = ", ".join(cols)
+def _bulk_ids(data):
+    ids = data.get("student_ids") or []
+    if isinstance(ids, str):
+        ids = ids.split(",")
+    return list(dict.fromkeys(str(i).strip() for i in ids if str(i).strip()))
 
-        cur.execute(
-            f"INSERT INTO dropouts ({col_sql}) VALUES ({placeholders})",
-            tuple(vals)
-        )
 
-        # Delete from students
-        cur.execute("DELETE FROM students WHERE id = %s", (student_id,))
+def _run_move(move, ids, *args):
+    """Run one move in a transaction -> (moved ids, error response or None)."""
+    conn = get_mysql_connection()
+    if not conn:
+        return None, (jsonify({"success": False, "message": "DB connection failed"}), 500)
+    cur = None
+    try:
+        cur = conn.cursor()
+        moved = move(cur, ids, *args)
         conn.commit()
-
-        cur.close()
-        try: conn.close()
-        except: pass
-
-        return jsonify({"success": True})
-
+        return moved, None
     except Exception as e:
         try:
             conn.rollback()
         except Exception:
             pass
-        print("DROP ERROR:", e)
-        return jsonify({"success": False, "message": str(e)}), 500
+        print("MOVE STUDENTS ERROR:", e)
+        return None, (jsonify({"success": False, "message": str(e)}), 500)
+    finally:
+        if cur: cur.close()
+        try: conn.close()
+        except: pass
+
+
+# ======================================
+# 🔹 Mark Student as Dropped
+# ======================================
+@students_bp.route("/api/mark_dropout", methods=["POST"])
+def mark_dropout():
+    if not is_logged_in():
+        return jsonify({"success": False, "message": "Unauthorized"}), 403
+
+    data = request.get_json(force=True, silent=True) or {}
+    student_id = data.get("student_id")
+    dropout_date = data.get("date") or data.get("dropout_date")
+    reason = data.get("reason") or data.get("dropout_reason")
+    remarks = data.get("remarks") or data.get("dropout_remarks")
+
+    if not student_id:
+        return jsonify({"success": False, "message": "Missing student ID"}), 400
+    if not dropout_date:
+        return jsonify({"success": False, "message": "Missing dropout date"}), 400
+
+    moved, error = _run_move(move_to_dropouts, [student_id], dropout_date, reason, remarks)
+    if error:
+        return error
+    if not moved:
+        return jsonify({"success": False, "message": "Student not found"}), 404
+
+    after_students_moved(moved)
+    return jsonify({"success": True})
 
 
 # ======================================
@@ -941,64 +1093,80 @@ def mark_admit():
     if not is_logged_in():
         return jsonify({"success": False, "message": "Unauthorized"}), 403
 
-    try:
-        data = request.get_json(force=True, silent=True) or {}
-        student_id = data.get("student_id")
+    data = request.get_json(force=True, silent=True) or {}
+    student_id = data.get("student_id")
 
-        if not student_id:
-            return jsonify({"success": False, "message": "Missing student_id"}), 400
+    if not student_id:
+        return jsonify({"success": False, "message": "Missing student_id"}), 400
 
-        conn = get_mysql_connection()
-        if not conn:
-            return jsonify({"success": False, "message": "DB connection failed"}), 500
+    moved, error = _run_move(move_to_students, [student_id])
+    if error:
+        return error
+    if not moved:
+        return jsonify({"success": False, "message": "Dropout record not found"}), 404
 
-        cur = conn.cursor()
+    after_students_moved(moved, admitted=True)
+    return jsonify({"success": True})
 
-        # Get dropout row
-        cur.execute("SELECT * FROM dropouts WHERE id = %s", (student_id,))
-        row = cur.fetchone()
-        if not row:
-            cur.close()
-            try: conn.close()
-            except: pass
-            return jsonify({"success": False, "message": "Dropout record not found"}), 404
-
-        dcols = [d[0] for d in cur.description]
-        drop_row = dict(zip(dcols, row))
-
-        # Build insert map for students table
-        student_map = {}
-        for c in STUDENTS_COLUMNS:
-            if c == "id":
-                student_map[c] = student_id
-            else:
-                student_map[c] = drop_row.get(c)
 
-        cols = ", ".join(student_map.keys())
-        placeholders = ", ".join(["%s"] * len(student_map))
+# ======================================
+# 🔹 Bulk Dropout / Re-admit
+# ======================================
+@students_bp.route("/api/students/bulk_dropout", methods=["POST"])
+def bulk_dropout():
+    """
+    Payload: {"student_ids": [...], "dropout_date": "YYYY-MM-DD",
+              "reason": "...", "remarks": "..."}
+    All listed students move in one transaction.
+    """
+    if not is_logged_in():
+        return jsonify({"success": False, "message": "Unauthorized"}), 403
 
-        cur.execute(
-            f"INSERT INTO students ({cols}) VALUES ({placeholders})",
-            tuple(student_map.values())
-        )
+    data = request.get_json(force=True, silent=True) or {}
+    ids = _bulk_ids(data)
+    dropout_date = data.get("date") or data.get("dropout_date")
+    reason = data.get("reason") or data.get("dropout_reason")
+    remarks = data.get("remarks") or data.get("dropout_remarks")
 
-        # Delete from dropouts
-        cur.execute("DELETE FROM dropouts WHERE id = %s", (student_id,))
-        conn.commit()
+    if not ids:
+        return jsonify({"success": False, "message": "No student ids provided"}), 400
+    if len(ids) > BULK_MOVE_MAX:
+        return jsonify({"success": False, "message": f"At most {BULK_MOVE_MAX} students per request"}), 400
+    if not dropout_date:
+        return jsonify({"success": False, "message": "Missing dropout date"}), 400
 
-        cur.close()
-        try: conn.close()
-        except: pass
+    moved, error = _run_move(move_to_dropouts, ids, dropout_date, reason, remarks)
+    if error:
+        return error
 
-        return jsonify({"success": True})
+    after_students_moved(moved)
+    moved_set = set(moved)
+    return jsonify({"success": True, "moved": len(moved),
+                    "not_found": [i for i in ids if i not in moved_set]})
 
-    except Exception as e:
-        try:
-            conn.rollback()
-        except Exception:
-            pass
-        print("ERROR in mark_admit:", e)
-        return jsonify({"success": False, "message": str(e)}), 500
+
+@students_bp.route("/api/students/bulk_admit", methods=["POST"])
+def bulk_admit():
+    """Payload: {"student_ids": [...]} - dropouts back to students, one transaction."""
+    if not is_logged_in():
+        return jsonify({"success": False, "message": "Unauthorized"}), 403
+
+    data = request.get_json(force=True, silent=True) or {}
+    ids = _bulk_ids(data)
+
+    if not ids:
+        return jsonify({"success": False, "message": "No student ids provided"}), 400
+    if len(ids) > BULK_MOVE_MAX:
+        return jsonify({"success": False, "message": f"At most {BULK_MOVE_MAX} students per request"}), 400
+
+    moved, error = _run_move(move_to_students, ids)
+    if error:
+        return error
+
+    after_students_moved(moved, admitted=True)
+    moved_set = set(moved)
+    return jsonify({"success": True, "moved": len(moved),
+                    "not_found": [i for i in ids if i not in moved_set]})
 
 # ============================
 # 🔵 PROMOTE STUDENTS PAGE
@@ -1104,12 +1272,9 @@ def api_promote_students():
         updated_count = 0
         for sid in student_ids:
             # fetch current student row
-            cur.execute("SELECT * FROM students WHERE id = %s", (sid,))
-            row = cur.fetchone()
-            if not row:
+            rowd = queries.fetchone_dict(conn, "student_by_id", (sid,))
+            if not rowd:
                 continue
-            cols = [d[0] for d in cur.description]
-            rowd = dict(zip(cols, row))
 
             # build academic update mapping
             set_clauses = []
@@ -1131,6 +1296,8 @@ def api_promote_students():
             updated_count += 1
 
         conn.commit()
+        typeahead.invalidate()
+        invalidate_snapshot()
         cur.close()
         try: conn.close()
         except: pass
@@ -1165,6 +1332,7 @@ def session_wise_data():
       - branch
       - department
       - batch
+    With ?fields=a,b,c each item is a flat object with only those columns.
     """
     if not is_logged_in():
         return jsonify([])
@@ -1180,28 +1348,32 @@ def session_wise_data():
         if not conn:
             return jsonify([])
 
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM students")
-        rows = cur.fetchall()
-        cols = [d[0] for d in cur.description]
-        result = []
-        for row in rows:
-            rowd = dict(zip(cols, row))
-            a = rowd  # academic fields are keys on top-level in rowd
+        fields = parse_fields(request.args.get("fields"), STUDENT_LIST_FIELDS)
 
-            if session_f and (a.get("session") or "") != session_f:
-                continue
-            if course_f and (a.get("course") or "") != course_f:
-                continue
-            if branch_f and (a.get("branch") or "") != branch_f:
-                continue
-            if department_f and (a.get("department") or "") != department_f:
-                continue
-            if batch_f and (a.get("batch") or "") != batch_f:
-                continue
+        where_clauses = []
+        params = []
+        for col, val in (("session", session_f), ("course", course_f), ("branch", branch_f),
+                         ("department", department_f), ("batch", batch_f)):
+            if val:
+                where_clauses.append(f"{col} = %s"); params.append(val)
+        where_sql = ("WHERE " + " AND ".join(where_clauses)) if where_clauses else ""
+        if fields:
+            # column names are whitelisted by parse_fields()
+            select_cols = [f for f in fields if f in STUDENTS_COLUMNS]
+            if "photo_thumb_url" in fields:
+                select_cols.append("photo_url")  # thumbnail is derived from it
+            select_sql = ", ".join(dict.fromkeys(select_cols))
+        else:
+            select_sql = "*"
 
-            nested = build_nested_student_from_row(rowd)
-            result.append(nested)
+        cur = conn.cursor()
+        cur.execute(f"SELECT {select_sql} FROM students {where_sql}", tuple(params))
+        rows = fetch_rows(cur)
+
+        if fields:
+            result = [project_student(row, fields) for row in rows]
+        else:
+            result = [build_nested_student_from_row(row) for row in rows]
 
         cur.close()
         try: conn.close()
@@ -1280,21 +1452,31 @@ def student_login_required(f):
         if not auth.startswith("Bearer "):
             return jsonify({"success": False, "message": "Unauthorized"}), 401
 
-        token = auth.split(" ", 1)[1]
-        try:
-            payload = jwt.decode(
-                token,
-                current_app.config.get("SECRET_KEY", "tatwadarsha_secret"),
-                algorithms=["HS256"]
-            )
-            request.student_id = payload["student_id"]
-        except Exception:
+        student_id = token_student_id()
+        if student_id is None:
             return jsonify({"success": False, "message": "Invalid or expired token"}), 401
+        request.student_id = student_id
 
         return f(*args, **kwargs)
     return wrapper
 
 
+def token_student_id():
+    """student_id from a valid `Authorization: Bearer` student JWT, else None."""
+    auth = request.headers.get("Authorization", "")
+    if not auth.startswith("Bearer "):
+        return None
+    try:
+        payload = jwt.decode(
+            auth.split(" ", 1)[1],
+            current_app.config.get("SECRET_KEY", "tatwadarsha_secret"),
+            algorithms=["HS256"]
+        )
+        return payload["student_id"]
+    except Exception:
+        return None
+
+
 # =====================================================
 # 👤 STUDENT PROFILE API (UNCHANGED)
 # =====================================================
@@ -1305,15 +1487,12 @@ def api_student_profile():
     cur = None
     try:
         conn = get_mysql_connection()
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM students WHERE id=%s", (request.student_id,))
-        row = cur.fetchone()
+        row = queries.fetchone_dict(conn, "student_by_id", (request.student_id,))
 
         if not row:
             return jsonify({"success": False}), 404
 
-        cols = [d[0] for d in cur.description]
-        profile = build_nested_student_from_row(dict(zip(cols, row)))
+        profile = build_nested_student_from_row(row)
 
         return jsonify({"success": True, "student": profile})
 
@@ -1331,30 +1510,126 @@ def api_student_profile():
 # =====================================================
 # 📂 FILE HELPERS (UNCHANGED)
 # =====================================================
-def save_student_file(file, subfolder, prefix):
-    BASE = os.path.abspath(os.path.dirname(__file__))
-    upload_dir = os.path.join(BASE, "..", "uploads", "students", subfolder)
-    os.makedirs(upload_dir, exist_ok=True)
+STUDENT_UPLOAD_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "uploads", "students")
+
+
+def save_student_file(file, subfolder, prefix, cur=None):
+    upload_dir = os.path.join(STUDENT_UPLOAD_DIR, subfolder)
+
+    # content-addressed (aa/bb/<sha256>.ext); camera uploads without an extension stay .jpg
+    ext = storage.extension_of(file.filename) or ".jpg"
+    stored = storage.save(file, upload_dir, ext=ext, cur=cur)
+
+    return f"/uploads/students/{subfolder}/{stored.path}"
+
+
+def _document_relink(column, student_id, subfolder, old_rel):
+    """
+    relink callback for images.schedule: stores the downscaled copy as its
+    own blob and moves the student's column over, unless it changed since.
+    The original's reference is dropped; app.upload_gc reclaims the file.
+    """
+    upload_dir = os.path.join(STUDENT_UPLOAD_DIR, subfolder)
+    old_url = f"/uploads/students/{subfolder}/{old_rel}"
+
+    def relink(path, mime):
+        ext = os.path.splitext(path)[1].lower()
+        conn = get_mysql_connection()
+        if not conn:
+            return None
+        cur = conn.cursor()
+        try:
+            with open(path, "rb") as f:
+                stored = storage.save(
+                    FileStorage(f, filename="image" + ext, content_type=mime),
+                    upload_dir, ext=ext, cur=cur,
+                )
+            cur.execute(
+                f"UPDATE students SET {column}=%s WHERE id=%s AND {column}=%s",
+                (f"/uploads/students/{subfolder}/{stored.path}", student_id, old_url)
+            )
+            if cur.rowcount != 1:
+                # replaced meanwhile; the downscaled copy isn't needed
+                conn.rollback()
+                storage.purge(upload_dir, stored.path)
+                return None
+            storage.release(upload_dir, old_rel, cur=cur)
+            conn.commit()
+            return stored.path
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+            conn.close()
+
+    return relink
 
-    filename = f"{prefix}_{request.student_id}_{uuid.uuid4().hex}.jpg"
-    path = os.path.join(upload_dir, filename)
-    file.save(path)
 
-    return f"/uploads/students/{subfolder}/{filename}"
+STUDENT_DOCUMENT_COLUMNS = ("photo_url", "aadhaar_url", "marksheet_url", "tc_url", "migration_url")
+
+
+def student_owns_file(student_id, filename):
+    """True if one of the student's document columns points at this upload (or its thumbnail)."""
+    url = f"/uploads/students/{filename}"
+    head, _, name = url.rpartition("/")
+    if name.endswith(images.THUMB_SUFFIX):
+        # <sha>_thumb.jpg belongs to <sha>.<ext>, whatever the extension
+        prefix = f"{head}/{name[:-len(images.THUMB_SUFFIX)]}."
+    else:
+        prefix = url
+    conn = get_mysql_connection()
+    if not conn:
+        return False
+    cur = conn.cursor()
+    try:
+        match = " OR ".join(
+            f"({col} = %s OR LEFT({col}, %s) = %s)" for col in STUDENT_DOCUMENT_COLUMNS
+        )
+        params = [student_id]
+        for _ in STUDENT_DOCUMENT_COLUMNS:
+            params += [url, len(prefix), prefix]
+        cur.execute(f"SELECT 1 FROM students WHERE id=%s AND ({match}) LIMIT 1", tuple(params))
+        return cur.fetchone() is not None
+    finally:
+        cur.close()
+        conn.close()
+
+
+@students_bp.route("/uploads/students/<path:filename>")
+def student_upload_file(filename):
+    # ID scans: staff session, or the student's own token
+    if not session.get("logged_in"):
+        student_id = token_student_id()
+        if student_id is None:
+            return jsonify({"success": False, "message": "Unauthorized"}), 401
+        if not student_owns_file(student_id, filename):
+            abort(404)
+
+    return serve_file(STUDENT_UPLOAD_DIR, filename)
 
 
 def update_student_document(column, file, folder, prefix):
+    if not file or not file.filename:
+        abort(400)
     conn = None
     cur = None
     try:
-        url = save_student_file(file, folder, prefix)
         conn = get_mysql_connection()
         cur = conn.cursor()
+        url = save_student_file(file, folder, prefix, cur=cur)
         cur.execute(
             f"UPDATE students SET {column}=%s WHERE id=%s",
             (url, request.student_id)
         )
         conn.commit()
+
+        # downscale + thumbnail in the background pool; the request returns now
+        rel = url.split("/", 4)[4]
+        images.schedule(
+            os.path.join(STUDENT_UPLOAD_DIR, folder), rel,
+            relink=_document_relink(column, request.student_id, folder, rel),
+        )
         return url
     except Exception:
         if conn:
@@ -1368,40 +1643,41 @@ def update_student_document(column, file, folder, prefix):
 
 
 # =====================================================
-# 📤 UPLOAD ROUTES (UNCHANGED)
+# 📤 UPLOAD ROUTES (multipart file or a finished resumable upload id)
 # =====================================================
 @students_bp.route("/api/student/update-photo", methods=["POST"])
 @student_login_required
 def update_photo():
-    if "photo" not in request.files:
+    photo = resumable.request_file("photo")
+    if not photo:
         return jsonify({"success": False}), 400
-    url = update_student_document("photo_url", request.files["photo"], "photos", "photo")
+    url = update_student_document("photo_url", photo, "photos", "photo")
     return jsonify({"success": True, "photo_url": url})
 
 
 @students_bp.route("/api/student/upload/marksheet_10", methods=["POST"])
 @student_login_required
 def upload_marksheet():
-    url = update_student_document("marksheet_url", request.files["file"], "marksheets", "marksheet")
+    url = update_student_document("marksheet_url", resumable.request_file("file"), "marksheets", "marksheet")
     return jsonify({"success": True, "marksheet_url": url})
 
 
 @students_bp.route("/api/student/upload/aadhaar", methods=["POST"])
 @student_login_required
 def upload_aadhaar():
-    url = update_student_document("aadhaar_url", request.files["file"], "aadhaar", "aadhaar")
+    url = update_student_document("aadhaar_url", resumable.request_file("file"), "aadhaar", "aadhaar")
     return jsonify({"success": True, "aadhaar_url": url})
 
 
 @students_bp.route("/api/student/upload/tc", methods=["POST"])
 @student_login_required
 def upload_tc():
-    url = update_student_document("tc_url", request.files["file"], "tc", "tc")
+    url = update_student_document("tc_url", resumable.request_file("file"), "tc", "tc")
     return jsonify({"success": True, "tc_url": url})
 
 
 @students_bp.route("/api/student/upload/migration", methods=["POST"])
 @student_login_required
 def upload_migration():
-    url = update_student_document("migration_url", request.files["file"], "migration", "migration")
+    url = update_student_document("migration_url", resumable.request_file("file"), "migration", "migration")
     return jsonify({"success": True, "migration_url": url})
@@ -0,0 +1,136 @@
+# ============================================
+# FILE: app/routers/uploads.py
+# Resumable chunked uploads (protocol in app/resumable.py)
+# ============================================
+
+import math
+
+from flask import Blueprint, jsonify, request, session
+
+from app import resumable, upload_gc
+from app.routers.jobs import enqueue_response
+
+uploads_bp = Blueprint("uploads", __name__)
+
+
+@uploads_bp.app_errorhandler(resumable.UploadError)
+def upload_error(e):
+    body = {"success": False, "message": e.message}
+    if e.offset is not None:
+        body["offset"] = e.offset
+    return jsonify(body), e.status
+
+
+def _owner():
+    owner = resumable.request_owner()
+    if owner is None:
+        raise resumable.UploadError(401, "Unauthorized")
+    return owner
+
+
+# ======================================
+# 🔹 Start an upload
+# ======================================
+@uploads_bp.route("/api/uploads", methods=["POST"])
+def upload_init():
+    data = request.get_json(silent=True) or request.form
+    state = resumable.start(
+        data.get("filename"),
+        data.get("size"),
+        _owner(),
+        sha256=data.get("sha256"),
+        mime=data.get("mime"),
+    )
+    return jsonify({"success": True, **resumable.public(state)}), 201
+
+
+# ======================================
+# 🔹 Where to resume
+# ======================================
+@uploads_bp.route("/api/uploads/<upload_id>", methods=["GET", "HEAD"])
+def upload_status(upload_id):
+    state = resumable.load(upload_id, _owner())
+    response = jsonify({"success": True, **resumable.public(state)})
+    response.headers["Upload-Offset"] = str(state["offset"])
+    return response
+
+
+# ======================================
+# 🔹 Append a chunk
+# ======================================
+@uploads_bp.route("/api/uploads/<upload_id>", methods=["PATCH", "PUT"])
+def upload_append(upload_id):
+    offset = request.headers.get("Upload-Offset", request.args.get("offset"))
+    chunk_sha256 = request.headers.get("X-Chunk-Sha256") or request.args.get("sha256")
+
+    # raw body (application/offset+octet-stream) or a multipart "chunk" field
+    if request.mimetype == "multipart/form-data":
+        chunk = request.files.get("chunk")
+        if chunk is None:
+            raise resumable.UploadError(400, "chunk is required")
+        stream = chunk.stream
+    else:
+        stream = request.stream
+
+    new_offset = resumable.append(upload_id, _owner(), offset, stream, chunk_sha256)
+    response = jsonify({"success": True, "upload_id": upload_id, "offset": new_offset})
+    response.headers["Upload-Offset"] = str(new_offset)
+    return response
+
+
+# ======================================
+# 🔹 Finish (verify size + checksum)
+# ======================================
+@uploads_bp.route("/api/uploads/<upload_id>/complete", methods=["POST"])
+def upload_complete(upload_id):
+    state = resumable.complete(upload_id, _owner())
+    return jsonify({"success": True, "sha256": state["sha256"], **resumable.public(state)})
+
+
+# ======================================
+# 🔹 Cancel
+# ======================================
+@uploads_bp.route("/api/uploads/<upload_id>", methods=["DELETE"])
+def upload_cancel(upload_id):
+    resumable.load(upload_id, _owner())
+    resumable.discard(upload_id)
+    return jsonify({"success": True})
+
+
+# ======================================
+# 🔹 Orphaned upload GC (background job, see app/upload_gc.py)
+# ======================================
+@uploads_bp.route("/api/uploads/gc", methods=["POST"])
+def upload_gc_start():
+    if not session.get("logged_in"):
+        return jsonify({"success": False, "message": "Unauthorized"}), 401
+
+    data = request.get_json(silent=True) or {}
+    mode = data.get("mode") or "dry_run"
+    roots = data.get("roots") or None
+    if mode not in upload_gc.MODES:
+        return jsonify({"success": False, "message": f"mode must be one of {', '.join(upload_gc.MODES)}"}), 400
+    unknown = set(roots or ()) - set(upload_gc.ROOTS)
+    if unknown:
+        return jsonify({"success": False, "message": f"Unknown roots: {', '.join(sorted(unknown))}"}), 400
+
+    min_age_hours = data.get("min_age_hours")
+    if min_age_hours is None or min_age_hours == "":
+        min_age_hours = upload_gc.MIN_AGE_HOURS
+    try:
+        if isinstance(min_age_hours, bool):
+            raise ValueError
+        min_age_hours = float(min_age_hours)
+    except (TypeError, ValueError):
+        return jsonify({"success": False, "message": "min_age_hours must be a number"}), 400
+    # files this young may belong to a request that is still committing
+    if not math.isfinite(min_age_hours) or min_age_hours < upload_gc.MIN_AGE_FLOOR_HOURS:
+        return jsonify({"success": False,
+                        "message": f"min_age_hours must be at least {upload_gc.MIN_AGE_FLOOR_HOURS:g}"}), 400
+
+    return enqueue_response("uploads.gc", {
+        "mode": mode,
+        "roots": roots,
+        "min_age_hours": min_age_hours,
+        "force": bool(data.get("force")),
+    })
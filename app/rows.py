@@ -0,0 +1,102 @@
+# ============================================
+# FILE: app/rows.py
+# Compact row objects + field projection for list endpoints
+# ============================================
+"""
+Replacement for the `cols = [d[0] for d in cur.description]` /
+`dict(zip(cols, row))` pattern on large result sets.
+
+    rows = fetch_rows(cur)            # tuple-backed Row objects
+    rows[0].name, rows[0].get("name") # attribute or dict-style access
+    rows[0].as_dict()                 # when a real dict is needed
+
+Row classes are namedtuple subclasses (no per-row __dict__) built once per
+distinct column list and cached, together with their column -> index map.
+
+List endpoints accept `?fields=a,b,c`; `parse_fields()` validates it
+against the columns the endpoint allows and `project()` emits only those
+keys, so the list views that show three columns no longer serialize fifty.
+"""
+
+from collections import namedtuple
+from functools import lru_cache
+
+
+# ============================================
+# Row classes
+# ============================================
+@lru_cache(maxsize=256)
+def row_class(columns):
+    """namedtuple-based Row type for a column tuple (cached)."""
+    base = namedtuple("Row", columns, rename=True)
+    colidx = {c: i for i, c in enumerate(columns)}
+
+    def get(self, key, default=None):
+        i = colidx.get(key)
+        return default if i is None else self[i]
+
+    def as_dict(self):
+        return dict(zip(columns, self))
+
+    return type("Row", (base,), {
+        "__slots__": (),
+        "get": get,
+        "as_dict": as_dict,
+        "__getitem__": _getitem,
+        "columns": columns,
+        "_colidx": colidx,
+    })
+
+
+def _getitem(self, key):
+    # row["name"] works like the old dict rows; ints/slices keep tuple behaviour
+    if isinstance(key, str):
+        return tuple.__getitem__(self, self._colidx[key])
+    return tuple.__getitem__(self, key)
+
+
+def column_names(cur):
+    return tuple(d[0] for d in cur.description) if cur.description else ()
+
+
+def fetch_rows(cur):
+    """fetchall() as Row objects (plain tuples in, no dict per row)."""
+    cls = row_class(column_names(cur))
+    make = cls._make
+    return [make(r) for r in cur.fetchall()]
+
+
+def fetch_row(cur):
+    row = cur.fetchone()
+    if row is None:
+        return None
+    return row_class(column_names(cur))._make(row)
+
+
+# ============================================
+# Projection
+# ============================================
+def parse_fields(value, allowed):
+    """
+    `?fields=a,b` -> ("a", "b") restricted to `allowed` (order kept,
+    duplicates dropped). None / empty -> None (caller emits full objects).
+    """
+    if not value:
+        return None
+    allowed = set(allowed)
+    out = []
+    for f in value.split(","):
+        f = f.strip()
+        if f and f in allowed and f not in out:
+            out.append(f)
+    return tuple(out) or None
+
+
+def project(row, fields):
+    """Flat dict with only `fields` (works on Row objects and dicts)."""
+    get = row.get
+    return {f: get(f) for f in fields}
+
+
+def project_all(rows, fields):
+    return [project(r, fields) for r in rows]
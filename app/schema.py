@@ -0,0 +1,551 @@
+# ============================================
+# FILE: app/schema.py
+# Versioned schema + index migrations, EXPLAIN audit
+# ============================================
+"""
+The routers assume their tables already exist; this module is the single
+place where that schema (and the indexes the WHERE / ORDER BY clauses rely
+on) is written down.
+
+    MIGRATIONS     ordered list of (version, description, steps)
+    upgrade(conn)  applies every version not yet in `schema_migrations`
+    status(conn)   applied / pending versions
+    explain_audit  runs EXPLAIN on AUDIT_QUERIES and flags full table scans
+
+Every step is idempotent (CREATE TABLE IF NOT EXISTS, indexes checked in
+information_schema first), so running it against the existing production
+database only adds what is missing.
+
+CLI: python tools/migrate.py upgrade | status | explain
+"""
+
+from datetime import datetime
+
+from app.search import KEY_SQL
+
+
+# ============================================
+# Step helpers
+# ============================================
+def _index_exists(cur, table, name):
+    cur.execute("""
+        SELECT 1 FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+        LIMIT 1
+    """, (table, name))
+    return cur.fetchone() is not None
+
+
+def _column_exists(cur, table, column):
+    cur.execute("""
+        SELECT 1 FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+        LIMIT 1
+    """, (table, column))
+    return cur.fetchone() is not None
+
+
+def add_index(table, name, columns, kind="INDEX"):
+    """Step: create an index unless one with that name is already there."""
+    def step(cur):
+        if _index_exists(cur, table, name):
+            return None
+        sql = f"ALTER TABLE `{table}` ADD {kind} `{name}` ({columns})"
+        cur.execute(sql)
+        return sql
+    step.describe = f"{kind} {name} ON {table} ({columns})"
+    return step
+
+
+def add_column(table, column, definition):
+    """Step: add a column unless it already exists."""
+    def step(cur):
+        if _column_exists(cur, table, column):
+            return None
+        sql = f"ALTER TABLE `{table}` ADD COLUMN `{column}` {definition}"
+        cur.execute(sql)
+        return sql
+    step.describe = f"COLUMN {table}.{column} {definition}"
+    return step
+
+
+def make_invisible(table, column, definition):
+    """
+    Step: hide a column from SELECT * (MySQL 8.0.23+ / MariaDB 10.3+);
+    `definition` is the column's full current definition.
+    """
+    def step(cur):
+        cur.execute("""
+            SELECT EXTRA FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+        """, (table, column))
+        row = cur.fetchone()
+        if row is None or "INVISIBLE" in (row[0] or "").upper():
+            return None
+        sql = f"ALTER TABLE `{table}` MODIFY COLUMN `{column}` {definition} INVISIBLE"
+        cur.execute(sql)
+        return sql
+    step.describe = f"INVISIBLE {table}.{column}"
+    return step
+
+
+def recount_chat_messages(cur):
+    """Step: rebuild finance_requests.msg_count / last_message_id from finance_chat."""
+    sql = """
+        UPDATE finance_requests fr
+        LEFT JOIN (
+            SELECT request_id, COUNT(*) AS n, MAX(id) AS last_id
+            FROM finance_chat GROUP BY request_id
+        ) c ON c.request_id = fr.id
+        SET fr.msg_count = COALESCE(c.n, 0), fr.last_message_id = c.last_id
+    """
+    cur.execute(sql)
+    return sql
+
+
+recount_chat_messages.describe = "backfill finance_requests.msg_count / last_message_id"
+
+
+# ============================================
+# Base tables
+# ============================================
+_STUDENT_FIELDS = """
+    admission_date VARCHAR(20), batch VARCHAR(50), branch VARCHAR(100),
+    course VARCHAR(100), department VARCHAR(100), enrollment_no VARCHAR(50),
+    last_exam_passed VARCHAR(100), previous_school VARCHAR(255),
+    register_number VARCHAR(50), registration_no VARCHAR(50), roll_no VARCHAR(50),
+    session VARCHAR(20), semester VARCHAR(20), section VARCHAR(20),
+    tenth_board VARCHAR(100), tenth_percent VARCHAR(20),
+    twelfth_board VARCHAR(100), twelfth_percent VARCHAR(20),
+    name VARCHAR(255), gender VARCHAR(20), dob VARCHAR(20), blood_group VARCHAR(10),
+    email VARCHAR(255), aadhaar VARCHAR(20), phone VARCHAR(20), address TEXT,
+    caste VARCHAR(50), religion VARCHAR(50), father_name VARCHAR(255),
+    father_mobile VARCHAR(20), father_occupation VARCHAR(100), mother_name VARCHAR(255),
+    mother_mobile VARCHAR(20), guardian_name VARCHAR(255), guardian_mobile VARCHAR(20),
+    guardian_email VARCHAR(255), annual_income VARCHAR(50), account_holder VARCHAR(255),
+    account_number VARCHAR(50), bank_name VARCHAR(100), ifsc VARCHAR(20),
+    aadhaar_url VARCHAR(255), marksheet_url VARCHAR(255), migration_url VARCHAR(255),
+    photo_url VARCHAR(255), tc_url VARCHAR(255), created_at DATETIME
+"""
+
+BASE_TABLES = [
+    f"""CREATE TABLE IF NOT EXISTS students (
+        id VARCHAR(64) NOT NULL PRIMARY KEY,
+        {_STUDENT_FIELDS}
+    ) CHARACTER SET utf8mb4""",
+    f"""CREATE TABLE IF NOT EXISTS dropouts (
+        id VARCHAR(64) NOT NULL PRIMARY KEY,
+        dropout_date VARCHAR(20), dropout_reason VARCHAR(255), dropout_remarks TEXT,
+        student_id VARCHAR(64),
+        {_STUDENT_FIELDS}
+    ) CHARACTER SET utf8mb4""",
+    """CREATE TABLE IF NOT EXISTS masters (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        master_name VARCHAR(100) NOT NULL UNIQUE
+    ) CHARACTER SET utf8mb4""",
+    """CREATE TABLE IF NOT EXISTS master_items (
+        id VARCHAR(64) NOT NULL PRIMARY KEY,
+        master_id INT, name VARCHAR(255), created_at DATETIME
+    ) CHARACTER SET utf8mb4""",
+    """CREATE TABLE IF NOT EXISTS config_master_list (
+        key_name VARCHAR(100) NOT NULL PRIMARY KEY,
+        label VARCHAR(255)
+    ) CHARACTER SET utf8mb4""",
+    """CREATE TABLE IF NOT EXISTS fee_heads (
+        id VARCHAR(64) NOT NULL PRIMARY KEY,
+        name VARCHAR(255), amount DECIMAL(12,2),
+        start_date DATE, end_date DATE, due_date DATE,
+        status VARCHAR(20) DEFAULT 'active',
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    ) CHARACTER SET utf8mb4""",
+    """CREATE TABLE IF NOT EXISTS fee_structures (
+        id VARCHAR(64) NOT NULL PRIMARY KEY,
+        course VARCHAR(100), session VARCHAR(20), branch VARCHAR(100),
+        department VARCHAR(100), batch VARCHAR(50), head_id VARCHAR(64),
+        amount DECIMAL(12,2), created_at DATETIME
+    ) CHARACTER SET utf8mb4""",
+    """CREATE TABLE IF NOT EXISTS payment_modes (
+        id VARCHAR(64) NOT NULL PRIMARY KEY,
+        name VARCHAR(100), fields TEXT, file_path VARCHAR(255), created_at DATETIME
+    ) CHARACTER SET utf8mb4""",
+    """CREATE TABLE IF NOT EXISTS assigned_fees (
+        id VARCHAR(64) NOT NULL PRIMARY KEY,
+        student_id VARCHAR(64), head_id VARCHAR(64), amount DECIMAL(12,2),
+        due_date DATE, status VARCHAR(20) DEFAULT 'Not Paid', created_at DATETIME
+    ) CHARACTER SET utf8mb4""",
+    """CREATE TABLE IF NOT EXISTS fee_payments (
+        id VARCHAR(64) NOT NULL PRIMARY KEY,
+        assigned_fee_id VARCHAR(64), student_id VARCHAR(64), amount DECIMAL(12,2),
+        payment_mode_id VARCHAR(64), reference_no VARCHAR(100), meta_json TEXT,
+        file_path VARCHAR(255), paid_on DATETIME, created_at DATETIME
+    ) CHARACTER SET utf8mb4""",
+    """CREATE TABLE IF NOT EXISTS fee_receipts (
+        id VARCHAR(64) NOT NULL PRIMARY KEY,
+        payment_id VARCHAR(64), receipt_no VARCHAR(50), created_at DATETIME
+    ) CHARACTER SET utf8mb4""",
+    """CREATE TABLE IF NOT EXISTS bank_accounts (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        account_type VARCHAR(20), account_name VARCHAR(100),
+        account_holder_name VARCHAR(100), account_number VARCHAR(30),
+        ifsc_code VARCHAR(20), branch_name VARCHAR(100),
+        opening_balance DECIMAL(12,2) DEFAULT 0
+    ) CHARACTER SET utf8mb4""",
+    # Several inserts omit `id`, so it needs a server-side default
+    """CREATE TABLE IF NOT EXISTS finance_transactions (
+        id VARCHAR(64) NOT NULL DEFAULT (REPLACE(UUID(), '-', '')) PRIMARY KEY,
+        account_id INT, transaction_mode VARCHAR(10), transaction_type VARCHAR(20),
+        amount DECIMAL(12,2), category VARCHAR(100), description TEXT,
+        attachment_url VARCHAR(255), tx_date DATE,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        student_name VARCHAR(255), fee_head VARCHAR(255), payment_mode VARCHAR(100),
+        utr_no VARCHAR(100), remark TEXT, receipt_no VARCHAR(50),
+        income_category VARCHAR(100)
+    ) CHARACTER SET utf8mb4""",
+    """CREATE TABLE IF NOT EXISTS expense_categories (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        category_name VARCHAR(100) NOT NULL
+    ) CHARACTER SET utf8mb4""",
+    """CREATE TABLE IF NOT EXISTS income_categories (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        category_name VARCHAR(100) NOT NULL,
+        is_active TINYINT(1) DEFAULT 1
+    ) CHARACTER SET utf8mb4""",
+    """CREATE TABLE IF NOT EXISTS chat_users (
+        user_id INT AUTO_INCREMENT PRIMARY KEY,
+        username VARCHAR(100), password VARCHAR(255), full_name VARCHAR(255),
+        role VARCHAR(20), active TINYINT(1) DEFAULT 1
+    ) CHARACTER SET utf8mb4""",
+    """CREATE TABLE IF NOT EXISTS finance_requests (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        requester_id INT, requester_name VARCHAR(255), amount DECIMAL(12,2),
+        purpose TEXT, attachment VARCHAR(255), status VARCHAR(20) DEFAULT 'pending',
+        remarks TEXT, created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    ) CHARACTER SET utf8mb4""",
+    """CREATE TABLE IF NOT EXISTS finance_chat (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        request_id INT, sender_id INT, sender_name VARCHAR(255),
+        message TEXT, file_url VARCHAR(255),
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    ) CHARACTER SET utf8mb4""",
+    """CREATE TABLE IF NOT EXISTS exam_papers (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        student_id VARCHAR(64), subject VARCHAR(255), exam_name VARCHAR(255),
+        year VARCHAR(10), file_url VARCHAR(255),
+        uploaded_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    ) CHARACTER SET utf8mb4""",
+]
+
+
+# students search keys (app/search.py), as created by version 8
+ROLL_KEY_DEF = f"VARCHAR(50) GENERATED ALWAYS AS ({KEY_SQL.format(col='roll_no')}) STORED"
+REGISTER_KEY_DEF = f"VARCHAR(50) GENERATED ALWAYS AS ({KEY_SQL.format(col='register_number')}) STORED"
+
+
+# ============================================
+# Migrations (append only — never edit an applied version)
+# ============================================
+MIGRATIONS = [
+    (1, "base tables", BASE_TABLES),
+    (2, "indexes for router filters / joins", [
+        # students: login + search + filter dropdowns
+        add_index("students", "idx_students_register_number", "register_number"),
+        add_index("students", "idx_students_roll_no", "roll_no"),
+        add_index("students", "idx_students_session_course", "session, course, batch"),
+        add_index("students", "idx_students_course_batch", "course, batch"),
+        add_index("dropouts", "idx_dropouts_student_id", "student_id"),
+        add_index("master_items", "idx_master_items_master", "master_id, name"),
+        # fees
+        add_index("assigned_fees", "idx_af_student_head", "student_id, head_id"),
+        add_index("assigned_fees", "idx_af_head", "head_id"),
+        add_index("assigned_fees", "idx_af_status_due", "status, due_date"),
+        add_index("fee_payments", "idx_fp_assigned_fee", "assigned_fee_id, amount"),
+        add_index("fee_payments", "idx_fp_student", "student_id"),
+        add_index("fee_payments", "idx_fp_paid_on", "paid_on"),
+        add_index("fee_payments", "idx_fp_mode", "payment_mode_id"),
+        add_index("fee_receipts", "idx_fr_payment", "payment_id"),
+        add_index("fee_receipts", "idx_fr_created", "created_at"),
+        add_index("fee_structures", "idx_fs_course_session", "course, session"),
+        # finance ledgers
+        add_index("finance_transactions", "idx_ft_account_date", "account_id, tx_date"),
+        add_index("finance_transactions", "idx_ft_type_date", "transaction_type, tx_date"),
+        add_index("finance_transactions", "idx_ft_receipt_no", "receipt_no"),
+        # chat
+        add_index("finance_chat", "idx_fc_request_created", "request_id, created_at"),
+        add_index("finance_requests", "idx_freq_requester", "requester_id, created_at"),
+        add_index("finance_requests", "idx_freq_status", "status"),
+        add_index("chat_users", "idx_chat_users_username", "username"),
+        # exam papers
+        add_index("exam_papers", "idx_ep_student", "student_id, uploaded_at"),
+        add_index("exam_papers", "idx_ep_uploaded", "uploaded_at"),
+    ]),
+    (3, "chat cursor pagination", [
+        add_index("finance_chat", "idx_fc_request_id", "request_id, id"),
+    ]),
+    (4, "chat event bus (CHAT_BUS_SHARED)", [
+        """CREATE TABLE IF NOT EXISTS chat_events (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            channels VARCHAR(255) NOT NULL, kind VARCHAR(20) NOT NULL,
+            payload TEXT, created_at DATETIME NOT NULL,
+            INDEX idx_ce_created (created_at)
+        ) CHARACTER SET utf8mb4""",
+    ]),
+    (5, "chat message counters + read markers", [
+        add_column("finance_requests", "msg_count", "INT NOT NULL DEFAULT 0"),
+        add_column("finance_requests", "last_message_id", "INT NULL"),
+        """CREATE TABLE IF NOT EXISTS finance_chat_reads (
+            user_id INT NOT NULL, request_id INT NOT NULL,
+            read_count INT NOT NULL DEFAULT 0, last_read_id INT NULL,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, request_id)
+        ) CHARACTER SET utf8mb4""",
+        recount_chat_messages,
+    ]),
+    (6, "content-addressed upload metadata", [
+        """CREATE TABLE IF NOT EXISTS upload_blobs (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            root VARCHAR(255) NOT NULL, sha256 CHAR(64) NOT NULL,
+            rel_path VARCHAR(255) NOT NULL, size BIGINT NOT NULL,
+            mime VARCHAR(100), original_name VARCHAR(255),
+            ref_count INT NOT NULL DEFAULT 1,
+            created_at DATETIME NOT NULL, last_seen_at DATETIME NULL,
+            UNIQUE KEY uq_blob_root_sha (root, sha256)
+        ) CHARACTER SET utf8mb4""",
+    ]),
+    (7, "background job queue", [
+        """CREATE TABLE IF NOT EXISTS jobs (
+            id CHAR(32) PRIMARY KEY,
+            kind VARCHAR(64) NOT NULL, status VARCHAR(16) NOT NULL,
+            payload MEDIUMTEXT, result MEDIUMTEXT, error TEXT,
+            progress_done INT NOT NULL DEFAULT 0, progress_total INT NULL,
+            message VARCHAR(255) NULL,
+            attempts INT NOT NULL DEFAULT 0, max_attempts INT NOT NULL DEFAULT 3,
+            run_after DATETIME NOT NULL,
+            locked_by VARCHAR(128) NULL, locked_at DATETIME NULL,
+            artifact_name VARCHAR(255) NULL,
+            created_by VARCHAR(100) NULL, created_at DATETIME NOT NULL,
+            started_at DATETIME NULL, finished_at DATETIME NULL,
+            KEY idx_jobs_queue (status, run_after),
+            KEY idx_jobs_owner (created_by, created_at)
+        ) CHARACTER SET utf8mb4""",
+    ]),
+    (8, "student search keys (roll / register prefix, name FULLTEXT)", [
+        add_column("students", "roll_key",
+                   f"VARCHAR(50) GENERATED ALWAYS AS ({KEY_SQL.format(col='roll_no')}) STORED"),
+        add_column("students", "register_key",
+                   f"VARCHAR(50) GENERATED ALWAYS AS ({KEY_SQL.format(col='register_number')}) STORED"),
+        add_index("students", "idx_students_roll_key", "roll_key"),
+        add_index("students", "idx_students_register_key", "register_key"),
+        add_index("students", "idx_students_name", "name"),
+        add_index("students", "ft_students_name", "name", kind="FULLTEXT"),
+    ]),
+    (9, "fee structure provenance on assigned_fees (app/fee_engine.py)", [
+        add_column("assigned_fees", "structure_id", "VARCHAR(64) NULL"),
+        # duplicate protection for structure assignments (manual rows keep NULL)
+        add_index("assigned_fees", "uq_af_student_structure", "student_id, structure_id", kind="UNIQUE"),
+    ]),
+    (10, "academic-year rollover runs + checkpoints (app/rollover.py)", [
+        """CREATE TABLE IF NOT EXISTS rollover_runs (
+            id CHAR(32) PRIMARY KEY,
+            label VARCHAR(100), plan MEDIUMTEXT NOT NULL,
+            status VARCHAR(16) NOT NULL, step VARCHAR(32) NULL, error TEXT,
+            created_by VARCHAR(100) NULL, created_at DATETIME NOT NULL,
+            updated_at DATETIME NOT NULL, finished_at DATETIME NULL
+        ) CHARACTER SET utf8mb4""",
+        """CREATE TABLE IF NOT EXISTS rollover_checkpoints (
+            run_id CHAR(32) NOT NULL, step VARCHAR(32) NOT NULL,
+            position VARCHAR(64) NULL, done INT NOT NULL DEFAULT 0,
+            finished_at DATETIME NULL,
+            PRIMARY KEY (run_id, step)
+        ) CHARACTER SET utf8mb4""",
+        """CREATE TABLE IF NOT EXISTS rollover_members (
+            run_id CHAR(32) NOT NULL, student_id VARCHAR(64) NOT NULL,
+            cohort INT NOT NULL,
+            PRIMARY KEY (run_id, student_id),
+            KEY idx_rm_cohort (run_id, cohort, student_id)
+        ) CHARACTER SET utf8mb4""",
+        """CREATE TABLE IF NOT EXISTS account_balance_snapshots (
+            run_id CHAR(32) NOT NULL, account_id INT NOT NULL,
+            as_of DATE NOT NULL, balance DECIMAL(14,2) NOT NULL,
+            created_at DATETIME NOT NULL,
+            PRIMARY KEY (run_id, account_id)
+        ) CHARACTER SET utf8mb4""",
+    ]),
+    (11, "fee -> finance transactional outbox (app/finance_outbox.py)", [
+        """CREATE TABLE IF NOT EXISTS finance_outbox (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            kind VARCHAR(32) NOT NULL, ref_id VARCHAR(64) NOT NULL,
+            payload TEXT NOT NULL,
+            status VARCHAR(16) NOT NULL, attempts INT NOT NULL DEFAULT 0,
+            next_attempt_at DATETIME NOT NULL, last_error TEXT,
+            created_at DATETIME NOT NULL, processed_at DATETIME NULL,
+            UNIQUE KEY uq_outbox_ref (kind, ref_id),
+            KEY idx_outbox_due (status, next_attempt_at, id)
+        ) CHARACTER SET utf8mb4""",
+    ]),
+    (12, "keep the student search keys out of SELECT * (API payloads)", [
+        # still usable by name (search WHERE clauses), just not in SELECT *
+        make_invisible("students", "roll_key", ROLL_KEY_DEF),
+        make_invisible("students", "register_key", REGISTER_KEY_DEF),
+    ]),
+]
+
+
+# ============================================
+# Runner
+# ============================================
+def _ensure_migrations_table(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT NOT NULL PRIMARY KEY,
+            description VARCHAR(255),
+            applied_at DATETIME
+        )
+    """)
+
+
+def applied_versions(conn):
+    cur = conn.cursor()
+    try:
+        _ensure_migrations_table(cur)
+        cur.execute("SELECT version FROM schema_migrations")
+        return {row[0] for row in cur.fetchall()}
+    finally:
+        cur.close()
+
+
+def status(conn):
+    """[(version, description, applied: bool)] for every known migration."""
+    done = applied_versions(conn)
+    return [(v, desc, v in done) for v, desc, _ in MIGRATIONS]
+
+
+def _describe(step):
+    if callable(step):
+        return getattr(step, "describe", step.__name__)
+    return " ".join(step.split())[:120]
+
+
+def upgrade(conn, target=None, dry_run=False, log=print):
+    """
+    Apply pending migrations in order. DDL auto-commits in MySQL, so each
+    version is recorded right after its last step; a failure stops the run
+    and the version stays pending (steps are safe to re-run).
+    """
+    done = applied_versions(conn)
+    applied = []
+    cur = conn.cursor()
+    try:
+        for version, description, steps in MIGRATIONS:
+            if version in done or (target is not None and version > target):
+                continue
+
+            log(f"▶ {version:04d} {description}")
+            for step in steps:
+                if dry_run:
+                    log(f"    would run: {_describe(step)}")
+                    continue
+                if callable(step):
+                    ran = step(cur)
+                    log(f"    {'✅' if ran else '·  exists'} {_describe(step)}")
+                else:
+                    cur.execute(step)
+                    log(f"    ✅ {_describe(step)}")
+
+            if not dry_run:
+                cur.execute(
+                    "INSERT INTO schema_migrations (version, description, applied_at) VALUES (%s, %s, %s)",
+                    (version, description, datetime.utcnow()),
+                )
+                conn.commit()
+            applied.append(version)
+    finally:
+        cur.close()
+    return applied
+
+
+# ============================================
+# EXPLAIN audit
+# ============================================
+# Representative shapes of the hot router queries (name, sql, params).
+AUDIT_QUERIES = [
+    ("students.login", "SELECT * FROM students WHERE register_number=%s", ("REG000001",)),
+    ("students.session_filter",
+     "SELECT * FROM students WHERE session=%s AND course=%s ORDER BY name", ("2024-25", "GNM")),
+    ("fees.assigned_for_student", """
+        SELECT af.*, fh.name FROM assigned_fees af
+        LEFT JOIN fee_heads fh ON fh.id = af.head_id
+        WHERE af.student_id=%s""", ("x",)),
+    ("fees.paid_sum", "SELECT IFNULL(SUM(amount),0) FROM fee_payments WHERE assigned_fee_id=%s", ("x",)),
+    ("fees.receipt_by_payment", "SELECT * FROM fee_receipts WHERE payment_id=%s", ("x",)),
+    ("fees.collections_range", """
+        SELECT fp.* FROM fee_payments fp
+        WHERE fp.paid_on >= %s AND fp.paid_on < %s""", ("2025-01-01", "2025-02-01")),
+    ("fees.pending", """
+        SELECT af.id FROM assigned_fees af WHERE af.status <> 'Paid' AND af.due_date < %s""",
+     ("2025-06-01",)),
+    ("finance.ledger", """
+        SELECT * FROM finance_transactions
+        WHERE account_id=%s AND tx_date BETWEEN %s AND %s ORDER BY tx_date, created_at""",
+     (1, "2025-01-01", "2025-12-31")),
+    ("finance.opening", """
+        SELECT SUM(amount) FROM finance_transactions WHERE account_id=%s AND tx_date < %s""",
+     (1, "2025-01-01")),
+    ("finance.history_by_type", """
+        SELECT * FROM finance_transactions WHERE transaction_type=%s ORDER BY tx_date DESC LIMIT 200""",
+     ("DEPOSIT",)),
+    ("finance.history_page", """
+        SELECT ft.id FROM finance_transactions ft
+        WHERE ft.transaction_type IN (%s) AND (ft.tx_date < %s OR (ft.tx_date = %s AND ft.id < %s))
+        ORDER BY ft.tx_date DESC, ft.id DESC LIMIT 201""", ("EXPENSE", "2025-06-01", "2025-06-01", "z")),
+    ("finance.outbox_due", """
+        SELECT id, ref_id, payload, attempts FROM finance_outbox
+        WHERE status=%s AND next_attempt_at <= %s ORDER BY id LIMIT 200""", ("pending", "2025-06-01")),
+    ("chat.messages_after", """
+        SELECT * FROM finance_chat WHERE request_id=%s AND id > %s ORDER BY id ASC LIMIT 200""", (1, 0)),
+    ("chat.messages_before", """
+        SELECT * FROM finance_chat WHERE request_id=%s AND id < %s ORDER BY id DESC LIMIT 51""", (1, 10**9)),
+    ("chat.my_requests", """
+        SELECT fr.*, fr.msg_count - COALESCE(r.read_count, 0) AS unread
+        FROM finance_requests fr
+        LEFT JOIN finance_chat_reads r ON r.user_id = %s AND r.request_id = fr.id
+        WHERE fr.requester_id=%s ORDER BY fr.created_at DESC""", (1, 1)),
+    ("exam_papers.for_student", """
+        SELECT * FROM exam_papers WHERE student_id=%s ORDER BY uploaded_at DESC""", ("x",)),
+    ("exam_papers.range", """
+        SELECT * FROM exam_papers WHERE uploaded_at >= %s AND uploaded_at < %s
+        ORDER BY uploaded_at DESC, id DESC LIMIT 51""", ("2025-01-01", "2025-02-01")),
+    ("students.search_roll", "SELECT id FROM students WHERE roll_key LIKE %s LIMIT 500", ("TIONS1%",)),
+    ("students.search_register", "SELECT id FROM students WHERE register_key LIKE %s LIMIT 500", ("REG0%",)),
+    ("students.search_name", """
+        SELECT id FROM students WHERE MATCH(name) AGAINST (%s IN BOOLEAN MODE) LIMIT 500""", ("+ram*",)),
+]
+
+
+def explain_audit(conn, queries=None):
+    """
+    EXPLAIN each registered query. Returns a list of dicts, one per plan row,
+    with `full_scan` set when the access type is ALL (table scan).
+    """
+    report = []
+    cur = conn.cursor(dictionary=True)
+    try:
+        for name, sql, params in (queries or AUDIT_QUERIES):
+            try:
+                cur.execute("EXPLAIN " + sql, params)
+                plan = cur.fetchall()
+            except Exception as e:
+                report.append({"query": name, "error": str(e), "full_scan": False})
+                continue
+            for row in plan:
+                report.append({
+                    "query": name,
+                    "table": row.get("table"),
+                    "type": row.get("type"),
+                    "key": row.get("key"),
+                    "rows": row.get("rows"),
+                    "extra": row.get("Extra"),
+                    "full_scan": (row.get("type") or "").upper() == "ALL",
+                })
+    finally:
+        cur.close()
+    return report
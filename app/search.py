@@ -0,0 +1,93 @@
+# ============================================
+# FILE: app/search.py
+# Index-friendly student search (roll / register prefix + name FULLTEXT)
+# ============================================
+"""
+Student lookup used by the exam paper screens (and anything else that
+searches students by "name / roll no / register no").
+
+`LOWER(col) LIKE '%q%'` can't use an index, so every keystroke scanned
+the students table (and, in the exam paper list, the join). Instead:
+
+  * roll_no / register_number are matched on the normalized generated
+    columns `roll_key` / `register_key` (upper case, no spaces, "-" or
+    "/"), by prefix:  roll_key LIKE 'TIONS1%'  -> index range scan.
+    Both are INVISIBLE (schema version 12), so SELECT * payloads don't
+    carry them
+  * name uses the FULLTEXT index (`+word*` per word, so "ram ku" finds
+    "Ram Kumar"); words shorter than FULLTEXT_MIN (the server's
+    innodb_ft_min_token_size, default 3) fall back to a name prefix match
+    on idx_students_name
+
+Each branch is its own indexed SELECT, combined with UNION, so MySQL
+never has to OR a FULLTEXT predicate with range predicates.
+
+The columns and indexes come from schema migration 8.
+"""
+
+import os
+import re
+
+FULLTEXT_MIN = int(os.getenv("SEARCH_FULLTEXT_MIN", "3"))
+MAX_MATCHES = int(os.getenv("SEARCH_MAX_MATCHES", "500"))
+
+_KEY_STRIP = re.compile(r"[\s\-/]+")
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+# keep in sync with the generated columns in app/schema.py
+KEY_SQL = "UPPER(REPLACE(REPLACE(REPLACE({col}, ' ', ''), '-', ''), '/', ''))"
+
+
+def normalize_key(value):
+    """Python twin of KEY_SQL: "tions-1 " -> "TIONS1"."""
+    return _KEY_STRIP.sub("", value or "").upper()
+
+
+def like_prefix(value):
+    """LIKE pattern matching values that start with `value` (wildcards escaped)."""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def fulltext_query(q):
+    """'ram ku' -> '+ram* +ku*' (None when a word is too short for the index)."""
+    words = _WORD.findall(q or "")
+    if not words or any(len(w) < FULLTEXT_MIN for w in words):
+        return None
+    return " ".join(f"+{w}*" for w in words)
+
+
+def student_match_sql(q, columns="id", limit=MAX_MATCHES):
+    """
+    (sql, params) selecting `columns` of students matching `q` on roll /
+    register prefix or name. `columns` must be plain students columns.
+    """
+    key = normalize_key(q)
+    branches, params = [], []
+
+    if key:
+        for col in ("roll_key", "register_key"):
+            branches.append(f"(SELECT {columns} FROM students WHERE {col} LIKE %s LIMIT {int(limit)})")
+            params.append(like_prefix(key))
+
+    ft = fulltext_query(q)
+    if ft:
+        branches.append(
+            f"(SELECT {columns} FROM students WHERE MATCH(name) AGAINST (%s IN BOOLEAN MODE) LIMIT {int(limit)})"
+        )
+        params.append(ft)
+    elif q.strip():
+        branches.append(f"(SELECT {columns} FROM students WHERE name LIKE %s LIMIT {int(limit)})")
+        params.append(like_prefix(q.strip()))
+
+    if not branches:
+        return None, []
+    return " UNION ".join(branches), params
+
+
+def matching_student_ids(cur, q, limit=MAX_MATCHES):
+    """Ids of students matching `q` (at most `limit`)."""
+    sql, params = student_match_sql(q, "id", limit)
+    if not sql:
+        return []
+    cur.execute(sql, tuple(params))
+    return [row[0] for row in cur.fetchall()][:limit]
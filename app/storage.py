@@ -0,0 +1,505 @@
+# ============================================
+# FILE: app/storage.py
+# Content-addressed upload store (sha256, sharded, deduplicated)
+# ============================================
+"""
+Single place where uploaded files are written to disk.
+
+    stored = storage.save(file, upload_dir)
+    stored.path      -> "3f/a9/3fa9...c1.pdf"  (relative to upload_dir)
+    stored.sha256, stored.size, stored.mime, stored.original_name
+    stored.deduped   -> True when identical bytes were already stored
+
+    storage.release(upload_dir, stored.path)   # record deleted / replaced
+
+The upload is hashed while it is streamed into a temp file, then renamed
+to <aa>/<bb>/<sha256><ext>. If that file already exists the temp copy is
+dropped, so the same receipt or marksheet uploaded twice costs no extra
+disk, and no directory ever holds more than a slice of the files.
+
+Each upload directory keeps its own blobs, so the existing URL shapes and
+serving routes (chat_uploads, payments, exam_papers, finance, students)
+keep working; stored values just gain the shard prefix.
+
+Metadata goes to `upload_blobs` (one row per directory + hash, with a
+ref_count of the records pointing at it). Derived files stored next to a
+blob (<sha256>_thumb.jpg, app.images) belong to its row and go with it.
+release() only unlinks a blob when its count reaches zero, and does so
+while holding the row lock (SELECT ... FOR UPDATE); save() counts its
+reference before putting the file in place, so a save of the same bytes
+can't slip in between the last release and the unlink. Files saved before this module existed (flat
+names) are deleted directly, as before.
+
+Routes that write the record pointing at an upload pass their cursor, so
+the count commits or rolls back together with that record (a failed
+INSERT leaves no reference behind) and no second pooled connection is
+taken:
+
+    stored = storage.save(file, upload_dir, cur=cur)
+    cur.execute("INSERT ...", (..., stored.path))
+    conn.commit()
+
+    last = storage.release(upload_dir, old_path, cur=cur)
+    cur.execute("DELETE ...")
+    conn.commit()
+    if last:
+        storage.purge(upload_dir, old_path)   # unlink only after the commit
+
+Where the blobs live is a backend (STORAGE_BACKEND):
+
+  * "local" (default) - the upload directory itself, as above
+  * "s3" - an S3-compatible bucket (AWS S3, MinIO, ...). The object key is
+    the file's path relative to the project, e.g.
+    "app/uploads/finance/3f/a9/3fa9...c1.pdf", so directory + stored
+    path map to one key no matter how a route splits them. Uploads are
+    still hashed into a local temp file first, then sent to the bucket.
+    app.file_serving redirects downloads to a short-lived pre-signed URL,
+    so file bytes never pass through a Flask worker.
+
+    S3_BUCKET, S3_PREFIX, S3_REGION, S3_ENDPOINT_URL (MinIO / other
+    S3-compatible servers), S3_PUBLIC_ENDPOINT_URL (host the browser uses
+    when it differs from the server's), S3_URL_TTL (seconds, default 300);
+    credentials come from the usual AWS_* variables. Needs boto3.
+
+save(..., local=True) keeps a file on local disk whatever the backend
+(job inputs the worker reads straight from disk).
+"""
+
+import hashlib
+import mimetypes
+import os
+import re
+import shutil
+import tempfile
+from collections import namedtuple
+from urllib.parse import quote
+
+from werkzeug.utils import secure_filename
+
+try:
+    import boto3
+    from botocore.config import Config as BotoConfig
+    from botocore.exceptions import ClientError
+except ImportError:  # only needed for STORAGE_BACKEND=s3
+    boto3 = None
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(APP_DIR)
+BACKEND = os.getenv("STORAGE_BACKEND", "local").strip().lower()
+CHUNK_SIZE = 64 * 1024
+TMP_DIRNAME = ".tmp"
+
+StoredFile = namedtuple("StoredFile", "path sha256 size mime original_name deduped")
+
+_CONTENT_PATH = re.compile(r"^([0-9a-f]{2})/([0-9a-f]{2})/([0-9a-f]{64})(\.[a-z0-9]+)?$")
+
+# derived files stored next to a blob (<sha256><suffix>, see app.images);
+# they are removed together with it
+THUMB_SUFFIX = "_thumb.jpg"
+VARIANT_SUFFIXES = (THUMB_SUFFIX,)
+
+
+# ============================================
+# Paths
+# ============================================
+def root_key(directory):
+    """Upload directory as stored in upload_blobs (relative to app/, posix)."""
+    rel = os.path.relpath(os.path.abspath(directory), APP_DIR)
+    return rel.replace(os.sep, "/")
+
+
+def content_path(digest, ext=""):
+    return f"{digest[:2]}/{digest[2:4]}/{digest}{ext}"
+
+
+def is_content_path(rel_path):
+    return bool(rel_path and _CONTENT_PATH.match(rel_path.replace("\\", "/")))
+
+
+def digest_of(rel_path):
+    m = _CONTENT_PATH.match((rel_path or "").replace("\\", "/"))
+    return m.group(3) if m else None
+
+
+def variant_paths(rel_path):
+    """Derived files of a content path: aa/bb/<sha>.jpg -> [aa/bb/<sha>_thumb.jpg]"""
+    stem = os.path.splitext(rel_path)[0]
+    return [stem + suffix for suffix in VARIANT_SUFFIXES]
+
+
+def extension_of(filename):
+    """Lower-cased extension of a client filename ("" when it has none)."""
+    return os.path.splitext(secure_filename(filename or ""))[1].lower()
+
+
+def object_key(directory, rel_path):
+    """Backend key of a stored file: its path relative to the project (posix)."""
+    full = os.path.join(os.path.abspath(directory), *rel_path.replace("\\", "/").split("/"))
+    return os.path.relpath(full, PROJECT_DIR).replace(os.sep, "/")
+
+
+def local_path(key):
+    return os.path.join(PROJECT_DIR, *key.split("/"))
+
+
+# ============================================
+# Backends
+# ============================================
+class LocalBackend:
+    """Blobs stay in the upload directories on this machine."""
+
+    remote = False
+
+    def put(self, tmp_path, key, mime=None):
+        """Move a finished temp file into place; False if it already existed."""
+        final_path = local_path(key)
+        if os.path.exists(final_path):
+            os.remove(tmp_path)
+            return False
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        os.replace(tmp_path, final_path)
+        return True
+
+    def exists(self, key):
+        return os.path.isfile(local_path(key))
+
+    def fetch(self, key, dest_path):
+        shutil.copyfile(local_path(key), dest_path)
+
+    def delete(self, key):
+        return _unlink(local_path(key))
+
+    def url(self, key, download_name=None, as_attachment=False):
+        return None  # served by app.file_serving from disk
+
+    def list(self, prefix, skip_dirs=()):
+        """(rel_path, size, mtime) under `prefix`, in plain string order of rel_path."""
+        def walk(path, rel):
+            try:
+                entries = list(os.scandir(path))
+            except OSError:
+                return
+            # "name/" for directories keeps the whole walk in string order
+            entries.sort(key=lambda e: e.name + "/" if e.is_dir(follow_symlinks=False) else e.name)
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in skip_dirs:
+                        yield from walk(entry.path, rel + entry.name + "/")
+                elif entry.is_file(follow_symlinks=False):
+                    st = entry.stat()
+                    yield rel + entry.name, st.st_size, st.st_mtime
+
+        yield from walk(local_path(prefix), "")
+
+
+class S3Backend:
+    """Blobs in an S3-compatible bucket, downloaded via pre-signed URLs."""
+
+    remote = True
+
+    def __init__(self):
+        if boto3 is None:
+            raise RuntimeError("STORAGE_BACKEND=s3 needs boto3 (pip install boto3)")
+        self.bucket = os.environ["S3_BUCKET"]
+        self.prefix = os.getenv("S3_PREFIX", "").strip("/")
+        self.url_ttl = int(os.getenv("S3_URL_TTL", "300"))
+        endpoint = os.getenv("S3_ENDPOINT_URL") or None
+        options = {
+            "region_name": os.getenv("S3_REGION") or None,
+            # MinIO and most self-hosted servers only do path-style addressing
+            "config": BotoConfig(signature_version="s3v4",
+                                 s3={"addressing_style": "path" if endpoint else "auto"}),
+        }
+        self.client = boto3.client("s3", endpoint_url=endpoint, **options)
+        public = os.getenv("S3_PUBLIC_ENDPOINT_URL")
+        self.signer = boto3.client("s3", endpoint_url=public, **options) if public else self.client
+
+    def _key(self, key):
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def put(self, tmp_path, key, mime=None):
+        try:
+            if self.exists(key):
+                return False
+            extra = {"ContentType": mime} if mime else {}
+            self.client.upload_file(tmp_path, self.bucket, self._key(key), ExtraArgs=extra)
+            return True
+        finally:
+            os.remove(tmp_path)
+
+    def exists(self, key):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def fetch(self, key, dest_path):
+        self.client.download_file(self.bucket, self._key(key), dest_path)
+
+    def delete(self, key):
+        try:
+            self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+            return True
+        except Exception as e:
+            print("⚠️ Could not delete object from bucket:", e)
+            return False
+
+    def list(self, prefix, skip_dirs=()):
+        """Same contract as LocalBackend.list (S3 lists keys in UTF-8 byte order)."""
+        start = self._key(prefix).rstrip("/") + "/"
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=start):
+            for obj in page.get("Contents", ()):
+                rel = obj["Key"][len(start):]
+                if any(part in skip_dirs for part in rel.split("/")[:-1]):
+                    continue
+                yield rel, obj["Size"], obj["LastModified"].timestamp()
+
+    def url(self, key, download_name=None, as_attachment=False):
+        params = {"Bucket": self.bucket, "Key": self._key(key)}
+        if download_name:
+            kind = "attachment" if as_attachment else "inline"
+            params["ResponseContentDisposition"] = f"{kind}; filename*=UTF-8''{quote(download_name)}"
+        return self.signer.generate_presigned_url("get_object", Params=params, ExpiresIn=self.url_ttl)
+
+
+_LOCAL = LocalBackend()
+_backend = None
+
+
+def backend():
+    """The configured backend (created on first use)."""
+    global _backend
+    if _backend is None:
+        _backend = S3Backend() if BACKEND == "s3" else _LOCAL
+    return _backend
+
+
+# ============================================
+# Save
+# ============================================
+def save(file, directory, ext=None, local=False, cur=None):
+    """
+    Stream a werkzeug FileStorage (or any object with .stream/.read) into
+    `directory`, returning a StoredFile. `ext` overrides the extension
+    taken from the client filename; `local` bypasses the configured backend.
+    `cur`: record the blob in the caller's transaction (caller commits)
+    instead of on a connection of its own.
+    """
+    original_name = getattr(file, "filename", None) or ""
+    ext = extension_of(original_name) if ext is None else ext.lower()
+    stream = getattr(file, "stream", file)
+
+    tmp_dir = os.path.join(directory, TMP_DIRNAME)
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    h = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                h.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+
+        digest = h.hexdigest()
+        rel_path = content_path(digest, ext)
+        mime = (getattr(file, "mimetype", None)
+                or mimetypes.guess_type(original_name)[0]
+                or "application/octet-stream")
+        target = _LOCAL if local else backend()
+
+        def put():
+            return not target.put(tmp_path, object_key(directory, rel_path), mime)
+
+        stored = StoredFile(rel_path, digest, size, mime, original_name, False)
+        # the upload_blobs row is counted (and locked) before the file is put
+        # in place, so a concurrent release() of the same bytes either sees
+        # this reference or has finished unlinking before we look
+        deduped = _record(directory, stored, put, cur)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return stored._replace(deduped=deduped)
+
+
+# ============================================
+# Metadata (upload_blobs)
+# ============================================
+def _connect():
+    from app.db import get_mysql_connection
+    return get_mysql_connection()
+
+
+def _record(directory, stored, put, cur=None):
+    """Count one reference to the blob, then put() the file; returns put()'s result."""
+    own = None
+    if cur is None:
+        own = _connect()
+        if own is None:
+            return put()  # the file still goes to disk; only the bookkeeping is missing
+        cur = own.cursor()
+    try:
+        try:
+            cur.execute("""
+                INSERT INTO upload_blobs
+                    (root, sha256, rel_path, size, mime, original_name, ref_count, created_at)
+                VALUES (%s, %s, %s, %s, %s, %s, 1, NOW())
+                ON DUPLICATE KEY UPDATE ref_count = ref_count + 1, last_seen_at = NOW()
+            """, (root_key(directory), stored.sha256, stored.path, stored.size,
+                  stored.mime[:100], stored.original_name[:255]))
+        except Exception as e:
+            print("❌ upload_blobs record error:", e)
+            if own is not None:
+                own.rollback()
+            return put()
+        deduped = put()
+        if own is not None:
+            own.commit()
+        return deduped
+    except Exception:
+        if own is not None:
+            own.rollback()
+        raise
+    finally:
+        if own is not None:
+            cur.close()
+            own.close()
+
+
+def _ref_count(row):
+    if row is None:
+        return None
+    return row["ref_count"] if isinstance(row, dict) else row[0]
+
+
+def _drop_ref(cur, key):
+    """Lock the blob row and drop one reference; True when that was the last one."""
+    # row lock until commit: a save() of the same bytes waits for us
+    cur.execute("SELECT ref_count FROM upload_blobs WHERE root=%s AND sha256=%s FOR UPDATE", key)
+    count = _ref_count(cur.fetchone())
+    if count is None:
+        return False  # unknown ref count -> keep the blob
+    if count > 1:
+        cur.execute("UPDATE upload_blobs SET ref_count = ref_count - 1 WHERE root=%s AND sha256=%s", key)
+        return False
+    cur.execute("DELETE FROM upload_blobs WHERE root=%s AND sha256=%s", key)
+    return True
+
+
+def _remove_blob(directory, rel_path):
+    """Remove a blob and its derived files (thumbnails)."""
+    removed = False
+    for i, rel in enumerate([rel_path] + variant_paths(rel_path)):
+        full_path = os.path.join(directory, *rel.split("/"))
+        if os.path.isfile(full_path):
+            done = _unlink(full_path)  # local backend, or kept local (job inputs)
+        elif backend().remote:
+            done = backend().delete(object_key(directory, rel))
+        else:
+            done = False
+        if i == 0:
+            removed = done
+    return removed
+
+
+def _clean(rel_path):
+    return rel_path.replace("\\", "/").lstrip("/")
+
+
+def release(directory, rel_path, cur=None):
+    """
+    Drop one reference to a stored file; unlink it when nothing else uses it.
+    Returns True if the file was removed.
+
+    With `cur` only the count changes, in the caller's transaction, and
+    nothing is unlinked: the return value is True when that was the last
+    reference, and the caller then calls purge() after its commit - so a
+    rolled-back delete never leaves a row pointing at a missing file.
+    """
+    if not rel_path:
+        return False
+    rel_path = _clean(rel_path)
+
+    if not is_content_path(rel_path):
+        # legacy flat upload - owned by exactly one record
+        return True if cur is not None else _unlink(os.path.join(directory, *rel_path.split("/")))
+
+    key = (root_key(directory), digest_of(rel_path))
+    if cur is not None:
+        return _drop_ref(cur, key)
+
+    conn = _connect()
+    if conn is None:
+        return False  # unknown ref count -> keep the blob
+    cur = conn.cursor()
+    try:
+        removed = False
+        if _drop_ref(cur, key):
+            # last reference: remove the file while still holding the lock
+            removed = _remove_blob(directory, rel_path)
+        conn.commit()
+        return removed
+    except Exception as e:
+        print("❌ upload release error:", e)
+        conn.rollback()
+        return False
+    finally:
+        cur.close()
+        conn.close()
+
+
+def purge(directory, rel_path):
+    """
+    Unlink a file whose last reference was dropped by release(..., cur=)
+    and committed. Re-checks under the row lock first: if a save() of the
+    same bytes has counted it again since, the file stays.
+    """
+    if not rel_path:
+        return False
+    rel_path = _clean(rel_path)
+    if not is_content_path(rel_path):
+        return _unlink(os.path.join(directory, *rel_path.split("/")))
+
+    key = (root_key(directory), digest_of(rel_path))
+    conn = _connect()
+    if conn is None:
+        return False
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT ref_count FROM upload_blobs WHERE root=%s AND sha256=%s FOR UPDATE", key)
+        count = _ref_count(cur.fetchone())
+        if count is not None and count > 0:
+            conn.commit()
+            return False
+        removed = _remove_blob(directory, rel_path)
+        if count is not None:
+            cur.execute("DELETE FROM upload_blobs WHERE root=%s AND sha256=%s", key)
+        conn.commit()
+        return removed
+    except Exception as e:
+        print("❌ upload purge error:", e)
+        conn.rollback()
+        return False
+    finally:
+        cur.close()
+        conn.close()
+
+
+def _unlink(path):
+    try:
+        if os.path.isfile(path):
+            os.remove(path)
+            return True
+    except OSError as e:
+        print("⚠️ Could not delete file from disk:", e)
+    return False
@@ -0,0 +1,230 @@
+# ============================================
+# FILE: app/typeahead.py
+# In-memory student typeahead (sorted prefix keys + bisect)
+# ============================================
+"""
+Per-worker prefix index over active students, for "type a few letters"
+lookups (fee collection, exam paper student search, receipt search):
+
+    typeahead.search("ram ku", limit=10)  -> [{id, name, register_number, ...}]
+    typeahead.match_ids("TIONS-1")        -> {"<id>", ...}
+
+Every student contributes a handful of keys to one sorted list of
+(key, id) pairs:
+
+  * each word of the name ("ram", "kumar")
+  * register / roll number, normalized like app.search.normalize_key
+    ("tions1"), so "TIONS-1", "tions 1" and "Tions1" all hit
+  * phone digits (and the last 10 digits, so "+91..." numbers match)
+
+A prefix lookup is two bisects; a multi-word query intersects the name
+word matches. Nothing touches MySQL after the first (lazy) load.
+
+Freshness: routers call refresh() / remove() after single-student writes
+and invalidate() after bulk ones (bulk import, roll generation,
+promotion). Other processes (more gunicorn workers, the job worker)
+can't reach this memory, so the whole index is also rebuilt every
+TYPEAHEAD_TTL seconds (default 120).
+"""
+
+import os
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+
+from app.search import normalize_key
+
+TTL = int(os.getenv("TYPEAHEAD_TTL", "120"))
+FIELDS = ("id", "name", "register_number", "roll_no", "phone", "course", "batch", "branch")
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+_DIGITS = re.compile(r"\D+")
+_HIGH = "\uffff"
+
+_lock = threading.Lock()
+_build_lock = threading.Lock()
+_index = {"keys": [], "records": {}, "keys_by_id": {}, "loaded_at": None}
+
+
+# ============================================
+# Keys
+# ============================================
+def _keys_for(record):
+    keys = set(w.lower() for w in _WORD.findall(record.get("name") or ""))
+    for col in ("register_number", "roll_no"):
+        key = normalize_key(str(record.get(col) or "")).lower()
+        if key:
+            keys.add(key)
+    digits = _DIGITS.sub("", str(record.get("phone") or ""))
+    if digits:
+        keys.add(digits)
+        keys.add(digits[-10:])
+    return keys
+
+
+def _prefix_ids(keys, prefix):
+    lo = bisect_left(keys, (prefix,))
+    hi = bisect_left(keys, (prefix + _HIGH,))
+    return {sid for _, sid in keys[lo:hi]}
+
+
+# ============================================
+# Build / refresh
+# ============================================
+def _fetch(cur, student_id=None):
+    sql = f"SELECT {', '.join(FIELDS)} FROM students"
+    if student_id is None:
+        cur.execute(sql)
+    else:
+        cur.execute(sql + " WHERE id=%s", (student_id,))
+    return [dict(zip(FIELDS, row)) for row in cur.fetchall()]
+
+
+def _build():
+    from app.db import get_mysql_connection
+
+    conn = get_mysql_connection()
+    if conn is None:
+        return False
+    try:
+        cur = conn.cursor()
+        rows = _fetch(cur)
+        cur.close()
+    except Exception as e:
+        print("❌ Typeahead load error:", e)
+        return False
+    finally:
+        conn.close()
+
+    records, keys_by_id, keys = {}, {}, []
+    for record in rows:
+        sid = record["id"]
+        records[sid] = record
+        keys_by_id[sid] = _keys_for(record)
+        keys.extend((k, sid) for k in keys_by_id[sid])
+    keys.sort()
+
+    with _lock:
+        _index.update(keys=keys, records=records, keys_by_id=keys_by_id, loaded_at=time.monotonic())
+    print(f"🔎 Typeahead index: {len(records)} students, {len(keys)} keys")
+    return True
+
+
+def _fresh():
+    loaded_at = _index["loaded_at"]
+    return loaded_at is not None and time.monotonic() - loaded_at < TTL
+
+
+def _ensure():
+    if _fresh():
+        return True
+    have_copy = bool(_index["records"])
+    # one thread rebuilds; the others keep answering from the stale copy
+    if not _build_lock.acquire(blocking=not have_copy):
+        return True
+    try:
+        if _fresh() or _build():
+            return True
+        return have_copy
+    finally:
+        _build_lock.release()
+
+
+def _drop(student_id):
+    """Remove a student's keys (caller holds _lock)."""
+    keys = _index["keys"]
+    for k in _index["keys_by_id"].pop(student_id, ()):
+        i = bisect_left(keys, (k, student_id))
+        if i < len(keys) and keys[i] == (k, student_id):
+            del keys[i]
+    _index["records"].pop(student_id, None)
+
+
+def upsert(record):
+    """Add or replace one student (dict with FIELDS; extra keys ignored)."""
+    if _index["loaded_at"] is None:
+        return  # not built yet - the lazy load will see it
+    record = {f: record.get(f) for f in FIELDS}
+    sid = record["id"]
+    with _lock:
+        _drop(sid)
+        _index["records"][sid] = record
+        _index["keys_by_id"][sid] = _keys_for(record)
+        for k in _index["keys_by_id"][sid]:
+            insort(_index["keys"], (k, sid))
+
+
+def remove(student_id):
+    if _index["loaded_at"] is None:
+        return
+    with _lock:
+        _drop(student_id)
+
+
+def refresh(conn, student_id):
+    """Re-read one student after a write (removes it if the row is gone)."""
+    if _index["loaded_at"] is None:
+        return
+    try:
+        cur = conn.cursor()
+        rows = _fetch(cur, student_id)
+        cur.close()
+    except Exception as e:
+        print("⚠️ Typeahead refresh error:", e)
+        invalidate()
+        return
+    if rows:
+        upsert(rows[0])
+    else:
+        remove(student_id)
+
+
+def invalidate():
+    """Rebuild on next use (after bulk writes)."""
+    if _index["loaded_at"] is not None:
+        _index["loaded_at"] = float("-inf")
+
+
+# ============================================
+# Lookup
+# ============================================
+def match_ids(q):
+    """
+    Ids of students matching `q`, or None when the index can't be loaded
+    (callers fall back to SQL).
+    """
+    if not _ensure():
+        return None
+    words = [w.lower() for w in _WORD.findall(q or "")]
+    if not words:
+        return set()
+
+    with _lock:
+        keys = _index["keys"]
+        # every word must prefix some key (name words, numbers, phone)
+        found = None
+        for w in words:
+            ids = _prefix_ids(keys, w)
+            found = ids if found is None else found & ids
+            if not found:
+                break
+        # "TIONS - 1", "98765 43210": the whole query as one key
+        joined = normalize_key(q).lower()
+        digits = _DIGITS.sub("", q)
+        if len(words) > 1 and joined:
+            found = (found or set()) | _prefix_ids(keys, joined)
+        if len(words) > 1 and digits:
+            found = (found or set()) | _prefix_ids(keys, digits)
+    return found or set()
+
+
+def search(q, limit=10):
+    """Matching student records sorted by name, or None (see match_ids)."""
+    ids = match_ids(q)
+    if ids is None:
+        return None
+    records = _index["records"]
+    rows = [records[sid] for sid in ids if sid in records]
+    rows.sort(key=lambda r: ((r.get("name") or "").lower(), r["id"]))
+    return [dict(r) for r in rows[:limit]]
@@ -0,0 +1,337 @@
+# ============================================
+# FILE: app/upload_gc.py
+# Orphaned upload collector (DB references vs. stored files)
+# ============================================
+"""
+Files nobody points at any more: a paper or transaction deleted while its
+blob is shared, a student document replaced, a request that saved its
+upload and then failed on the INSERT. They only cost disk and backup time,
+so this finds and removes them:
+
+    python tools/upload_gc.py                  # dry run: report only
+    python tools/upload_gc.py --quarantine     # move to <root>/.quarantine/<stamp>/
+    python tools/upload_gc.py --delete
+    POST /api/uploads/gc {"mode": "dry_run"}   # same, as the "uploads.gc" job (CSV report)
+
+Per upload root (ROOTS) two sorted streams are merged, never loaded whole
+or compared pairwise:
+
+  * references - one UNION ALL over every column that stores a path under
+    that root, ORDER BY the binary value, read row by row; the fixed URL
+    prefix is cut off (order is kept) and thumbnails of referenced images
+    are merged in as references too
+  * files - the storage backend's listing (local walk or bucket listing),
+    also in plain string order
+
+A file is an orphan when the reference cursor passes it without a match.
+Either stream arriving out of order stops the root before anything is
+touched.
+
+Safety: files younger than GC_MIN_AGE hours (default 24) are never
+orphans (their request may still be committing), and a root where more
+than GC_MAX_ORPHAN_SHARE of the files look orphaned is only reported
+unless force=True - that is a wrong prefix, not garbage.
+
+Each orphan is re-checked right before it is removed, holding the lock on
+its upload_blobs row: if its ref_count is above zero or a column now
+points at it (a deduped re-upload during the scan), it is left alone and
+counted as "kept". A blob whose count is still above zero without any
+row pointing at it is therefore only reported, never removed.
+"""
+
+import heapq
+import itertools
+import os
+import shutil
+import time
+from datetime import datetime
+
+from app import images, jobs, storage
+
+MIN_AGE_HOURS = float(os.getenv("GC_MIN_AGE", "24"))
+MIN_AGE_FLOOR_HOURS = 1.0  # lowest min_age_hours the API accepts
+MAX_ORPHAN_SHARE = float(os.getenv("GC_MAX_ORPHAN_SHARE", "0.5"))
+
+QUARANTINE_DIRNAME = ".quarantine"
+SKIP_DIRS = (storage.TMP_DIRNAME, QUARANTINE_DIRNAME, "_resumable")
+
+MODES = ("dry_run", "quarantine", "delete")
+
+_STUDENT_DOCS = ("photo_url", "marksheet_url", "aadhaar_url", "tc_url", "migration_url")
+
+# name -> (directory, stored-value prefix, [(table, column), ...])
+ROOTS = {
+    "finance": (
+        os.path.join(storage.APP_DIR, "uploads", "finance"), "",
+        [("finance_transactions", "attachment_url")],
+    ),
+    "payments": (
+        os.path.join(storage.PROJECT_DIR, "uploads", "payments"), "uploads/payments/",
+        [("fee_payments", "file_path"), ("payment_modes", "file_path")],
+    ),
+    "exam_papers": (
+        os.path.join(storage.PROJECT_DIR, "static", "exam_papers"), "",
+        [("exam_papers", "file_url")],
+    ),
+    "chat": (
+        os.path.join(storage.APP_DIR, "static", "chat_uploads"), "/static/chat_uploads/",
+        [("finance_chat", "file_url"), ("finance_requests", "attachment")],
+    ),
+    "students": (
+        os.path.join(storage.APP_DIR, "uploads", "students"), "/uploads/students/",
+        [(t, c) for t in ("students", "dropouts") for c in _STUDENT_DOCS],
+    ),
+}
+
+
+# ============================================
+# Sorted streams
+# ============================================
+def _in_order(items, what, key=lambda x: x):
+    """Pass items through, refusing to continue if they go backwards."""
+    last = None
+    for item in items:
+        k = key(item)
+        if last is not None and k < last:
+            raise RuntimeError(f"{what} not in sorted order ({last!r} > {k!r}); nothing was changed")
+        last = k
+        yield item
+
+
+def _reference_rows(conn, columns, batch=1000):
+    selects = " UNION ALL ".join(
+        f"SELECT {col} AS v FROM {table} WHERE {col} IS NOT NULL AND {col} <> ''"
+        for table, col in columns
+    )
+    cur = conn.cursor()
+    try:
+        cur.execute(f"SELECT v FROM ({selects}) refs ORDER BY CAST(v AS BINARY)")
+        while True:
+            rows = cur.fetchmany(batch)
+            if not rows:
+                break
+            for (value,) in rows:
+                yield value.decode("utf-8") if isinstance(value, (bytes, bytearray)) else value
+    finally:
+        try:
+            cur.fetchall()  # unbuffered cursor: drain what the merge didn't need
+        except Exception:
+            pass
+        cur.close()
+
+
+def references(rows, prefix):
+    """Sorted, de-duplicated paths (relative to the root) from the reference rows."""
+    def stripped():
+        for value in rows:
+            value = value.replace("\\", "/")
+            if value.startswith(prefix):
+                yield value[len(prefix):]
+
+    refs, originals = itertools.tee(_in_order(stripped(), "references"))
+    # <sha>_thumb.jpg belongs to <sha>.<ext>; for content paths it sorts right after it
+    thumbs = (images.thumb_path(r) for r in originals
+              if images.is_image(r) and storage.is_content_path("/".join(r.split("/")[-3:])))
+    last = None
+    for ref in _in_order(heapq.merge(refs, thumbs), "references + thumbnails"):
+        if ref != last:
+            yield ref
+            last = ref
+
+
+def find_orphans(files, refs, min_mtime):
+    """
+    Sorted merge of the file listing against the references.
+    Yields (rel_path, size, mtime, status) with status "orphan" or "recent".
+    """
+    refs = iter(refs)
+    ref = next(refs, None)
+    for rel, size, mtime in _in_order(files, "file listing", key=lambda f: f[0]):
+        while ref is not None and ref < rel:
+            ref = next(refs, None)
+        if ref == rel:
+            continue
+        yield rel, size, mtime, ("recent" if mtime > min_mtime else "orphan")
+
+
+# ============================================
+# Acting on orphans
+# ============================================
+def _blob_key(directory, rel):
+    """(root, sha256) of the upload_blobs row a file belongs to, or None for legacy names."""
+    parts = rel.split("/")
+    name = parts[-1]
+    if name.endswith(images.THUMB_SUFFIX):
+        name = name[:-len(images.THUMB_SUFFIX)]  # a thumbnail lives and dies with its original
+    content = "/".join(parts[-3:-1] + [name])
+    if not storage.is_content_path(content):
+        return None
+    return storage.root_key(os.path.join(directory, *parts[:-3])), storage.digest_of(content)
+
+
+def _still_orphaned(cur, directory, prefix, columns, rel):
+    """
+    Re-check one orphan right before removing it, inside the removal's
+    transaction: lock its upload_blobs row (a concurrent save() of the same
+    bytes waits for us, see app.storage) and make sure nothing counts or
+    references it now. The scan ran without locks, so a deduped re-upload
+    since then - which doesn't touch the file's mtime - shows up here.
+    """
+    key = _blob_key(directory, rel)
+    if key is not None:
+        cur.execute("SELECT ref_count FROM upload_blobs WHERE root=%s AND sha256=%s FOR UPDATE", key)
+        row = cur.fetchone()
+        if row is not None and row[0] > 0:
+            return False
+
+    value = prefix + rel
+    name = value.rsplit("/", 1)[-1]
+    if name.endswith(images.THUMB_SUFFIX):
+        # referenced through its original, whatever that one's extension
+        stem = value[:-len(images.THUMB_SUFFIX)] + "."
+        match, params = "LEFT({col}, %s) = %s", (len(stem), stem)
+    else:
+        match, params = "{col} = %s", (value,)
+    for table, col in columns:
+        cur.execute(f"SELECT 1 FROM {table} WHERE {match.format(col=col)} LIMIT 1", params)
+        if cur.fetchone() is not None:
+            return False
+    return True
+
+
+def _forget_blob(cur, directory, rel):
+    """Drop the upload_blobs row of a removed content-addressed file."""
+    key = _blob_key(directory, rel)
+    if key is not None and not rel.endswith(images.THUMB_SUFFIX):
+        cur.execute("DELETE FROM upload_blobs WHERE root=%s AND sha256=%s", key)
+
+
+def _quarantine(directory, rel, stamp):
+    src = os.path.join(directory, *rel.split("/"))
+    dest = os.path.join(directory, QUARANTINE_DIRNAME, stamp, *rel.split("/"))
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    shutil.move(src, dest)
+
+
+def _stale_temp_files(directory, min_mtime):
+    """Leftovers of saves that died mid-stream (storage .tmp dirs)."""
+    for dirpath, dirnames, filenames in os.walk(directory):
+        if os.path.basename(dirpath) != storage.TMP_DIRNAME:
+            dirnames[:] = [d for d in dirnames if d != QUARANTINE_DIRNAME]
+            continue
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            try:
+                if os.path.getmtime(path) < min_mtime:
+                    yield path
+            except OSError:
+                pass
+
+
+def collect_root(conn, name, mode="dry_run", min_age_hours=MIN_AGE_HOURS, force=False, report=None):
+    """GC one root; returns its summary dict. Orphan rows are appended to `report`."""
+    directory, prefix, columns = ROOTS[name]
+    store = storage.backend()
+    min_mtime = time.time() - min_age_hours * 3600
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+
+    summary = {"root": name, "mode": mode, "orphans": 0, "orphan_bytes": 0,
+               "recent": 0, "files": 0, "removed": 0, "kept": 0, "temp_removed": 0, "skipped": None}
+
+    def counted(listing):
+        for item in listing:
+            summary["files"] += 1
+            yield item
+
+    listing = counted(store.list(storage.object_key(directory, ""), SKIP_DIRS))
+    rows = _reference_rows(conn, columns)
+    orphans = []
+    try:
+        for rel, size, mtime, status in find_orphans(listing, references(rows, prefix), min_mtime):
+            if status == "recent":
+                summary["recent"] += 1
+                continue
+            orphans.append((rel, size, mtime))
+            summary["orphans"] += 1
+            summary["orphan_bytes"] += size
+    finally:
+        rows.close()
+
+    if report is not None:
+        report.extend({"root": name, "path": rel, "size": size,
+                       "modified": datetime.fromtimestamp(mtime).isoformat(timespec="seconds")}
+                      for rel, size, mtime in orphans)
+
+    if mode == "dry_run" or not orphans:
+        pass
+    elif not force and summary["orphans"] > MAX_ORPHAN_SHARE * summary["files"]:
+        summary["skipped"] = (f"{summary['orphans']} of {summary['files']} files look orphaned; "
+                              "check the prefix / columns or run with force")
+    elif mode == "quarantine" and store.remote:
+        summary["skipped"] = "quarantine is for local storage; use delete for a bucket"
+    else:
+        for rel, _, _ in orphans:
+            cur = conn.cursor()
+            try:
+                if not _still_orphaned(cur, directory, prefix, columns, rel):
+                    conn.rollback()
+                    summary["kept"] += 1
+                    continue
+                # removed while the blob row is locked, then the row goes
+                if mode == "quarantine":
+                    _quarantine(directory, rel, stamp)
+                else:
+                    store.delete(storage.object_key(directory, rel))
+                _forget_blob(cur, directory, rel)
+                conn.commit()
+                summary["removed"] += 1
+            except Exception as e:
+                conn.rollback()
+                print(f"⚠️ GC could not remove {name}/{rel}:", e)
+            finally:
+                cur.close()
+
+    if mode != "dry_run" and not store.remote:
+        for path in _stale_temp_files(directory, min_mtime):
+            if storage._unlink(path):
+                summary["temp_removed"] += 1
+
+    return summary
+
+
+def collect(conn, roots=None, mode="dry_run", min_age_hours=MIN_AGE_HOURS, force=False, progress=None):
+    """GC the given roots (all by default); returns (summaries, orphan report rows)."""
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {', '.join(MODES)}")
+    names = list(roots or ROOTS)
+    summaries, report = [], []
+    for i, name in enumerate(names):
+        try:
+            summaries.append(collect_root(conn, name, mode, min_age_hours, force, report))
+        except Exception as e:
+            # a failed reference query must never turn into "everything is orphaned"
+            print(f"❌ GC {name} stopped:", e)
+            summaries.append({"root": name, "mode": mode, "error": str(e)})
+        if progress:
+            progress(i + 1, len(names), f"GC {name}")
+    return summaries, report
+
+
+def report_csv(report):
+    lines = ["root,path,size,modified"]
+    lines += [f"{r['root']},{r['path']},{r['size']},{r['modified']}" for r in report]
+    return "\n".join(lines) + "\n"
+
+
+# ============================================
+# Background job
+# ============================================
+@jobs.task("uploads.gc")
+def run_upload_gc(job, mode="dry_run", roots=None, min_age_hours=MIN_AGE_HOURS, force=False):
+    summaries, report = collect(
+        job.conn, roots, mode, float(min_age_hours), bool(force),
+        progress=lambda done, total, msg: job.progress(done, total, msg, force=True),
+    )
+    if report:
+        job.save_artifact("orphans.csv", report_csv(report))
+    return {"roots": summaries}
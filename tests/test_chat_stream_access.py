@@ -0,0 +1,63 @@
+"""
+The mobile chat stream only subscribes a non-admin to their own requests.
+
+    python -m pytest -q tests
+"""
+
+import os
+
+os.environ.setdefault("MYSQL_HOST", "127.0.0.1")
+
+import pytest
+
+from app.main import app
+from app.routers import chat
+
+ROWS = {
+    "chat_users": {"u1": {"role": "accountant"}, "u2": {"role": "accountant"}},
+    "finance_requests": {7: {"requester_id": "u1"}},
+}
+
+
+class FakeCursor:
+    def __init__(self):
+        self.row = None
+
+    def execute(self, sql, params=()):
+        table = "chat_users" if "chat_users" in sql else "finance_requests"
+        self.row = ROWS[table].get(params[0])
+
+    def fetchone(self):
+        return self.row
+
+    def close(self):
+        pass
+
+
+class FakeConn:
+    def cursor(self, dictionary=False):
+        return FakeCursor()
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(chat, "get_db_safe", lambda: FakeConn())
+    monkeypatch.setattr(chat, "sse_response", lambda channels, client: ("", 204))
+    return app.test_client()
+
+
+def stream(client, user_id, req_id):
+    return client.get(f"/api/mobile/chat/stream?request_id={req_id}",
+                      headers={"Authorization": f"Bearer chat_{user_id}"})
+
+
+def test_requester_can_subscribe(client):
+    assert stream(client, "u1", 7).status_code == 204
+
+
+@pytest.mark.parametrize("req_id", [7, 8])
+def test_other_users_request_is_403(client, req_id):
+    assert stream(client, "u2", req_id).status_code == 403
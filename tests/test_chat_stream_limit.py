@@ -0,0 +1,30 @@
+"""
+Open SSE streams per worker are capped (each holds a gthread thread).
+
+    python -m pytest -q tests
+"""
+
+import os
+
+os.environ.setdefault("MYSQL_HOST", "127.0.0.1")
+
+from app.main import app
+from app import chat_bus
+from app.routers import chat
+
+
+def test_stream_over_limit_is_503_and_slot_is_released(monkeypatch):
+    monkeypatch.setattr(chat, "SSE_MAX_STREAMS", chat_bus._state["subscribers"] + 1)
+    with app.test_request_context("/chat/stream"):
+        first = chat.sse_response(["admin"], "web")
+        assert first.mimetype == "text/event-stream"
+
+        second = chat.sse_response(["admin"], "web")
+        assert second.status_code == 503
+        assert second.get_json()["retry"] == chat.SSE_RETRY_MS
+        assert second.headers["Retry-After"]
+
+        first.close()  # server closing the stream frees its slot
+        third = chat.sse_response(["admin"], "web")
+        assert third.mimetype == "text/event-stream"
+        third.close()
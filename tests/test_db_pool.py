@@ -0,0 +1,51 @@
+"""
+Pool checkout waits for a returned connection instead of polling.
+
+    python -m pytest -q tests
+"""
+
+import os
+import threading
+import time
+
+os.environ.setdefault("MYSQL_HOST", "127.0.0.1")
+
+import pytest
+from mysql.connector import pooling
+from mysql.connector.errors import PoolError
+
+from app import db
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    free = []
+
+    def get_connection(self):
+        if not free:
+            raise PoolError("Failed getting connection; pool exhausted")
+        return free.pop()
+
+    def add_connection(self, cnx=None):
+        free.append(cnx)
+
+    monkeypatch.setattr(pooling.MySQLConnectionPool, "get_connection", get_connection)
+    monkeypatch.setattr(pooling.MySQLConnectionPool, "add_connection", add_connection)
+    monkeypatch.setattr(pooling.MySQLConnectionPool, "__init__", lambda self, **kw: add_connection(self, "c1"))
+    return db.BlockingPool(pool_size=1)
+
+
+def test_checkout_wakes_up_when_a_connection_is_returned(pool):
+    held = pool.get_connection()
+    threading.Timer(0.1, pool.add_connection, args=(held,)).start()
+    start = time.monotonic()
+    assert pool.get_connection(timeout=5) == "c1"
+    assert time.monotonic() - start < 2
+
+
+def test_checkout_times_out(pool):
+    pool.get_connection()
+    start = time.monotonic()
+    with pytest.raises(PoolError):
+        pool.get_connection(timeout=0.1)
+    assert time.monotonic() - start >= 0.1
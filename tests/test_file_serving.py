@@ -0,0 +1,47 @@
+"""
+Cache validators of content-named uploads (app/file_serving.py).
+
+    python -m pytest -q tests
+"""
+
+import os
+
+os.environ.setdefault("MYSQL_HOST", "127.0.0.1")
+
+import pytest
+
+from app.main import app
+from app.file_serving import serve_file
+
+SHA = "ab" * 32
+
+
+@pytest.fixture
+def upload_dir(tmp_path):
+    (tmp_path / "ab" / "ab").mkdir(parents=True)
+    return tmp_path
+
+
+def serve(directory, rel, headers=None):
+    with app.test_request_context(headers=headers or {}):
+        return serve_file(str(directory), rel)
+
+
+def test_content_named_pdf_uses_hash_etag(upload_dir):
+    rel = f"ab/ab/{SHA}.pdf"
+    (upload_dir / rel).write_bytes(b"%PDF-1.4 test")
+    response = serve(upload_dir, rel)
+    assert response.get_etag() == (SHA, False)
+    assert response.cache_control.immutable
+    assert response.cache_control.private
+    assert not response.cache_control.public
+
+
+def test_content_named_image_is_immutable(upload_dir):
+    # app.images never rewrites an upload; a downscaled copy is a new blob
+    rel = f"ab/ab/{SHA}.jpg"
+    (upload_dir / rel).write_bytes(b"x" * 5000)
+    response = serve(upload_dir, rel)
+    assert response.get_etag() == (SHA, False)
+    assert response.cache_control.immutable
+    assert serve(upload_dir, rel, {"If-None-Match": f'"{SHA}"'}).status_code == 304
@@ -0,0 +1,33 @@
+"""
+GET /api/finance/outbox rejects a bad ?limit= before touching the database.
+
+    python -m pytest -q tests
+"""
+
+import os
+
+os.environ.setdefault("MYSQL_HOST", "127.0.0.1")
+
+import pytest
+
+from app.main import app
+from app.routers import finance
+
+
+@pytest.fixture
+def client(monkeypatch):
+    def no_db():
+        raise AssertionError("database used for an invalid request")
+
+    monkeypatch.setattr(finance, "get_mysql_connection", no_db)
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess["logged_in"] = True
+    return client
+
+
+@pytest.mark.parametrize("limit", ["abc", "0", "-5", "1.5"])
+def test_bad_limit_is_400(client, limit):
+    res = client.get(f"/api/finance/outbox?limit={limit}")
+    assert res.status_code == 400
+    assert res.get_json()["success"] is False
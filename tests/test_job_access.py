@@ -0,0 +1,44 @@
+"""
+Job status / artifact routes only answer the user who queued the job.
+
+    python -m pytest -q tests
+"""
+
+import os
+
+os.environ.setdefault("MYSQL_HOST", "127.0.0.1")
+
+import pytest
+
+from app.main import app
+from app import jobs
+
+JOB = {"id": "j1", "status": "done", "created_by": "alice", "has_artifact": False}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(jobs, "get", lambda job_id: dict(JOB))
+    monkeypatch.setattr(jobs, "artifact", lambda job_id: ("alice", "/nonexistent", "report.csv"))
+    return app.test_client()
+
+
+def login(client, username):
+    with client.session_transaction() as sess:
+        sess["logged_in"] = True
+        if username:
+            sess["username"] = username
+
+
+def test_owner_sees_job_status(client):
+    login(client, "alice")
+    res = client.get("/api/jobs/j1")
+    assert res.status_code == 200
+    assert res.get_json()["job"]["id"] == "j1"
+
+
+@pytest.mark.parametrize("username", ["bob", None])
+def test_other_users_get_404(client, username):
+    login(client, username)
+    assert client.get("/api/jobs/j1").status_code == 404
+    assert client.get("/jobs/j1/artifact").status_code == 404
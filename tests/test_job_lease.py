@@ -0,0 +1,83 @@
+"""
+Job leases: a heartbeat renews them while a task runs, and a run whose
+lease was taken over can't record its outcome.
+
+    python -m pytest -q tests
+"""
+
+import os
+import threading
+import time
+
+os.environ.setdefault("MYSQL_HOST", "127.0.0.1")
+
+import pytest
+
+from app import db, jobs
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rowcount = 0
+
+    def execute(self, sql, params=()):
+        sql = " ".join(sql.split())
+        with self.conn.lock:
+            self.conn.log.append((sql, params))
+        if sql.startswith("UPDATE jobs"):
+            # the row is ours only while locked_by matches
+            self.rowcount = 1 if self.conn.owner in params else 0
+
+    def fetchone(self):
+        return (3,)
+
+    def close(self):
+        pass
+
+
+class FakeConn:
+    def __init__(self, owner):
+        self.owner = owner
+        self.log = []
+        self.lock = threading.Lock()
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def task(monkeypatch):
+    def slow(job, seconds):
+        time.sleep(seconds)
+        return {"ok": True}
+
+    monkeypatch.setitem(jobs._TASKS, "test.slow", slow)
+    monkeypatch.setattr(jobs, "HEARTBEAT_SECONDS", 0.01)
+    return "test.slow"
+
+
+def test_heartbeat_renews_lease_while_task_runs(task, monkeypatch):
+    beats = FakeConn("w/1")
+    monkeypatch.setattr(db, "get_direct_connection", lambda: beats)
+    assert jobs.run_one(FakeConn("w/1"), "w/1", "j1", task, {"seconds": 0.1}, 1)
+    renewals = [p for sql, p in beats.log if sql.startswith("UPDATE jobs SET locked_at")]
+    assert len(renewals) >= 2
+    assert all(p[1:3] == ("j1", "w/1") for p in renewals)
+
+
+def test_stale_run_does_not_overwrite_new_claim(task, monkeypatch):
+    monkeypatch.setattr(db, "get_direct_connection", lambda: FakeConn("w/2"))
+    conn = FakeConn("w/2")  # another claim holds the row now
+    assert not jobs.run_one(conn, "w/1", "j1", task, {"seconds": 0}, 1)
+    done = [(sql, p) for sql, p in conn.log if "finished_at" in sql]
+    assert done and "locked_by=%s" in done[0][0] and done[0][1][-1] == "w/1"
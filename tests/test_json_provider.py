@@ -0,0 +1,34 @@
+"""
+app.rows Row objects serialize as JSON objects with and without orjson
+(app/json_provider.py).
+
+    python -m pytest -q tests
+"""
+
+import os
+
+os.environ.setdefault("MYSQL_HOST", "127.0.0.1")
+
+import pytest
+from flask import jsonify
+
+from app import json_provider
+from app.main import app
+from app.rows import row_class
+
+Row = row_class(("id", "name"))
+
+
+@pytest.mark.parametrize("with_orjson", [True, False])
+def test_rows_serialize_as_objects(monkeypatch, with_orjson):
+    if not with_orjson:
+        monkeypatch.setattr(json_provider, "orjson", None)
+    elif json_provider.orjson is None:
+        pytest.skip("orjson not installed")
+
+    payload = {"success": True, "data": [Row("s1", "Ram"), Row("s2", "Sita")]}
+    with app.test_request_context():
+        body = jsonify(payload).get_json()
+        text = app.json.dumps(payload)
+    assert body["data"] == [{"id": "s1", "name": "Ram"}, {"id": "s2", "name": "Sita"}]
+    assert app.json.loads(text) == body
@@ -0,0 +1,40 @@
+"""
+/metrics is closed unless a scraper token matches or the session is logged in.
+
+    python -m pytest -q tests
+"""
+
+import os
+
+os.environ.setdefault("MYSQL_HOST", "127.0.0.1")
+
+import pytest
+
+from app.main import app
+from app import metrics
+
+
+@pytest.fixture
+def client():
+    return app.test_client()
+
+
+@pytest.mark.parametrize("token", [None, "s3cret"])
+def test_anonymous_is_404(client, monkeypatch, token):
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", token)
+    assert client.get("/metrics").status_code == 404
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 404
+
+
+def test_scraper_token(client, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", "s3cret")
+    res = client.get("/metrics", headers={"Authorization": "Bearer s3cret"})
+    assert res.status_code == 200
+    assert b"erp_" in res.data
+
+
+def test_logged_in_session(client, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", None)
+    with client.session_transaction() as sess:
+        sess["logged_in"] = True
+    assert client.get("/metrics").status_code == 200
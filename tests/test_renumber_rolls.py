@@ -0,0 +1,35 @@
+"""
+renumber_rolls() counts the whole group, not just the rows MySQL changed
+(app/routers/roll_number_allocation.py).
+
+    python -m pytest -q tests
+"""
+
+import os
+
+os.environ.setdefault("MYSQL_HOST", "127.0.0.1")
+
+from app.routers.roll_number_allocation import renumber_rolls
+
+
+class FakeCursor:
+    rowcount = -1
+
+    def __init__(self, group_size, changed):
+        self.group_size = group_size
+        self.changed = changed
+        self.row = None
+
+    def execute(self, sql, params=()):
+        if sql.startswith("SELECT COUNT(*)"):
+            self.row = (self.group_size,)
+        else:
+            # without CLIENT_FOUND_ROWS only changed rows are counted
+            self.rowcount = self.changed
+
+    def fetchone(self):
+        return self.row
+
+
+def test_rerun_reports_group_size():
+    assert renumber_rolls(FakeCursor(group_size=40, changed=0), "BSC NURSING", "2nd Year") == 40
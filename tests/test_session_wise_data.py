@@ -0,0 +1,77 @@
+"""
+/students/session-wise-data with and without ?fields= (fake DB connection).
+
+    python -m pytest -q tests
+"""
+
+import os
+
+os.environ.setdefault("MYSQL_HOST", "127.0.0.1")
+
+import pytest
+
+from app.main import app
+from app.routers import students
+
+COLUMNS = ("id", "name", "register_number", "session", "course", "batch", "photo_url")
+ROW = ("s1", "Ram Kumar", "TIONS1", "2025-26", "BSC NURSING", "1st Year", None)
+
+
+class FakeCursor:
+    def __init__(self, log):
+        self.log = log
+        self.description = None
+
+    def execute(self, sql, params=()):
+        self.log.append((sql, params))
+        cols = COLUMNS
+        if not sql.startswith("SELECT *"):
+            cols = [c.strip() for c in sql[len("SELECT "):sql.index(" FROM")].split(",")]
+        self.description = [(c,) for c in cols]
+        self._rows = [tuple(ROW[COLUMNS.index(c)] for c in cols)]
+
+    def fetchall(self):
+        return self._rows
+
+    def close(self):
+        pass
+
+
+class FakeConn:
+    def __init__(self):
+        self.log = []
+
+    def cursor(self, *args, **kwargs):
+        return FakeCursor(self.log)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def client(monkeypatch):
+    conn = FakeConn()
+    monkeypatch.setattr(students, "get_mysql_connection", lambda: conn)
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess["logged_in"] = True
+    client.conn = conn
+    return client
+
+
+def test_without_fields_returns_nested_students(client):
+    res = client.get("/students/session-wise-data?session=2025-26")
+    assert res.status_code == 200
+    data = res.get_json()
+    assert len(data) == 1
+    assert data[0]["id"] == "s1"
+    sql, params = client.conn.log[0]
+    assert sql.startswith("SELECT * FROM students")
+    assert params == ("2025-26",)
+
+
+def test_with_fields_selects_only_those_columns(client):
+    res = client.get("/students/session-wise-data?fields=id,name")
+    assert res.status_code == 200
+    assert res.get_json() == [{"id": "s1", "name": "Ram Kumar"}]
+    assert client.conn.log[0][0].startswith("SELECT id, name FROM students")
@@ -0,0 +1,120 @@
+"""
+upload_blobs bookkeeping in app/storage.py: the reference is counted
+before the file lands, the last release unlinks under the row lock, and
+with a caller's cursor nothing is unlinked before the caller commits.
+
+    python -m pytest -q tests
+"""
+
+import io
+import os
+
+os.environ.setdefault("MYSQL_HOST", "127.0.0.1")
+
+import pytest
+
+from app import storage
+
+
+class FakeCursor:
+    def __init__(self, log, ref_count):
+        self.log = log
+        self.ref_count = ref_count
+        self.row = None
+
+    def execute(self, sql, params=()):
+        sql = " ".join(sql.split())
+        self.log.append(sql.split()[0] + (" FOR UPDATE" if "FOR UPDATE" in sql else ""))
+        if sql.startswith("SELECT ref_count"):
+            self.row = None if self.ref_count is None else (self.ref_count,)
+
+    def fetchone(self):
+        return self.row
+
+    def close(self):
+        pass
+
+
+class FakeConn:
+    def __init__(self, log, ref_count=1):
+        self.log = log
+        self.ref_count = ref_count
+
+    def cursor(self):
+        return FakeCursor(self.log, self.ref_count)
+
+    def commit(self):
+        self.log.append("COMMIT")
+
+    def rollback(self):
+        self.log.append("ROLLBACK")
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def log(monkeypatch):
+    log = []
+    real_unlink = storage._unlink
+
+    def unlink(path):
+        log.append("UNLINK")
+        return real_unlink(path)
+
+    monkeypatch.setattr(storage, "_unlink", unlink)
+    monkeypatch.setattr(storage, "_connect", lambda: FakeConn(log))
+    return log
+
+
+def test_save_counts_the_blob_before_committing(tmp_path, log):
+    stored = storage.save(io.BytesIO(b"receipt"), str(tmp_path), ext=".txt")
+    assert (tmp_path / stored.path).read_bytes() == b"receipt"
+    assert log == ["INSERT", "COMMIT"]
+
+
+def test_last_release_unlinks_while_row_is_locked(tmp_path, log):
+    stored = storage.save(io.BytesIO(b"receipt"), str(tmp_path), ext=".txt")
+    del log[:]
+    assert storage.release(str(tmp_path), stored.path)
+    assert not (tmp_path / stored.path).exists()
+    assert log == ["SELECT FOR UPDATE", "DELETE", "UNLINK", "COMMIT"]  # unlinked before the lock goes
+
+
+def test_release_with_caller_cursor_leaves_commit_to_caller(tmp_path, log):
+    stored = storage.save(io.BytesIO(b"receipt"), str(tmp_path), ext=".txt")
+    del log[:]
+    cur = FakeCursor(log, ref_count=2)
+    assert not storage.release(str(tmp_path), stored.path, cur=cur)
+    assert (tmp_path / stored.path).exists()
+    assert log == ["SELECT FOR UPDATE", "UPDATE"]
+
+
+def test_last_release_with_caller_cursor_unlinks_only_on_purge(tmp_path, log, monkeypatch):
+    stored = storage.save(io.BytesIO(b"receipt"), str(tmp_path), ext=".txt")
+    del log[:]
+    assert storage.release(str(tmp_path), stored.path, cur=FakeCursor(log, ref_count=1))
+    assert (tmp_path / stored.path).exists()  # caller hasn't committed yet
+    assert log == ["SELECT FOR UPDATE", "DELETE"]
+
+    del log[:]
+    monkeypatch.setattr(storage, "_connect", lambda: FakeConn(log, ref_count=None))
+    assert storage.purge(str(tmp_path), stored.path)
+    assert not (tmp_path / stored.path).exists()
+    assert log == ["SELECT FOR UPDATE", "UNLINK", "COMMIT"]
+
+
+def test_purge_keeps_a_blob_saved_again_after_the_commit(tmp_path, log, monkeypatch):
+    stored = storage.save(io.BytesIO(b"receipt"), str(tmp_path), ext=".txt")
+    monkeypatch.setattr(storage, "_connect", lambda: FakeConn(log, ref_count=1))
+    assert not storage.purge(str(tmp_path), stored.path)
+    assert (tmp_path / stored.path).exists()
+
+
+def test_last_release_takes_the_thumbnail_with_it(tmp_path, log):
+    stored = storage.save(io.BytesIO(b"photo"), str(tmp_path), ext=".jpg")
+    thumb = tmp_path / storage.variant_paths(stored.path)[0]
+    thumb.write_bytes(b"thumb")
+    assert storage.release(str(tmp_path), stored.path)
+    assert not (tmp_path / stored.path).exists()
+    assert not thumb.exists()
@@ -0,0 +1,80 @@
+"""
+/uploads/students/<path> (Aadhaar, TC, marksheet scans) needs a staff
+session or the owning student's token.
+
+    python -m pytest -q tests
+"""
+
+import os
+from datetime import datetime, timedelta
+
+os.environ.setdefault("MYSQL_HOST", "127.0.0.1")
+
+import jwt
+import pytest
+
+from app.main import app
+from app.routers import students
+
+SHA = "cd" * 32
+REL = f"aadhaar/cd/cd/{SHA}.pdf"
+
+
+class FakeCursor:
+    def __init__(self, owner):
+        self.owner = owner
+        self.row = None
+
+    def execute(self, sql, params=()):
+        self.row = (1,) if params[0] == self.owner else None
+
+    def fetchone(self):
+        return self.row
+
+    def close(self):
+        pass
+
+
+class FakeConn:
+    def __init__(self, owner):
+        self.owner = owner
+
+    def cursor(self):
+        return FakeCursor(self.owner)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    (tmp_path / "aadhaar" / "cd" / "cd").mkdir(parents=True)
+    (tmp_path / REL).write_bytes(b"%PDF-1.4 scan")
+    monkeypatch.setattr(students, "STUDENT_UPLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr(students, "get_mysql_connection", lambda: FakeConn("s1"))
+    return app.test_client()
+
+
+def bearer(student_id):
+    token = jwt.encode({"student_id": student_id, "role": "STUDENT",
+                        "exp": datetime.utcnow() + timedelta(days=1)},
+                       app.config["SECRET_KEY"], algorithm="HS256")
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_anonymous_is_401(client):
+    assert client.get(f"/uploads/students/{REL}").status_code == 401
+
+
+def test_staff_session_is_served(client):
+    with client.session_transaction() as sess:
+        sess["logged_in"] = True
+    assert client.get(f"/uploads/students/{REL}").status_code == 200
+
+
+def test_owner_token_is_served(client):
+    assert client.get(f"/uploads/students/{REL}", headers=bearer("s1")).status_code == 200
+
+
+def test_other_students_token_is_404(client):
+    assert client.get(f"/uploads/students/{REL}", headers=bearer("s2")).status_code == 404
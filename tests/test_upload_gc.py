@@ -0,0 +1,109 @@
+"""
+upload GC re-checks each orphan under the blob row lock before removing it,
+and the API rejects a min_age_hours that would disable the age guard.
+
+    python -m pytest -q tests
+"""
+
+import os
+
+os.environ.setdefault("MYSQL_HOST", "127.0.0.1")
+
+import pytest
+
+from app import upload_gc
+from app.main import app
+from app.routers import uploads
+
+FREE = "aa" * 32     # ref_count 0: really orphaned
+REUSED = "bb" * 32   # deduped re-upload during the scan: ref_count 1
+
+
+class FakeCursor:
+    def __init__(self, log):
+        self.log = log
+        self.rows = []
+
+    def execute(self, sql, params=()):
+        sql = " ".join(sql.split())
+        self.log.append((sql.split()[0], params))
+        if sql.startswith("SELECT ref_count"):
+            self.rows = [(1 if params[1] == REUSED else 0,)]
+        else:
+            self.rows = []  # no column references anything
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchmany(self, n):
+        rows, self.rows = self.rows, []
+        return rows
+
+    def fetchall(self):
+        return self.fetchmany(0)
+
+    def close(self):
+        pass
+
+
+class FakeConn:
+    def __init__(self):
+        self.log = []
+
+    def cursor(self):
+        return FakeCursor(self.log)
+
+    def commit(self):
+        self.log.append(("COMMIT", ()))
+
+    def rollback(self):
+        self.log.append(("ROLLBACK", ()))
+
+
+@pytest.fixture
+def root(tmp_path, monkeypatch):
+    for sha in (FREE, REUSED):
+        path = tmp_path / sha[:2] / sha[2:4] / f"{sha}.pdf"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(sha.encode())
+        os.utime(path, (0, 0))
+    monkeypatch.setitem(upload_gc.ROOTS, "test", (str(tmp_path), "", [("t", "file_url")]))
+    return tmp_path
+
+
+def test_delete_skips_blob_referenced_since_the_scan(root):
+    conn = FakeConn()
+    summary = upload_gc.collect_root(conn, "test", mode="delete", force=True)
+
+    assert summary["orphans"] == 2
+    assert summary["removed"] == 1
+    assert summary["kept"] == 1
+    assert not (root / FREE[:2] / FREE[2:4] / f"{FREE}.pdf").exists()
+    assert (root / REUSED[:2] / REUSED[2:4] / f"{REUSED}.pdf").exists()
+    # the free blob: locked, re-checked, removed, row dropped; the reused one: left alone
+    assert [op for op, _ in conn.log[-6:]] == ["SELECT", "SELECT", "DELETE", "COMMIT", "SELECT", "ROLLBACK"]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    queued = []
+    monkeypatch.setattr(uploads, "enqueue_response",
+                        lambda kind, payload: (queued.append(payload), ("", 202))[1])
+    client = app.test_client()
+    client.queued = queued
+    with client.session_transaction() as sess:
+        sess["logged_in"] = True
+    return client
+
+
+@pytest.mark.parametrize("value", ["abc", [], True, 0, 0.5, -1, "nan"])
+def test_gc_rejects_bad_min_age(client, value):
+    response = client.post("/api/uploads/gc", json={"mode": "delete", "force": True, "min_age_hours": value})
+    assert response.status_code == 400
+    assert client.queued == []
+
+
+def test_gc_min_age_defaults_and_parses(client):
+    client.post("/api/uploads/gc", json={})
+    client.post("/api/uploads/gc", json={"min_age_hours": "2"})
+    assert [p["min_age_hours"] for p in client.queued] == [upload_gc.MIN_AGE_HOURS, 2.0]
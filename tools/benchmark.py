@@ -0,0 +1,392 @@
+# tools/benchmark.py
+"""
+Reproducible endpoint benchmark against a local MySQL-compatible server.
+
+Seeds a synthetic dataset (students, assigned fees, payments, finance
+transactions, chat messages), then drives the hot endpoints through the
+Flask test client and reports p50/p95 latency, SQL statements per request
+(from the Server-Timing header added by app/metrics.py) and peak RSS.
+
+Start a throwaway server first, e.g.
+
+    docker run --rm -e MYSQL_ROOT_PASSWORD=bench -p 3306:3306 mysql:8
+
+then:
+
+    python tools/benchmark.py --students 2000 --requests 30
+    python tools/benchmark.py --no-seed --json bench.json
+    python tools/benchmark.py --no-seed --compare bench.json --max-regression 1.25
+
+The target database is DROPPED and recreated when seeding, so its name must
+start with "erp_bench" unless --force is given.
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import resource
+import statistics
+import sys
+import time
+import uuid
+from datetime import date, datetime, timedelta
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from app.schema import recount_chat_messages, upgrade
+
+COURSES = ["BSC NURSING", "BSC NURSING YEARLY", "MSC NURSING", "GNM", "ANM"]
+BATCHES = ["2021", "2022", "2023", "2024", "2025"]
+SESSIONS = ["2023-24", "2024-25", "2025-26"]
+DEPARTMENTS = ["Nursing", "Community Health", "Pediatrics"]
+BRANCHES = ["Main", "City"]
+FEE_HEADS = ["Tuition", "Hostel", "Exam", "Library", "Uniform", "Transport"]
+
+# ============================================
+# Config / connection
+# ============================================
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Seed a synthetic ERP dataset and benchmark hot endpoints.")
+    p.add_argument("--host", default=os.getenv("BENCH_MYSQL_HOST", "127.0.0.1"))
+    p.add_argument("--port", type=int, default=int(os.getenv("BENCH_MYSQL_PORT", 3306)))
+    p.add_argument("--user", default=os.getenv("BENCH_MYSQL_USER", "root"))
+    p.add_argument("--password", default=os.getenv("BENCH_MYSQL_PASSWORD", "bench"))
+    p.add_argument("--database", default=os.getenv("BENCH_MYSQL_DB", "erp_bench"))
+    p.add_argument("--students", type=int, default=2000)
+    p.add_argument("--fees-per-student", type=int, default=4)
+    p.add_argument("--payment-ratio", type=float, default=0.6,
+                   help="fraction of assigned fees with at least one payment")
+    p.add_argument("--transactions", type=int, default=20000)
+    p.add_argument("--chat-requests", type=int, default=50)
+    p.add_argument("--chat-messages", type=int, default=5000)
+    p.add_argument("--requests", type=int, default=20, help="timed requests per endpoint")
+    p.add_argument("--warmup", type=int, default=2)
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--no-seed", action="store_true", help="reuse the existing dataset")
+    p.add_argument("--only", default="", help="comma separated endpoint names to run")
+    p.add_argument("--json", dest="json_out", help="write results to this file")
+    p.add_argument("--compare", help="baseline JSON produced by --json")
+    p.add_argument("--max-regression", type=float, default=1.25,
+                   help="fail when p95 exceeds baseline p95 by this factor")
+    p.add_argument("--force", action="store_true", help="allow a database not named erp_bench*")
+    return p.parse_args(argv)
+
+
+def configure_env(args):
+    """Point every DB helper in the app at the benchmark database (before importing it)."""
+    os.environ["MYSQL_HOST"] = args.host
+    os.environ["MYSQL_PORT"] = str(args.port)
+    os.environ["MYSQL_USER"] = args.user
+    os.environ["MYSQL_PASSWORD"] = args.password
+    os.environ["MYSQL_DB"] = args.database
+    os.environ["MYSQL_DATABASE"] = args.database
+
+
+def server_connection(args, database=None):
+    import mysql.connector
+    return mysql.connector.connect(
+        host=args.host, port=args.port, user=args.user, password=args.password,
+        database=database, autocommit=False,
+    )
+
+
+# ============================================
+# Seeding
+# ============================================
+def _chunks(seq, size):
+    for i in range(0, len(seq), size):
+        yield seq[i:i + size]
+
+
+def _insert(cur, table, cols, rows, batch=1000):
+    sql = f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join(['%s'] * len(cols))})"
+    for chunk in _chunks(rows, batch):
+        cur.executemany(sql, chunk)
+
+
+def seed(args):
+    rnd = random.Random(args.seed)
+    conn = server_connection(args)
+    cur = conn.cursor()
+    cur.execute(f"DROP DATABASE IF EXISTS `{args.database}`")
+    cur.execute(f"CREATE DATABASE `{args.database}` CHARACTER SET utf8mb4")
+    cur.execute(f"USE `{args.database}`")
+    upgrade(conn, log=lambda msg: None)
+
+    now = datetime(2025, 6, 1, 10, 0, 0)
+    t0 = time.perf_counter()
+
+    # students
+    students = []
+    for i in range(args.students):
+        sid = uuid.UUID(int=rnd.getrandbits(128)).hex
+        students.append((
+            sid, f"Student {i:05d}", f"REG{i:06d}", f"TIONS{i}", f"9{rnd.randrange(10**9):09d}",
+            rnd.choice(COURSES), rnd.choice(BATCHES), rnd.choice(SESSIONS),
+            rnd.choice(DEPARTMENTS), rnd.choice(BRANCHES), now,
+        ))
+    _insert(cur, "students",
+            ["id", "name", "register_number", "roll_no", "phone", "course", "batch",
+             "session", "department", "branch", "created_at"], students)
+
+    # fee heads + payment modes
+    heads = [(uuid.UUID(int=rnd.getrandbits(128)).hex, name, 5000 + 1000 * i, "active", now)
+             for i, name in enumerate(FEE_HEADS)]
+    _insert(cur, "fee_heads", ["id", "name", "amount", "status", "created_at"], heads)
+    modes = [(uuid.UUID(int=rnd.getrandbits(128)).hex, name, "[]", now) for name in ("Cash", "UPI", "Cheque")]
+    _insert(cur, "payment_modes", ["id", "name", "fields", "created_at"], modes)
+
+    # accounts
+    _insert(cur, "bank_accounts", ["account_type", "account_name", "opening_balance"],
+            [("CASH", "Cash In Hand", 10000), ("BANK", "SBI Main", 250000), ("BANK", "HDFC Fees", 50000)])
+
+    # assigned fees + payments + receipts
+    assigned, payments, receipts = [], [], []
+    for s in students:
+        for head in rnd.sample(heads, min(args.fees_per_student, len(heads))):
+            aid = uuid.UUID(int=rnd.getrandbits(128)).hex
+            amount = head[2]
+            due = date(2025, rnd.randint(1, 12), rnd.randint(1, 28))
+            paid_total = 0
+            if rnd.random() < args.payment_ratio:
+                for _ in range(rnd.randint(1, 2)):
+                    pid = uuid.UUID(int=rnd.getrandbits(128)).hex
+                    amt = rnd.choice([amount // 2, amount])
+                    paid_total += amt
+                    paid_on = now - timedelta(days=rnd.randint(0, 365), minutes=rnd.randint(0, 600))
+                    payments.append((pid, aid, s[0], amt, rnd.choice(modes)[0], "", paid_on, paid_on))
+                    receipts.append((uuid.UUID(int=rnd.getrandbits(128)).hex, pid,
+                                     f"REC{len(receipts):010d}", paid_on))
+            status = "Paid" if paid_total >= amount else ("Partially Paid" if paid_total else "Not Paid")
+            assigned.append((aid, s[0], head[0], amount, due, status, now))
+    _insert(cur, "assigned_fees",
+            ["id", "student_id", "head_id", "amount", "due_date", "status", "created_at"], assigned)
+    _insert(cur, "fee_payments",
+            ["id", "assigned_fee_id", "student_id", "amount", "payment_mode_id",
+             "reference_no", "paid_on", "created_at"], payments)
+    _insert(cur, "fee_receipts", ["id", "payment_id", "receipt_no", "created_at"], receipts)
+
+    # finance transactions
+    txs = []
+    for _ in range(args.transactions):
+        account_id = rnd.randint(1, 3)
+        mode = "CASH" if account_id == 1 else "BANK"
+        tx_type = rnd.choice(["INCOME", "EXPENSE", "DEPOSIT", "WITHDRAWAL"])
+        txs.append((uuid.UUID(int=rnd.getrandbits(128)).hex, account_id, mode, tx_type,
+                    rnd.randint(100, 20000), rnd.choice(["Fee", "Salary", "Maintenance"]),
+                    "synthetic", date(2025, 1, 1) + timedelta(days=rnd.randint(0, 364))))
+    _insert(cur, "finance_transactions",
+            ["id", "account_id", "transaction_mode", "transaction_type", "amount",
+             "category", "description", "tx_date"], txs)
+
+    # chat
+    _insert(cur, "chat_users", ["username", "password", "full_name", "role"],
+            [("admin", "admin", "Admin", "admin"), ("acct", "acct", "Accountant", "accountant")])
+    _insert(cur, "finance_requests", ["requester_id", "requester_name", "amount", "purpose", "created_at"],
+            [(2, "Accountant", rnd.randint(500, 50000), f"Request {i}", now) for i in range(args.chat_requests)])
+    msgs = []
+    for i in range(args.chat_messages):
+        msgs.append((rnd.randint(1, max(args.chat_requests, 1)), rnd.choice([1, 2]), "User",
+                     f"message {i}", now + timedelta(seconds=i)))
+    _insert(cur, "finance_chat", ["request_id", "sender_id", "sender_name", "message", "created_at"], msgs)
+    recount_chat_messages(cur)  # seeded rows bypass the send path's counters
+
+    conn.commit()
+    cur.close()
+    conn.close()
+
+    print(f"Seeded {len(students)} students, {len(assigned)} assigned fees, {len(payments)} payments, "
+          f"{len(txs)} transactions, {len(msgs)} chat messages in {time.perf_counter() - t0:.1f}s")
+
+
+# ============================================
+# Scenarios
+# ============================================
+def load_fixtures(args):
+    conn = server_connection(args, args.database)
+    cur = conn.cursor()
+    cur.execute("SELECT id FROM students ORDER BY id LIMIT 1")
+    student_id = cur.fetchone()[0]
+    cur.execute("""
+        SELECT af.id, af.student_id FROM assigned_fees af
+        WHERE af.status <> 'Paid' ORDER BY af.id LIMIT 500
+    """)
+    unpaid = cur.fetchall()
+    cur.execute("SELECT id FROM payment_modes ORDER BY name LIMIT 1")
+    mode_id = cur.fetchone()[0]
+    cur.execute("SELECT MIN(id) FROM finance_requests")
+    request_id = cur.fetchone()[0]
+    cur.close()
+    conn.close()
+    return {"student_id": student_id, "unpaid": unpaid, "mode_id": mode_id, "request_id": request_id}
+
+
+def build_scenarios(fx):
+    unpaid = list(fx["unpaid"])
+
+    def collect_payload(i):
+        aid, sid = unpaid[i % len(unpaid)]
+        return {
+            "assigned_fee_id": aid, "student_id": sid, "amount": 100,
+            "payment_mode_id": fx["mode_id"], "account_id": 2,
+            "paid_on": "2025-06-01", "meta": {"utr": f"BENCH{i}"},
+        }
+
+    ledger = "account_id={acc}&from_date=2025-01-01&to_date=2025-12-31"
+    return [
+        ("students_list", "GET", lambda i: "/api/get_students", None, {}),
+        ("session_wise", "GET", lambda i: "/students/session-wise-data?session=2024-25", None, {}),
+        ("pending_fees", "GET", lambda i: "/fees/api/pending", None, {}),
+        ("defaulters", "GET", lambda i: "/fees/api/reports/defaulters", None, {}),
+        ("receipts", "GET", lambda i: "/fees/api/receipts", None, {}),
+        ("student_fees", "GET", lambda i: f"/fees/api/assigned?student_id={fx['student_id']}", None, {}),
+        ("cash_ledger", "GET", lambda i: "/finance/api/cash-report?" + ledger.format(acc=1), None, {}),
+        ("bank_ledger", "GET", lambda i: "/finance/api/bank-report?" + ledger.format(acc=2), None, {}),
+        ("fee_collect", "POST", lambda i: "/fees/collect/pay", collect_payload, {}),
+        ("chat_messages", "GET", lambda i: f"/api/mobile/chat/messages/{fx['request_id']}", None,
+         {"Authorization": "Bearer chat_1"}),
+    ]
+
+
+_QUERIES_RE = re.compile(r'desc="(\d+) queries"')
+
+
+def _peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024.0 * 1024.0) if sys.platform == "darwin" else rss / 1024.0
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[k]
+
+
+def run_scenarios(client, scenarios, args):
+    only = {s.strip() for s in args.only.split(",") if s.strip()}
+    results = {}
+    counter = 0
+    for name, method, url_fn, body_fn, headers in scenarios:
+        if only and name not in only:
+            continue
+        latencies, queries, sizes, errors = [], [], [], 0
+        rss_before = _peak_rss_mb()
+        for i in range(args.warmup + args.requests):
+            counter += 1
+            url = url_fn(counter)
+            kwargs = {"headers": headers}
+            if body_fn:
+                kwargs["json"] = body_fn(counter)
+            start = time.perf_counter()
+            resp = client.open(url, method=method, **kwargs)
+            data = resp.get_data()
+            elapsed = (time.perf_counter() - start) * 1000.0
+            if resp.status_code >= 400:
+                errors += 1
+            if i < args.warmup:
+                continue
+            latencies.append(elapsed)
+            sizes.append(len(data))
+            m = _QUERIES_RE.search(resp.headers.get("Server-Timing", ""))
+            if m:
+                queries.append(int(m.group(1)))
+
+        results[name] = {
+            "p50_ms": round(_percentile(latencies, 50), 2),
+            "p95_ms": round(_percentile(latencies, 95), 2),
+            "mean_ms": round(statistics.mean(latencies), 2) if latencies else 0.0,
+            "queries_per_request": round(statistics.mean(queries), 1) if queries else None,
+            "response_kb": round(statistics.mean(sizes) / 1024.0, 1) if sizes else 0.0,
+            "peak_rss_mb": round(_peak_rss_mb(), 1),
+            "rss_growth_mb": round(_peak_rss_mb() - rss_before, 1),
+            "errors": errors,
+        }
+    return results
+
+
+def print_table(results):
+    header = f"{'endpoint':<16}{'p50 ms':>10}{'p95 ms':>10}{'queries':>10}{'resp KB':>10}{'peak RSS':>10}{'errors':>8}"
+    print(header)
+    print("-" * len(header))
+    for name, r in results.items():
+        q = "-" if r["queries_per_request"] is None else r["queries_per_request"]
+        print(f"{name:<16}{r['p50_ms']:>10}{r['p95_ms']:>10}{q:>10}{r['response_kb']:>10}"
+              f"{r['peak_rss_mb']:>10}{r['errors']:>8}")
+
+
+def compare(results, baseline_path, factor):
+    with open(baseline_path) as fh:
+        baseline = json.load(fh).get("results", {})
+    failed = []
+    for name, r in results.items():
+        base = baseline.get(name)
+        if not base or not base.get("p95_ms"):
+            continue
+        ratio = r["p95_ms"] / base["p95_ms"]
+        q_now, q_base = r.get("queries_per_request"), base.get("queries_per_request")
+        status = "ok"
+        if ratio > factor:
+            status = "REGRESSED"
+            failed.append(name)
+        elif q_now is not None and q_base is not None and q_now > q_base:
+            status = "MORE QUERIES"
+            failed.append(name)
+        print(f"{name:<16} p95 {base['p95_ms']:>8} -> {r['p95_ms']:>8} ms (x{ratio:.2f})  "
+              f"queries {q_base} -> {q_now}  {status}")
+    return failed
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not args.database.startswith("erp_bench") and not args.force:
+        print(f"Refusing to use database '{args.database}' (name must start with erp_bench, or pass --force)")
+        return 2
+
+    configure_env(args)
+    if not args.no_seed:
+        seed(args)
+
+    fx = load_fixtures(args)
+
+    from app.main import app  # imported after env is pointed at the bench DB
+
+    app.testing = True
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess["logged_in"] = True
+        sess["username"] = "bench"
+
+    results = run_scenarios(client, build_scenarios(fx), args)
+    print()
+    print_table(results)
+
+    if args.json_out:
+        with open(args.json_out, "w") as fh:
+            json.dump({
+                "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+                "dataset": {
+                    "students": args.students, "fees_per_student": args.fees_per_student,
+                    "transactions": args.transactions, "chat_messages": args.chat_messages,
+                },
+                "results": results,
+            }, fh, indent=2)
+        print(f"\nResults written to {args.json_out}")
+
+    if args.compare:
+        print()
+        failed = compare(results, args.compare, args.max_regression)
+        if failed:
+            print(f"\n❌ Regressions: {', '.join(failed)}")
+            return 1
+        print("\n✅ No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
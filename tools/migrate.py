@@ -0,0 +1,82 @@
+"""
+Schema migrations / index audit.
+
+    python tools/migrate.py status
+    python tools/migrate.py upgrade [--to N] [--dry-run]
+    python tools/migrate.py explain [--strict]
+
+Uses the same MYSQL_* environment (.env) as the app.
+"""
+
+import argparse
+import os
+import sys
+
+from dotenv import load_dotenv
+
+# Add project root to PATH
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+load_dotenv(os.path.join(ROOT_DIR, ".env"))
+
+from app.db import get_mysql_connection
+from app.schema import upgrade, status, explain_audit
+
+
+def cmd_status(conn, args):
+    for version, description, applied in status(conn):
+        print(f"{'✅' if applied else '⏳'} {version:04d} {description}")
+    return 0
+
+
+def cmd_upgrade(conn, args):
+    applied = upgrade(conn, target=args.to, dry_run=args.dry_run)
+    if not applied:
+        print("Schema is up to date.")
+    elif args.dry_run:
+        print(f"Would apply: {', '.join(str(v) for v in applied)}")
+    else:
+        print(f"Applied: {', '.join(str(v) for v in applied)}")
+    return 0
+
+
+def cmd_explain(conn, args):
+    report = explain_audit(conn)
+    scans = 0
+    for row in report:
+        if row.get("error"):
+            print(f"⚠️  {row['query']:<28} EXPLAIN failed: {row['error']}")
+            continue
+        flag = "❌ FULL SCAN" if row["full_scan"] else "✅"
+        if row["full_scan"]:
+            scans += 1
+        print(f"{flag:<12} {row['query']:<28} table={row['table']} type={row['type']} "
+              f"key={row['key']} rows={row['rows']}")
+    print(f"\n{scans} full table scan(s) in {len({r['query'] for r in report})} queries")
+    return 1 if (scans and args.strict) else 0
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="ERP schema migrations")
+    sub = p.add_subparsers(dest="command", required=True)
+    sub.add_parser("status")
+    up = sub.add_parser("upgrade")
+    up.add_argument("--to", type=int, help="stop after this version")
+    up.add_argument("--dry-run", action="store_true")
+    ex = sub.add_parser("explain")
+    ex.add_argument("--strict", action="store_true", help="exit 1 when a full scan is found")
+    args = p.parse_args(argv)
+
+    conn = get_mysql_connection()
+    if conn is None:
+        print("❌ Could not connect to MySQL")
+        return 2
+    try:
+        return {"status": cmd_status, "upgrade": cmd_upgrade, "explain": cmd_explain}[args.command](conn, args)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,46 @@
+"""
+Background job worker (see app/jobs.py).
+
+    python tools/run_jobs.py                 # run forever (Procfile `worker`)
+    python tools/run_jobs.py --once          # drain the queue and exit (cron)
+    python tools/run_jobs.py --kind fees.report_export --kind roll.generate
+
+Uses the same MYSQL_* environment (.env) as the app. Run as many workers
+as the database can take; each claims one job at a time.
+"""
+
+import argparse
+import os
+import sys
+
+from dotenv import load_dotenv
+
+# Add project root to PATH
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+load_dotenv(os.path.join(ROOT_DIR, ".env"))
+
+import app.main  # noqa: F401  (imports the routers, which register their tasks)
+from app import jobs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--kind", action="append", help="only run these job kinds (repeatable)")
+    parser.add_argument("--once", action="store_true", help="exit when the queue is empty")
+    args = parser.parse_args(argv)
+
+    unknown = set(args.kind or []) - set(jobs.registered())
+    if unknown:
+        parser.error(f"unknown job kind(s): {', '.join(sorted(unknown))}")
+
+    try:
+        jobs.run_worker(kinds=args.kind, once=args.once)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,40 @@
+"""
+Finance outbox consumer (see app/finance_outbox.py): posts fee payments
+to finance_transactions.
+
+    python tools/run_outbox.py               # run forever (Procfile `outbox`)
+    python tools/run_outbox.py --once        # drain what is due and exit (cron)
+
+Uses the same MYSQL_* environment (.env) as the app. Several consumers
+can run at once; batches are claimed with SKIP LOCKED.
+"""
+
+import argparse
+import os
+import sys
+
+from dotenv import load_dotenv
+
+# Add project root to PATH
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+load_dotenv(os.path.join(ROOT_DIR, ".env"))
+
+from app import finance_outbox
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--once", action="store_true", help="exit when nothing is due")
+    args = parser.parse_args(argv)
+
+    try:
+        finance_outbox.run_consumer(once=args.once)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""
+Find (and optionally remove) uploaded files no DB row points at.
+See app/upload_gc.py.
+
+    python tools/upload_gc.py                        # dry run, all roots
+    python tools/upload_gc.py --root chat --root finance
+    python tools/upload_gc.py --quarantine           # move to <root>/.quarantine/<stamp>/
+    python tools/upload_gc.py --delete --csv orphans.csv
+
+Uses the same MYSQL_* / STORAGE_BACKEND environment (.env) as the app.
+"""
+
+import argparse
+import os
+import sys
+
+from dotenv import load_dotenv
+
+# Add project root to PATH
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+load_dotenv(os.path.join(ROOT_DIR, ".env"))
+
+from app import upload_gc
+from app.db import get_mysql_connection
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--root", action="append", choices=sorted(upload_gc.ROOTS),
+                        help="only these upload roots (repeatable)")
+    action = parser.add_mutually_exclusive_group()
+    action.add_argument("--delete", action="store_true", help="delete orphans")
+    action.add_argument("--quarantine", action="store_true", help="move orphans aside (local storage)")
+    parser.add_argument("--min-age", type=float, default=upload_gc.MIN_AGE_HOURS,
+                        help="ignore files younger than this many hours (default %(default)s)")
+    parser.add_argument("--force", action="store_true",
+                        help=f"act even when more than {upload_gc.MAX_ORPHAN_SHARE:.0%} of a root looks orphaned")
+    parser.add_argument("--csv", help="write the orphan list to this file")
+    args = parser.parse_args(argv)
+
+    mode = "delete" if args.delete else "quarantine" if args.quarantine else "dry_run"
+
+    conn = get_mysql_connection()
+    if conn is None:
+        print("❌ Could not connect to MySQL (check MYSQL_* in .env)")
+        return 1
+    try:
+        summaries, report = upload_gc.collect(conn, args.root, mode, args.min_age, args.force)
+    finally:
+        conn.close()
+
+    failed = False
+    for s in summaries:
+        if s.get("error"):
+            failed = True
+            print(f"❌ {s['root']:<12} {s['error']}")
+            continue
+        print(f"{'🧹' if s['removed'] else '·'} {s['root']:<12} files={s['files']} orphans={s['orphans']} "
+              f"({s['orphan_bytes'] / 1048576:.1f} MB) recent={s['recent']} "
+              f"removed={s['removed']} kept={s['kept']} temp_removed={s['temp_removed']}")
+        if s.get("skipped"):
+            print(f"    ⚠️ not removed: {s['skipped']}")
+
+    if args.csv:
+        with open(args.csv, "w") as f:
+            f.write(upload_gc.report_csv(report))
+        print(f"📄 {len(report)} orphans written to {args.csv}")
+    if mode == "dry_run" and report:
+        print("Dry run - re-run with --quarantine or --delete to act.")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())